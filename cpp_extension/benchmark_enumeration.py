@@ -0,0 +1,75 @@
+"""CPU枚举内核微基准
+
+在构建好的扩展目录下运行(python setup.py build_ext --inplace 之后):
+    python benchmark_enumeration.py
+    python benchmark_enumeration.py --cases 500:4 200:5 --workers 1
+    python benchmark_enumeration.py --max-solutions 1000 --repeat 5
+
+使用固定随机种子生成的模组, 输出每个用例的组合总数, 耗时与组合/秒.
+较大的--max-solutions让更多组合进入top-K缓冲区, 主要衡量解的打包与堆合并吞吐;
+--repeat取多次运行中最快的一次, 减小机器抖动的影响
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from math import comb
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import module_optimizer_cpp as cpp
+from module_types import BASIC_ATTR_IDS, SPECIAL_ATTR_IDS, MODULE_ATTR_NAMES
+
+
+def build_modules(count: int, seed: int = 20240601):
+    """生成属性分布接近真实背包的模组: 1~3条属性, 特殊属性占少数"""
+    rng = random.Random(seed)
+    basic_ids = sorted(BASIC_ATTR_IDS)
+    special_ids = sorted(SPECIAL_ATTR_IDS)
+    modules = []
+    for uuid in range(count):
+        part_count = rng.choice((1, 2, 2, 3, 3, 3))
+        attr_ids = rng.sample(basic_ids, part_count)
+        if part_count == 3 and rng.random() < 0.3:
+            attr_ids[-1] = rng.choice(special_ids)
+        parts = [
+            cpp.ModulePart(attr_id, MODULE_ATTR_NAMES.get(attr_id, str(attr_id)), rng.randint(1, 10))
+            for attr_id in attr_ids
+        ]
+        modules.append(cpp.ModuleInfo("bench", 5500101, uuid + 1, 4, parts))
+    return modules
+
+
+def run_case(module_count: int, combination_size: int, workers: int, max_solutions: int, repeat: int = 1):
+    modules = build_modules(module_count)
+    total = comb(module_count, combination_size)
+    elapsed = float("inf")
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        solutions = cpp.strategy_enumeration_cpp(
+            modules, set(), set(), {}, max_solutions, workers, combination_size)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    best = solutions[0].score if solutions else 0
+    print(f"C({module_count},{combination_size}) = {total:,} combinations, "
+          f"{elapsed:.2f}s, {total / elapsed / 1e6:.1f}M comb/s, best={best}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU枚举内核微基准")
+    parser.add_argument("--cases", nargs="+", default=["500:4", "200:5"],
+                        help="模组数:组合长度, 默认 500:4 200:5")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="线程数")
+    parser.add_argument("--max-solutions", type=int, default=100, help="保留解数量")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例运行次数, 取最快一次")
+    args = parser.parse_args()
+
+    for case in args.cases:
+        module_count, combination_size = (int(x) for x in case.split(":"))
+        run_case(module_count, combination_size, args.workers, args.max_solutions, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
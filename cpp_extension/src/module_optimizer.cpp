@@ -1,6 +1,7 @@
 #include <immintrin.h>
 
 #include "module_optimizer.h"
+#include "search_budget.h"
 
 #ifdef USE_CUDA
 // 外部CUDA函数声明
@@ -13,7 +14,9 @@ extern "C" int GpuStrategyEnumeration(
     int max_solutions,
     int* result_scores,
     long long* result_indices,
-    int combination_size);
+    int combination_size,
+    int (*poll)(void*, long long, long long, int),
+    void* poll_context);
 #endif
 
 namespace {
@@ -24,16 +27,26 @@ using CompactMinHeap =
 
 constexpr int kMaxSlotValue = 20;
 constexpr int kMaxTotalAttrValue = 120;
+/// slot_value_power末尾附带总属性值战斗力表, 锁定模组时与槽位表一起平移
+constexpr int kTotalPowerOffset = Constants::CUDA_ATTR_DIM * 21;
 constexpr int kMinGreedyScanBase = 64;
 constexpr int kGreedyScanPerRemainingSlot = 32;
 
 static_assert(Constants::CUDA_ATTR_DIM == 24, "AVX2 helpers assume 24 dense slots");
+static_assert(sizeof(CompactSolution) == 16, "CompactSolution should stay 16 bytes for heap throughput");
 
 struct DenseModuleData {
     DenseSlotArray slot_values = {};
     int total_attr_value = 0;
+    /// config_id所属的大类(攻击/治疗/防护), 只有同一大类且属性相同的模组才是等价模组
+    int category = 0;
 };
 
+/// 两个模组能否合并为同一等价类
+bool SameModuleClass(const DenseModuleData& lhs, const DenseModuleData& rhs) {
+    return lhs.category == rhs.category && lhs.slot_values == rhs.slot_values;
+}
+
 struct ClusteredBeamModule {
     const ModuleInfo* module = nullptr;
     DenseModuleData dense;
@@ -50,6 +63,8 @@ struct BeamState {
     int total_attr_value = 0;
     int current_score = 0;
     int bound_score = 0;
+    // 子树内组合分数的上界, 用于统计被宽度淘汰的状态还可能达到的分数
+    int upper_bound = 0;
     int depth = 0;
     int last_index = -1;
 };
@@ -64,7 +79,11 @@ bool BetterBeamState(const BeamState& lhs, const BeamState& rhs) {
     if (lhs.depth != rhs.depth) {
         return lhs.depth > rhs.depth;
     }
-    return lhs.last_index < rhs.last_index;
+    if (lhs.last_index != rhs.last_index) {
+        return lhs.last_index < rhs.last_index;
+    }
+    // 全序比较, 保证并行扩展分块选出的前beam_width个与串行一致
+    return lhs.indices < rhs.indices;
 }
 
 inline void AddSlotArrays(DenseSlotArray& dst, const DenseSlotArray& src) {
@@ -79,19 +98,6 @@ inline void AddSlotArrays(DenseSlotArray& dst, const DenseSlotArray& src) {
     }
 }
 
-inline void AddSuffixUpperBound(
-    DenseSlotArray& dst,
-    size_t next_start,
-    int remaining_slots,
-    const std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM>& suffix_slot_best) {
-
-    DenseSlotArray suffix_delta = {};
-    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
-        suffix_delta[slot] = suffix_slot_best[slot][next_start][remaining_slots];
-    }
-    AddSlotArrays(dst, suffix_delta);
-}
-
 inline bool MeetsMinAttrRequirements(
     const DenseSlotArray& slot_sums,
     const std::vector<int>& min_attr_requirements) {
@@ -112,7 +118,8 @@ inline int CurrentBeamThreshold(const CompactMinHeap& top_solutions, int max_sol
     return top_solutions.top().score;
 }
 
-void TrimBeamStates(std::vector<BeamState>& states, int limit, bool keep_sorted_prefix) {
+/// 保留前limit个状态; dropped_bound非空时记录被淘汰状态的最高上界
+void TrimBeamStates(std::vector<BeamState>& states, int limit, bool keep_sorted_prefix, int* dropped_bound = nullptr) {
     if (states.empty()) {
         return;
     }
@@ -130,6 +137,11 @@ void TrimBeamStates(std::vector<BeamState>& states, int limit, bool keep_sorted_
     } else {
         std::nth_element(states.begin(), middle, states.end(), BetterBeamState);
     }
+    if (dropped_bound != nullptr) {
+        for (auto it = middle; it != states.end(); ++it) {
+            *dropped_bound = std::max(*dropped_bound, it->upper_bound);
+        }
+    }
     states.resize(static_cast<size_t>(limit));
 }
 
@@ -137,7 +149,7 @@ std::vector<int> BuildSlotValuePower(
     const std::unordered_set<int>& target_attributes,
     const std::unordered_set<int>& exclude_attributes) {
 
-    std::vector<int> slot_value_power(Constants::CUDA_ATTR_DIM * 21, 0);
+    std::vector<int> slot_value_power(kTotalPowerOffset + kMaxTotalAttrValue + 1, 0);
     for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
         const int attr_id = Constants::CUDA_SLOT_ATTR_IDS[slot];
         int multiplier = 1;
@@ -167,9 +179,16 @@ std::vector<int> BuildSlotValuePower(
                 (max_level > 0 ? power_values[max_level - 1] * multiplier : 0);
         }
     }
+    for (int total = 0; total <= kMaxTotalAttrValue; ++total) {
+        slot_value_power[kTotalPowerOffset + total] = Constants::TOTAL_ATTR_POWER_VALUES[total];
+    }
     return slot_value_power;
 }
 
+inline int TotalAttrPower(const std::vector<int>& slot_value_power, int total_attr_value) {
+    return slot_value_power[kTotalPowerOffset + std::min(total_attr_value, kMaxTotalAttrValue)];
+}
+
 std::vector<int> BuildMinAttrRequirementsDense(
     const std::unordered_map<int, int>& min_attr_sum_requirements) {
 
@@ -187,6 +206,7 @@ std::vector<DenseModuleData> BuildDenseModuleData(const std::vector<ModuleInfo>&
     std::vector<DenseModuleData> dense_modules(modules.size());
     for (size_t module_idx = 0; module_idx < modules.size(); ++module_idx) {
         auto& dense = dense_modules[module_idx];
+        dense.category = modules[module_idx].config_id / 100;
         for (const auto& part : modules[module_idx].parts) {
             auto slot_it = Constants::CUDA_ATTR_SLOT_MAP.find(part.id);
             if (slot_it != Constants::CUDA_ATTR_SLOT_MAP.end()) {
@@ -198,6 +218,27 @@ std::vector<DenseModuleData> BuildDenseModuleData(const std::vector<ModuleInfo>&
     return dense_modules;
 }
 
+/// 模组的稀疏槽位表示, 单个模组只占用少数几个槽位
+struct SparseModuleSlots {
+    std::array<uint8_t, Constants::CUDA_ATTR_DIM> slots = {};
+    std::array<int, Constants::CUDA_ATTR_DIM> values = {};
+    uint32_t slot_mask = 0;
+    int count = 0;
+};
+
+SparseModuleSlots BuildSparseModuleSlots(const DenseModuleData& dense) {
+    SparseModuleSlots sparse;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        if (dense.slot_values[slot] != 0) {
+            sparse.slots[static_cast<size_t>(sparse.count)] = static_cast<uint8_t>(slot);
+            sparse.values[static_cast<size_t>(sparse.count)] = dense.slot_values[slot];
+            sparse.slot_mask |= (1u << slot);
+            ++sparse.count;
+        }
+    }
+    return sparse;
+}
+
 int CalculateDenseScore(
     const DenseSlotArray& slot_sums,
     int total_attr_value,
@@ -207,7 +248,7 @@ int CalculateDenseScore(
     for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
         threshold_power += slot_value_power[slot * 21 + std::min(slot_sums[slot], kMaxSlotValue)];
     }
-    return threshold_power + Constants::TOTAL_ATTR_POWER_VALUES[std::min(total_attr_value, kMaxTotalAttrValue)];
+    return threshold_power + TotalAttrPower(slot_value_power, total_attr_value);
 }
 
 inline int CalculateDenseScoreWithDelta(
@@ -221,10 +262,124 @@ inline int CalculateDenseScoreWithDelta(
         const int combined = std::min(base_slots[slot] + delta_slots[slot], kMaxSlotValue);
         threshold_power += slot_value_power[slot * 21 + combined];
     }
-    return threshold_power + Constants::TOTAL_ATTR_POWER_VALUES[std::min(total_attr_value, kMaxTotalAttrValue)];
+    return threshold_power + TotalAttrPower(slot_value_power, total_attr_value);
+}
+
+/// 锁定/禁用模组约束: 禁用模组在构建稠密数据前剔除, 锁定模组合并为固定的属性基底,
+/// 搜索只需在剩余模组中选出free_size = combination_size - 锁定数量个模组
+struct ModuleConstraintPlan {
+    std::vector<ModuleInfo> free_modules;
+    std::vector<ModuleInfo> locked_modules;
+    DenseModuleData locked_base;
+    int free_size = 0;
+};
+
+/// 剩余位置少于该值时组合数很少, 所有策略都直接走CPU枚举
+constexpr int kMinConstrainedSearchSize = 3;
+
+/// 锁定的uuid不存在, 被同时禁用或数量超过组合长度时返回false
+bool BuildModuleConstraintPlan(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int combination_size,
+    ModuleConstraintPlan& plan) {
+
+    std::unordered_set<int> seen_locked;
+    plan.free_modules.reserve(modules.size());
+    for (const auto& module : modules) {
+        if (banned_uuids.find(module.uuid) != banned_uuids.end()) {
+            continue;
+        }
+        if (locked_uuids.find(module.uuid) != locked_uuids.end()) {
+            if (seen_locked.insert(module.uuid).second) {
+                plan.locked_modules.push_back(module);
+            }
+            continue;
+        }
+        plan.free_modules.push_back(module);
+    }
+    if (plan.locked_modules.size() != locked_uuids.size()) {
+        return false;
+    }
+    // 组合下标以16位存储, 超出上限的模组池无法编码
+    if (plan.free_modules.size() > Constants::MAX_SEARCH_MODULES) {
+        return false;
+    }
+    plan.free_size = combination_size - static_cast<int>(plan.locked_modules.size());
+    if (plan.free_size < 0) {
+        return false;
+    }
+    for (const auto& dense : BuildDenseModuleData(plan.locked_modules)) {
+        AddSlotArrays(plan.locked_base.slot_values, dense.slot_values);
+        plan.locked_base.total_attr_value += dense.total_attr_value;
+    }
+    return true;
+}
+
+/// 锁定基底折算进查表: 剩余模组属性和为v时实际属性和为v+基底, 查表上限之后的结果不变, 因此平移后的表同样精确.
+/// 最小属性和约束相应扣除基底
+void ApplyLockedBase(
+    const DenseModuleData& locked_base,
+    std::vector<int>& slot_value_power,
+    std::vector<int>& min_attr_requirements) {
+
+    const std::vector<int> original = slot_value_power;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        const int base = locked_base.slot_values[slot];
+        if (base == 0) {
+            continue;
+        }
+        for (int value = 0; value <= kMaxSlotValue; ++value) {
+            slot_value_power[slot * 21 + value] = original[slot * 21 + std::min(value + base, kMaxSlotValue)];
+        }
+        min_attr_requirements[slot] = std::max(0, min_attr_requirements[slot] - base);
+    }
+    for (int total = 0; total <= kMaxTotalAttrValue; ++total) {
+        slot_value_power[kTotalPowerOffset + total] =
+            original[kTotalPowerOffset + std::min(total + locked_base.total_attr_value, kMaxTotalAttrValue)];
+    }
+}
+
+/// 结果前补上锁定模组, 并按完整组合重新统计属性
+std::vector<ModuleSolution> AttachLockedModules(
+    const ModuleConstraintPlan& plan,
+    std::vector<ModuleSolution> solutions) {
+
+    if (plan.locked_modules.empty()) {
+        return solutions;
+    }
+    for (auto& solution : solutions) {
+        solution.modules.insert(solution.modules.begin(), plan.locked_modules.begin(), plan.locked_modules.end());
+        solution.attr_breakdown = ModuleOptimizerCpp::CalculateCombatPower(solution.modules).second;
+        if (!solution.equivalent_uuids.empty()) {
+            solution.equivalent_uuids.insert(
+                solution.equivalent_uuids.begin(), plan.locked_modules.size(), std::vector<int>{});
+        }
+    }
+    return solutions;
+}
+
+/// 全部位置都被锁定时唯一的组合就是锁定模组本身
+std::vector<ModuleSolution> BuildLockedOnlySolutions(
+    const ModuleConstraintPlan& plan,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements) {
+
+    if (!MeetsMinAttrRequirements(DenseSlotArray{}, min_attr_requirements)) {
+        return {};
+    }
+    std::vector<ModuleSolution> solutions;
+    solutions.emplace_back(
+        std::vector<ModuleInfo>{},
+        CalculateDenseScore(DenseSlotArray{}, 0, slot_value_power),
+        std::map<std::string, int>{});
+    solutions.back().certified = true;
+    return AttachLockedModules(plan, std::move(solutions));
 }
 
-inline bool NextCombination(uint16_t* comb, size_t r, size_t n) {
+/// 推进到下一个组合, 返回发生变化的最左位置, 已是最后一个组合时返回-1
+inline int NextCombination(uint16_t* comb, size_t r, size_t n) {
     for (int pos = static_cast<int>(r) - 1; pos >= 0; --pos) {
         uint16_t limit = static_cast<uint16_t>(n - r + pos);
         if (comb[pos] < limit) {
@@ -232,34 +387,49 @@ inline bool NextCombination(uint16_t* comb, size_t r, size_t n) {
             for (size_t k = pos + 1; k < r; ++k) {
                 comb[k] = static_cast<uint16_t>(comb[k - 1] + 1);
             }
-            return true;
+            return pos;
         }
     }
-    return false;
+    return -1;
 }
 
-uint64_t PackIndices(const uint16_t* indices, int combination_size) {
-    uint64_t packed = 0;
-    for (int i = 0; i < combination_size; ++i) {
-        packed |= (static_cast<uint64_t>(indices[i] & 0x0FFFu) << (i * 12));
+/// 前depth+1个位置固定时, 从当前组合(含)到该前缀下最后一个组合的数量
+inline size_t RemainingWithPrefix(const uint16_t* comb, size_t depth, size_t r, size_t n) {
+    size_t remaining = CombinationCount(n - comb[depth] - 1, r - depth - 1);
+    for (size_t j = depth + 1; j < r; ++j) {
+        remaining -= CombinationCount(n - comb[j - 1] - 1, r - j) - CombinationCount(n - comb[j], r - j);
     }
+    return remaining;
+}
+
+PackedIndices PackIndices(const uint16_t* indices, int combination_size) {
+    PackedIndices packed;
+    std::copy(indices, indices + combination_size, packed.indices.begin());
     return packed;
 }
 
+/// 组合分数, 不满足最小属性和约束时返回-1
 int CalculateDenseScoreByIndices(
-    const std::vector<size_t>& indices,
+    const PackedIndices& indices,
+    int combination_size,
     const std::vector<DenseModuleData>& dense_modules,
-    const std::vector<int>& slot_value_power) {
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements) {
 
     DenseSlotArray slot_sums = {};
     int total_attr_value = 0;
-    for (size_t index : indices) {
-        AddSlotArrays(slot_sums, dense_modules[index].slot_values);
-        total_attr_value += dense_modules[index].total_attr_value;
+    for (int i = 0; i < combination_size; ++i) {
+        const auto& module = dense_modules[indices.indices[static_cast<size_t>(i)]];
+        AddSlotArrays(slot_sums, module.slot_values);
+        total_attr_value += module.total_attr_value;
+    }
+    if (!MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+        return -1;
     }
     return CalculateDenseScore(slot_sums, total_attr_value, slot_value_power);
 }
 
+#ifdef USE_CUDA
 std::vector<int> BuildDenseModuleMatrix(const std::vector<DenseModuleData>& dense_modules) {
     std::vector<int> module_matrix(
         dense_modules.size() * static_cast<size_t>(Constants::CUDA_ATTR_DIM), 0);
@@ -271,6 +441,7 @@ std::vector<int> BuildDenseModuleMatrix(const std::vector<DenseModuleData>& dens
     }
     return module_matrix;
 }
+#endif
 
 std::vector<ClusteredBeamModule> BuildClusteredBeamModules(
     const std::vector<ModuleInfo>& modules,
@@ -408,20 +579,61 @@ bool CanSatisfyMinRequirements(
     return true;
 }
 
-int CalculateOptimisticBound(
+/// 在后缀上界基础上增加词条数约束: 剩余k个模组最多只能抬升 k*max_module_slots 个槽位,
+/// 因此只累加收益最大的这些槽位
+int CalculatePartLimitedBound(
     const DenseSlotArray& slot_sums,
     int total_attr_value,
     size_t next_start,
     int remaining_slots,
+    int max_module_slots,
     const std::vector<int>& slot_value_power,
     const std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM>& suffix_slot_best,
     const std::vector<BeamPickArray>& suffix_total_best) {
 
-    DenseSlotArray optimistic_slots = slot_sums;
-    AddSuffixUpperBound(optimistic_slots, next_start, remaining_slots, suffix_slot_best);
+    DenseSlotArray gains = {};
+    int base_power = 0;
+    int positive_gains = 0;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        const int current = std::min(slot_sums[slot], kMaxSlotValue);
+        const int optimistic = std::min(
+            slot_sums[slot] + suffix_slot_best[slot][next_start][remaining_slots], kMaxSlotValue);
+        const int current_power = slot_value_power[slot * 21 + current];
+        base_power += current_power;
+        gains[slot] = slot_value_power[slot * 21 + optimistic] - current_power;
+        positive_gains += gains[slot] > 0 ? 1 : 0;
+    }
+
+    const int gain_limit = remaining_slots * max_module_slots;
+    if (positive_gains > gain_limit) {
+        std::nth_element(gains.begin(), gains.begin() + gain_limit, gains.end(), std::greater<int>());
+    }
+    const int counted = std::min(positive_gains, gain_limit);
+    if (positive_gains > gain_limit) {
+        for (int i = 0; i < counted; ++i) {
+            base_power += gains[i];
+        }
+    } else {
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            base_power += gains[slot];
+        }
+    }
+
     const int optimistic_total_attr =
         total_attr_value + suffix_total_best[next_start][remaining_slots];
-    return CalculateDenseScore(optimistic_slots, optimistic_total_attr, slot_value_power);
+    return base_power + TotalAttrPower(slot_value_power, optimistic_total_attr);
+}
+
+int CountMaxModuleSlots(const std::vector<DenseModuleData>& dense_modules) {
+    int max_slots = 1;
+    for (const auto& dense : dense_modules) {
+        int used = 0;
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            used += dense.slot_values[slot] > 0 ? 1 : 0;
+        }
+        max_slots = std::max(max_slots, used);
+    }
+    return max_slots;
 }
 
 int GreedyCompletionScore(
@@ -475,68 +687,125 @@ int GreedyCompletionScore(
     return greedy_score;
 }
 
-uint64_t PackIndicesFromState(const BeamState& state);
+PackedIndices PackIndicesFromState(const BeamState& state);
 
-bool IsCombinationUniqueLocal(
-    const std::vector<size_t>& indices,
-    const std::set<std::vector<size_t>>& seen_combinations) {
+/// 组合去重用的开放寻址集合, 键为升序排列的下标与其64位哈希, 元素内联存放不做逐个分配
+class PackedIndexSet {
+public:
+    explicit PackedIndexSet(size_t expected_size) {
+        size_t capacity = 16;
+        while (capacity < expected_size * 2) {
+            capacity <<= 1;
+        }
+        slots_.resize(capacity);
+    }
 
-    std::vector<size_t> sorted_indices = indices;
-    std::sort(sorted_indices.begin(), sorted_indices.end());
-    return seen_combinations.find(sorted_indices) == seen_combinations.end();
+    /// 插入升序排列的组合下标, 已存在时返回false
+    bool Insert(const PackedIndices& key) {
+        if ((size_ + 1) * 2 > slots_.size()) {
+            Grow();
+        }
+        const uint64_t hash = static_cast<uint64_t>(PackedIndicesHash()(key)) | 1ull;
+        const size_t mask = slots_.size() - 1;
+        for (size_t pos = static_cast<size_t>(hash) & mask;; pos = (pos + 1) & mask) {
+            auto& slot = slots_[pos];
+            if (slot.hash == 0) {
+                slot.hash = hash;
+                slot.key = key;
+                ++size_;
+                return true;
+            }
+            if (slot.hash == hash && slot.key == key) {
+                return false;
+            }
+        }
+    }
+
+private:
+    struct Slot {
+        // 0表示空槽, 插入时哈希的最低位固定为1
+        uint64_t hash = 0;
+        PackedIndices key;
+    };
+
+    void Grow() {
+        std::vector<Slot> old_slots(slots_.size() * 2);
+        old_slots.swap(slots_);
+        const size_t mask = slots_.size() - 1;
+        for (const auto& slot : old_slots) {
+            if (slot.hash == 0) {
+                continue;
+            }
+            size_t pos = static_cast<size_t>(slot.hash) & mask;
+            while (slots_[pos].hash != 0) {
+                pos = (pos + 1) & mask;
+            }
+            slots_[pos] = slot;
+        }
+    }
+
+    std::vector<Slot> slots_;
+    size_t size_ = 0;
+};
+
+/// 定长下标数组的前length个元素升序排列, length超出数组长度时按数组长度截断;
+/// 组合最多5个模组, 插入排序即可
+template <size_t N>
+inline void SortIndexPrefix(std::array<uint16_t, N>& indices, size_t length) {
+    length = std::min(length, N);
+    for (size_t i = 1; i < length; ++i) {
+        const uint16_t value = indices[i];
+        size_t j = i;
+        for (; j > 0 && indices[j - 1] > value; --j) {
+            indices[j] = indices[j - 1];
+        }
+        indices[j] = value;
+    }
+}
+
+/// 组合去重的键: 前combination_size个下标升序排列
+inline PackedIndices SortedCombinationKey(PackedIndices indices, int combination_size) {
+    SortIndexPrefix(indices.indices, static_cast<size_t>(std::max(0, combination_size)));
+    return indices;
 }
 
-LightweightSolution LocalSearchImproveByIndicesLocal(
-    const LightweightSolution& solution,
+/// 随机替换单个位置的局部搜索, 下标保存在定长数组中, 每次尝试不产生堆分配; 只接受满足最小属性和约束的替换
+CompactSolution LocalSearchImproveByIndicesLocal(
+    const CompactSolution& solution,
+    int combination_size,
     const std::vector<DenseModuleData>& dense_modules,
-    const std::vector<ModuleInfo>& all_modules,
     int iterations,
-    const std::vector<int>& slot_value_power) {
-
-    LightweightSolution best_solution = solution;
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    std::mt19937& gen) {
 
-    std::random_device rd;
-    std::mt19937 gen(rd());
-    std::uniform_int_distribution<> module_dis(0, static_cast<int>(all_modules.size()) - 1);
+    CompactSolution best_solution = solution;
+    std::uniform_int_distribution<> module_dis(0, static_cast<int>(dense_modules.size()) - 1);
+    const int candidate_count = std::min(20, static_cast<int>(dense_modules.size()));
+    auto& best_indices = best_solution.packed_indices.indices;
 
     for (int iteration = 0; iteration < iterations; ++iteration) {
         bool improved = false;
 
-        for (size_t i = 0; i < best_solution.module_indices.size(); ++i) {
-            int candidate_count = std::min(20, static_cast<int>(all_modules.size()));
-            std::vector<size_t> candidates;
-
+        for (int i = 0; i < combination_size && !improved; ++i) {
             for (int j = 0; j < candidate_count; ++j) {
-                candidates.push_back(static_cast<size_t>(module_dis(gen)));
-            }
-
-            for (size_t new_module_idx : candidates) {
-                bool already_included = false;
-                for (size_t existing_idx : best_solution.module_indices) {
-                    if (existing_idx == new_module_idx) {
-                        already_included = true;
-                        break;
-                    }
-                }
-                if (already_included) {
+                const auto new_module_idx = static_cast<uint16_t>(module_dis(gen));
+                if (std::find(best_indices.begin(), best_indices.begin() + combination_size, new_module_idx) !=
+                    best_indices.begin() + combination_size) {
                     continue;
                 }
 
-                std::vector<size_t> new_indices = best_solution.module_indices;
-                new_indices[i] = new_module_idx;
-
-                int new_score = CalculateDenseScoreByIndices(
-                    new_indices, dense_modules, slot_value_power);
+                PackedIndices new_indices = best_solution.packed_indices;
+                new_indices.indices[static_cast<size_t>(i)] = new_module_idx;
+                const int new_score = CalculateDenseScoreByIndices(
+                    new_indices, combination_size, dense_modules, slot_value_power, min_attr_requirements);
                 if (new_score > best_solution.score) {
-                    best_solution = LightweightSolution(new_indices, new_score);
+                    best_solution.packed_indices = new_indices;
+                    best_solution.score = new_score;
                     improved = true;
                     break;
                 }
             }
-
-            if (improved) {
-                break;
-            }
         }
 
         if (!improved && iteration > iterations / 2) {
@@ -552,12 +821,23 @@ std::vector<CompactSolution> ProcessCombinationRange(
     size_t end_combination,
     size_t n,
     const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<SparseModuleSlots>& sparse_modules,
     const std::vector<int>& slot_value_power,
     const std::vector<int>& min_attr_requirements,
+    const std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM>& suffix_slot_best,
+    const std::vector<BeamPickArray>& suffix_total_best,
+    int max_module_slots,
     int local_top_capacity,
-    int combination_size) {
+    int combination_size,
+    SearchBudget* budget = nullptr) {
 
+    if (budget != nullptr && budget->Stopped()) {
+        return {};
+    }
     size_t range_size = end_combination - start_combination;
+    BudgetTicker ticker;
+    ticker.budget = budget;
+    size_t ticked = 0;
 
     std::vector<CompactSolution> solutions;
     int ext_space = local_top_capacity;
@@ -572,23 +852,143 @@ std::vector<CompactSolution> ProcessCombinationRange(
         combination_buffer[j] = static_cast<uint16_t>(temp_combination[j]);
     }
 
+    std::vector<int> required_slots;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        if (min_attr_requirements[slot] > 0) {
+            required_slots.push_back(slot);
+        }
+    }
+    // 前缀属性和加上从next_start起再选remaining个模组的最大值能否满足最低属性要求
+    auto can_satisfy = [&](const DenseSlotArray& slot_sums, size_t next_start, int remaining) {
+        for (int slot : required_slots) {
+            if (slot_sums[slot] + suffix_slot_best[slot][next_start][remaining] < min_attr_requirements[slot]) {
+                return false;
+            }
+        }
+        return true;
+    };
+
+    // prefix_sums[d]为前d个模组的属性和; 组合推进时只重算变化位置之后的前缀,
+    // 最内层只需叠加最后一个模组的少数槽位
+    const size_t last = static_cast<size_t>(combination_size) - 1;
+    std::array<DenseSlotArray, 5> prefix_sums = {};
+    std::array<int, 5> prefix_totals = {};
+    DenseSlotArray prefix_power = {};
+    int prefix_base_power = 0;
+    bool inner_loop_start = true;
+    size_t changed_pos = 0;
+
     size_t produced = 0;
     while (produced < range_size) {
-        DenseSlotArray slot_sums = {};
-        int total_attr_value = 0;
-        for (int i = 0; i < combination_size; ++i) {
-            const auto& dense = dense_modules[combination_buffer[i]];
-            AddSlotArrays(slot_sums, dense.slot_values);
-            total_attr_value += dense.total_attr_value;
+        if (inner_loop_start) {
+            // 只在前缀变化时累加计数, 最内层循环不受影响
+            const long long delta = static_cast<long long>(produced - ticked);
+            ticked = produced;
+            ticker.pending_work += delta;
+            if (ticker.Tick(delta)) {
+                break;
+            }
+            // 前缀加上剩余位置的最大可取值仍达不到最低属性要求时, 跳过该前缀下的所有组合
+            int infeasible_depth = -1;
+            for (size_t depth = changed_pos; depth < last; ++depth) {
+                const auto& dense = dense_modules[combination_buffer[depth]];
+                prefix_sums[depth + 1] = prefix_sums[depth];
+                AddSlotArrays(prefix_sums[depth + 1], dense.slot_values);
+                prefix_totals[depth + 1] = prefix_totals[depth] + dense.total_attr_value;
+                if (!can_satisfy(prefix_sums[depth + 1], static_cast<size_t>(combination_buffer[depth]) + 1,
+                                 static_cast<int>(last - depth))) {
+                    infeasible_depth = static_cast<int>(depth);
+                    break;
+                }
+            }
+            if (infeasible_depth >= 0) {
+                const size_t depth = static_cast<size_t>(infeasible_depth);
+                produced += RemainingWithPrefix(combination_buffer.data(), depth, static_cast<size_t>(combination_size), n);
+                for (size_t j = depth + 1; j <= last; ++j) {
+                    combination_buffer[j] = static_cast<uint16_t>(n - static_cast<size_t>(combination_size) + j);
+                }
+                if (produced >= range_size) {
+                    break;
+                }
+                const int pos = NextCombination(combination_buffer.data(), static_cast<size_t>(combination_size), n);
+                if (pos < 0) {
+                    break;
+                }
+                changed_pos = static_cast<size_t>(pos);
+                continue;
+            }
+            inner_loop_start = false;
+
+            // 前缀加上后缀最优单模组仍无法超过current_min时, 跳过整个内层循环
+            const size_t inner_start = combination_buffer[last];
+            const size_t inner_count = n - inner_start;
+            const bool cannot_improve = current_min != std::numeric_limits<int>::min() &&
+                CalculatePartLimitedBound(
+                    prefix_sums[last], prefix_totals[last], inner_start, 1, max_module_slots,
+                    slot_value_power, suffix_slot_best, suffix_total_best) <= current_min;
+            if (cannot_improve) {
+                produced += inner_count;
+                combination_buffer[last] = static_cast<uint16_t>(n - 1);
+                if (produced >= range_size) {
+                    break;
+                }
+                const int pos = NextCombination(combination_buffer.data(), static_cast<size_t>(combination_size), n);
+                if (pos < 0) {
+                    break;
+                }
+                changed_pos = static_cast<size_t>(pos);
+                inner_loop_start = true;
+                continue;
+            }
+
+            prefix_base_power = 0;
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                prefix_power[slot] = slot_value_power[slot * 21 + std::min(prefix_sums[last][slot], kMaxSlotValue)];
+                prefix_base_power += prefix_power[slot];
+            }
+        }
+
+        const size_t module_idx = combination_buffer[last];
+        const auto& prefix = prefix_sums[last];
+        bool meets_requirements = true;
+        for (int slot : required_slots) {
+            if (prefix[slot] + dense_modules[module_idx].slot_values[slot] < min_attr_requirements[slot]) {
+                meets_requirements = false;
+                break;
+            }
+        }
+
+        if (!meets_requirements && module_idx + 1 < n && !can_satisfy(prefix, module_idx + 1, 1)) {
+            // 后缀最大值随起点单调不增, 内层剩余的组合同样达不到要求
+            produced += n - module_idx;
+            combination_buffer[last] = static_cast<uint16_t>(n - 1);
+            if (produced >= range_size) {
+                break;
+            }
+            const int pos = NextCombination(combination_buffer.data(), static_cast<size_t>(combination_size), n);
+            if (pos < 0) {
+                break;
+            }
+            changed_pos = static_cast<size_t>(pos);
+            inner_loop_start = true;
+            continue;
         }
 
-        if (MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
-            CompactSolution candidate;
-            candidate.packed_indices = PackIndices(combination_buffer.data(), combination_size);
-            candidate.score = CalculateDenseScore(slot_sums, total_attr_value, slot_value_power);
+        if (meets_requirements) {
+            const auto& sparse = sparse_modules[module_idx];
+            int score = prefix_base_power + TotalAttrPower(
+                slot_value_power, prefix_totals[last] + dense_modules[module_idx].total_attr_value);
+            for (int k = 0; k < sparse.count; ++k) {
+                const int slot = sparse.slots[static_cast<size_t>(k)];
+                score += slot_value_power[slot * 21 + std::min(prefix[slot] + sparse.values[static_cast<size_t>(k)], kMaxSlotValue)] -
+                    prefix_power[slot];
+            }
+
+            ticker.Offer(score);
 
+            // 只有进入候选缓冲区的组合才打包下标
             if (static_cast<int>(solutions.size()) < local_top_capacity) {
-                solutions.emplace_back(candidate);
+                solutions.emplace_back(combination_buffer.data(), combination_size, score);
                 if (static_cast<int>(solutions.size()) == local_top_capacity) {
                     int mn = solutions[0].score;
                     for (int i = 1; i < local_top_capacity; ++i) {
@@ -596,8 +996,8 @@ std::vector<CompactSolution> ProcessCombinationRange(
                     }
                     current_min = mn;
                 }
-            } else if (candidate.score > current_min) {
-                solutions.emplace_back(candidate);
+            } else if (score > current_min) {
+                solutions.emplace_back(combination_buffer.data(), combination_size, score);
                 if (static_cast<int>(solutions.size()) == local_top_capacity + ext_space) {
                     std::nth_element(
                         solutions.begin(),
@@ -620,10 +1020,18 @@ std::vector<CompactSolution> ProcessCombinationRange(
         if (produced >= range_size) {
             break;
         }
-        if (!NextCombination(combination_buffer.data(), static_cast<size_t>(combination_size), n)) {
+        const int pos = NextCombination(combination_buffer.data(), static_cast<size_t>(combination_size), n);
+        if (pos < 0) {
             break;
         }
+        if (static_cast<size_t>(pos) != last) {
+            changed_pos = static_cast<size_t>(pos);
+            inner_loop_start = true;
+        }
     }
+    ticker.pending += static_cast<long long>(produced - ticked);
+    ticker.pending_work += static_cast<long long>(produced - ticked);
+    ticker.Flush();
 
     if (static_cast<int>(solutions.size()) > local_top_capacity) {
         std::nth_element(
@@ -639,53 +1047,128 @@ std::vector<CompactSolution> ProcessCombinationRange(
     return solutions;
 }
 
-std::vector<LightweightSolution> RunSingleBeam(
-    const std::vector<ModuleInfo>& modules,
-    const std::vector<DenseModuleData>& dense_modules_raw,
-    const std::vector<int>& slot_value_power,
-    const std::vector<int>& min_attr_requirements,
-    int sort_strategy,
-    int beam_width,
-    int max_solutions,
-    int expand_per_state,
-    int combination_size) {
+/// beam逐层扩展共用的只读数据
+struct BeamExpansionContext {
+    const std::vector<DenseModuleData>* dense_modules = nullptr;
+    const std::vector<int>* slot_value_power = nullptr;
+    const std::vector<int>* min_attr_requirements = nullptr;
+    const std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM>* suffix_slot_best = nullptr;
+    const std::vector<BeamPickArray>* suffix_total_best = nullptr;
+    int combination_size = 4;
+    int max_solutions = 60;
+    int expand_per_state = 0;
+    int max_module_slots = 3;
+};
 
-    const auto clustered_modules =
-        BuildClusteredBeamModules(modules, dense_modules_raw, slot_value_power, sort_strategy);
+/// 完整组合放入top-K堆; 堆满时把第K名分数共享给同层的其它线程
+inline void PushBeamLeaf(
+    CompactMinHeap& top_solutions,
+    int max_solutions,
+    const CompactSolution& compact,
+    std::atomic<int>* shared_threshold) {
 
-    std::vector<ModuleInfo> beam_modules;
-    beam_modules.reserve(clustered_modules.size());
-    std::vector<DenseModuleData> dense_modules;
-    dense_modules.reserve(clustered_modules.size());
-    std::vector<size_t> sorted_to_original;
-    sorted_to_original.reserve(clustered_modules.size());
-    for (const auto& item : clustered_modules) {
-        beam_modules.push_back(*item.module);
-        dense_modules.push_back(item.dense);
-        sorted_to_original.push_back(item.original_index);
+    if (max_solutions <= 0) {
+        return;
+    }
+    if (top_solutions.size() < static_cast<size_t>(max_solutions)) {
+        top_solutions.push(compact);
+    } else if (compact.score > top_solutions.top().score) {
+        top_solutions.pop();
+        top_solutions.push(compact);
+    } else {
+        return;
+    }
+    if (shared_threshold != nullptr && top_solutions.size() == static_cast<size_t>(max_solutions)) {
+        const int local_threshold = top_solutions.top().score;
+        int current = shared_threshold->load(std::memory_order_relaxed);
+        while (local_threshold > current &&
+               !shared_threshold->compare_exchange_weak(current, local_threshold, std::memory_order_relaxed)) {
+        }
     }
+}
 
-    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
-    std::vector<BeamPickArray> suffix_total_best;
-    BuildSuffixUpperBounds(dense_modules, combination_size, suffix_slot_best, suffix_total_best);
+/// beam一层的子状态缓冲, 容量在各层之间复用.
+/// 缓冲达到2*limit时原地选出前limit个, 并记下被淘汰者中最好的一个作为门槛, 此后不优于门槛的子状态直接丢弃;
+/// 峰值内存因此与beam_width成正比, 而不是与beam_width乘模组数成正比
+struct BeamChildBuffer {
+    std::vector<BeamState> states;
+    // expand_per_state>0时单个父状态的子状态暂存区
+    std::vector<BeamState> scratch;
+    BeamState cutoff;
+    bool has_cutoff = false;
+    size_t limit = 1;
+    // 本层产生的子状态数, 包含被门槛丢弃的, 供收尾阶段计数
+    size_t produced = 0;
+    // 本层被淘汰的子状态的最高上界
+    int dropped_bound = std::numeric_limits<int>::min();
+
+    void Reset(int new_limit) {
+        states.clear();
+        limit = static_cast<size_t>(std::max(1, new_limit));
+        has_cutoff = false;
+        produced = 0;
+        dropped_bound = std::numeric_limits<int>::min();
+    }
 
-    std::vector<BeamState> frontier;
-    frontier.reserve(static_cast<size_t>(std::min(beam_width, static_cast<int>(beam_modules.size()))));
-    CompactMinHeap top_solutions;
+    void Push(const BeamState& state) {
+        ++produced;
+        if (has_cutoff && !BetterBeamState(state, cutoff)) {
+            dropped_bound = std::max(dropped_bound, state.upper_bound);
+            return;
+        }
+        states.push_back(state);
+        if (states.size() >= 2 * limit) {
+            Compact();
+        }
+    }
 
-    for (size_t module_idx = 0; module_idx < beam_modules.size(); ++module_idx) {
-        BeamState state;
-        state.indices[0] = static_cast<uint16_t>(module_idx);
-        state.depth = 1;
-        state.last_index = static_cast<int>(module_idx);
-        state.slot_sums = dense_modules[module_idx].slot_values;
-        state.total_attr_value = dense_modules[module_idx].total_attr_value;
-        state.current_score = CalculateDenseScore(state.slot_sums, state.total_attr_value, slot_value_power);
+    /// 只保留前limit个子状态, 顺序不定
+    void Compact() {
+        if (states.size() <= limit) {
+            return;
+        }
+        const auto middle = states.begin() + static_cast<std::ptrdiff_t>(limit);
+        std::nth_element(states.begin(), middle, states.end(), BetterBeamState);
+        cutoff = *middle;
+        has_cutoff = true;
+        for (auto it = middle; it != states.end(); ++it) {
+            dropped_bound = std::max(dropped_bound, it->upper_bound);
+        }
+        states.resize(limit);
+    }
+};
 
-        const int remaining_slots = combination_size - state.depth;
+/// 扩展一个父状态: 完整组合进入top_solutions, 其余子状态放入children;
+/// shared_threshold非空时剪枝阈值取本地第K名与其它线程共享的下界中较大者
+void ExpandBeamParent(
+    const BeamExpansionContext& ctx,
+    const BeamState& parent,
+    CompactMinHeap& top_solutions,
+    std::atomic<int>* shared_threshold,
+    BeamChildBuffer& children,
+    BudgetTicker& ticker) {
+
+    const auto& dense_modules = *ctx.dense_modules;
+    const auto& slot_value_power = *ctx.slot_value_power;
+    const auto& min_attr_requirements = *ctx.min_attr_requirements;
+    const auto& suffix_slot_best = *ctx.suffix_slot_best;
+    const int next_depth = parent.depth + 1;
+    children.scratch.clear();
+
+    for (size_t module_idx = static_cast<size_t>(parent.last_index + 1); module_idx < dense_modules.size(); ++module_idx) {
+        BeamState child = parent;
+        child.indices[static_cast<size_t>(parent.depth)] = static_cast<uint16_t>(module_idx);
+        child.depth = next_depth;
+        child.last_index = static_cast<int>(module_idx);
+
+        AddSlotArrays(child.slot_sums, dense_modules[module_idx].slot_values);
+        child.total_attr_value += dense_modules[module_idx].total_attr_value;
+        child.current_score = CalculateDenseScore(child.slot_sums, child.total_attr_value, slot_value_power);
+
+        const int remaining_slots = ctx.combination_size - child.depth;
         const size_t next_start = module_idx + 1;
         if (!CanSatisfyMinRequirements(
-                state.slot_sums,
+                child.slot_sums,
                 next_start,
                 remaining_slots,
                 min_attr_requirements,
@@ -693,114 +1176,346 @@ std::vector<LightweightSolution> RunSingleBeam(
             continue;
         }
 
-        const int optimistic_bound = CalculateOptimisticBound(
-            state.slot_sums,
-            state.total_attr_value,
+        const int optimistic_bound = CalculatePartLimitedBound(
+            child.slot_sums,
+            child.total_attr_value,
             next_start,
             remaining_slots,
+            ctx.max_module_slots,
             slot_value_power,
             suffix_slot_best,
-            suffix_total_best);
-        if (optimistic_bound <= CurrentBeamThreshold(top_solutions, max_solutions)) {
+            *ctx.suffix_total_best);
+        int threshold = CurrentBeamThreshold(top_solutions, ctx.max_solutions);
+        if (shared_threshold != nullptr) {
+            threshold = std::max(threshold, shared_threshold->load(std::memory_order_relaxed));
+        }
+        if (optimistic_bound <= threshold) {
             continue;
         }
-        state.bound_score = std::max(
-            state.current_score,
+        child.upper_bound = optimistic_bound;
+        child.bound_score = std::max(
+            child.current_score,
             GreedyCompletionScore(
-                state,
+                child,
                 next_start,
                 remaining_slots,
                 dense_modules,
                 slot_value_power));
-        frontier.push_back(state);
-    }
 
-    TrimBeamStates(frontier, beam_width, false);
+        if (child.depth == ctx.combination_size) {
+            if (!MeetsMinAttrRequirements(child.slot_sums, min_attr_requirements)) {
+                continue;
+            }
+            CompactSolution compact;
+            compact.packed_indices = PackIndicesFromState(child);
+            compact.score = child.current_score;
+            PushBeamLeaf(top_solutions, ctx.max_solutions, compact, shared_threshold);
+            ticker.Offer(compact.score);
+        } else if (ctx.expand_per_state > 0) {
+            children.scratch.push_back(child);
+        } else {
+            children.Push(child);
+        }
+    }
 
-    while (!frontier.empty() && frontier.front().depth < combination_size) {
-        std::vector<BeamState> next_frontier;
-        const int next_depth = frontier.front().depth + 1;
+    if (!children.scratch.empty()) {
+        TrimBeamStates(children.scratch, ctx.expand_per_state, false, &children.dropped_bound);
+        for (const auto& child : children.scratch) {
+            children.Push(child);
+        }
+    }
+}
 
-        for (const auto& parent : frontier) {
-            std::vector<BeamState> local_children;
-            if (expand_per_state > 0) {
-                local_children.reserve(static_cast<size_t>(std::min(expand_per_state, static_cast<int>(beam_modules.size()))));
-            }
+/// 并行扩展时每个任务一次领取的父状态数
+constexpr size_t kBeamParentBlock = 16;
 
-            for (size_t module_idx = static_cast<size_t>(parent.last_index + 1); module_idx < beam_modules.size(); ++module_idx) {
-                BeamState child = parent;
-                child.indices[static_cast<size_t>(parent.depth)] = static_cast<uint16_t>(module_idx);
-                child.depth = next_depth;
-                child.last_index = static_cast<int>(module_idx);
+/// 自适应宽度的初始beam宽度与每轮的放大倍数
+constexpr int kAdaptiveBeamInitialWidth = 64;
+constexpr int kAdaptiveBeamGrowth = 4;
+/// 自适应宽度最多运行的窄beam轮数, 之后直接使用beam_width; 每轮都从根状态重跑, 窄轮数过多时总耗时超过单跑beam_width
+constexpr int kAdaptiveBeamMaxNarrowPasses = 2;
 
-                AddSlotArrays(child.slot_sums, dense_modules[module_idx].slot_values);
-                child.total_attr_value += dense_modules[module_idx].total_attr_value;
-                child.current_score = CalculateDenseScore(child.slot_sums, child.total_attr_value, slot_value_power);
+/// 单个扩展任务的缓冲, 由RunSingleBeam持有并在各层之间复用
+struct BeamLevelTask {
+    BeamChildBuffer children;
+    std::vector<CompactSolution> leaves;
+};
 
-                const int remaining_slots = combination_size - child.depth;
-                const size_t next_start = module_idx + 1;
-                if (!CanSatisfyMinRequirements(
-                        child.slot_sums,
-                        next_start,
-                        remaining_slots,
-                        min_attr_requirements,
-                        suffix_slot_best)) {
-                    continue;
+/// 并行扩展一层: 父状态按块分给线程池, 各任务写入自己的子状态缓冲与top-K堆, 并通过shared_threshold互相剪枝.
+/// 各任务的缓冲只保留自己的前limit个子状态, 全局前limit个必在这些子集的并集中, 合并时同样经过门槛筛选.
+/// 到期后与串行扩展相同, 凑够max_solutions个子状态即停止领取父状态
+void ExpandBeamLevelParallel(
+    const BeamExpansionContext& ctx,
+    const std::vector<BeamState>& frontier,
+    int limit,
+    CompactMinHeap& top_solutions,
+    BeamChildBuffer& next_frontier,
+    std::vector<BeamLevelTask>& tasks,
+    SimpleThreadPool& pool,
+    std::atomic<int>& shared_threshold,
+    SearchBudget* budget) {
+
+    const bool leaf_level = frontier.front().depth + 1 >= ctx.combination_size;
+    const long long module_count = static_cast<long long>(ctx.dense_modules->size());
+    std::atomic<size_t> next_parent{0};
+    std::atomic<size_t> produced{leaf_level ? top_solutions.size() : 0};
+
+    std::vector<std::future<void>> futures;
+    futures.reserve(tasks.size());
+    for (auto& task : tasks) {
+        futures.push_back(pool.enqueue(
+            [&, task_ptr = &task]() {
+                auto& children = task_ptr->children;
+                children.Reset(limit);
+                task_ptr->leaves.clear();
+                CompactMinHeap local_top;
+                BudgetTicker ticker;
+                ticker.budget = budget;
+                bool finishing = false;
+                while (!finishing) {
+                    const size_t begin = next_parent.fetch_add(kBeamParentBlock, std::memory_order_relaxed);
+                    if (begin >= frontier.size()) {
+                        break;
+                    }
+                    const size_t end = std::min(begin + kBeamParentBlock, frontier.size());
+                    for (size_t parent_idx = begin; parent_idx < end; ++parent_idx) {
+                        const auto& parent = frontier[parent_idx];
+                        ticker.pending_work += 1;
+                        // 其它任务发现到期后这里只需读取标志, 不必等本任务攒够一批
+                        const bool stopped =
+                            ticker.Tick(module_count - parent.last_index - 1) || (budget != nullptr && budget->Stopped());
+                        if (stopped &&
+                            produced.load(std::memory_order_relaxed) >= static_cast<size_t>(ctx.max_solutions)) {
+                            finishing = true;
+                            break;
+                        }
+                        const size_t before = leaf_level ? local_top.size() : children.produced;
+                        ExpandBeamParent(ctx, parent, local_top, &shared_threshold, children, ticker);
+                        const size_t after = leaf_level ? local_top.size() : children.produced;
+                        produced.fetch_add(after - before, std::memory_order_relaxed);
+                    }
                 }
-
-                const int optimistic_bound = CalculateOptimisticBound(
-                    child.slot_sums,
-                    child.total_attr_value,
-                    next_start,
-                    remaining_slots,
-                    slot_value_power,
-                    suffix_slot_best,
-                    suffix_total_best);
-                if (optimistic_bound <= CurrentBeamThreshold(top_solutions, max_solutions)) {
-                    continue;
+                ticker.Flush();
+                children.Compact();
+                while (!local_top.empty()) {
+                    task_ptr->leaves.push_back(local_top.top());
+                    local_top.pop();
                 }
-                child.bound_score = std::max(
-                    child.current_score,
-                    GreedyCompletionScore(
-                        child,
-                        next_start,
-                        remaining_slots,
-                        dense_modules,
-                        slot_value_power));
-
-                if (child.depth == combination_size) {
-                    if (!MeetsMinAttrRequirements(child.slot_sums, min_attr_requirements)) {
-                        continue;
-                    }
-                    CompactSolution compact;
-                    compact.packed_indices = PackIndicesFromState(child);
-                    compact.score = child.current_score;
-                    if (top_solutions.size() < static_cast<size_t>(max_solutions)) {
-                        top_solutions.push(compact);
-                    } else if (compact.score > top_solutions.top().score) {
-                        top_solutions.pop();
-                        top_solutions.push(compact);
+            }));
+    }
+
+    for (auto& future : futures) {
+        future.get();
+    }
+    for (const auto& task : tasks) {
+        for (const auto& leaf : task.leaves) {
+            PushBeamLeaf(top_solutions, ctx.max_solutions, leaf, nullptr);
+        }
+        for (const auto& child : task.children.states) {
+            next_frontier.Push(child);
+        }
+        // 计入任务内已被淘汰的子状态, 与串行扩展的计数一致
+        next_frontier.produced += task.children.produced - task.children.states.size();
+        next_frontier.dropped_bound = std::max(next_frontier.dropped_bound, task.children.dropped_bound);
+    }
+}
+
+/// level_pool非空时每层的父状态分给线程池并行扩展(level_tasks个任务), 否则在当前线程串行扩展.
+/// adaptive_width为true时从窄beam开始逐轮加宽到beam_width, 每次加宽都从根状态重跑整个beam, 而不是只重跑某一层;
+/// 被宽度淘汰的状态的上界都不超过第K名时结果即为精确top-K, 停止加宽并置位exact通知其它起点.
+/// 某层的状态数超过beam_width时加宽无法覆盖全部状态, 窄beam已跑满kAdaptiveBeamMaxNarrowPasses轮时也不再细分,
+/// 下一轮直接使用beam_width. 返回的解为原始modules中的下标
+std::vector<CompactSolution> RunSingleBeam(
+    const std::vector<ModuleInfo>& modules,
+    const std::vector<DenseModuleData>& dense_modules_raw,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int sort_strategy,
+    int beam_width,
+    int max_solutions,
+    int expand_per_state,
+    int combination_size,
+    SearchBudget* budget = nullptr,
+    SimpleThreadPool* level_pool = nullptr,
+    int level_tasks = 1,
+    bool adaptive_width = false,
+    std::atomic<bool>* exact = nullptr,
+    BeamSearchStats* stats = nullptr) {
+
+    const auto clustered_modules =
+        BuildClusteredBeamModules(modules, dense_modules_raw, slot_value_power, sort_strategy);
+    BudgetTicker ticker;
+    ticker.budget = budget;
+
+    std::vector<DenseModuleData> dense_modules;
+    dense_modules.reserve(clustered_modules.size());
+    std::vector<uint16_t> sorted_to_original;
+    sorted_to_original.reserve(clustered_modules.size());
+    for (const auto& item : clustered_modules) {
+        dense_modules.push_back(item.dense);
+        sorted_to_original.push_back(static_cast<uint16_t>(item.original_index));
+    }
+
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    BuildSuffixUpperBounds(dense_modules, combination_size, suffix_slot_best, suffix_total_best);
+    const int max_module_slots = CountMaxModuleSlots(dense_modules);
+
+    std::vector<BeamState> root_states;
+    root_states.reserve(dense_modules.size());
+
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        BeamState state;
+        state.indices[0] = static_cast<uint16_t>(module_idx);
+        state.depth = 1;
+        state.last_index = static_cast<int>(module_idx);
+        state.slot_sums = dense_modules[module_idx].slot_values;
+        state.total_attr_value = dense_modules[module_idx].total_attr_value;
+        state.current_score = CalculateDenseScore(state.slot_sums, state.total_attr_value, slot_value_power);
+
+        const int remaining_slots = combination_size - state.depth;
+        const size_t next_start = module_idx + 1;
+        if (!CanSatisfyMinRequirements(
+                state.slot_sums,
+                next_start,
+                remaining_slots,
+                min_attr_requirements,
+                suffix_slot_best)) {
+            continue;
+        }
+
+        state.upper_bound = CalculatePartLimitedBound(
+            state.slot_sums,
+            state.total_attr_value,
+            next_start,
+            remaining_slots,
+            max_module_slots,
+            slot_value_power,
+            suffix_slot_best,
+            suffix_total_best);
+        state.bound_score = std::max(
+            state.current_score,
+            GreedyCompletionScore(
+                state,
+                next_start,
+                remaining_slots,
+                dense_modules,
+                slot_value_power));
+        root_states.push_back(state);
+    }
+
+    BeamExpansionContext expansion;
+    expansion.dense_modules = &dense_modules;
+    expansion.slot_value_power = &slot_value_power;
+    expansion.min_attr_requirements = &min_attr_requirements;
+    expansion.suffix_slot_best = &suffix_slot_best;
+    expansion.suffix_total_best = &suffix_total_best;
+    expansion.combination_size = combination_size;
+    expansion.max_solutions = max_solutions;
+    expansion.expand_per_state = expand_per_state;
+    expansion.max_module_slots = max_module_slots;
+
+    // 各轮找到的完整组合合并到top_solutions, leaf_keys防止后一轮重复加入同一组合
+    CompactMinHeap top_solutions;
+    PackedIndexSet leaf_keys(static_cast<size_t>(max_solutions) * 2);
+    // 两层缓冲轮换使用, 各层和各轮都不再重新分配
+    std::vector<BeamState> frontier;
+    BeamChildBuffer next_frontier;
+    std::vector<BeamLevelTask> level_buffers(level_pool != nullptr ? static_cast<size_t>(std::max(1, level_tasks)) : 0);
+
+    int width = adaptive_width ? std::min(beam_width, std::max(kAdaptiveBeamInitialWidth, max_solutions)) : beam_width;
+    int passes = 0;
+    int bound_gap = 0;
+    while (true) {
+        ++passes;
+        CompactMinHeap pass_top;
+        // 以前几轮的第K名作为剪枝阈值, 分数不超过它的组合不可能进入最终结果
+        std::atomic<int> shared_threshold{CurrentBeamThreshold(top_solutions, max_solutions)};
+        int dropped_bound = std::numeric_limits<int>::min();
+        // 本轮各层裁剪前的最大状态数, 决定下一轮的宽度
+        size_t widest_level = root_states.size();
+        frontier.assign(root_states.begin(), root_states.end());
+        TrimBeamStates(frontier, width, false, &dropped_bound);
+
+        while (!frontier.empty() && frontier.front().depth < combination_size) {
+            next_frontier.Reset(width);
+            const int next_depth = frontier.front().depth + 1;
+
+            if (level_pool != nullptr && frontier.size() >= 2 * kBeamParentBlock) {
+                ExpandBeamLevelParallel(
+                    expansion, frontier, width, pass_top, next_frontier, level_buffers, *level_pool,
+                    shared_threshold, budget);
+                ticker.stopped = ticker.stopped || (budget != nullptr && budget->Stopped());
+            } else {
+                for (const auto& parent : frontier) {
+                    // 到期后进入收尾阶段: 按上界从高到低扩展, 凑够max_solutions个子状态(最后一层为完整组合)即进入下一层,
+                    // 保证很快得到完整组合
+                    ticker.pending_work += 1;
+                    if (ticker.Tick(static_cast<long long>(dense_modules.size()) - parent.last_index - 1)) {
+                        const size_t produced = next_depth >= combination_size ? pass_top.size() : next_frontier.produced;
+                        if (produced >= static_cast<size_t>(max_solutions)) {
+                            break;
+                        }
                     }
-                } else if (expand_per_state > 0) {
-                    local_children.push_back(child);
-                } else {
-                    next_frontier.push_back(child);
+                    ExpandBeamParent(expansion, parent, pass_top, &shared_threshold, next_frontier, ticker);
                 }
             }
+            dropped_bound = std::max(dropped_bound, next_frontier.dropped_bound);
+
+            if (next_depth >= combination_size) {
+                break;
+            }
+            widest_level = std::max(widest_level, next_frontier.produced);
+
+            TrimBeamStates(
+                next_frontier.states, ticker.stopped ? std::min(width, max_solutions) : width, true, &dropped_bound);
+            frontier.swap(next_frontier.states);
+        }
 
-            if (expand_per_state > 0 && !local_children.empty()) {
-                TrimBeamStates(local_children, expand_per_state, false);
-                next_frontier.insert(next_frontier.end(), local_children.begin(), local_children.end());
+        while (!pass_top.empty()) {
+            const auto leaf = pass_top.top();
+            pass_top.pop();
+            if (leaf_keys.Insert(leaf.packed_indices)) {
+                PushBeamLeaf(top_solutions, max_solutions, leaf, nullptr);
             }
         }
 
-        if (next_depth >= combination_size) {
+        // 本轮覆盖了除被淘汰状态之外的全部组合(按阈值剪掉的组合不可能进入top-K), 被淘汰状态的上界都不超过第K名时
+        // 结果即为精确top-K; 不足K个解时任何被淘汰的状态都可能补进来
+        if (dropped_bound != std::numeric_limits<int>::min()) {
+            const int kth_score = top_solutions.size() < static_cast<size_t>(max_solutions) ? -1 : top_solutions.top().score;
+            bound_gap = std::max(0, dropped_bound - kth_score);
+        } else {
+            bound_gap = 0;
+        }
+        if (bound_gap == 0 && !ticker.stopped) {
+            if (exact != nullptr) {
+                exact->store(true, std::memory_order_relaxed);
+            }
             break;
         }
-
-        TrimBeamStates(next_frontier, beam_width, true);
-        frontier.swap(next_frontier);
+        if (!adaptive_width || ticker.stopped || width >= beam_width ||
+            (exact != nullptr && exact->load(std::memory_order_relaxed))) {
+            break;
+        }
+        // 最宽的一层能放进beam_width时直接加宽到能容纳它, 否则只剩beam_width一轮
+        if (widest_level > static_cast<size_t>(beam_width) || passes >= kAdaptiveBeamMaxNarrowPasses) {
+            width = beam_width;
+        } else {
+            width = static_cast<int>(std::min<long long>(
+                beam_width,
+                std::max(static_cast<long long>(width) * kAdaptiveBeamGrowth, static_cast<long long>(widest_level))));
+        }
     }
+    const bool proven = bound_gap == 0 && !ticker.stopped;
+    if (stats != nullptr) {
+        stats->final_width = width;
+        stats->bound_gap = bound_gap;
+        stats->passes = passes;
+        stats->exact = proven;
+    }
+
+    ticker.Flush();
 
     std::vector<CompactSolution> compact_results;
     compact_results.reserve(top_solutions.size());
@@ -810,37 +1525,39 @@ std::vector<LightweightSolution> RunSingleBeam(
     }
     std::reverse(compact_results.begin(), compact_results.end());
 
-    std::vector<LightweightSolution> refined_solutions;
-    refined_solutions.reserve(compact_results.size());
-    std::set<std::vector<size_t>> seen_combinations;
+    std::vector<CompactSolution> refined_solutions;
+    refined_solutions.reserve(compact_results.size() * 2);
+    PackedIndexSet seen_combinations(compact_results.size() * 2);
+    std::mt19937 gen(std::random_device{}());
     constexpr int kBeamLocalSearchIterations = 20;
 
+    auto append_original = [&](CompactSolution solution) {
+        auto& indices = solution.packed_indices.indices;
+        for (int i = 0; i < combination_size; ++i) {
+            indices[static_cast<size_t>(i)] = sorted_to_original[indices[static_cast<size_t>(i)]];
+        }
+        if (seen_combinations.Insert(SortedCombinationKey(solution.packed_indices, combination_size))) {
+            refined_solutions.push_back(solution);
+        }
+    };
+
     for (const auto& compact : compact_results) {
-        LightweightSolution solution(compact.unpack_indices_vector(combination_size), compact.score);
-        auto improved_solution = LocalSearchImproveByIndicesLocal(
-            solution,
+        append_original(LocalSearchImproveByIndicesLocal(
+            compact,
+            combination_size,
             dense_modules,
-            beam_modules,
             kBeamLocalSearchIterations,
-            slot_value_power);
-
-        std::vector<size_t> original_indices;
-        original_indices.reserve(improved_solution.module_indices.size());
-        for (size_t sorted_index : improved_solution.module_indices) {
-            original_indices.push_back(sorted_to_original[sorted_index]);
-        }
-
-        LightweightSolution original_solution(original_indices, improved_solution.score);
-        if (IsCombinationUniqueLocal(original_solution.module_indices, seen_combinations)) {
-            std::vector<size_t> sorted_indices = original_solution.module_indices;
-            std::sort(sorted_indices.begin(), sorted_indices.end());
-            seen_combinations.insert(sorted_indices);
-            refined_solutions.push_back(original_solution);
+            slot_value_power,
+            min_attr_requirements,
+            gen));
+        // 已证明最优时局部搜索可能把解换成与其它解重复的组合, 原解也保留, 保证精确top-K完整
+        if (proven) {
+            append_original(compact);
         }
     }
 
     std::sort(refined_solutions.begin(), refined_solutions.end(),
-        [](const LightweightSolution& lhs, const LightweightSolution& rhs) {
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
             return lhs.score > rhs.score;
         });
     if (static_cast<int>(refined_solutions.size()) > max_solutions) {
@@ -850,122 +1567,2439 @@ std::vector<LightweightSolution> RunSingleBeam(
     return refined_solutions;
 }
 
-uint64_t PackIndicesFromState(const BeamState& state) {
-    uint64_t packed = 0;
-    for (int i = 0; i < state.depth; ++i) {
-        packed |= (static_cast<uint64_t>(state.indices[i] & 0x0FFFu) << (i * 12));
-    }
-    return packed;
-}
+/// 支配关系预筛选: 属性向量完全相同的模组视为同一类, 被至少keep_threshold个其它类
+/// 在所有计分槽位及总属性上同时支配的类可以安全丢弃. budget到期或取消时尚未检查的类全部保留, 结果仍可安全使用
+std::vector<size_t> FindUndominatedModules(
+    const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int keep_threshold,
+    SearchBudget* budget = nullptr) {
 
-std::vector<ModuleSolution> BuildGpuSolutions(
-    const std::vector<ModuleInfo>& modules,
-    int gpu_result_count,
-    const std::vector<int>& gpu_scores,
-    const std::vector<long long>& gpu_indices,
-    int combination_size) {
+    std::array<bool, Constants::CUDA_ATTR_DIM> scored_slots = {};
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        scored_slots[slot] = slot_value_power[slot * 21 + kMaxSlotValue] > 0 || min_attr_requirements[slot] > 0;
+    }
 
-    std::vector<ModuleSolution> final_solutions;
-    final_solutions.reserve(std::max(0, gpu_result_count));
+    // 按总属性值降序排列类代表, 支配者总属性值不小于被支配者, 只需向前查找
+    std::vector<size_t> order(dense_modules.size());
+    for (size_t i = 0; i < order.size(); ++i) {
+        order[i] = i;
+    }
+    std::sort(order.begin(), order.end(),
+        [&](size_t lhs, size_t rhs) {
+            if (dense_modules[lhs].total_attr_value != dense_modules[rhs].total_attr_value) {
+                return dense_modules[lhs].total_attr_value > dense_modules[rhs].total_attr_value;
+            }
+            if (dense_modules[lhs].slot_values != dense_modules[rhs].slot_values) {
+                return dense_modules[lhs].slot_values > dense_modules[rhs].slot_values;
+            }
+            if (dense_modules[lhs].category != dense_modules[rhs].category) {
+                return dense_modules[lhs].category < dense_modules[rhs].category;
+            }
+            return lhs < rhs;
+        });
 
-    for (int i = 0; i < gpu_result_count; ++i) {
-        long long packed = gpu_indices[i];
-        std::vector<ModuleInfo> solution_modules;
-        solution_modules.reserve(static_cast<size_t>(combination_size));
+    std::vector<size_t> class_representatives;
+    std::vector<size_t> module_class(dense_modules.size(), 0);
+    for (size_t pos = 0; pos < order.size(); ++pos) {
+        if (pos == 0 || !SameModuleClass(dense_modules[order[pos]], dense_modules[order[pos - 1]])) {
+            class_representatives.push_back(order[pos]);
+        }
+        module_class[order[pos]] = class_representatives.size() - 1;
+    }
 
-        for (int j = 0; j < combination_size; ++j) {
-            size_t module_idx = static_cast<size_t>((packed >> (j * 12)) & 0x0FFF);
-            if (module_idx < modules.size()) {
-                solution_modules.push_back(modules[module_idx]);
+    BudgetTicker ticker;
+    ticker.budget = budget;
+    std::vector<bool> class_kept(class_representatives.size(), true);
+    for (size_t target = 0; target < class_representatives.size(); ++target) {
+        if (ticker.Tick(static_cast<long long>(class_representatives.size()))) {
+            break;
+        }
+        const auto& dominated = dense_modules[class_representatives[target]];
+        std::array<int, Constants::CUDA_ATTR_DIM> check_slots;
+        int check_count = 0;
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            if (scored_slots[slot] && dominated.slot_values[slot] > 0) {
+                check_slots[static_cast<size_t>(check_count++)] = slot;
             }
         }
 
-        auto result = ModuleOptimizerCpp::CalculateCombatPower(solution_modules);
-        final_solutions.emplace_back(solution_modules, gpu_scores[i], result.second);
+        int dominator_count = 0;
+        for (size_t other = 0; other < class_representatives.size() && dominator_count < keep_threshold; ++other) {
+            if (other == target) {
+                continue;
+            }
+            const auto& candidate = dense_modules[class_representatives[other]];
+            if (candidate.total_attr_value < dominated.total_attr_value) {
+                break;
+            }
+            bool dominates = true;
+            bool strictly_better = candidate.total_attr_value > dominated.total_attr_value;
+            for (int k = 0; k < check_count; ++k) {
+                const int slot = check_slots[static_cast<size_t>(k)];
+                if (candidate.slot_values[slot] < dominated.slot_values[slot]) {
+                    dominates = false;
+                    break;
+                }
+                strictly_better = strictly_better || candidate.slot_values[slot] > dominated.slot_values[slot];
+            }
+            if (!dominates) {
+                continue;
+            }
+            if (!strictly_better) {
+                // 计分槽位完全相同的两类互相支配, 按排序先后打破平局避免双方同时被丢弃
+                for (int slot = 0; slot < Constants::CUDA_ATTR_DIM && !strictly_better; ++slot) {
+                    strictly_better = scored_slots[slot] && candidate.slot_values[slot] > dominated.slot_values[slot];
+                }
+                if (!strictly_better && other > target) {
+                    continue;
+                }
+            }
+            ++dominator_count;
+        }
+        class_kept[target] = dominator_count < keep_threshold;
     }
+    ticker.Flush();
 
-    return final_solutions;
+    std::vector<size_t> survivors;
+    survivors.reserve(dense_modules.size());
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        if (class_kept[module_class[module_idx]]) {
+            survivors.push_back(module_idx);
+        }
+    }
+    return survivors;
 }
-} // namespace
 
+/// 属性签名(模组占用的槽位集合)分桶预筛选上下文
+/// 每个桶展开为若干"单元": 第j个单元取桶内各槽位第j大的值, 前k个单元之和是该桶任选k个模组的逐槽位上界
+struct SignaturePrepassContext {
+    std::vector<std::vector<size_t>> bucket_members;
+    std::vector<DenseModuleData> units;
+    std::vector<size_t> unit_bucket;
+    std::vector<int> unit_offset;
+    const std::vector<DenseModuleData>* dense_modules = nullptr;
+    const std::vector<int>* slot_value_power = nullptr;
+    const std::vector<int>* min_attr_requirements = nullptr;
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    int combination_size = 4;
+    int max_solutions = 60;
+    int max_unit_slots = 3;
+};
 
-size_t CombinationCount(size_t n, size_t r) {
-    if (r > n) return 0;
-    if (r == 0 || r == n) return 1;
-    if (r > n - r) r = n - r;
-    
-    size_t result = 1;
-    for (size_t i = 0; i < r; ++i) {
-        result = result * (n - i) / (i + 1);
+/// 签名组合搜索状态. 第一遍用各签名组合的代表组合的真实分数抬高第K名分数的下界,
+/// 第二遍用最终下界逐个检查未被剪掉的签名组合中的成员
+struct SignaturePrepassState {
+    CompactMinHeap known_scores;
+    bool marking = false;
+    std::vector<bool> module_needed;
+    size_t needed_count = 0;
+    size_t work_budget = 0;
+    std::array<size_t, 5> picked_units = {};
+};
+
+constexpr size_t kSignatureWorkBudget = 1u << 20;
+
+void BuildSignaturePrepassContext(
+    const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int combination_size,
+    int max_solutions,
+    SignaturePrepassContext& ctx) {
+
+    ctx.dense_modules = &dense_modules;
+    ctx.slot_value_power = &slot_value_power;
+    ctx.min_attr_requirements = &min_attr_requirements;
+    ctx.combination_size = combination_size;
+    ctx.max_solutions = max_solutions;
+
+    // 签名只看参与计分的槽位, 不计分的属性只影响总属性值, 由单元的总属性值上界覆盖
+    std::array<bool, Constants::CUDA_ATTR_DIM> scored_slots = {};
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        scored_slots[slot] = slot_value_power[slot * 21 + kMaxSlotValue] > 0 || min_attr_requirements[slot] > 0;
     }
-    return result;
-}
 
-void GetCombinationByIndex(size_t n, size_t r, size_t index, std::vector<size_t>& combination) {
-    size_t remaining = index;
-    
-    for (size_t i = 0; i < r; ++i) {
-        size_t start = (i == 0) ? 0 : combination[i-1] + 1;
-        for (size_t j = start; j < n; ++j) {
-            size_t combinations_after = CombinationCount(n - j - 1, r - i - 1);
-            if (remaining < combinations_after) {
-                combination[i] = j;
-                break;
+    std::unordered_map<uint32_t, size_t> bucket_of_mask;
+    std::vector<int> contribution(dense_modules.size(), 0);
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        const auto& dense = dense_modules[module_idx];
+        uint32_t mask = 0;
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            if (scored_slots[slot] && dense.slot_values[slot] != 0) {
+                mask |= (1u << slot);
             }
-            remaining -= combinations_after;
         }
+        auto inserted = bucket_of_mask.emplace(mask, ctx.bucket_members.size());
+        if (inserted.second) {
+            ctx.bucket_members.emplace_back();
+        }
+        ctx.bucket_members[inserted.first->second].push_back(module_idx);
+        contribution[module_idx] = CalculateDenseScore(dense.slot_values, dense.total_attr_value, slot_value_power);
     }
-}
 
-std::pair<int, std::map<std::string, int>> ModuleOptimizerCpp::CalculateCombatPower(
-    const std::vector<ModuleInfo>& modules) {
-        std::unordered_map<std::string, int> attr_breakdown;
-        attr_breakdown.reserve(20);
-        
-        for (const auto& module : modules) {
-            for (const auto& part : module.parts) {
-                attr_breakdown[part.name] += part.value;
+    // 桶内按单体贡献度降序, 桶之间按最佳成员贡献度降序, 使高分签名组合先被搜索
+    for (auto& members : ctx.bucket_members) {
+        std::sort(members.begin(), members.end(), [&](size_t lhs, size_t rhs) {
+            return contribution[lhs] != contribution[rhs] ? contribution[lhs] > contribution[rhs] : lhs < rhs;
+        });
+    }
+    std::sort(ctx.bucket_members.begin(), ctx.bucket_members.end(),
+        [&](const std::vector<size_t>& lhs, const std::vector<size_t>& rhs) {
+            return contribution[lhs.front()] != contribution[rhs.front()]
+                ? contribution[lhs.front()] > contribution[rhs.front()]
+                : lhs.front() < rhs.front();
+        });
+
+    for (size_t bucket = 0; bucket < ctx.bucket_members.size(); ++bucket) {
+        const auto& members = ctx.bucket_members[bucket];
+        const int unit_count = std::min(static_cast<int>(members.size()), combination_size);
+        std::array<std::vector<int>, Constants::CUDA_ATTR_DIM> slot_values;
+        std::vector<int> totals;
+        for (size_t module_idx : members) {
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                slot_values[slot].push_back(dense_modules[module_idx].slot_values[slot]);
             }
+            totals.push_back(dense_modules[module_idx].total_attr_value);
         }
-        
-        int threshold_power = 0;
-        int total_attr_value = 0;
-        
-        for (const auto& [attr_name, attr_value] : attr_breakdown) {
-            total_attr_value += attr_value;
-            
-            int max_level = 0;
-            for (int level = 0; level < 6; ++level) {
-                if (attr_value >= Constants::ATTR_THRESHOLDS[level]) {
-                    max_level = level + 1;
-                } else {
-                    break;
-                }
-            }
-            
-            if (max_level > 0) {
-                bool is_special = Constants::SPECIAL_ATTR_NAMES_STR.find(attr_name) != Constants::SPECIAL_ATTR_NAMES_STR.end();
-                
-                int base_power;
-                if (is_special) {
-                    base_power = Constants::SPECIAL_ATTR_POWER_VALUES[max_level - 1];
-                } else {
-                    base_power = Constants::BASIC_ATTR_POWER_VALUES[max_level - 1];
-                }
-                threshold_power += base_power;
+        for (auto& values : slot_values) {
+            std::sort(values.begin(), values.end(), std::greater<int>());
+        }
+        std::sort(totals.begin(), totals.end(), std::greater<int>());
+
+        for (int offset = 0; offset < unit_count; ++offset) {
+            DenseModuleData unit;
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                unit.slot_values[slot] = scored_slots[slot] ? slot_values[slot][static_cast<size_t>(offset)] : 0;
             }
+            unit.total_attr_value = totals[static_cast<size_t>(offset)];
+            ctx.units.push_back(unit);
+            ctx.unit_bucket.push_back(bucket);
+            ctx.unit_offset.push_back(offset);
         }
-        
-        int total_attr_power = total_attr_power = Constants::TOTAL_ATTR_POWER_VALUES[std::min(total_attr_value, 120)];
-        
-        int total_power = threshold_power + total_attr_power;
-        
-        std::map<std::string, int> result_map;
-        for (const auto& [key, value] : attr_breakdown) {
-            result_map.emplace(key, value);
+    }
+
+    ctx.max_unit_slots = CountMaxModuleSlots(ctx.units);
+    BuildSuffixUpperBounds(ctx.units, combination_size, ctx.suffix_slot_best, ctx.suffix_total_best);
+}
+
+/// 第一遍: 签名组合的代表组合. 除最后一个单元外各取桶内对应位置的成员, 最后一个单元遍历桶内剩余成员.
+/// 不同签名组合的代表组合互不相同, 其真实分数的第K名是全局第K名分数的下界
+void CollectSignatureTupleScores(
+    const SignaturePrepassContext& ctx,
+    SignaturePrepassState& state) {
+
+    DenseSlotArray prefix_sums = {};
+    int prefix_total = 0;
+    for (int depth = 0; depth + 1 < ctx.combination_size; ++depth) {
+        const size_t unit = state.picked_units[static_cast<size_t>(depth)];
+        const auto& member = (*ctx.dense_modules)[ctx.bucket_members[ctx.unit_bucket[unit]][static_cast<size_t>(ctx.unit_offset[unit])]];
+        AddSlotArrays(prefix_sums, member.slot_values);
+        prefix_total += member.total_attr_value;
+    }
+
+    const size_t last_unit = state.picked_units[static_cast<size_t>(ctx.combination_size - 1)];
+    const auto& members = ctx.bucket_members[ctx.unit_bucket[last_unit]];
+    for (size_t member_idx = static_cast<size_t>(ctx.unit_offset[last_unit]); member_idx < members.size(); ++member_idx) {
+        const auto& member = (*ctx.dense_modules)[members[member_idx]];
+        DenseSlotArray slot_sums = prefix_sums;
+        AddSlotArrays(slot_sums, member.slot_values);
+        if (!MeetsMinAttrRequirements(slot_sums, *ctx.min_attr_requirements)) {
+            continue;
         }
-        
-        return {total_power, result_map};
+        CompactSolution known;
+        known.score = CalculateDenseScore(slot_sums, prefix_total + member.total_attr_value, *ctx.slot_value_power);
+        if (state.known_scores.size() < static_cast<size_t>(ctx.max_solutions)) {
+            state.known_scores.push(known);
+        } else if (known.score > state.known_scores.top().score) {
+            state.known_scores.pop();
+            state.known_scores.push(known);
+        }
+    }
+    const size_t work = members.size() - static_cast<size_t>(ctx.unit_offset[last_unit]);
+    state.work_budget -= std::min(state.work_budget, work);
+}
+
+/// 第二遍: 桶内选了k个模组时, 其余k-1个模组不超过前k-1个单元, 用成员替换第k个单元后仍能达到下界的成员才需要保留
+void MarkSignatureTupleMembers(
+    const SignaturePrepassContext& ctx,
+    SignaturePrepassState& state,
+    const DenseSlotArray& unit_sums,
+    int unit_total,
+    int lower_bound) {
+
+    for (int depth = 0; depth < ctx.combination_size; ++depth) {
+        const size_t unit = state.picked_units[static_cast<size_t>(depth)];
+        const size_t bucket = ctx.unit_bucket[unit];
+        if (depth + 1 < ctx.combination_size &&
+            ctx.unit_bucket[state.picked_units[static_cast<size_t>(depth + 1)]] == bucket) {
+            continue;
+        }
+
+        DenseSlotArray base_sums = unit_sums;
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            base_sums[slot] -= ctx.units[unit].slot_values[slot];
+        }
+        const int base_total = unit_total - ctx.units[unit].total_attr_value;
+        const auto& members = ctx.bucket_members[bucket];
+        for (size_t module_idx : members) {
+            if (state.module_needed[module_idx]) {
+                continue;
+            }
+            const auto& member = (*ctx.dense_modules)[module_idx];
+            DenseSlotArray slot_sums = base_sums;
+            AddSlotArrays(slot_sums, member.slot_values);
+            if (MeetsMinAttrRequirements(slot_sums, *ctx.min_attr_requirements) &&
+                CalculateDenseScore(slot_sums, base_total + member.total_attr_value, *ctx.slot_value_power) >= lower_bound) {
+                state.module_needed[module_idx] = true;
+                ++state.needed_count;
+            }
+        }
+        state.work_budget -= std::min(state.work_budget, members.size());
+    }
+}
+
+void SignatureTupleDfs(
+    const SignaturePrepassContext& ctx,
+    SignaturePrepassState& state,
+    int depth,
+    const DenseSlotArray& unit_sums,
+    int unit_total,
+    size_t next_unit) {
+
+    const int remaining_slots = ctx.combination_size - depth;
+    for (size_t unit = next_unit; unit + static_cast<size_t>(remaining_slots) <= ctx.units.size(); ++unit) {
+        if (state.work_budget == 0 || state.needed_count == state.module_needed.size()) {
+            return;
+        }
+        // 同一桶只允许按单元顺序选取前缀, 每个签名多重集只访问一次
+        if (ctx.unit_offset[unit] != 0 &&
+            (depth == 0 || state.picked_units[static_cast<size_t>(depth - 1)] + 1 != unit)) {
+            continue;
+        }
+
+        // 只剪掉严格低于下界的签名组合, 与第K名同分的组合仍然保留
+        const int lower_bound = CurrentBeamThreshold(state.known_scores, ctx.max_solutions);
+        if (CalculatePartLimitedBound(
+                unit_sums, unit_total, unit, remaining_slots, ctx.max_unit_slots,
+                *ctx.slot_value_power, ctx.suffix_slot_best, ctx.suffix_total_best) < lower_bound) {
+            return;
+        }
+        if (!CanSatisfyMinRequirements(
+                unit_sums, unit, remaining_slots, *ctx.min_attr_requirements, ctx.suffix_slot_best)) {
+            return;
+        }
+
+        DenseSlotArray child_sums = unit_sums;
+        AddSlotArrays(child_sums, ctx.units[unit].slot_values);
+        const int child_total = unit_total + ctx.units[unit].total_attr_value;
+        state.picked_units[static_cast<size_t>(depth)] = unit;
+        if (remaining_slots > 1) {
+            SignatureTupleDfs(ctx, state, depth + 1, child_sums, child_total, unit + 1);
+            continue;
+        }
+
+        --state.work_budget;
+        if (!MeetsMinAttrRequirements(child_sums, *ctx.min_attr_requirements) ||
+            CalculateDenseScore(child_sums, child_total, *ctx.slot_value_power) < lower_bound) {
+            continue;
+        }
+        if (state.marking) {
+            MarkSignatureTupleMembers(ctx, state, child_sums, child_total, lower_bound);
+        } else {
+            CollectSignatureTupleScores(ctx, state);
+        }
+    }
+}
+
+/// 属性签名分桶预筛选: 先枚举签名组合并用桶上界整体剪枝, 只保留在未被剪掉的签名组合中可能进入前K名的模组.
+/// 搜索超出预算时不做筛选, 返回全部模组
+std::vector<size_t> FindSignatureCandidates(
+    const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int combination_size,
+    int max_solutions) {
+
+    std::vector<size_t> all_modules(dense_modules.size());
+    for (size_t i = 0; i < all_modules.size(); ++i) {
+        all_modules[i] = i;
+    }
+    if (combination_size <= 0 || combination_size > 5 || max_solutions <= 0 ||
+        static_cast<size_t>(combination_size) > dense_modules.size()) {
+        return all_modules;
+    }
+
+    SignaturePrepassContext ctx;
+    BuildSignaturePrepassContext(
+        dense_modules, slot_value_power, min_attr_requirements, combination_size, max_solutions, ctx);
+
+    SignaturePrepassState state;
+    state.module_needed.assign(dense_modules.size(), false);
+    state.work_budget = kSignatureWorkBudget;
+    SignatureTupleDfs(ctx, state, 0, DenseSlotArray{}, 0, 0);
+    if (state.work_budget == 0) {
+        return all_modules;
+    }
+    state.marking = true;
+    SignatureTupleDfs(ctx, state, 0, DenseSlotArray{}, 0, 0);
+    if (state.work_budget == 0) {
+        return all_modules;
+    }
+
+    std::vector<size_t> candidates;
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        if (state.module_needed[module_idx]) {
+            candidates.push_back(module_idx);
+        }
+    }
+    return candidates;
+}
+
+/// 按属性签名分桶预筛选模组列表, 返回的模组保持原有顺序
+std::vector<ModuleInfo> FilterBySignatureBounds(
+    const std::vector<ModuleInfo>& modules,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int combination_size,
+    int max_solutions) {
+
+    const auto dense_modules = BuildDenseModuleData(modules);
+    const auto candidates = FindSignatureCandidates(
+        dense_modules, slot_value_power, min_attr_requirements, combination_size, max_solutions);
+    if (candidates.size() == modules.size()) {
+        return modules;
+    }
+    std::vector<ModuleInfo> filtered;
+    filtered.reserve(candidates.size());
+    for (size_t module_idx : candidates) {
+        filtered.push_back(modules[module_idx]);
+    }
+    return filtered;
+}
+
+/// 两两模组属性和表, 按首个模组分组, 组内按第二个模组升序
+/// 只收录等价类内合法的前缀组合, 搜索最后两层时直接与前缀合并
+struct PairSumTable {
+    std::vector<size_t> group_offset;
+    std::vector<uint16_t> second_index;
+    std::vector<int> total_attr_value;
+    std::vector<uint32_t> slot_offset;
+    std::vector<uint8_t> slot_ids;
+    std::vector<int> slot_values;
+};
+
+/// 分支定界搜索上下文: 按贡献度降序排列的模组及其后缀上界
+struct BranchAndBoundContext {
+    std::vector<DenseModuleData> dense_modules;
+    std::vector<SparseModuleSlots> sparse_modules;
+    std::vector<size_t> sorted_to_original;
+    std::vector<int> class_offset;
+    std::vector<size_t> module_class;
+    std::vector<std::vector<size_t>> class_members;
+    std::vector<int> slot_value_power;
+    std::vector<int> min_attr_requirements;
+    std::vector<int> required_slots;
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    int combination_size = 4;
+    int max_solutions = 60;
+    int max_module_slots = 3;
+    bool has_min_requirements = false;
+    const PairSumTable* pair_table = nullptr;
+    /// 分页搜索: 只接受分数低于score_ceiling, 或等于它但不在ceiling_keys中的组合
+    int score_ceiling = std::numeric_limits<int>::max();
+    std::unordered_set<PackedIndices, PackedIndicesHash> ceiling_keys;
+};
+
+/// 分支定界中间快照: 各线程轮询时同步自己的top-K, 快照到期时由其中一个线程合并推送
+struct BranchAndBoundSnapshotBoard {
+    const std::vector<ModuleInfo>* modules = nullptr;
+    const BranchAndBoundContext* ctx = nullptr;
+    SearchBudget* budget = nullptr;
+    std::mutex mutex;
+    std::vector<std::vector<CompactSolution>> worker_solutions;
+    bool dirty = false;
+};
+
+/// 分支定界线程间共享状态
+struct BranchAndBoundShared {
+    std::atomic<int> threshold{std::numeric_limits<int>::min()};
+    std::atomic<size_t> next_root{0};
+    SearchBudget* budget = nullptr;
+    BranchAndBoundSnapshotBoard* snapshots = nullptr;
+};
+
+/// 分支定界线程局部状态
+struct BranchAndBoundLocal {
+    CompactMinHeap top_solutions;
+    std::array<uint16_t, 5> indices = {};
+    BudgetTicker ticker;
+    /// top_solutions每次变化递增, 与已同步到快照板的版本不同时才需要重新同步
+    size_t heap_version = 0;
+    size_t synced_version = 0;
+    size_t snapshot_slot = 0;
+    BranchAndBoundSnapshotBoard* snapshots = nullptr;
+};
+
+std::vector<size_t> BuildContributionOrder(
+    const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<int>& slot_value_power) {
+
+    std::vector<int> contribution(dense_modules.size(), 0);
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        contribution[module_idx] = CalculateDenseScore(
+            dense_modules[module_idx].slot_values,
+            dense_modules[module_idx].total_attr_value,
+            slot_value_power);
+    }
+
+    std::vector<size_t> order(dense_modules.size());
+    for (size_t i = 0; i < order.size(); ++i) {
+        order[i] = i;
+    }
+    std::sort(order.begin(), order.end(),
+        [&](size_t lhs, size_t rhs) {
+            if (contribution[lhs] != contribution[rhs]) {
+                return contribution[lhs] > contribution[rhs];
+            }
+            if (dense_modules[lhs].total_attr_value != dense_modules[rhs].total_attr_value) {
+                return dense_modules[lhs].total_attr_value > dense_modules[rhs].total_attr_value;
+            }
+            // 同一大类且属性完全相同的模组必须相邻, 便于合并为等价类
+            if (dense_modules[lhs].slot_values != dense_modules[rhs].slot_values) {
+                return dense_modules[lhs].slot_values < dense_modules[rhs].slot_values;
+            }
+            if (dense_modules[lhs].category != dense_modules[rhs].category) {
+                return dense_modules[lhs].category < dense_modules[rhs].category;
+            }
+            return lhs < rhs;
+        });
+    return order;
+}
+
+void BuildBranchAndBoundContext(
+    const std::vector<DenseModuleData>& dense_modules_raw,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int combination_size,
+    int max_solutions,
+    BranchAndBoundContext& ctx) {
+
+    const auto order = BuildContributionOrder(dense_modules_raw, slot_value_power);
+    ctx.sorted_to_original.clear();
+    ctx.class_offset.clear();
+    ctx.module_class.clear();
+    ctx.class_members.clear();
+    ctx.dense_modules.clear();
+    ctx.dense_modules.reserve(dense_modules_raw.size());
+    ctx.sparse_modules.clear();
+    ctx.sparse_modules.reserve(dense_modules_raw.size());
+
+    // 同一大类且属性向量完全相同的模组合并为等价类, 每类最多保留combination_size个副本参与搜索
+    for (size_t pos = 0; pos < order.size(); ++pos) {
+        const size_t original_index = order[pos];
+        const auto& dense = dense_modules_raw[original_index];
+        if (pos == 0 || !SameModuleClass(dense, dense_modules_raw[order[pos - 1]])) {
+            ctx.class_members.emplace_back();
+        }
+        auto& members = ctx.class_members.back();
+        members.push_back(original_index);
+        if (members.size() > static_cast<size_t>(combination_size)) {
+            continue;
+        }
+        ctx.sorted_to_original.push_back(original_index);
+        ctx.class_offset.push_back(static_cast<int>(members.size()) - 1);
+        ctx.module_class.push_back(ctx.class_members.size() - 1);
+        ctx.dense_modules.push_back(dense);
+        ctx.sparse_modules.push_back(BuildSparseModuleSlots(dense));
+    }
+    ctx.slot_value_power = slot_value_power;
+    ctx.min_attr_requirements = min_attr_requirements;
+    ctx.required_slots.clear();
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        if (min_attr_requirements[slot] > 0) {
+            ctx.required_slots.push_back(slot);
+        }
+    }
+    ctx.has_min_requirements = !ctx.required_slots.empty();
+    ctx.combination_size = combination_size;
+    ctx.max_solutions = max_solutions;
+    ctx.max_module_slots = CountMaxModuleSlots(ctx.dense_modules);
+    BuildSuffixUpperBounds(ctx.dense_modules, combination_size, ctx.suffix_slot_best, ctx.suffix_total_best);
+}
+
+void BuildPairSumTable(const BranchAndBoundContext& ctx, PairSumTable& table) {
+    const size_t n = ctx.dense_modules.size();
+    table.group_offset.assign(n + 1, 0);
+    table.second_index.clear();
+    table.total_attr_value.clear();
+    table.slot_offset.assign(1, 0);
+    table.slot_ids.clear();
+    table.slot_values.clear();
+
+    for (size_t first = 0; first < n; ++first) {
+        table.group_offset[first] = table.second_index.size();
+        const auto& first_dense = ctx.dense_modules[first];
+        for (size_t second = first + 1; second < n; ++second) {
+            // 第二个模组若是等价类的非首个副本, 只能紧跟在前一个副本之后
+            if (ctx.class_offset[second] != 0 && second != first + 1) {
+                continue;
+            }
+            const auto& second_dense = ctx.dense_modules[second];
+            table.second_index.push_back(static_cast<uint16_t>(second));
+            table.total_attr_value.push_back(first_dense.total_attr_value + second_dense.total_attr_value);
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                const int value = first_dense.slot_values[slot] + second_dense.slot_values[slot];
+                if (value != 0) {
+                    table.slot_ids.push_back(static_cast<uint8_t>(slot));
+                    table.slot_values.push_back(value);
+                }
+            }
+            table.slot_offset.push_back(static_cast<uint32_t>(table.slot_ids.size()));
+        }
+    }
+    table.group_offset[n] = table.second_index.size();
+}
+
+inline int CalculateBranchAndBoundBound(
+    const BranchAndBoundContext& ctx,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    size_t next_start,
+    int remaining_slots) {
+
+    return CalculatePartLimitedBound(
+        slot_sums, total_attr_value, next_start, remaining_slots, ctx.max_module_slots,
+        ctx.slot_value_power, ctx.suffix_slot_best, ctx.suffix_total_best);
+}
+
+/// 加入module_idx后, 剩余picks个模组从next_start起选取能否满足最小属性和约束
+inline bool CanSatisfyMinRequirementsWith(
+    const BranchAndBoundContext& ctx,
+    const DenseSlotArray& slot_sums,
+    size_t module_idx,
+    size_t next_start,
+    int remaining_slots) {
+
+    const auto& dense = ctx.dense_modules[module_idx];
+    for (int slot : ctx.required_slots) {
+        const int optimistic = slot_sums[slot] + dense.slot_values[slot] +
+            (remaining_slots > 0 ? ctx.suffix_slot_best[slot][next_start][remaining_slots] : 0);
+        if (optimistic < ctx.min_attr_requirements[slot]) {
+            return false;
+        }
+    }
+    return true;
+}
+
+/// 等价类内只允许选取前缀副本, 保证每个多重集只被枚举一次
+inline bool IsCanonicalClassPick(
+    const BranchAndBoundContext& ctx,
+    const BranchAndBoundLocal& local,
+    int depth,
+    size_t module_idx) {
+
+    return ctx.class_offset[module_idx] == 0 ||
+        (depth > 0 && local.indices[static_cast<size_t>(depth - 1)] + 1u == module_idx);
+}
+
+inline int BranchAndBoundThreshold(
+    const BranchAndBoundLocal& local,
+    const BranchAndBoundShared& shared,
+    int max_solutions) {
+
+    return std::max(
+        CurrentBeamThreshold(local.top_solutions, max_solutions),
+        shared.threshold.load(std::memory_order_relaxed));
+}
+
+void BranchAndBoundPush(
+    const BranchAndBoundContext& ctx,
+    BranchAndBoundShared& shared,
+    BranchAndBoundLocal& local,
+    int score) {
+
+    if (score > ctx.score_ceiling) {
+        return;
+    }
+    CompactSolution candidate;
+    candidate.packed_indices = PackIndices(local.indices.data(), ctx.combination_size);
+    candidate.score = score;
+    if (score == ctx.score_ceiling && ctx.ceiling_keys.count(candidate.packed_indices) != 0) {
+        return;
+    }
+    if (local.top_solutions.size() < static_cast<size_t>(ctx.max_solutions)) {
+        local.top_solutions.push(candidate);
+    } else if (score > local.top_solutions.top().score) {
+        local.top_solutions.pop();
+        local.top_solutions.push(candidate);
+    } else {
+        return;
+    }
+    ++local.heap_version;
+    local.ticker.Offer(score);
+
+    // 任一线程的第K名都是全局第K名的下界, 可以安全地共享给其它线程
+    if (local.top_solutions.size() == static_cast<size_t>(ctx.max_solutions)) {
+        const int local_threshold = local.top_solutions.top().score;
+        int shared_threshold = shared.threshold.load(std::memory_order_relaxed);
+        while (local_threshold > shared_threshold &&
+               !shared.threshold.compare_exchange_weak(shared_threshold, local_threshold, std::memory_order_relaxed)) {
+        }
+    }
+}
+
+/// 最后两层: 前缀与首模组为first_idx的两两属性和表合并
+void BranchAndBoundJoinPairs(
+    const BranchAndBoundContext& ctx,
+    BranchAndBoundShared& shared,
+    BranchAndBoundLocal& local,
+    int depth,
+    const DenseSlotArray& slot_sums,
+    const DenseSlotArray& slot_power,
+    int base_power,
+    int total_attr_value,
+    const DenseSlotArray& child_sums,
+    size_t first_idx) {
+
+    const auto& table = *ctx.pair_table;
+    const auto& slot_value_power = ctx.slot_value_power;
+    const int child_total = total_attr_value + ctx.dense_modules[first_idx].total_attr_value;
+    const size_t begin = table.group_offset[first_idx];
+    const size_t end = table.group_offset[first_idx + 1];
+
+    size_t entry = begin;
+    for (; entry < end; ++entry) {
+        const size_t second_idx = table.second_index[entry];
+        const int threshold = BranchAndBoundThreshold(local, shared, ctx.max_solutions);
+        // 组内第二个模组升序排列, 后缀上界单调不增
+        if (((entry - begin) & 7u) == 0 &&
+            CalculateBranchAndBoundBound(ctx, child_sums, child_total, second_idx, 1) <= threshold) {
+            break;
+        }
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirementsWith(ctx, child_sums, second_idx, second_idx + 1, 0)) {
+            continue;
+        }
+
+        int score = base_power + TotalAttrPower(
+            slot_value_power, total_attr_value + table.total_attr_value[entry]);
+        for (uint32_t k = table.slot_offset[entry]; k < table.slot_offset[entry + 1]; ++k) {
+            const int slot = table.slot_ids[k];
+            score += slot_value_power[slot * 21 + std::min(slot_sums[slot] + table.slot_values[k], kMaxSlotValue)] -
+                slot_power[slot];
+        }
+        if (score <= threshold) {
+            continue;
+        }
+        local.indices[static_cast<size_t>(depth + 1)] = static_cast<uint16_t>(second_idx);
+        BranchAndBoundPush(ctx, shared, local, score);
+    }
+    local.ticker.Tick(static_cast<long long>(entry - begin));
+}
+
+void BranchAndBoundDfs(
+    const BranchAndBoundContext& ctx,
+    BranchAndBoundShared& shared,
+    BranchAndBoundLocal& local,
+    int depth,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    size_t next_start) {
+
+    if (local.ticker.Tick(1)) {
+        return;
+    }
+    const size_t n = ctx.dense_modules.size();
+    const int remaining_slots = ctx.combination_size - depth;
+    const auto& slot_value_power = ctx.slot_value_power;
+
+    // 缓存当前前缀的逐槽位战斗力, 子节点只需要修正自身占用的少数槽位
+    DenseSlotArray slot_power = {};
+    int base_power = 0;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        slot_power[slot] = slot_value_power[slot * 21 + std::min(slot_sums[slot], kMaxSlotValue)];
+        base_power += slot_power[slot];
+    }
+
+    if (remaining_slots == 1) {
+        size_t module_idx = next_start;
+        for (; module_idx < n; ++module_idx) {
+            const int threshold = BranchAndBoundThreshold(local, shared, ctx.max_solutions);
+            // 后缀上界随起点单调不增, 每隔若干个候选检查一次即可整体截断
+            if (((module_idx - next_start) & 7u) == 0 &&
+                CalculateBranchAndBoundBound(ctx, slot_sums, total_attr_value, module_idx, 1) <= threshold) {
+                break;
+            }
+            if (!IsCanonicalClassPick(ctx, local, depth, module_idx)) {
+                continue;
+            }
+            if (ctx.has_min_requirements &&
+                !CanSatisfyMinRequirementsWith(ctx, slot_sums, module_idx, module_idx + 1, 0)) {
+                continue;
+            }
+
+            const auto& sparse = ctx.sparse_modules[module_idx];
+            int score = base_power + TotalAttrPower(
+                slot_value_power, total_attr_value + ctx.dense_modules[module_idx].total_attr_value);
+            for (int k = 0; k < sparse.count; ++k) {
+                const int slot = sparse.slots[static_cast<size_t>(k)];
+                score += slot_value_power[slot * 21 + std::min(slot_sums[slot] + sparse.values[static_cast<size_t>(k)], kMaxSlotValue)] -
+                    slot_power[slot];
+            }
+            if (score <= threshold) {
+                continue;
+            }
+            local.indices[static_cast<size_t>(depth)] = static_cast<uint16_t>(module_idx);
+            BranchAndBoundPush(ctx, shared, local, score);
+        }
+        local.ticker.Tick(static_cast<long long>(module_idx - next_start));
+        return;
+    }
+
+    // 子节点之外槽位的后缀收益, 以node级后缀计算(覆盖所有子节点的后缀)保证上界有效
+    const int child_remaining = remaining_slots - 1;
+    const size_t gain_start = std::min(next_start + 1, n);
+    std::array<std::pair<int, int>, Constants::CUDA_ATTR_DIM> node_gains;
+    int node_gain_count = 0;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        const int optimistic = std::min(
+            slot_sums[slot] + ctx.suffix_slot_best[slot][gain_start][child_remaining], kMaxSlotValue);
+        const int gain = slot_value_power[slot * 21 + optimistic] - slot_power[slot];
+        if (gain > 0) {
+            node_gains[static_cast<size_t>(node_gain_count++)] = {gain, slot};
+        }
+    }
+    std::sort(node_gains.begin(), node_gains.begin() + node_gain_count, std::greater<std::pair<int, int>>());
+    const int gain_limit = child_remaining * ctx.max_module_slots;
+
+    for (size_t module_idx = next_start; module_idx + static_cast<size_t>(remaining_slots) <= n; ++module_idx) {
+        const int threshold = BranchAndBoundThreshold(local, shared, ctx.max_solutions);
+        if (((module_idx - next_start) & 7u) == 0) {
+            if (CalculateBranchAndBoundBound(ctx, slot_sums, total_attr_value, module_idx, remaining_slots) <= threshold) {
+                break;
+            }
+            if (ctx.has_min_requirements &&
+                !CanSatisfyMinRequirements(
+                    slot_sums, module_idx, remaining_slots, ctx.min_attr_requirements, ctx.suffix_slot_best)) {
+                break;
+            }
+        }
+
+        if (!IsCanonicalClassPick(ctx, local, depth, module_idx)) {
+            continue;
+        }
+        const size_t child_start = module_idx + 1;
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirementsWith(ctx, slot_sums, module_idx, child_start, child_remaining)) {
+            continue;
+        }
+
+        const auto& dense = ctx.dense_modules[module_idx];
+        const auto& sparse = ctx.sparse_modules[module_idx];
+        int child_bound = base_power + TotalAttrPower(
+            slot_value_power,
+            total_attr_value + dense.total_attr_value + ctx.suffix_total_best[child_start][child_remaining]);
+
+        std::array<int, Constants::CUDA_ATTR_DIM * 2> top_gains;
+        int top_count = 0;
+        for (int k = 0; k < sparse.count; ++k) {
+            const int slot = sparse.slots[static_cast<size_t>(k)];
+            const int child_value = slot_sums[slot] + sparse.values[static_cast<size_t>(k)];
+            const int child_power = slot_value_power[slot * 21 + std::min(child_value, kMaxSlotValue)];
+            child_bound += child_power - slot_power[slot];
+            const int gain = slot_value_power[slot * 21 + std::min(
+                child_value + ctx.suffix_slot_best[slot][child_start][child_remaining], kMaxSlotValue)] - child_power;
+            if (gain > 0) {
+                top_gains[static_cast<size_t>(top_count++)] = gain;
+            }
+        }
+        int taken = 0;
+        for (int g = 0; g < node_gain_count && taken < gain_limit; ++g) {
+            if (sparse.slot_mask & (1u << node_gains[static_cast<size_t>(g)].second)) {
+                continue;
+            }
+            top_gains[static_cast<size_t>(top_count++)] = node_gains[static_cast<size_t>(g)].first;
+            ++taken;
+        }
+        if (top_count > gain_limit) {
+            std::nth_element(top_gains.begin(), top_gains.begin() + gain_limit, top_gains.begin() + top_count, std::greater<int>());
+            top_count = gain_limit;
+        }
+        for (int g = 0; g < top_count; ++g) {
+            child_bound += top_gains[static_cast<size_t>(g)];
+        }
+        if (child_bound <= threshold) {
+            continue;
+        }
+
+        DenseSlotArray child_sums = slot_sums;
+        AddSlotArrays(child_sums, dense.slot_values);
+        local.indices[static_cast<size_t>(depth)] = static_cast<uint16_t>(module_idx);
+        if (ctx.pair_table != nullptr && remaining_slots == 2) {
+            BranchAndBoundJoinPairs(
+                ctx, shared, local, depth, slot_sums, slot_power, base_power,
+                total_attr_value, child_sums, module_idx);
+        } else {
+            BranchAndBoundDfs(
+                ctx, shared, local, depth + 1, child_sums,
+                total_attr_value + dense.total_attr_value, child_start);
+        }
+        // 叶子层每攒够一批才轮询预算, 这里只读取局部标志
+        if (local.ticker.stopped) {
+            return;
+        }
+    }
+}
+
+/// base非空时所有组合都额外包含这个不在ctx中的模组, 分数按合并后的属性和计算
+void SyncBranchAndBoundSnapshot(void* context);
+
+std::vector<CompactSolution> BranchAndBoundWorker(
+    const BranchAndBoundContext& ctx,
+    BranchAndBoundShared& shared,
+    const DenseModuleData* base = nullptr) {
+
+    BranchAndBoundLocal local;
+    local.ticker.budget = shared.budget;
+    if (shared.snapshots != nullptr) {
+        std::lock_guard<std::mutex> lock(shared.snapshots->mutex);
+        local.snapshots = shared.snapshots;
+        local.snapshot_slot = shared.snapshots->worker_solutions.size();
+        shared.snapshots->worker_solutions.emplace_back();
+        local.ticker.on_flush = &SyncBranchAndBoundSnapshot;
+        local.ticker.on_flush_context = &local;
+    }
+    const size_t n = ctx.dense_modules.size();
+    const DenseModuleData empty_base;
+    const DenseSlotArray& base_sums = (base != nullptr ? *base : empty_base).slot_values;
+    const int base_total = base != nullptr ? base->total_attr_value : 0;
+
+    while (true) {
+        const size_t root = shared.next_root.fetch_add(1, std::memory_order_relaxed);
+        if (root + static_cast<size_t>(ctx.combination_size) > n || local.ticker.stopped) {
+            break;
+        }
+        ++local.ticker.pending_work;
+
+        const int threshold = BranchAndBoundThreshold(local, shared, ctx.max_solutions);
+        // 根节点按贡献度排序, 首个无法超过阈值的根之后全部可以截断
+        if (CalculateBranchAndBoundBound(ctx, base_sums, base_total, root, ctx.combination_size) <= threshold) {
+            break;
+        }
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirements(
+                base_sums, root, ctx.combination_size, ctx.min_attr_requirements, ctx.suffix_slot_best)) {
+            break;
+        }
+
+        if (ctx.class_offset[root] != 0) {
+            continue;
+        }
+        DenseSlotArray root_sums = base_sums;
+        AddSlotArrays(root_sums, ctx.dense_modules[root].slot_values);
+        const int root_total = base_total + ctx.dense_modules[root].total_attr_value;
+        local.indices[0] = static_cast<uint16_t>(root);
+        // 锁定模组后可能只剩一个位置, 根节点本身就是完整组合
+        if (ctx.combination_size == 1) {
+            const int score = CalculateDenseScore(root_sums, root_total, ctx.slot_value_power);
+            if (score > threshold && MeetsMinAttrRequirements(root_sums, ctx.min_attr_requirements)) {
+                BranchAndBoundPush(ctx, shared, local, score);
+            }
+            continue;
+        }
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirements(
+                root_sums, root + 1, ctx.combination_size - 1,
+                ctx.min_attr_requirements, ctx.suffix_slot_best)) {
+            continue;
+        }
+        BranchAndBoundDfs(ctx, shared, local, 1, root_sums, root_total, root + 1);
+    }
+    local.ticker.Flush();
+
+    std::vector<CompactSolution> solutions;
+    solutions.reserve(local.top_solutions.size());
+    while (!local.top_solutions.empty()) {
+        solutions.push_back(local.top_solutions.top());
+        local.top_solutions.pop();
+    }
+    return solutions;
+}
+
+/// 统计在所有计分槽位与总属性值上都不低于target的模组数量, 达到limit即返回
+int CountDominatingModules(
+    const std::vector<DenseModuleData>& dense_modules,
+    const DenseModuleData& target,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int limit) {
+
+    std::array<int, Constants::CUDA_ATTR_DIM> check_slots;
+    int check_count = 0;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        if (target.slot_values[slot] > 0 &&
+            (slot_value_power[slot * 21 + kMaxSlotValue] > 0 || min_attr_requirements[slot] > 0)) {
+            check_slots[static_cast<size_t>(check_count++)] = slot;
+        }
+    }
+    int count = 0;
+    for (const auto& dense : dense_modules) {
+        if (dense.total_attr_value < target.total_attr_value) {
+            continue;
+        }
+        bool dominates = true;
+        for (int k = 0; k < check_count && dominates; ++k) {
+            const int slot = check_slots[static_cast<size_t>(k)];
+            dominates = dense.slot_values[slot] >= target.slot_values[slot];
+        }
+        if (dominates && ++count >= limit) {
+            break;
+        }
+    }
+    return count;
+}
+
+std::vector<ModuleSolution> BuildSolutionsFromCompact(
+    const std::vector<ModuleInfo>& modules,
+    const std::vector<CompactSolution>& compact_solutions,
+    const BranchAndBoundContext& ctx) {
+
+    std::vector<ModuleSolution> final_solutions;
+    final_solutions.reserve(compact_solutions.size());
+    for (const auto& solution : compact_solutions) {
+        auto indices = solution.unpack_indices_vector(ctx.combination_size);
+        std::vector<ModuleInfo> solution_modules;
+        solution_modules.reserve(indices.size());
+        std::map<size_t, size_t> class_pick_count;
+        for (size_t index : indices) {
+            solution_modules.push_back(modules[ctx.sorted_to_original[index]]);
+            ++class_pick_count[ctx.module_class[index]];
+        }
+        auto result = ModuleOptimizerCpp::CalculateCombatPower(solution_modules);
+        final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        final_solutions.back().certified = true;
+
+        // 等价类中未被选中的模组可以与所选模组任意互换, 分数不变
+        auto& equivalent_uuids = final_solutions.back().equivalent_uuids;
+        equivalent_uuids.resize(indices.size());
+        for (size_t pos = 0; pos < indices.size(); ++pos) {
+            const size_t class_id = ctx.module_class[indices[pos]];
+            const auto& members = ctx.class_members[class_id];
+            for (size_t member = class_pick_count[class_id]; member < members.size(); ++member) {
+                equivalent_uuids[pos].push_back(modules[members[member]].uuid);
+            }
+        }
+    }
+    return final_solutions;
+}
+
+/// BudgetTicker轮询后的回调: 把本线程变化过的top-K同步到快照板, 快照到期时合并各线程结果推送
+void SyncBranchAndBoundSnapshot(void* context) {
+    auto& local = *static_cast<BranchAndBoundLocal*>(context);
+    auto& board = *local.snapshots;
+    std::vector<CompactSolution> local_solutions;
+    if (local.synced_version != local.heap_version) {
+        CompactMinHeap heap = local.top_solutions;
+        local_solutions.reserve(heap.size());
+        while (!heap.empty()) {
+            local_solutions.push_back(heap.top());
+            heap.pop();
+        }
+    }
+
+    std::vector<CompactSolution> merged;
+    {
+        std::lock_guard<std::mutex> lock(board.mutex);
+        if (local.synced_version != local.heap_version) {
+            board.worker_solutions[local.snapshot_slot].swap(local_solutions);
+            local.synced_version = local.heap_version;
+            board.dirty = true;
+        }
+        if (!board.dirty || !board.budget->SnapshotDue()) {
+            return;
+        }
+        board.dirty = false;
+        for (const auto& solutions : board.worker_solutions) {
+            merged.insert(merged.end(), solutions.begin(), solutions.end());
+        }
+    }
+
+    std::sort(merged.begin(), merged.end(),
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
+            if (lhs.score != rhs.score) {
+                return lhs.score > rhs.score;
+            }
+            return lhs.packed_indices < rhs.packed_indices;
+        });
+    merged.resize(std::min(merged.size(), static_cast<size_t>(board.ctx->max_solutions)));
+    board.budget->PublishSnapshot(BuildSolutionsFromCompact(*board.modules, merged, *board.ctx), false);
+}
+
+/// seed_threshold为已知的第K名分数下界(如beam结果), 只搜索不低于该分数的组合;
+/// budget到期或取消时各线程停止展开, 返回已搜索部分的top-K
+std::vector<ModuleSolution> RunBranchAndBound(
+    const std::vector<ModuleInfo>& modules,
+    const BranchAndBoundContext& ctx,
+    int max_workers,
+    int seed_threshold = std::numeric_limits<int>::min(),
+    std::vector<ModuleSolution>* surplus = nullptr,
+    SearchBudget* budget = nullptr) {
+
+    const int worker_count = std::max(1, max_workers);
+    BranchAndBoundShared shared;
+    if (seed_threshold != std::numeric_limits<int>::min()) {
+        shared.threshold.store(seed_threshold - 1, std::memory_order_relaxed);
+    }
+    shared.budget = budget;
+    if (budget != nullptr) {
+        budget->SetTotalWork(static_cast<long long>(ctx.dense_modules.size()));
+    }
+    BranchAndBoundSnapshotBoard snapshots;
+    if (budget != nullptr && budget->WantsSnapshots()) {
+        snapshots.modules = &modules;
+        snapshots.ctx = &ctx;
+        snapshots.budget = budget;
+        shared.snapshots = &snapshots;
+    }
+
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<std::vector<CompactSolution>>> futures;
+    futures.reserve(static_cast<size_t>(worker_count));
+    for (int worker = 0; worker < worker_count; ++worker) {
+        futures.push_back(pool->enqueue(
+            [&ctx, &shared]() {
+                return BranchAndBoundWorker(ctx, shared);
+            }));
+    }
+
+    // 各线程的根节点互不相交, 合并后按分数降序, 同分按组合下标排序保证分页稳定
+    std::vector<CompactSolution> all_solutions;
+    for (auto& future : futures) {
+        auto batch = future.get();
+        all_solutions.insert(all_solutions.end(), batch.begin(), batch.end());
+    }
+    pool.reset();
+    std::sort(all_solutions.begin(), all_solutions.end(),
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
+            if (lhs.score != rhs.score) {
+                return lhs.score > rhs.score;
+            }
+            return lhs.packed_indices < rhs.packed_indices;
+        });
+
+    // 超出top-K的部分同样是真实组合, 分页时作为下一页的候选
+    const size_t keep = std::min(all_solutions.size(), static_cast<size_t>(ctx.max_solutions));
+    if (surplus != nullptr) {
+        const size_t surplus_end = std::min(all_solutions.size(), keep + static_cast<size_t>(ctx.max_solutions));
+        *surplus = BuildSolutionsFromCompact(
+            modules, std::vector<CompactSolution>(all_solutions.begin() + keep, all_solutions.begin() + surplus_end), ctx);
+    }
+    all_solutions.resize(keep);
+
+    return BuildSolutionsFromCompact(modules, all_solutions, ctx);
+}
+
+/// 帕累托前沿最多支持的属性维度
+constexpr int kMaxParetoAttrs = 3;
+
+using ParetoSumArray = std::array<int, kMaxParetoAttrs>;
+
+struct ParetoPoint {
+    int score = 0;
+    ParetoSumArray sums = {};
+    PackedIndices packed_indices;
+};
+
+/// 分数与所选属性和构成的非支配点集合, 取值相同的组合只保留组合下标最小的一个代表
+struct ParetoFrontier {
+    int dims = 1;
+    std::vector<ParetoPoint> points;
+
+    /// 存在分数与各属性和都不低于给定值的点时返回true, 用于对乐观上界剪枝
+    bool Covers(int score, const ParetoSumArray& sums) const {
+        for (const auto& point : points) {
+            if (point.score < score) {
+                continue;
+            }
+            bool covers = true;
+            for (int d = 0; d < dims && covers; ++d) {
+                covers = point.sums[static_cast<size_t>(d)] >= sums[static_cast<size_t>(d)];
+            }
+            if (covers) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    void Insert(const ParetoPoint& candidate) {
+        size_t keep = 0;
+        for (size_t i = 0; i < points.size(); ++i) {
+            const auto& point = points[i];
+            bool point_ge = point.score >= candidate.score;
+            bool candidate_ge = candidate.score >= point.score;
+            for (int d = 0; d < dims; ++d) {
+                point_ge = point_ge && point.sums[static_cast<size_t>(d)] >= candidate.sums[static_cast<size_t>(d)];
+                candidate_ge = candidate_ge && candidate.sums[static_cast<size_t>(d)] >= point.sums[static_cast<size_t>(d)];
+            }
+            if (point_ge && !(candidate_ge && candidate.packed_indices < point.packed_indices)) {
+                return;
+            }
+            if (!candidate_ge) {
+                points[keep++] = point;
+            }
+        }
+        points.resize(keep);
+        points.push_back(candidate);
+    }
+};
+
+struct ParetoSearchContext {
+    const BranchAndBoundContext* bnb = nullptr;
+    ParetoSumArray frontier_slots = {};
+    ParetoSumArray base_sums = {};
+    int dims = 1;
+    SearchBudget* budget = nullptr;
+};
+
+inline ParetoSumArray OptimisticParetoSums(
+    const ParetoSearchContext& pctx,
+    const DenseSlotArray& slot_sums,
+    size_t next_start,
+    int remaining_slots) {
+
+    ParetoSumArray sums = {};
+    for (int d = 0; d < pctx.dims; ++d) {
+        const int slot = pctx.frontier_slots[static_cast<size_t>(d)];
+        sums[static_cast<size_t>(d)] = pctx.base_sums[static_cast<size_t>(d)] + slot_sums[slot] +
+            pctx.bnb->suffix_slot_best[slot][next_start][remaining_slots];
+    }
+    return sums;
+}
+
+void ParetoDfs(
+    const ParetoSearchContext& pctx,
+    ParetoFrontier& frontier,
+    BudgetTicker& ticker,
+    std::array<uint16_t, 5>& indices,
+    int depth,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    size_t next_start) {
+
+    const auto& ctx = *pctx.bnb;
+    const int remaining_slots = ctx.combination_size - depth;
+    if (ticker.Tick(1)) {
+        return;
+    }
+    if (remaining_slots == 0) {
+        if (ctx.has_min_requirements && !MeetsMinAttrRequirements(slot_sums, ctx.min_attr_requirements)) {
+            return;
+        }
+        ParetoPoint point;
+        point.score = CalculateDenseScore(slot_sums, total_attr_value, ctx.slot_value_power);
+        point.sums = OptimisticParetoSums(pctx, slot_sums, next_start, 0);
+        point.packed_indices = PackIndices(indices.data(), ctx.combination_size);
+        ticker.Offer(point.score);
+        frontier.Insert(point);
+        return;
+    }
+
+    const size_t n = ctx.dense_modules.size();
+    for (size_t module_idx = next_start; module_idx + static_cast<size_t>(remaining_slots) <= n; ++module_idx) {
+        // 分数上界与各属性和的乐观值都随起点单调不增, 一旦被前沿覆盖, 之后的候选全部截断
+        if (((module_idx - next_start) & 7u) == 0) {
+            const int bound = CalculateBranchAndBoundBound(ctx, slot_sums, total_attr_value, module_idx, remaining_slots);
+            if (frontier.Covers(bound, OptimisticParetoSums(pctx, slot_sums, module_idx, remaining_slots))) {
+                break;
+            }
+            if (ctx.has_min_requirements &&
+                !CanSatisfyMinRequirements(
+                    slot_sums, module_idx, remaining_slots, ctx.min_attr_requirements, ctx.suffix_slot_best)) {
+                break;
+            }
+        }
+        if (ctx.class_offset[module_idx] != 0 &&
+            (depth == 0 || indices[static_cast<size_t>(depth - 1)] + 1u != module_idx)) {
+            continue;
+        }
+        const size_t child_start = module_idx + 1;
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirementsWith(ctx, slot_sums, module_idx, child_start, remaining_slots - 1)) {
+            continue;
+        }
+
+        const auto& dense = ctx.dense_modules[module_idx];
+        DenseSlotArray child_sums = slot_sums;
+        AddSlotArrays(child_sums, dense.slot_values);
+        indices[static_cast<size_t>(depth)] = static_cast<uint16_t>(module_idx);
+        ParetoDfs(pctx, frontier, ticker, indices, depth + 1, child_sums, total_attr_value + dense.total_attr_value, child_start);
+        if (ticker.stopped) {
+            return;
+        }
+    }
+}
+
+/// 各线程按根节点分摊搜索并维护各自的前沿, 合并时重新筛选非支配点
+std::vector<CompactSolution> RunParetoSearch(const ParetoSearchContext& pctx, int max_workers) {
+    const auto& ctx = *pctx.bnb;
+    const size_t n = ctx.dense_modules.size();
+    const int worker_count = std::max(1, max_workers);
+    std::atomic<size_t> next_root{0};
+
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<std::vector<ParetoPoint>>> futures;
+    futures.reserve(static_cast<size_t>(worker_count));
+    for (int worker = 0; worker < worker_count; ++worker) {
+        futures.push_back(pool->enqueue(
+            [&pctx, &ctx, &next_root, n]() {
+                ParetoFrontier frontier;
+                frontier.dims = pctx.dims;
+                BudgetTicker ticker;
+                ticker.budget = pctx.budget;
+                std::array<uint16_t, 5> indices = {};
+                const DenseSlotArray empty_sums = {};
+                while (true) {
+                    const size_t root = next_root.fetch_add(1, std::memory_order_relaxed);
+                    if (root + static_cast<size_t>(ctx.combination_size) > n || ticker.stopped) {
+                        break;
+                    }
+                    ++ticker.pending_work;
+                    // 根节点的乐观值随编号单调不增, 被本线程前沿覆盖后其余根节点同样被覆盖
+                    const int bound = CalculateBranchAndBoundBound(ctx, empty_sums, 0, root, ctx.combination_size);
+                    if (frontier.Covers(bound, OptimisticParetoSums(pctx, empty_sums, root, ctx.combination_size))) {
+                        break;
+                    }
+                    if (ctx.class_offset[root] != 0) {
+                        continue;
+                    }
+                    const auto& dense = ctx.dense_modules[root];
+                    indices[0] = static_cast<uint16_t>(root);
+                    ParetoDfs(pctx, frontier, ticker, indices, 1, dense.slot_values, dense.total_attr_value, root + 1);
+                }
+                ticker.Flush();
+                return frontier.points;
+            }));
+    }
+
+    std::vector<ParetoPoint> all_points;
+    for (auto& future : futures) {
+        auto batch = future.get();
+        all_points.insert(all_points.end(), batch.begin(), batch.end());
+    }
+    pool.reset();
+    std::sort(all_points.begin(), all_points.end(),
+        [](const ParetoPoint& lhs, const ParetoPoint& rhs) {
+            if (lhs.score != rhs.score) {
+                return lhs.score > rhs.score;
+            }
+            return lhs.packed_indices < rhs.packed_indices;
+        });
+    ParetoFrontier merged;
+    merged.dims = pctx.dims;
+    for (const auto& point : all_points) {
+        merged.Insert(point);
+    }
+
+    std::vector<CompactSolution> solutions;
+    solutions.reserve(merged.points.size());
+    for (const auto& point : merged.points) {
+        CompactSolution solution;
+        solution.packed_indices = point.packed_indices;
+        solution.score = point.score;
+        solutions.push_back(solution);
+    }
+    std::sort(solutions.begin(), solutions.end(),
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
+            if (lhs.score != rhs.score) {
+                return lhs.score > rhs.score;
+            }
+            return lhs.packed_indices < rhs.packed_indices;
+        });
+    return solutions;
+}
+
+/// 全量交换局部搜索上下文: 模组按单体贡献度降序, 后缀上界用于补全搜索的提前终止
+struct SwapSearchContext {
+    std::vector<DenseModuleData> dense_modules;
+    std::vector<size_t> sorted_to_original;
+    std::vector<size_t> original_to_sorted;
+    const std::vector<int>* slot_value_power = nullptr;
+    const std::vector<int>* min_attr_requirements = nullptr;
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    int max_module_slots = 3;
+    bool has_min_requirements = false;
+};
+
+constexpr int kMaxSwapPicks = 2;
+constexpr int kMaxSwapRounds = 16;
+
+void BuildSwapSearchContext(
+    const std::vector<DenseModuleData>& dense_modules_raw,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    SwapSearchContext& ctx) {
+
+    ctx.slot_value_power = &slot_value_power;
+    ctx.min_attr_requirements = &min_attr_requirements;
+    ctx.has_min_requirements = std::any_of(
+        min_attr_requirements.begin(), min_attr_requirements.end(), [](int need) { return need > 0; });
+
+    std::vector<int> contribution(dense_modules_raw.size(), 0);
+    ctx.sorted_to_original.resize(dense_modules_raw.size());
+    for (size_t i = 0; i < dense_modules_raw.size(); ++i) {
+        ctx.sorted_to_original[i] = i;
+        contribution[i] = CalculateDenseScore(
+            dense_modules_raw[i].slot_values, dense_modules_raw[i].total_attr_value, slot_value_power);
+    }
+    std::stable_sort(ctx.sorted_to_original.begin(), ctx.sorted_to_original.end(),
+        [&](size_t lhs, size_t rhs) { return contribution[lhs] > contribution[rhs]; });
+
+    ctx.original_to_sorted.resize(dense_modules_raw.size());
+    ctx.dense_modules.reserve(dense_modules_raw.size());
+    for (size_t sorted_idx = 0; sorted_idx < ctx.sorted_to_original.size(); ++sorted_idx) {
+        ctx.original_to_sorted[ctx.sorted_to_original[sorted_idx]] = sorted_idx;
+        ctx.dense_modules.push_back(dense_modules_raw[ctx.sorted_to_original[sorted_idx]]);
+    }
+    ctx.max_module_slots = CountMaxModuleSlots(ctx.dense_modules);
+    BuildSuffixUpperBounds(ctx.dense_modules, kMaxSwapPicks, ctx.suffix_slot_best, ctx.suffix_total_best);
+}
+
+inline bool IsKeptModule(const std::array<size_t, 5>& kept, int kept_count, size_t module_idx) {
+    for (int i = 0; i < kept_count; ++i) {
+        if (kept[static_cast<size_t>(i)] == module_idx) {
+            return true;
+        }
+    }
+    return false;
+}
+
+/// 在保留模组之外选picks(1或2)个模组补全组合, 寻找分数严格高于best_score的最优补全.
+/// 模组按贡献度降序排列, 后缀上界不超过best_score时后续起点全部可以截断
+bool FindBestSwapCompletion(
+    const SwapSearchContext& ctx,
+    const std::array<size_t, 5>& kept,
+    int kept_count,
+    const DenseSlotArray& base_sums,
+    int base_total,
+    int picks,
+    int& best_score,
+    std::array<size_t, kMaxSwapPicks>& best_picks) {
+
+    const auto& slot_value_power = *ctx.slot_value_power;
+    const auto& min_attr_requirements = *ctx.min_attr_requirements;
+    const size_t n = ctx.dense_modules.size();
+    bool found = false;
+
+    for (size_t first = 0; first + static_cast<size_t>(picks) <= n; ++first) {
+        if (CalculatePartLimitedBound(
+                base_sums, base_total, first, picks, ctx.max_module_slots,
+                slot_value_power, ctx.suffix_slot_best, ctx.suffix_total_best) <= best_score) {
+            break;
+        }
+        if (ctx.has_min_requirements &&
+            !CanSatisfyMinRequirements(base_sums, first, picks, min_attr_requirements, ctx.suffix_slot_best)) {
+            break;
+        }
+        if (IsKeptModule(kept, kept_count, first)) {
+            continue;
+        }
+
+        const auto& first_module = ctx.dense_modules[first];
+        if (picks == 1) {
+            const int score = CalculateDenseScoreWithDelta(
+                base_sums, first_module.slot_values, base_total + first_module.total_attr_value, slot_value_power);
+            if (score <= best_score) {
+                continue;
+            }
+            if (ctx.has_min_requirements) {
+                DenseSlotArray slot_sums = base_sums;
+                AddSlotArrays(slot_sums, first_module.slot_values);
+                if (!MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+                    continue;
+                }
+            }
+            best_score = score;
+            best_picks[0] = first;
+            found = true;
+            continue;
+        }
+
+        DenseSlotArray first_sums = base_sums;
+        AddSlotArrays(first_sums, first_module.slot_values);
+        const int first_total = base_total + first_module.total_attr_value;
+        for (size_t second = first + 1; second < n; ++second) {
+            if (CalculatePartLimitedBound(
+                    first_sums, first_total, second, 1, ctx.max_module_slots,
+                    slot_value_power, ctx.suffix_slot_best, ctx.suffix_total_best) <= best_score) {
+                break;
+            }
+            if (IsKeptModule(kept, kept_count, second)) {
+                continue;
+            }
+            const auto& second_module = ctx.dense_modules[second];
+            const int score = CalculateDenseScoreWithDelta(
+                first_sums, second_module.slot_values, first_total + second_module.total_attr_value, slot_value_power);
+            if (score <= best_score) {
+                continue;
+            }
+            if (ctx.has_min_requirements) {
+                DenseSlotArray slot_sums = first_sums;
+                AddSlotArrays(slot_sums, second_module.slot_values);
+                if (!MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+                    continue;
+                }
+            }
+            best_score = score;
+            best_picks[0] = first;
+            best_picks[1] = second;
+            found = true;
+        }
+    }
+    return found;
+}
+
+/// 从一个初始组合出发做1-交换/2-交换爬山, 每轮选取邻域内分数提升最大的一步.
+/// 返回经过的组合(含初始组合), 下标为排序后的模组下标. 爬山是确定性的, 走到climbed中已有的组合即可停止
+std::vector<LightweightSolution> ClimbBySwaps(
+    const SwapSearchContext& ctx,
+    const std::vector<size_t>& seed_indices,
+    std::set<std::vector<size_t>>& climbed,
+    BudgetTicker& ticker) {
+
+    const int combination_size = static_cast<int>(seed_indices.size());
+    std::vector<size_t> current = seed_indices;
+    DenseSlotArray current_sums = {};
+    int current_total = 0;
+    for (size_t module_idx : current) {
+        AddSlotArrays(current_sums, ctx.dense_modules[module_idx].slot_values);
+        current_total += ctx.dense_modules[module_idx].total_attr_value;
+    }
+    int current_score = CalculateDenseScore(current_sums, current_total, *ctx.slot_value_power);
+    if (ctx.has_min_requirements && !MeetsMinAttrRequirements(current_sums, *ctx.min_attr_requirements)) {
+        current_score = std::numeric_limits<int>::min();
+    }
+
+    std::vector<LightweightSolution> visited;
+    if (current_score != std::numeric_limits<int>::min()) {
+        visited.emplace_back(current, current_score);
+    }
+
+    for (int round = 0; round < kMaxSwapRounds; ++round) {
+        // 每轮要做完整的邻域扫描, 轮询开销相对可以忽略
+        ticker.Offer(current_score);
+        if (ticker.Flush()) {
+            break;
+        }
+        std::vector<size_t> sorted_current = current;
+        std::sort(sorted_current.begin(), sorted_current.end());
+        if (!climbed.insert(std::move(sorted_current)).second) {
+            break;
+        }
+
+        int best_score = current_score;
+        std::array<size_t, kMaxSwapPicks> best_picks = {};
+        std::array<int, kMaxSwapPicks> best_drops = {-1, -1};
+        int best_pick_count = 0;
+
+        // 先在1-交换邻域内寻找改进, 只有1-交换无法改进时才搜索代价更高的2-交换邻域
+        for (int picks = 1; picks <= std::min(kMaxSwapPicks, combination_size) && best_pick_count == 0; ++picks) {
+            for (int drop_first = 0; drop_first < combination_size; ++drop_first) {
+                for (int drop_second = picks == 1 ? drop_first : drop_first + 1;
+                     drop_second < combination_size; ++drop_second) {
+                    std::array<size_t, 5> kept = {};
+                    int kept_count = 0;
+                    DenseSlotArray base_sums = {};
+                    int base_total = 0;
+                    for (int pos = 0; pos < combination_size; ++pos) {
+                        if (pos == drop_first || pos == drop_second) {
+                            continue;
+                        }
+                        const size_t module_idx = current[static_cast<size_t>(pos)];
+                        kept[static_cast<size_t>(kept_count++)] = module_idx;
+                        AddSlotArrays(base_sums, ctx.dense_modules[module_idx].slot_values);
+                        base_total += ctx.dense_modules[module_idx].total_attr_value;
+                    }
+
+                    ++ticker.pending;
+                    std::array<size_t, kMaxSwapPicks> picked = {};
+                    if (FindBestSwapCompletion(ctx, kept, kept_count, base_sums, base_total, picks, best_score, picked)) {
+                        best_picks = picked;
+                        best_drops = {drop_first, picks == 1 ? -1 : drop_second};
+                        best_pick_count = picks;
+                    }
+                }
+            }
+        }
+
+        if (best_pick_count == 0) {
+            break;
+        }
+        for (int i = 0; i < best_pick_count; ++i) {
+            const int drop = best_drops[static_cast<size_t>(i)];
+            const size_t old_idx = current[static_cast<size_t>(drop)];
+            const size_t new_idx = best_picks[static_cast<size_t>(i)];
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                current_sums[slot] += ctx.dense_modules[new_idx].slot_values[slot] -
+                    ctx.dense_modules[old_idx].slot_values[slot];
+            }
+            current_total += ctx.dense_modules[new_idx].total_attr_value - ctx.dense_modules[old_idx].total_attr_value;
+            current[static_cast<size_t>(drop)] = new_idx;
+        }
+        current_score = best_score;
+        visited.emplace_back(current, current_score);
+    }
+    return visited;
+}
+
+/// 截断属性和动态规划: 状态只记录计分槽位的截断属性和与截断总属性值,
+/// 同一终态的所有组合分数相同, 因此每个状态只需保留若干回溯指针
+constexpr int kDpTotalBits = 7;
+constexpr int kDpSlotBits = 5;
+constexpr int kDpMaxTrackedSlots = (64 - kDpTotalBits) / kDpSlotBits;
+constexpr size_t kDpMaxStates = 2000000;
+
+struct DpBackPointer {
+    uint64_t prev_key;
+    uint16_t module_idx;
+};
+
+using DpLayer = std::unordered_map<uint64_t, std::vector<DpBackPointer>>;
+
+struct CappedSumDpContext {
+    std::vector<int> tracked_slots;
+    std::vector<int> slot_caps;
+    std::vector<std::vector<int>> module_values;
+    std::vector<int> module_totals;
+    /// 未跟踪槽位的属性和恒为0, 其战斗力(锁定模组时可能非0)是常数
+    int untracked_power = 0;
+};
+
+inline uint64_t AddModuleToDpKey(const CappedSumDpContext& ctx, uint64_t key, size_t module_idx) {
+    const uint64_t total_mask = (1ull << kDpTotalBits) - 1;
+    const uint64_t slot_mask = (1ull << kDpSlotBits) - 1;
+    const int total = std::min(static_cast<int>(key & total_mask) + ctx.module_totals[module_idx], kMaxTotalAttrValue);
+    uint64_t next_key = static_cast<uint64_t>(total);
+    const auto& values = ctx.module_values[module_idx];
+    for (size_t k = 0; k < ctx.tracked_slots.size(); ++k) {
+        const int shift = kDpTotalBits + static_cast<int>(k) * kDpSlotBits;
+        const int value = std::min(static_cast<int>((key >> shift) & slot_mask) + values[k], ctx.slot_caps[k]);
+        next_key |= static_cast<uint64_t>(value) << shift;
+    }
+    return next_key;
+}
+
+/// 终态分数, 不满足最小属性和约束时返回false
+inline bool ScoreDpKey(
+    const CappedSumDpContext& ctx,
+    uint64_t key,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int& score) {
+
+    const uint64_t slot_mask = (1ull << kDpSlotBits) - 1;
+    score = ctx.untracked_power +
+        TotalAttrPower(slot_value_power, static_cast<int>(key & ((1ull << kDpTotalBits) - 1)));
+    for (size_t k = 0; k < ctx.tracked_slots.size(); ++k) {
+        const int slot = ctx.tracked_slots[k];
+        const int value = static_cast<int>((key >> (kDpTotalBits + static_cast<int>(k) * kDpSlotBits)) & slot_mask);
+        if (value < min_attr_requirements[slot]) {
+            return false;
+        }
+        score += slot_value_power[slot * 21 + std::min(value, kMaxSlotValue)];
+    }
+    return true;
+}
+
+/// 沿回溯指针还原组合, 只使用编号小于bound_module的入边保证模组不重复
+void CollectDpCombinations(
+    const std::vector<DpLayer>& layers,
+    int layer,
+    uint64_t key,
+    size_t bound_module,
+    int combination_size,
+    int score,
+    size_t limit,
+    std::array<uint16_t, 5>& indices,
+    std::vector<CompactSolution>& out) {
+
+    if (layer == 0) {
+        CompactSolution solution;
+        solution.packed_indices = PackIndices(indices.data(), combination_size);
+        solution.score = score;
+        out.push_back(solution);
+        return;
+    }
+    const auto it = layers[static_cast<size_t>(layer)].find(key);
+    if (it == layers[static_cast<size_t>(layer)].end()) {
+        return;
+    }
+    for (const auto& back : it->second) {
+        if (back.module_idx >= bound_module || out.size() >= limit) {
+            break;
+        }
+        indices[static_cast<size_t>(layer - 1)] = back.module_idx;
+        CollectDpCombinations(
+            layers, layer - 1, back.prev_key, back.module_idx,
+            combination_size, score, limit, indices, out);
+    }
+}
+
+/// 状态数超出上限或计分槽位过多时返回false, 由调用方回退到其它精确策略
+bool RunCappedSumDp(
+    const std::vector<DenseModuleData>& dense_modules,
+    const std::vector<int>& slot_value_power,
+    const std::vector<int>& min_attr_requirements,
+    int combination_size,
+    int max_solutions,
+    std::vector<CompactSolution>& solutions,
+    SearchBudget* budget = nullptr) {
+
+    CappedSumDpContext ctx;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        const bool scored = slot_value_power[slot * 21 + kMaxSlotValue] > 0 || min_attr_requirements[slot] > 0;
+        const bool touched = std::any_of(dense_modules.begin(), dense_modules.end(),
+            [slot](const DenseModuleData& dense) { return dense.slot_values[slot] != 0; });
+        if (min_attr_requirements[slot] > 0 && !touched) {
+            solutions.clear();
+            return true;
+        }
+        if (scored && touched) {
+            ctx.tracked_slots.push_back(slot);
+            ctx.slot_caps.push_back(std::max(kMaxSlotValue, min_attr_requirements[slot]));
+        } else {
+            ctx.untracked_power += slot_value_power[slot * 21];
+        }
+    }
+    if (static_cast<int>(ctx.tracked_slots.size()) > kDpMaxTrackedSlots ||
+        std::any_of(ctx.slot_caps.begin(), ctx.slot_caps.end(),
+            [](int cap) { return cap >= (1 << kDpSlotBits); })) {
+        return false;
+    }
+    for (const auto& dense : dense_modules) {
+        std::vector<int> values;
+        values.reserve(ctx.tracked_slots.size());
+        for (int slot : ctx.tracked_slots) {
+            values.push_back(dense.slot_values[slot]);
+        }
+        ctx.module_values.push_back(std::move(values));
+        ctx.module_totals.push_back(dense.total_attr_value);
+    }
+
+    // 0/1背包顺序: 组合长度从大到小转移, 每个模组最多使用一次.
+    // 预算到期时停在某个模组之后, 已有的状态正好是模组前缀上的精确解
+    std::vector<DpLayer> layers(static_cast<size_t>(combination_size) + 1);
+    layers[0][0] = {};
+    size_t state_count = 1;
+    BudgetTicker ticker;
+    ticker.budget = budget;
+    for (size_t module_idx = 0; module_idx < dense_modules.size(); ++module_idx) {
+        const int top = std::min(static_cast<int>(module_idx), combination_size - 1);
+        for (int count = top; count >= 0; --count) {
+            auto& next_layer = layers[static_cast<size_t>(count) + 1];
+            ticker.pending += static_cast<long long>(layers[static_cast<size_t>(count)].size());
+            for (const auto& entry : layers[static_cast<size_t>(count)]) {
+                const uint64_t next_key = AddModuleToDpKey(ctx, entry.first, module_idx);
+                auto inserted = next_layer.try_emplace(next_key);
+                if (inserted.second) {
+                    ++state_count;
+                }
+                auto& backs = inserted.first->second;
+                if (backs.size() < static_cast<size_t>(max_solutions)) {
+                    backs.push_back({entry.first, static_cast<uint16_t>(module_idx)});
+                }
+            }
+        }
+        if (state_count > kDpMaxStates) {
+            return false;
+        }
+        ++ticker.pending_work;
+        if (ticker.Tick(0)) {
+            break;
+        }
+    }
+    ticker.Flush();
+
+    std::vector<std::pair<int, uint64_t>> final_states;
+    final_states.reserve(layers.back().size());
+    for (const auto& entry : layers.back()) {
+        int score = 0;
+        if (ScoreDpKey(ctx, entry.first, slot_value_power, min_attr_requirements, score)) {
+            final_states.emplace_back(score, entry.first);
+        }
+    }
+    std::sort(final_states.begin(), final_states.end(), std::greater<std::pair<int, uint64_t>>());
+
+    solutions.clear();
+    std::array<uint16_t, 5> indices = {};
+    for (const auto& [score, key] : final_states) {
+        if (solutions.size() >= static_cast<size_t>(max_solutions)) {
+            break;
+        }
+        CollectDpCombinations(
+            layers, combination_size, key, dense_modules.size(), combination_size,
+            score, static_cast<size_t>(max_solutions), indices, solutions);
+    }
+    return true;
+}
+
+/// 模拟退火: 每次重启从随机组合出发, 每步随机替换一个位置, 在稠密属性和上增量计算新分数.
+/// 目标为分数减去最小属性和缺口的罚分, 只有满足约束的组合进入top-K
+struct AnnealingContext {
+    const std::vector<DenseModuleData>* dense_modules = nullptr;
+    const std::vector<int>* slot_value_power = nullptr;
+    const std::vector<int>* min_attr_requirements = nullptr;
+    std::vector<int> required_slots;
+    int combination_size = 5;
+    int max_solutions = 60;
+    int iterations = 20000;
+};
+
+/// 最小属性和每差1点的罚分
+constexpr int kAnnealingDeficitPenalty = 64;
+/// 估计初始温度时采样的随机移动数
+constexpr int kAnnealingTemperatureSamples = 64;
+constexpr double kAnnealingFinalTemperature = 0.5;
+
+inline int AnnealingDeficit(const AnnealingContext& ctx, const DenseSlotArray& slot_sums) {
+    int deficit = 0;
+    for (int slot : ctx.required_slots) {
+        deficit += std::max(0, (*ctx.min_attr_requirements)[slot] - slot_sums[slot]);
+    }
+    return deficit;
+}
+
+/// 第restart次重启的随机数种子(splitmix64), 只由基础种子与重启序号决定, 与线程调度无关
+inline uint64_t AnnealingRestartSeed(uint64_t base_seed, uint64_t restart) {
+    uint64_t z = base_seed + (restart + 1) * 0x9E3779B97F4A7C15ull;
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ull;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBull;
+    return z ^ (z >> 31);
+}
+
+inline bool ContainsModule(const PackedIndices& indices, int combination_size, uint16_t module_idx) {
+    const auto end = indices.indices.begin() + combination_size;
+    return std::find(indices.indices.begin(), end, module_idx) != end;
+}
+
+/// 将position处的模组换成module_idx后的属性和
+inline void ApplyAnnealingSwap(
+    const AnnealingContext& ctx,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    uint16_t removed,
+    uint16_t added,
+    DenseSlotArray& next_sums,
+    int& next_total) {
+
+    const auto& dense_modules = *ctx.dense_modules;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        next_sums[slot] = slot_sums[slot] + dense_modules[added].slot_values[slot] -
+            dense_modules[removed].slot_values[slot];
+    }
+    next_total = total_attr_value + dense_modules[added].total_attr_value - dense_modules[removed].total_attr_value;
+}
+
+/// 单次重启, 把访问过的满足约束的组合中的top-K追加到solutions
+void RunAnnealingRestart(
+    const AnnealingContext& ctx,
+    uint64_t seed,
+    BudgetTicker& ticker,
+    std::vector<CompactSolution>& solutions) {
+
+    const auto& dense_modules = *ctx.dense_modules;
+    const auto& slot_value_power = *ctx.slot_value_power;
+    const int combination_size = ctx.combination_size;
+    std::mt19937_64 gen(seed);
+    std::uniform_int_distribution<int> module_dis(0, static_cast<int>(dense_modules.size()) - 1);
+    std::uniform_int_distribution<int> position_dis(0, combination_size - 1);
+    std::uniform_real_distribution<double> unit_dis(0.0, 1.0);
+
+    PackedIndices current;
+    DenseSlotArray slot_sums = {};
+    int total_attr_value = 0;
+    for (int i = 0; i < combination_size; ++i) {
+        uint16_t module_idx = 0;
+        do {
+            module_idx = static_cast<uint16_t>(module_dis(gen));
+        } while (ContainsModule(current, i, module_idx));
+        current.indices[static_cast<size_t>(i)] = module_idx;
+        AddSlotArrays(slot_sums, dense_modules[module_idx].slot_values);
+        total_attr_value += dense_modules[module_idx].total_attr_value;
+    }
+    int score = CalculateDenseScore(slot_sums, total_attr_value, slot_value_power);
+    int deficit = AnnealingDeficit(ctx, slot_sums);
+
+    CompactMinHeap top_solutions;
+    PackedIndexSet seen(static_cast<size_t>(ctx.max_solutions) * 2);
+    auto offer_current = [&]() {
+        if (deficit != 0 || (top_solutions.size() >= static_cast<size_t>(ctx.max_solutions) &&
+                             score <= top_solutions.top().score)) {
+            return;
+        }
+        CompactSolution solution;
+        solution.packed_indices = SortedCombinationKey(current, combination_size);
+        solution.score = score;
+        if (seen.Insert(solution.packed_indices)) {
+            PushBeamLeaf(top_solutions, ctx.max_solutions, solution, nullptr);
+            ticker.Offer(score);
+        }
+    };
+    offer_current();
+
+    // 初始温度取随机移动平均变差的1/ln2, 使典型的变差移动一开始约有一半被接受
+    DenseSlotArray next_sums = {};
+    int next_total = 0;
+    long long worse_sum = 0;
+    int worse_count = 0;
+    for (int sample = 0; sample < kAnnealingTemperatureSamples; ++sample) {
+        const int position = position_dis(gen);
+        const auto added = static_cast<uint16_t>(module_dis(gen));
+        if (ContainsModule(current, combination_size, added)) {
+            continue;
+        }
+        ApplyAnnealingSwap(
+            ctx, slot_sums, total_attr_value, current.indices[static_cast<size_t>(position)], added,
+            next_sums, next_total);
+        const int delta = CalculateDenseScore(next_sums, next_total, slot_value_power) - score -
+            kAnnealingDeficitPenalty * (AnnealingDeficit(ctx, next_sums) - deficit);
+        if (delta < 0) {
+            worse_sum -= delta;
+            ++worse_count;
+        }
+    }
+    double temperature = worse_count > 0
+        ? std::max(1.0, static_cast<double>(worse_sum) / worse_count / std::log(2.0))
+        : 1.0;
+    const double cooling = std::pow(
+        std::min(1.0, kAnnealingFinalTemperature / temperature), 1.0 / static_cast<double>(ctx.iterations));
+
+    for (int iteration = 0; iteration < ctx.iterations; ++iteration, temperature *= cooling) {
+        if (ticker.Tick(1)) {
+            break;
+        }
+        const int position = position_dis(gen);
+        const auto added = static_cast<uint16_t>(module_dis(gen));
+        if (ContainsModule(current, combination_size, added)) {
+            continue;
+        }
+        ApplyAnnealingSwap(
+            ctx, slot_sums, total_attr_value, current.indices[static_cast<size_t>(position)], added,
+            next_sums, next_total);
+        const int next_score = CalculateDenseScore(next_sums, next_total, slot_value_power);
+        const int next_deficit = AnnealingDeficit(ctx, next_sums);
+        const int delta = next_score - score - kAnnealingDeficitPenalty * (next_deficit - deficit);
+        if (delta < 0 && unit_dis(gen) >= std::exp(static_cast<double>(delta) / temperature)) {
+            continue;
+        }
+        current.indices[static_cast<size_t>(position)] = added;
+        slot_sums = next_sums;
+        total_attr_value = next_total;
+        score = next_score;
+        deficit = next_deficit;
+        offer_current();
+    }
+
+    while (!top_solutions.empty()) {
+        solutions.push_back(top_solutions.top());
+        top_solutions.pop();
+    }
+}
+
+/// 批量搜索单次最多合并的查询数, 每个模组用一个64位掩码记录可参与的查询
+constexpr size_t kMaxBatchQueries = 64;
+
+/// 每扫描这么多个候选模组重新检查一次各查询的分数上界
+constexpr size_t kBatchBoundRecheckInterval = 16;
+
+/// 批量搜索中的计分配置: 计分表与最小属性和约束完全相同的查询(如同一属性配置的不同类别)共用一份,
+/// 分数与上界只计算一次, 再与各查询自己的第K名比较
+struct BatchScoringProfile {
+    std::vector<int> slot_value_power;
+    std::vector<int> min_attr_requirements;
+    std::vector<int> required_slots;
+    uint64_t query_mask = 0;
+};
+
+/// 多查询单次扫描: 同一组合的属性和只累加一次, 再按各计分配置分别打分,
+/// 每个查询各自维护top-K; 模组掩码与前缀按位与, 掩码为0的子树直接跳过
+struct BatchSweepContext {
+    const std::vector<DenseModuleData>* dense_modules = nullptr;
+    const std::vector<SparseModuleSlots>* sparse_modules = nullptr;
+    const std::vector<uint64_t>* module_masks = nullptr;
+    /// 模组在等价类中的序号, 非0的副本只能紧跟前一个副本选取, 保证每个多重集只枚举一次
+    const std::vector<int>* class_offset = nullptr;
+    const std::vector<BatchScoringProfile>* profiles = nullptr;
+    size_t query_count = 0;
+    /// 各查询在所有线程中的第K名分数, 任一线程的第K名都是全局第K名的下界
+    std::unique_ptr<std::atomic<int>[]> shared_thresholds;
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    int max_module_slots = 3;
+    int combination_size = 4;
+    int max_solutions = 60;
+};
+
+/// 内部节点在单个计分配置下的缓存: 前缀逐槽位战斗力, 以及子节点之外槽位的后缀收益(降序)
+struct BatchNodeState {
+    DenseSlotArray slot_power = {};
+    int base_power = 0;
+    std::array<std::pair<int, int>, Constants::CUDA_ATTR_DIM> gains = {};
+    int gain_count = 0;
+};
+
+/// 工作线程局部的各查询top-K与当前组合; nodes按[深度 * 配置数 + 配置]存放各层节点缓存
+struct BatchSweepWorker {
+    std::vector<CompactMinHeap> top_solutions;
+    std::vector<BatchNodeState> nodes;
+    std::array<uint16_t, 5> indices = {};
+    BudgetTicker ticker;
+};
+
+inline bool IsCanonicalBatchPick(
+    const BatchSweepContext& ctx,
+    const BatchSweepWorker& worker,
+    int depth,
+    size_t module_idx) {
+
+    return (*ctx.class_offset)[module_idx] == 0 ||
+        (depth > 0 && worker.indices[static_cast<size_t>(depth - 1)] + 1u == module_idx);
+}
+
+inline int BatchQueryThreshold(const BatchSweepContext& ctx, const BatchSweepWorker& worker, size_t query) {
+    return std::max(
+        CurrentBeamThreshold(worker.top_solutions[query], ctx.max_solutions),
+        ctx.shared_thresholds[query].load(std::memory_order_relaxed));
+}
+
+/// active中各查询第K名的最小值
+inline int BatchMinThreshold(const BatchSweepContext& ctx, const BatchSweepWorker& worker, uint64_t active) {
+    int threshold = std::numeric_limits<int>::max();
+    for (size_t q = 0; q < ctx.query_count; ++q) {
+        if (((active >> q) & 1u) != 0) {
+            threshold = std::min(threshold, BatchQueryThreshold(ctx, worker, q));
+        }
+    }
+    return threshold;
+}
+
+/// 从query_mask中去掉active里第K名已不低于bound的查询; bound为INT_MIN表示最小属性和无法满足
+inline uint64_t DropBeatenQueries(
+    const BatchSweepContext& ctx,
+    const BatchSweepWorker& worker,
+    uint64_t query_mask,
+    uint64_t active,
+    int bound) {
+
+    if (bound == std::numeric_limits<int>::min()) {
+        return query_mask & ~active;
+    }
+    for (size_t q = 0; q < ctx.query_count; ++q) {
+        if (((active >> q) & 1u) != 0 && BatchQueryThreshold(ctx, worker, q) >= bound) {
+            query_mask &= ~(uint64_t{1} << q);
+        }
+    }
+    return query_mask;
+}
+
+/// 用后缀上界重新检查query_mask中的查询, 返回仍可能改进的查询
+inline uint64_t RecheckBatchQueries(
+    const BatchSweepContext& ctx,
+    const BatchSweepWorker& worker,
+    uint64_t query_mask,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    size_t next_start,
+    int remaining) {
+
+    for (const auto& profile : *ctx.profiles) {
+        const uint64_t active = query_mask & profile.query_mask;
+        if (active == 0) {
+            continue;
+        }
+        bool feasible = true;
+        for (int slot : profile.required_slots) {
+            if (slot_sums[slot] + ctx.suffix_slot_best[slot][next_start][remaining] < profile.min_attr_requirements[slot]) {
+                feasible = false;
+                break;
+            }
+        }
+        if (!feasible) {
+            query_mask &= ~active;
+            continue;
+        }
+        if (BatchMinThreshold(ctx, worker, active) == std::numeric_limits<int>::min()) {
+            continue;
+        }
+        const int bound = CalculatePartLimitedBound(
+            slot_sums, total_attr_value, next_start, remaining, ctx.max_module_slots,
+            profile.slot_value_power, ctx.suffix_slot_best, ctx.suffix_total_best);
+        query_mask = DropBeatenQueries(ctx, worker, query_mask, active, bound);
+    }
+    return query_mask;
+}
+
+/// 各计分配置在当前前缀下的逐槽位战斗力; child_remaining大于0时同时准备子节点上界所需的后缀收益
+void PrepareBatchNodes(
+    const BatchSweepContext& ctx,
+    BatchSweepWorker& worker,
+    int depth,
+    uint64_t query_mask,
+    const DenseSlotArray& slot_sums,
+    size_t gain_start,
+    int child_remaining) {
+
+    const auto& profiles = *ctx.profiles;
+    for (size_t p = 0; p < profiles.size(); ++p) {
+        if ((query_mask & profiles[p].query_mask) == 0) {
+            continue;
+        }
+        const auto& slot_value_power = profiles[p].slot_value_power;
+        auto& node = worker.nodes[static_cast<size_t>(depth) * profiles.size() + p];
+        node.base_power = 0;
+        node.gain_count = 0;
+        for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+            node.slot_power[slot] = slot_value_power[slot * 21 + std::min(slot_sums[slot], kMaxSlotValue)];
+            node.base_power += node.slot_power[slot];
+            if (child_remaining > 0) {
+                const int optimistic = std::min(
+                    slot_sums[slot] + ctx.suffix_slot_best[slot][gain_start][child_remaining], kMaxSlotValue);
+                const int gain = slot_value_power[slot * 21 + optimistic] - node.slot_power[slot];
+                if (gain > 0) {
+                    node.gains[static_cast<size_t>(node.gain_count++)] = {gain, slot};
+                }
+            }
+        }
+        std::sort(node.gains.begin(), node.gains.begin() + node.gain_count, std::greater<std::pair<int, int>>());
+    }
+}
+
+/// 选入module_idx后剩余child_remaining个位置从child_start起选取时的分数上界;
+/// 最小属性和无法满足时返回INT_MIN, need_bound为false时只检查约束并返回INT_MAX
+inline int BatchChildBound(
+    const BatchSweepContext& ctx,
+    const BatchNodeState& node,
+    const BatchScoringProfile& profile,
+    bool need_bound,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value,
+    size_t module_idx,
+    size_t child_start,
+    int child_remaining) {
+
+    const auto& dense = (*ctx.dense_modules)[module_idx];
+    for (int slot : profile.required_slots) {
+        if (slot_sums[slot] + dense.slot_values[slot] + ctx.suffix_slot_best[slot][child_start][child_remaining] <
+            profile.min_attr_requirements[slot]) {
+            return std::numeric_limits<int>::min();
+        }
+    }
+    if (!need_bound) {
+        return std::numeric_limits<int>::max();
+    }
+
+    const auto& slot_value_power = profile.slot_value_power;
+    const auto& sparse = (*ctx.sparse_modules)[module_idx];
+    int child_bound = node.base_power + TotalAttrPower(
+        slot_value_power,
+        total_attr_value + dense.total_attr_value + ctx.suffix_total_best[child_start][child_remaining]);
+    std::array<int, Constants::CUDA_ATTR_DIM * 2> top_gains;
+    int top_count = 0;
+    for (int k = 0; k < sparse.count; ++k) {
+        const int slot = sparse.slots[static_cast<size_t>(k)];
+        const int child_value = slot_sums[slot] + sparse.values[static_cast<size_t>(k)];
+        const int child_power = slot_value_power[slot * 21 + std::min(child_value, kMaxSlotValue)];
+        child_bound += child_power - node.slot_power[slot];
+        const int gain = slot_value_power[slot * 21 + std::min(
+            child_value + ctx.suffix_slot_best[slot][child_start][child_remaining], kMaxSlotValue)] - child_power;
+        if (gain > 0) {
+            top_gains[static_cast<size_t>(top_count++)] = gain;
+        }
+    }
+    const int gain_limit = child_remaining * ctx.max_module_slots;
+    int taken = 0;
+    for (int g = 0; g < node.gain_count && taken < gain_limit; ++g) {
+        if (sparse.slot_mask & (1u << node.gains[static_cast<size_t>(g)].second)) {
+            continue;
+        }
+        top_gains[static_cast<size_t>(top_count++)] = node.gains[static_cast<size_t>(g)].first;
+        ++taken;
+    }
+    if (top_count > gain_limit) {
+        std::nth_element(top_gains.begin(), top_gains.begin() + gain_limit, top_gains.begin() + top_count, std::greater<int>());
+        top_count = gain_limit;
+    }
+    for (int g = 0; g < top_count; ++g) {
+        child_bound += top_gains[static_cast<size_t>(g)];
+    }
+    return child_bound;
+}
+
+/// 最后一个位置: 前缀属性和在寄存器中, 每个模组只叠加自己的少数槽位, 每个计分配置打分一次后放入其各查询的top-K
+void SweepBatchLastModule(
+    const BatchSweepContext& ctx,
+    BatchSweepWorker& worker,
+    int depth,
+    size_t next_start,
+    uint64_t query_mask,
+    const DenseSlotArray& prefix_sums,
+    int prefix_total) {
+
+    const auto& profiles = *ctx.profiles;
+    const auto& dense_modules = *ctx.dense_modules;
+    const auto& sparse_modules = *ctx.sparse_modules;
+    const auto& module_masks = *ctx.module_masks;
+    PrepareBatchNodes(ctx, worker, depth, query_mask, prefix_sums, next_start, 0);
+    const BatchNodeState* nodes = worker.nodes.data() + static_cast<size_t>(depth) * profiles.size();
+
+    const size_t n = dense_modules.size();
+    size_t module_idx = next_start;
+    for (; module_idx < n; ++module_idx) {
+        // 后缀上界随起点单调不增, 每隔一段重新检查, 上界已达不到第K名的查询不再打分
+        if (module_idx != next_start && (module_idx - next_start) % kBatchBoundRecheckInterval == 0) {
+            query_mask = RecheckBatchQueries(ctx, worker, query_mask, prefix_sums, prefix_total, module_idx, 1);
+            if (query_mask == 0) {
+                break;
+            }
+        }
+        const uint64_t module_mask = query_mask & module_masks[module_idx];
+        if (module_mask == 0 || !IsCanonicalBatchPick(ctx, worker, depth, module_idx)) {
+            continue;
+        }
+        const auto& sparse = sparse_modules[module_idx];
+        const auto& dense = dense_modules[module_idx];
+        const int total_attr_value = prefix_total + dense.total_attr_value;
+        for (size_t p = 0; p < profiles.size(); ++p) {
+            const uint64_t active = module_mask & profiles[p].query_mask;
+            if (active == 0) {
+                continue;
+            }
+            const auto& profile = profiles[p];
+            bool meets_requirements = true;
+            for (int slot : profile.required_slots) {
+                if (prefix_sums[slot] + dense.slot_values[slot] < profile.min_attr_requirements[slot]) {
+                    meets_requirements = false;
+                    break;
+                }
+            }
+            if (!meets_requirements) {
+                continue;
+            }
+            const auto& slot_value_power = profile.slot_value_power;
+            const auto& node = nodes[p];
+            int score = node.base_power + TotalAttrPower(slot_value_power, total_attr_value);
+            for (int k = 0; k < sparse.count; ++k) {
+                const int slot = sparse.slots[static_cast<size_t>(k)];
+                score += slot_value_power[slot * 21 + std::min(prefix_sums[slot] + sparse.values[static_cast<size_t>(k)], kMaxSlotValue)] -
+                    node.slot_power[slot];
+            }
+            for (size_t q = 0; q < ctx.query_count; ++q) {
+                if (((active >> q) & 1u) == 0 || score <= BatchQueryThreshold(ctx, worker, q)) {
+                    continue;
+                }
+                worker.indices[static_cast<size_t>(depth)] = static_cast<uint16_t>(module_idx);
+                PushBeamLeaf(
+                    worker.top_solutions[q], ctx.max_solutions,
+                    CompactSolution(worker.indices.data(), ctx.combination_size, score), &ctx.shared_thresholds[q]);
+                worker.ticker.Offer(score);
+            }
+        }
+    }
+    worker.ticker.Tick(static_cast<long long>(module_idx - next_start));
+}
+
+/// 内部节点: query_mask中的查询已由父节点确认仍可能改进; 每个子节点按各计分配置的分数上界再筛一次掩码
+void SweepBatchCombinations(
+    const BatchSweepContext& ctx,
+    BatchSweepWorker& worker,
+    int depth,
+    size_t next_start,
+    uint64_t query_mask,
+    const DenseSlotArray& slot_sums,
+    int total_attr_value) {
+
+    const int remaining = ctx.combination_size - depth;
+    if (remaining == 1) {
+        SweepBatchLastModule(ctx, worker, depth, next_start, query_mask, slot_sums, total_attr_value);
+        return;
+    }
+    if (worker.ticker.Tick(1)) {
+        return;
+    }
+
+    const auto& profiles = *ctx.profiles;
+    const auto& dense_modules = *ctx.dense_modules;
+    const auto& module_masks = *ctx.module_masks;
+    const size_t n = dense_modules.size();
+    const int child_remaining = remaining - 1;
+    PrepareBatchNodes(ctx, worker, depth, query_mask, slot_sums, std::min(next_start + 1, n), child_remaining);
+    const BatchNodeState* nodes = worker.nodes.data() + static_cast<size_t>(depth) * profiles.size();
+
+    DenseSlotArray child_sums;
+    for (size_t module_idx = next_start; module_idx + static_cast<size_t>(remaining) <= n; ++module_idx) {
+        if (module_idx != next_start && (module_idx - next_start) % kBatchBoundRecheckInterval == 0) {
+            query_mask = RecheckBatchQueries(
+                ctx, worker, query_mask, slot_sums, total_attr_value, module_idx, remaining);
+            if (query_mask == 0) {
+                break;
+            }
+        }
+        if (!IsCanonicalBatchPick(ctx, worker, depth, module_idx)) {
+            continue;
+        }
+        uint64_t child_mask = query_mask & module_masks[module_idx];
+        const size_t child_start = module_idx + 1;
+        for (size_t p = 0; p < profiles.size() && child_mask != 0; ++p) {
+            const uint64_t active = child_mask & profiles[p].query_mask;
+            if (active == 0) {
+                continue;
+            }
+            const bool need_bound = BatchMinThreshold(ctx, worker, active) != std::numeric_limits<int>::min();
+            if (!need_bound && profiles[p].required_slots.empty()) {
+                continue;
+            }
+            const int child_bound = BatchChildBound(
+                ctx, nodes[p], profiles[p], need_bound, slot_sums, total_attr_value,
+                module_idx, child_start, child_remaining);
+            child_mask = DropBeatenQueries(ctx, worker, child_mask, active, child_bound);
+        }
+        if (child_mask == 0) {
+            continue;
+        }
+        const auto& dense = dense_modules[module_idx];
+        child_sums = slot_sums;
+        AddSlotArrays(child_sums, dense.slot_values);
+        worker.indices[static_cast<size_t>(depth)] = static_cast<uint16_t>(module_idx);
+        SweepBatchCombinations(
+            ctx, worker, depth + 1, child_start, child_mask, child_sums, total_attr_value + dense.total_attr_value);
+        if (worker.ticker.stopped) {
+            return;
+        }
+    }
+}
+
+PackedIndices PackIndicesFromState(const BeamState& state) {
+    return PackIndices(state.indices.data(), state.depth);
+}
+
+#ifdef USE_CUDA
+std::vector<ModuleSolution> BuildGpuSolutions(
+    const std::vector<ModuleInfo>& modules,
+    int gpu_result_count,
+    const std::vector<int>& gpu_scores,
+    const std::vector<long long>& gpu_indices,
+    int combination_size) {
+
+    std::vector<ModuleSolution> final_solutions;
+    final_solutions.reserve(std::max(0, gpu_result_count));
+
+    const int index_bits = GpuPackedIndexBits(combination_size);
+    const unsigned long long index_mask = (1ull << index_bits) - 1;
+    for (int i = 0; i < gpu_result_count; ++i) {
+        const unsigned long long packed = static_cast<unsigned long long>(gpu_indices[i]);
+        std::vector<ModuleInfo> solution_modules;
+        solution_modules.reserve(static_cast<size_t>(combination_size));
+
+        for (int j = 0; j < combination_size; ++j) {
+            size_t module_idx = static_cast<size_t>((packed >> (j * index_bits)) & index_mask);
+            if (module_idx < modules.size()) {
+                solution_modules.push_back(modules[module_idx]);
+            }
+        }
+
+        auto result = ModuleOptimizerCpp::CalculateCombatPower(solution_modules);
+        final_solutions.emplace_back(solution_modules, gpu_scores[i], result.second);
+        final_solutions.back().certified = true;
+    }
+
+    return final_solutions;
+}
+#endif
+} // namespace
+
+
+size_t CombinationCount(size_t n, size_t r) {
+    if (r > n) return 0;
+    if (r == 0 || r == n) return 1;
+    if (r > n - r) r = n - r;
+    
+    size_t result = 1;
+    for (size_t i = 0; i < r; ++i) {
+        result = result * (n - i) / (i + 1);
+    }
+    return result;
+}
+
+void GetCombinationByIndex(size_t n, size_t r, size_t index, std::vector<size_t>& combination) {
+    size_t remaining = index;
+    
+    for (size_t i = 0; i < r; ++i) {
+        size_t start = (i == 0) ? 0 : combination[i-1] + 1;
+        for (size_t j = start; j < n; ++j) {
+            size_t combinations_after = CombinationCount(n - j - 1, r - i - 1);
+            if (remaining < combinations_after) {
+                combination[i] = j;
+                break;
+            }
+            remaining -= combinations_after;
+        }
+    }
+}
+
+std::pair<int, std::map<std::string, int>> ModuleOptimizerCpp::CalculateCombatPower(
+    const std::vector<ModuleInfo>& modules) {
+        std::unordered_map<std::string, int> attr_breakdown;
+        attr_breakdown.reserve(20);
+        
+        for (const auto& module : modules) {
+            for (const auto& part : module.parts) {
+                attr_breakdown[part.name] += part.value;
+            }
+        }
+        
+        int threshold_power = 0;
+        int total_attr_value = 0;
+        
+        for (const auto& [attr_name, attr_value] : attr_breakdown) {
+            total_attr_value += attr_value;
+            
+            int max_level = 0;
+            for (int level = 0; level < 6; ++level) {
+                if (attr_value >= Constants::ATTR_THRESHOLDS[level]) {
+                    max_level = level + 1;
+                } else {
+                    break;
+                }
+            }
+            
+            if (max_level > 0) {
+                bool is_special = Constants::SPECIAL_ATTR_NAMES_STR.find(attr_name) != Constants::SPECIAL_ATTR_NAMES_STR.end();
+                
+                int base_power;
+                if (is_special) {
+                    base_power = Constants::SPECIAL_ATTR_POWER_VALUES[max_level - 1];
+                } else {
+                    base_power = Constants::BASIC_ATTR_POWER_VALUES[max_level - 1];
+                }
+                threshold_power += base_power;
+            }
+        }
+        
+        int total_attr_power = total_attr_power = Constants::TOTAL_ATTR_POWER_VALUES[std::min(total_attr_value, 120)];
+        
+        int total_power = threshold_power + total_attr_power;
+        
+        std::map<std::string, int> result_map;
+        for (const auto& [key, value] : attr_breakdown) {
+            result_map.emplace(key, value);
+        }
+        
+        return {total_power, result_map};
 }
 
 std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumeration(
@@ -975,212 +4009,1909 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumeration(
     const std::unordered_map<int, int>& min_attr_sum_requirements,
     int max_solutions,
     int max_workers,
-    int combination_size) {
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    combination_size = plan.free_size;
+    if (static_cast<size_t>(combination_size) > plan.free_modules.size()) {
+        return {};
+    }
+
+    const auto candidate_modules = FilterBySignatureBounds(
+        plan.free_modules, slot_value_power, min_attr_requirements, combination_size, max_solutions);
+    const auto dense_modules = BuildDenseModuleData(candidate_modules);
+    size_t n = candidate_modules.size();
+    size_t total_combinations = CombinationCount(n, static_cast<size_t>(combination_size));
+    budget.SetTotalWork(static_cast<long long>(total_combinations));
+
+    std::vector<SparseModuleSlots> sparse_modules;
+    sparse_modules.reserve(dense_modules.size());
+    for (const auto& dense : dense_modules) {
+        sparse_modules.push_back(BuildSparseModuleSlots(dense));
+    }
+    std::array<std::vector<BeamPickArray>, Constants::CUDA_ATTR_DIM> suffix_slot_best;
+    std::vector<BeamPickArray> suffix_total_best;
+    BuildSuffixUpperBounds(dense_modules, combination_size, suffix_slot_best, suffix_total_best);
+    const int max_module_slots = CountMaxModuleSlots(dense_modules);
+
+    size_t batch_size = std::max(static_cast<size_t>(1000), total_combinations / (max_workers * 4));
+    batch_size = std::min(batch_size, static_cast<size_t>(1307072));
+    size_t num_batches = (total_combinations + batch_size - 1) / batch_size;
+    // 每个工作线程从共享计数器领取批次, 同时在途的批次不超过线程数;
+    // 预算耗尽后不再领取新批次, 各线程在自己的堆里合并结果, 主线程只合并线程数个堆
+    const int worker_count = std::max(1, std::min(max_workers, static_cast<int>(num_batches)));
+    std::atomic<size_t> next_batch{0};
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<std::vector<CompactSolution>>> futures;
+    futures.reserve(static_cast<size_t>(worker_count));
+    for (int worker = 0; worker < worker_count; ++worker) {
+        futures.push_back(pool->enqueue(
+            [&next_batch, num_batches, batch_size, total_combinations, n, max_solutions, combination_size,
+             max_module_slots, &dense_modules, &sparse_modules, &slot_value_power, &min_attr_requirements,
+             &suffix_slot_best, &suffix_total_best, &budget]() {
+                std::priority_queue<CompactSolution, std::vector<CompactSolution>,
+                                   std::greater<CompactSolution>> worker_top;
+                for (size_t batch_idx = next_batch.fetch_add(1); batch_idx < num_batches && !budget.Stopped();
+                     batch_idx = next_batch.fetch_add(1)) {
+                    size_t start_combination = batch_idx * batch_size;
+                    size_t end_combination = std::min(start_combination + batch_size, total_combinations);
+                    size_t range_size = end_combination - start_combination;
+                    int oversample_factor = 2;
+                    int local_top_capacity = static_cast<int>(
+                        std::min(range_size, static_cast<size_t>(max_solutions * oversample_factor)));
+                    const auto batch_result = ProcessCombinationRange(
+                        start_combination, end_combination, n,
+                        dense_modules, sparse_modules, slot_value_power, min_attr_requirements,
+                        suffix_slot_best, suffix_total_best, max_module_slots,
+                        local_top_capacity, combination_size, &budget);
+                    for (const auto& solution : batch_result) {
+                        if (worker_top.size() < static_cast<size_t>(max_solutions)) {
+                            worker_top.push(solution);
+                        } else if (solution.score > worker_top.top().score) {
+                            worker_top.pop();
+                            worker_top.push(solution);
+                        }
+                    }
+                }
+                std::vector<CompactSolution> worker_solutions;
+                worker_solutions.reserve(worker_top.size());
+                while (!worker_top.empty()) {
+                    worker_solutions.push_back(worker_top.top());
+                    worker_top.pop();
+                }
+                return worker_solutions;
+            }
+        ));
+    }
+
+    // 优先队列收集解保持真正占内存的只有最后的解+运行中线程创建的LightweightSolution
+    std::priority_queue<CompactSolution, std::vector<CompactSolution>, 
+                       std::greater<CompactSolution>> top_solutions;
+    for (auto& future : futures) {
+        for (const auto& solution : future.get()) {
+            if (top_solutions.size() < static_cast<size_t>(max_solutions)) {
+                top_solutions.push(solution);
+            } else if (solution.score > top_solutions.top().score) {
+                top_solutions.pop();
+                top_solutions.push(solution);
+            }
+        }
+    }
+    pool.reset();
+    
+    
+    // 优先队列->vector
+    std::vector<CompactSolution> all_solutions;
+    all_solutions.reserve(top_solutions.size());
+    
+    while (!top_solutions.empty()) {
+        all_solutions.push_back(top_solutions.top());
+        top_solutions.pop();
+    }
+    
+    // 降序提取前max_solutions结果, 构造完整解
+    std::reverse(all_solutions.begin(), all_solutions.end());
+    std::vector<ModuleSolution> final_solutions;
+    final_solutions.reserve(all_solutions.size());
+    for (const auto& solution : all_solutions) {
+        auto indices = solution.unpack_indices_vector(combination_size);
+        std::vector<ModuleInfo> solution_modules;
+        solution_modules.reserve(indices.size());
+        for (size_t index : indices) {
+            solution_modules.push_back(candidate_modules[index]);
+        }
+        auto result = CalculateCombatPower(solution_modules);
+        final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        final_solutions.back().certified = true;
+    }
+
+    return FinishSearch(budget, AttachLockedModules(plan, std::move(final_solutions)));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationCUDA(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+#ifdef USE_CUDA
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    // 核函数只支持4/5模组组合; 5模组的64位结果编码每个下标只有12位, 超出时交给CPU枚举
+    const bool encodable = plan.free_modules.size() <= (size_t{1} << GpuPackedIndexBits(plan.free_size));
+    if (plan.free_size >= 4 && encodable && TestCuda()) {
+        printf("CUDA GPU acceleration enabled - dense LUT kernel\n");
+
+        auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+        auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+        ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+        const auto dense_modules = BuildDenseModuleData(plan.free_modules);
+        const auto module_matrix = BuildDenseModuleMatrix(dense_modules);
+
+        std::vector<int> gpu_scores(max_solutions);
+        std::vector<long long> gpu_indices(max_solutions);
+
+        // 每个批次结束后轮询一次预算, 到期时返回已处理批次的top-K
+        SearchBudget budget(deadline_ms, control);
+        int gpu_result_count = GpuStrategyEnumeration(
+            module_matrix.data(),
+            static_cast<int>(plan.free_modules.size()),
+            slot_value_power.data(),
+            min_attr_requirements.data(),
+            max_solutions,
+            gpu_scores.data(),
+            gpu_indices.data(),
+            plan.free_size,
+            &SearchBudget::PollCallback,
+            &budget);
+
+        return FinishSearch(budget, AttachLockedModules(plan, BuildGpuSolutions(
+            plan.free_modules, gpu_result_count, gpu_scores, gpu_indices, plan.free_size)));
+    }
+
+    printf("CUDA not available, using CPU optimized version\n");
+#endif
+    return StrategyEnumeration(
+        modules, target_attributes, exclude_attributes,
+        min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+        locked_uuids, banned_uuids, deadline_ms, control);
+}
+
+#ifdef USE_OPENCL
+extern "C" int TestOpenCL();
+#endif
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationGPU(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+#ifdef USE_CUDA
+    if (TestCuda()) {
+        return StrategyEnumerationCUDA(
+            modules, target_attributes, exclude_attributes,
+            min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+            locked_uuids, banned_uuids, deadline_ms, control);
+    }
+#endif
+
+#ifdef USE_OPENCL
+    // OpenCL核函数按属性id计分, 无法叠加锁定模组的属性基底
+    if (combination_size <= 4 && locked_uuids.empty() && TestOpenCL()) {
+        return StrategyEnumerationOpenCL(
+            modules, target_attributes, exclude_attributes,
+            min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+            locked_uuids, banned_uuids, deadline_ms, control);
+    }
+#endif
+    // CPU回退: 剩余4/5模组使用两两属性和表合并的精确搜索
+    if (combination_size - static_cast<int>(locked_uuids.size()) >= 4) {
+        return StrategyMeetInTheMiddle(
+            modules, target_attributes, exclude_attributes,
+            min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+            locked_uuids, banned_uuids, deadline_ms, control);
+    }
+    return StrategyEnumeration(
+        modules, target_attributes, exclude_attributes,
+        min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+        locked_uuids, banned_uuids, deadline_ms, control);
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBeamSearch(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int beam_width,
+    int expand_per_state,
+    int combination_size,
+    int max_workers,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control,
+    bool adaptive_width,
+    BeamSearchStats* stats) {
+
+    if (modules.empty() || max_solutions <= 0 || beam_width <= 0) {
+        return {};
+    }
+    if (combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan) ||
+        static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    // 锁定后只剩很少的位置时组合数很小, 直接精确枚举
+    if (!plan.locked_modules.empty() && plan.free_size < kMinConstrainedSearchSize) {
+        if (stats != nullptr) {
+            *stats = BeamSearchStats();
+            stats->exact = true;
+        }
+        return StrategyEnumeration(
+            modules, target_attributes, exclude_attributes, min_attr_sum_requirements,
+            max_solutions, max_workers, combination_size, locked_uuids, banned_uuids, deadline_ms, control);
+    }
+    combination_size = plan.free_size;
+    const int worker_count = std::max(1, max_workers);
+    SearchBudget budget(deadline_ms, control);
+
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto candidate_modules = FilterBySignatureBounds(
+        plan.free_modules, slot_value_power, min_attr_requirements, combination_size, max_solutions);
+    if (static_cast<size_t>(combination_size) > candidate_modules.size()) {
+        return {};
+    }
+    const auto dense_modules_raw = BuildDenseModuleData(candidate_modules);
+    constexpr int kBeamStrategyCount = 3;
+    // 工作量按每层最多beam_width个父节点估计
+    budget.SetTotalWork(
+        static_cast<long long>(kBeamStrategyCount) * (combination_size - 1) *
+        std::min(static_cast<long long>(beam_width), static_cast<long long>(candidate_modules.size())));
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(std::min(worker_count, kBeamStrategyCount)));
+    // 线程数多于起点数时每层扩展再分给全部线程, 墙钟时间随核数而不是起点数缩短
+    std::unique_ptr<SimpleThreadPool> level_pool;
+    if (worker_count > kBeamStrategyCount) {
+        level_pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    }
+    std::vector<std::future<std::vector<CompactSolution>>> futures;
+    futures.reserve(kBeamStrategyCount);
+    std::array<BeamSearchStats, kBeamStrategyCount> strategy_stats;
+    std::atomic<bool> exact{false};
+
+    for (int strategy = 0; strategy < kBeamStrategyCount; ++strategy) {
+        futures.push_back(pool->enqueue(
+            [&, strategy]() {
+                return RunSingleBeam(
+                    candidate_modules,
+                    dense_modules_raw,
+                    slot_value_power,
+                    min_attr_requirements,
+                    strategy,
+                    beam_width,
+                    max_solutions,
+                    expand_per_state,
+                    combination_size,
+                    &budget,
+                    level_pool.get(),
+                    worker_count,
+                    adaptive_width,
+                    &exact,
+                    &strategy_stats[static_cast<size_t>(strategy)]);
+            }));
+    }
+
+    std::vector<CompactSolution> all_solutions;
+    for (auto& future : futures) {
+        auto batch = future.get();
+        all_solutions.insert(all_solutions.end(), batch.begin(), batch.end());
+    }
+    pool.reset();
+
+    if (stats != nullptr) {
+        *stats = strategy_stats.front();
+        for (const auto& item : strategy_stats) {
+            if (item.exact != stats->exact ? item.exact : item.bound_gap < stats->bound_gap) {
+                *stats = item;
+            }
+        }
+    }
+
+    PackedIndexSet seen_combinations(all_solutions.size());
+    std::vector<CompactSolution> unique_solutions;
+    unique_solutions.reserve(std::min(all_solutions.size(), static_cast<size_t>(max_solutions)));
+    std::sort(all_solutions.begin(), all_solutions.end(),
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
+            return lhs.score > rhs.score;
+        });
+    for (const auto& solution : all_solutions) {
+        if (seen_combinations.Insert(SortedCombinationKey(solution.packed_indices, combination_size))) {
+            unique_solutions.push_back(solution);
+            if (static_cast<int>(unique_solutions.size()) >= max_solutions) {
+                break;
+            }
+        }
+    }
+
+    std::vector<ModuleSolution> final_solutions;
+    final_solutions.reserve(unique_solutions.size());
+    for (const auto& solution : unique_solutions) {
+        std::vector<ModuleInfo> solution_modules;
+        solution_modules.reserve(static_cast<size_t>(combination_size));
+        for (int i = 0; i < combination_size; ++i) {
+            solution_modules.push_back(candidate_modules[solution.packed_indices.indices[static_cast<size_t>(i)]]);
+        }
+        auto result = CalculateCombatPower(solution_modules);
+        final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        // 任一起点证明了精确top-K, 合并后的前K个也是精确的
+        final_solutions.back().certified = exact.load(std::memory_order_relaxed) && !budget.Stopped();
+    }
+
+    return FinishSearch(budget, AttachLockedModules(plan, std::move(final_solutions)));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBranchAndBound(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    if (static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    const auto dense_modules_raw = BuildDenseModuleData(plan.free_modules);
+
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        dense_modules_raw, slot_value_power, min_attr_requirements,
+        plan.free_size, max_solutions, ctx);
+    return FinishSearch(budget, AttachLockedModules(
+        plan, RunBranchAndBound(plan.free_modules, ctx, max_workers, std::numeric_limits<int>::min(), nullptr, &budget)));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBranchAndBoundPage(
+    const std::vector<ModuleInfo>& modules,
+    SearchCursor& cursor,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (cursor.exhausted || modules.empty() || max_solutions <= 0) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (combination_size <= 0 || combination_size > 5 ||
+        !BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan) ||
+        static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        cursor.exhausted = true;
+        return {};
+    }
+
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        cursor.exhausted = true;
+        ++cursor.page;
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    const auto dense_modules_raw = BuildDenseModuleData(plan.free_modules);
+
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        dense_modules_raw, slot_value_power, min_attr_requirements,
+        plan.free_size, max_solutions, ctx);
+
+    // 上限处已返回的组合去掉锁定模组后换算为排序后的下标键, 搜索时直接排除
+    std::unordered_map<int, size_t> uuid_to_sorted;
+    for (size_t sorted_idx = 0; sorted_idx < ctx.sorted_to_original.size(); ++sorted_idx) {
+        uuid_to_sorted.emplace(plan.free_modules[ctx.sorted_to_original[sorted_idx]].uuid, sorted_idx);
+    }
+    ctx.score_ceiling = cursor.score_ceiling;
+    for (const auto& uuids : cursor.ceiling_uuids) {
+        std::array<uint16_t, 5> indices = {};
+        size_t count = 0;
+        bool known = true;
+        for (int uuid : uuids) {
+            if (locked_uuids.find(uuid) != locked_uuids.end()) {
+                continue;
+            }
+            auto it = uuid_to_sorted.find(uuid);
+            if (it == uuid_to_sorted.end() || count >= indices.size()) {
+                known = false;
+                break;
+            }
+            indices[count++] = static_cast<uint16_t>(it->second);
+        }
+        if (!known || count != static_cast<size_t>(plan.free_size)) {
+            continue;
+        }
+        SortIndexPrefix(indices, count);
+        ctx.ceiling_keys.insert(PackIndices(indices.data(), plan.free_size));
+    }
+
+    // 上一页的剩余解都排在游标之后, 其第K名分数是本页第K名分数的下界
+    const int seed_threshold = cursor.pending.size() >= static_cast<size_t>(max_solutions)
+        ? cursor.pending[static_cast<size_t>(max_solutions) - 1].score
+        : std::numeric_limits<int>::min();
+    std::vector<ModuleSolution> surplus;
+    auto page_solutions = AttachLockedModules(
+        plan, RunBranchAndBound(plan.free_modules, ctx, max_workers, seed_threshold, &surplus, &budget));
+    surplus = AttachLockedModules(plan, std::move(surplus));
+
+    std::vector<ModuleSolution> candidates;
+    candidates.reserve(page_solutions.size() + surplus.size() + cursor.pending.size());
+    candidates.insert(candidates.end(), page_solutions.begin(), page_solutions.end());
+    candidates.insert(candidates.end(), surplus.begin(), surplus.end());
+    candidates.insert(candidates.end(), cursor.pending.begin(), cursor.pending.end());
+    std::stable_sort(candidates.begin(), candidates.end(),
+        [](const ModuleSolution& lhs, const ModuleSolution& rhs) {
+            return lhs.score > rhs.score;
+        });
+
+    std::set<std::vector<int>> seen_combinations;
+    std::vector<ModuleSolution> result;
+    std::vector<ModuleSolution> pending;
+    for (const auto& solution : candidates) {
+        std::vector<int> uuids;
+        uuids.reserve(solution.modules.size());
+        for (const auto& module : solution.modules) {
+            uuids.push_back(module.uuid);
+        }
+        std::sort(uuids.begin(), uuids.end());
+        if (!seen_combinations.insert(uuids).second) {
+            continue;
+        }
+        if (result.size() < static_cast<size_t>(max_solutions)) {
+            result.push_back(solution);
+        } else if (pending.size() < static_cast<size_t>(max_solutions)) {
+            pending.push_back(solution);
+        } else {
+            break;
+        }
+    }
+
+    // 部分结果不能作为下一页的起点, 游标保持不变, 再次调用会重新搜索本页
+    if (budget.Stopped()) {
+        return FinishSearch(budget, std::move(result));
+    }
+    cursor.pending = std::move(pending);
+    cursor.exhausted = result.size() < static_cast<size_t>(max_solutions);
+    if (!result.empty()) {
+        const int last_score = result.back().score;
+        if (last_score != cursor.score_ceiling) {
+            cursor.score_ceiling = last_score;
+            cursor.ceiling_uuids.clear();
+        }
+        for (const auto& solution : result) {
+            if (solution.score != last_score) {
+                continue;
+            }
+            std::vector<int> uuids;
+            uuids.reserve(solution.modules.size());
+            for (const auto& module : solution.modules) {
+                uuids.push_back(module.uuid);
+            }
+            cursor.ceiling_uuids.push_back(std::move(uuids));
+        }
+    }
+    ++cursor.page;
+    return FinishSearch(budget, std::move(result));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyParetoFrontier(
+    const std::vector<ModuleInfo>& modules,
+    const std::vector<int>& frontier_attributes,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ParetoSearchContext pctx;
+    pctx.dims = 0;
+    for (int attr_id : frontier_attributes) {
+        auto slot_it = Constants::CUDA_ATTR_SLOT_MAP.find(attr_id);
+        if (slot_it == Constants::CUDA_ATTR_SLOT_MAP.end()) {
+            continue;
+        }
+        const auto end = pctx.frontier_slots.begin() + pctx.dims;
+        if (std::find(pctx.frontier_slots.begin(), end, slot_it->second) != end) {
+            continue;
+        }
+        if (pctx.dims == kMaxParetoAttrs) {
+            return {};
+        }
+        pctx.frontier_slots[static_cast<size_t>(pctx.dims++)] = slot_it->second;
+    }
+    if (pctx.dims == 0) {
+        return {};
+    }
+
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    if (static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    for (int d = 0; d < pctx.dims; ++d) {
+        pctx.base_sums[static_cast<size_t>(d)] = plan.locked_base.slot_values[pctx.frontier_slots[static_cast<size_t>(d)]];
+    }
+
+    // 前沿属性也参与支配比较; 被至少free_size个模组支配的模组总能换成组合外的支配者,
+    // 分数和各属性和都不下降, 因此前沿上的取值不会丢失
+    std::vector<int> dominance_slots = min_attr_requirements;
+    for (int d = 0; d < pctx.dims; ++d) {
+        auto& need = dominance_slots[pctx.frontier_slots[static_cast<size_t>(d)]];
+        need = std::max(need, 1);
+    }
+    const auto survivors = FindUndominatedModules(
+        BuildDenseModuleData(plan.free_modules), slot_value_power, dominance_slots, plan.free_size, &budget);
+    std::vector<ModuleInfo> search_modules;
+    search_modules.reserve(survivors.size());
+    for (size_t module_idx : survivors) {
+        search_modules.push_back(plan.free_modules[module_idx]);
+    }
+    if (static_cast<size_t>(plan.free_size) > search_modules.size()) {
+        return {};
+    }
+
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        BuildDenseModuleData(search_modules), slot_value_power, min_attr_requirements,
+        plan.free_size, 1, ctx);
+    pctx.bnb = &ctx;
+    pctx.budget = &budget;
+    budget.SetTotalWork(static_cast<long long>(search_modules.size()));
+    const auto compact_solutions = RunParetoSearch(pctx, max_workers);
+    return FinishSearch(budget, AttachLockedModules(plan, BuildSolutionsFromCompact(search_modules, compact_solutions, ctx)));
+}
+
+std::vector<ModuleImportance> ModuleOptimizerCpp::ModuleImportanceReport(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    if (plan.free_size == 0 || static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto& free_modules = plan.free_modules;
+    const auto dense_modules_raw = BuildDenseModuleData(free_modules);
+
+    std::vector<ModuleImportance> report(free_modules.size());
+    std::unordered_map<int, size_t> uuid_to_index;
+    for (size_t i = 0; i < free_modules.size(); ++i) {
+        report[i].uuid = free_modules[i].uuid;
+        uuid_to_index.emplace(free_modules[i].uuid, i);
+    }
+    std::vector<int> locked_prefix;
+    for (const auto& module : plan.locked_modules) {
+        locked_prefix.push_back(module.uuid);
+    }
+
+    const auto survivors = FindUndominatedModules(
+        dense_modules_raw, slot_value_power, min_attr_requirements, plan.free_size, &budget);
+    std::vector<bool> survived(free_modules.size(), false);
+    for (size_t module_idx : survivors) {
+        survived[module_idx] = true;
+    }
+    for (size_t i = 0; i < free_modules.size(); ++i) {
+        report[i].dominated = !survived[i];
+    }
+
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        dense_modules_raw, slot_value_power, min_attr_requirements,
+        plan.free_size, max_solutions, ctx);
+    const auto top_solutions = RunBranchAndBound(
+        free_modules, ctx, max_workers, std::numeric_limits<int>::min(), nullptr, &budget);
+
+    // top-K按分数降序, 模组(及其未被选中的等价副本)首次出现时的分数就是包含它的最优分数
+    for (const auto& solution : top_solutions) {
+        std::vector<int> solution_uuids = locked_prefix;
+        for (const auto& module : solution.modules) {
+            solution_uuids.push_back(module.uuid);
+        }
+        for (size_t pos = 0; pos < solution.modules.size(); ++pos) {
+            const size_t uuid_pos = locked_prefix.size() + pos;
+            std::vector<int> holders = {solution.modules[pos].uuid};
+            if (pos < solution.equivalent_uuids.size()) {
+                holders.insert(holders.end(), solution.equivalent_uuids[pos].begin(), solution.equivalent_uuids[pos].end());
+            }
+            for (int uuid : holders) {
+                auto& entry = report[uuid_to_index[uuid]];
+                if (entry.in_top_k) {
+                    continue;
+                }
+                entry.in_top_k = true;
+                entry.best_score = solution.score;
+                entry.best_uuids = solution_uuids;
+                entry.best_uuids[uuid_pos] = uuid;
+            }
+        }
+    }
+
+    // 未进入top-K的模组按等价类求包含该类代表的最优补全, 结果对类内所有模组成立.
+    // 补全与锁定模组相同: 代表模组折算进查表, 在其余模组上做组合长度减一的分支定界
+    std::vector<size_t> class_representative(ctx.class_members.size(), 0);
+    for (size_t idx = 0; idx < ctx.dense_modules.size(); ++idx) {
+        if (ctx.class_offset[idx] == 0) {
+            class_representative[ctx.module_class[idx]] = ctx.sorted_to_original[idx];
+        }
+    }
+    std::vector<size_t> pending_classes;
+    for (size_t class_id = 0; class_id < ctx.class_members.size(); ++class_id) {
+        if (!report[ctx.class_members[class_id].front()].in_top_k) {
+            pending_classes.push_back(class_id);
+        }
+    }
+
+    // top-K组合作为初始下界: 把目标模组换入任一位置得到的组合都是可行解
+    std::vector<std::vector<size_t>> top_indices;
+    top_indices.reserve(top_solutions.size());
+    for (const auto& solution : top_solutions) {
+        std::vector<size_t> indices;
+        for (const auto& module : solution.modules) {
+            indices.push_back(uuid_to_index[module.uuid]);
+        }
+        top_indices.push_back(std::move(indices));
+    }
+
+    struct CompletionResult {
+        int score = std::numeric_limits<int>::min();
+        std::vector<size_t> partners;
+    };
+    std::vector<CompletionResult> completions(pending_classes.size());
+    {
+        const int worker_count = std::max(1, max_workers);
+        std::atomic<size_t> next_class{0};
+        auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+        std::vector<std::future<void>> futures;
+        futures.reserve(static_cast<size_t>(worker_count));
+        for (int worker = 0; worker < worker_count; ++worker) {
+            futures.push_back(pool->enqueue(
+                [&]() {
+                    std::vector<DenseModuleData> partner_dense;
+                    std::vector<size_t> partner_original;
+                    while (true) {
+                        const size_t task = next_class.fetch_add(1, std::memory_order_relaxed);
+                        if (task >= pending_classes.size() || budget.Stopped()) {
+                            break;
+                        }
+                        const size_t fixed_original = class_representative[pending_classes[task]];
+                        const auto& fixed = dense_modules_raw[fixed_original];
+                        auto& result = completions[task];
+                        if (plan.free_size == 1) {
+                            if (MeetsMinAttrRequirements(fixed.slot_values, min_attr_requirements)) {
+                                result.score = CalculateDenseScore(
+                                    fixed.slot_values, fixed.total_attr_value, slot_value_power);
+                            }
+                            continue;
+                        }
+                        for (const auto& indices : top_indices) {
+                            for (size_t replaced = 0; replaced < indices.size(); ++replaced) {
+                                DenseSlotArray slot_sums = fixed.slot_values;
+                                int total_attr_value = fixed.total_attr_value;
+                                for (size_t pos = 0; pos < indices.size(); ++pos) {
+                                    if (pos != replaced) {
+                                        AddSlotArrays(slot_sums, dense_modules_raw[indices[pos]].slot_values);
+                                        total_attr_value += dense_modules_raw[indices[pos]].total_attr_value;
+                                    }
+                                }
+                                if (ctx.has_min_requirements && !MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+                                    continue;
+                                }
+                                const int score = CalculateDenseScore(slot_sums, total_attr_value, slot_value_power);
+                                if (score > result.score) {
+                                    result.score = score;
+                                    result.partners = indices;
+                                    result.partners.erase(result.partners.begin() + static_cast<std::ptrdiff_t>(replaced));
+                                }
+                            }
+                        }
+
+                        partner_dense.clear();
+                        partner_original.clear();
+                        for (size_t i = 0; i < dense_modules_raw.size(); ++i) {
+                            if (i != fixed_original) {
+                                partner_dense.push_back(dense_modules_raw[i]);
+                                partner_original.push_back(i);
+                            }
+                        }
+                        auto fixed_value_power = slot_value_power;
+                        auto fixed_min_requirements = min_attr_requirements;
+                        ApplyLockedBase(fixed, fixed_value_power, fixed_min_requirements);
+                        BranchAndBoundContext partner_ctx;
+                        BuildBranchAndBoundContext(
+                            partner_dense, fixed_value_power, fixed_min_requirements,
+                            plan.free_size - 1, 1, partner_ctx);
+                        BranchAndBoundShared shared;
+                        shared.budget = &budget;
+                        if (result.score != std::numeric_limits<int>::min()) {
+                            shared.threshold.store(result.score, std::memory_order_relaxed);
+                        }
+                        for (const auto& candidate : BranchAndBoundWorker(partner_ctx, shared)) {
+                            if (candidate.score <= result.score) {
+                                continue;
+                            }
+                            result.score = candidate.score;
+                            result.partners.clear();
+                            for (size_t idx : candidate.unpack_indices_vector(plan.free_size - 1)) {
+                                result.partners.push_back(partner_original[partner_ctx.sorted_to_original[idx]]);
+                            }
+                        }
+                    }
+                }));
+        }
+        for (auto& future : futures) {
+            future.get();
+        }
+    }
+
+    for (size_t task = 0; task < pending_classes.size(); ++task) {
+        const auto& result = completions[task];
+        if (result.score == std::numeric_limits<int>::min()) {
+            continue;
+        }
+        const size_t representative = class_representative[pending_classes[task]];
+        for (size_t member : ctx.class_members[pending_classes[task]]) {
+            // 同类模组可互换: 补全中已含该模组时原样使用, 否则用它替换类代表
+            const bool in_partners =
+                std::find(result.partners.begin(), result.partners.end(), member) != result.partners.end();
+            std::vector<int> combination_uuids = locked_prefix;
+            combination_uuids.push_back(free_modules[in_partners ? representative : member].uuid);
+            for (size_t partner : result.partners) {
+                combination_uuids.push_back(free_modules[partner].uuid);
+            }
+            auto& entry = report[member];
+            entry.best_score = result.score;
+            entry.best_uuids = std::move(combination_uuids);
+        }
+    }
+
+    // 只有全局最优组合中的模组可能带来损失: 取top-K中第一个不依赖它的组合, 都依赖时禁用它重新求解
+    bool rerun_partial = false;
+    if (!top_solutions.empty() && !budget.Stopped()) {
+        const int best_score = top_solutions.front().score;
+        const auto& best = top_solutions.front();
+        for (size_t pos = 0; pos < best.modules.size(); ++pos) {
+            if (pos < best.equivalent_uuids.size() && !best.equivalent_uuids[pos].empty()) {
+                continue;
+            }
+            const int uuid = best.modules[pos].uuid;
+            int best_without = std::numeric_limits<int>::min();
+            for (const auto& solution : top_solutions) {
+                bool depends = false;
+                for (size_t other = 0; other < solution.modules.size() && !depends; ++other) {
+                    depends = solution.modules[other].uuid == uuid &&
+                        (other >= solution.equivalent_uuids.size() || solution.equivalent_uuids[other].empty());
+                }
+                if (!depends) {
+                    best_without = solution.score;
+                    break;
+                }
+            }
+            if (best_without == std::numeric_limits<int>::min()) {
+                std::unordered_set<int> banned_without = banned_uuids;
+                banned_without.insert(uuid);
+                const auto rerun = StrategyBranchAndBound(
+                    modules, target_attributes, exclude_attributes, min_attr_sum_requirements,
+                    1, max_workers, combination_size, locked_uuids, banned_without, budget.RemainingMs(), control);
+                if (!rerun.empty() && rerun.front().partial) {
+                    rerun_partial = true;
+                    break;
+                }
+                best_without = rerun.empty() ? 0 : rerun.front().score;
+            }
+            report[uuid_to_index[uuid]].loss_if_removed = best_score - best_without;
+        }
+    }
+
+    std::sort(report.begin(), report.end(),
+        [](const ModuleImportance& lhs, const ModuleImportance& rhs) {
+            if (lhs.best_score != rhs.best_score) {
+                return lhs.best_score > rhs.best_score;
+            }
+            return lhs.uuid < rhs.uuid;
+        });
+    // 到期或取消时报告只覆盖已搜索的部分, 整体标记为部分结果
+    if (budget.Stopped() || rerun_partial) {
+        for (auto& entry : report) {
+            entry.partial = true;
+        }
+    }
+    budget.Finish(report.empty() ? -1 : report.front().best_score);
+    return report;
+}
+
+std::vector<WhatIfResult> ModuleOptimizerCpp::EvaluateHypotheticalModules(
+    const std::vector<ModuleInfo>& modules,
+    const std::vector<std::vector<int>>& baseline_uuids,
+    const std::vector<ModuleInfo>& hypothetical_modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    std::vector<WhatIfResult> results(hypothetical_modules.size());
+    for (size_t i = 0; i < hypothetical_modules.size(); ++i) {
+        results[i].uuid = hypothetical_modules[i].uuid;
+    }
+    if (hypothetical_modules.empty() || combination_size <= 0 || combination_size > 5) {
+        return results;
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return results;
+    }
+    // 假设模组占一个位置, 其余partner_size个位置从库存中选取
+    const int partner_size = plan.free_size - 1;
+    if (partner_size < 0 || static_cast<size_t>(partner_size) > plan.free_modules.size()) {
+        return results;
+    }
+    SearchBudget budget(deadline_ms, control);
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto& free_modules = plan.free_modules;
+    const auto dense_modules_raw = BuildDenseModuleData(free_modules);
+    const auto hypothetical_dense = BuildDenseModuleData(hypothetical_modules);
+    std::vector<int> locked_prefix;
+    for (const auto& module : plan.locked_modules) {
+        locked_prefix.push_back(module.uuid);
+    }
+
+    std::unordered_map<int, size_t> uuid_to_index;
+    for (size_t i = 0; i < free_modules.size(); ++i) {
+        uuid_to_index.emplace(free_modules[i].uuid, i);
+    }
+
+    // 基准组合去掉锁定模组后转换为库存下标, 按当前目标重新评分(调用方缓存的分数可能已还原为原始战斗力)
+    std::vector<std::vector<size_t>> baseline_indices;
+    int baseline_score = std::numeric_limits<int>::min();
+    for (const auto& uuids : baseline_uuids) {
+        if (uuids.size() != static_cast<size_t>(combination_size)) {
+            continue;
+        }
+        std::vector<size_t> indices;
+        size_t locked_count = 0;
+        bool known = true;
+        for (int uuid : uuids) {
+            if (locked_uuids.find(uuid) != locked_uuids.end()) {
+                ++locked_count;
+                continue;
+            }
+            auto it = uuid_to_index.find(uuid);
+            if (it == uuid_to_index.end()) {
+                known = false;
+                break;
+            }
+            indices.push_back(it->second);
+        }
+        if (!known || locked_count != plan.locked_modules.size()) {
+            continue;
+        }
+        std::vector<size_t> sorted_indices = indices;
+        std::sort(sorted_indices.begin(), sorted_indices.end());
+        if (std::adjacent_find(sorted_indices.begin(), sorted_indices.end()) != sorted_indices.end()) {
+            continue;
+        }
+        DenseSlotArray slot_sums = {};
+        int total_attr_value = 0;
+        for (size_t index : indices) {
+            AddSlotArrays(slot_sums, dense_modules_raw[index].slot_values);
+            total_attr_value += dense_modules_raw[index].total_attr_value;
+        }
+        if (!MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+            continue;
+        }
+        baseline_score = std::max(baseline_score, CalculateDenseScore(slot_sums, total_attr_value, slot_value_power));
+        baseline_indices.push_back(std::move(indices));
+    }
+    // 没有可用的缓存时求一次精确最优作为基准
+    if (baseline_indices.empty() && plan.free_size > 0 &&
+        static_cast<size_t>(plan.free_size) <= free_modules.size()) {
+        BranchAndBoundContext baseline_ctx;
+        BuildBranchAndBoundContext(
+            dense_modules_raw, slot_value_power, min_attr_requirements, plan.free_size, 1, baseline_ctx);
+        for (const auto& solution : RunBranchAndBound(
+                 free_modules, baseline_ctx, max_workers, std::numeric_limits<int>::min(), nullptr, &budget)) {
+            baseline_score = solution.score;
+            std::vector<size_t> indices;
+            for (const auto& module : solution.modules) {
+                indices.push_back(uuid_to_index[module.uuid]);
+            }
+            baseline_indices.push_back(std::move(indices));
+        }
+    }
+
+    // 库存模组的排序, 等价类与后缀上界与假设模组无关, 所有假设模组共用一份上下文
+    BranchAndBoundContext ctx;
+    if (partner_size > 0) {
+        BuildBranchAndBoundContext(
+            dense_modules_raw, slot_value_power, min_attr_requirements, partner_size, 1, ctx);
+    }
+
+    // 属性完全相同的假设模组只评估一次(蒙特卡洛抽样中大量重复); 按总属性值降序评估,
+    // 已证明不提升的假设模组可以直接判定被它支配的后续模组
+    std::map<std::pair<DenseSlotArray, int>, size_t> unique_index;
+    std::vector<size_t> representative(hypothetical_modules.size());
+    std::vector<size_t> unique_tasks;
+    for (size_t i = 0; i < hypothetical_modules.size(); ++i) {
+        const auto key = std::make_pair(hypothetical_dense[i].slot_values, hypothetical_dense[i].total_attr_value);
+        auto inserted = unique_index.emplace(key, i);
+        representative[i] = inserted.first->second;
+        if (inserted.second) {
+            unique_tasks.push_back(i);
+        }
+    }
+    std::stable_sort(unique_tasks.begin(), unique_tasks.end(),
+        [&](size_t lhs, size_t rhs) {
+            return hypothetical_dense[lhs].total_attr_value > hypothetical_dense[rhs].total_attr_value;
+        });
+
+    std::mutex settled_mutex;
+    std::vector<DenseModuleData> settled_modules;
+    const int worker_count = std::max(1, std::min(max_workers, static_cast<int>(unique_tasks.size())));
+    std::atomic<size_t> next_task{0};
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<void>> futures;
+    futures.reserve(static_cast<size_t>(worker_count));
+    for (int worker = 0; worker < worker_count; ++worker) {
+        futures.push_back(pool->enqueue(
+            [&]() {
+                while (true) {
+                    const size_t order = next_task.fetch_add(1, std::memory_order_relaxed);
+                    if (order >= unique_tasks.size() || budget.Stopped()) {
+                        break;
+                    }
+                    const size_t task = unique_tasks[order];
+                    const auto& fixed = hypothetical_dense[task];
+                    int best_score = std::numeric_limits<int>::min();
+                    std::vector<size_t> partners;
+                    if (partner_size == 0) {
+                        if (MeetsMinAttrRequirements(fixed.slot_values, min_attr_requirements)) {
+                            best_score = CalculateDenseScore(fixed.slot_values, fixed.total_attr_value, slot_value_power);
+                        }
+                    } else {
+                        // 假设模组换入基准组合的任一位置都是可行解, 作为初始下界
+                        for (const auto& indices : baseline_indices) {
+                            for (size_t replaced = 0; replaced < indices.size(); ++replaced) {
+                                DenseSlotArray slot_sums = fixed.slot_values;
+                                int total_attr_value = fixed.total_attr_value;
+                                for (size_t pos = 0; pos < indices.size(); ++pos) {
+                                    if (pos != replaced) {
+                                        AddSlotArrays(slot_sums, dense_modules_raw[indices[pos]].slot_values);
+                                        total_attr_value += dense_modules_raw[indices[pos]].total_attr_value;
+                                    }
+                                }
+                                if (ctx.has_min_requirements && !MeetsMinAttrRequirements(slot_sums, min_attr_requirements)) {
+                                    continue;
+                                }
+                                const int score = CalculateDenseScore(slot_sums, total_attr_value, slot_value_power);
+                                if (score > best_score) {
+                                    best_score = score;
+                                    partners = indices;
+                                    partners.erase(partners.begin() + static_cast<std::ptrdiff_t>(replaced));
+                                }
+                            }
+                        }
+
+                        // 基准为精确最优时, 被至少free_size个库存模组或一个已证明不提升的假设模组支配的模组不可能提升:
+                        // 组合外总有一个支配者可以替换它且分数不降
+                        bool settled = false;
+                        if (best_score != std::numeric_limits<int>::min() && baseline_score != std::numeric_limits<int>::min()) {
+                            settled = CountDominatingModules(
+                                dense_modules_raw, fixed, slot_value_power, min_attr_requirements,
+                                plan.free_size) >= plan.free_size;
+                            std::lock_guard<std::mutex> lock(settled_mutex);
+                            settled = settled || CountDominatingModules(
+                                settled_modules, fixed, slot_value_power, min_attr_requirements, 1) >= 1;
+                        }
+                        if (!settled) {
+                            // 只关心能否超过基准: 阈值取换入下界与基准最优的较大者.
+                            // 换入也找不到可行解时不设阈值, 以区分"不存在组合"与"不提升"
+                            BranchAndBoundShared shared;
+                            shared.budget = &budget;
+                            shared.threshold.store(
+                                best_score == std::numeric_limits<int>::min() ? best_score : std::max(best_score, baseline_score),
+                                std::memory_order_relaxed);
+                            for (const auto& candidate : BranchAndBoundWorker(ctx, shared, &fixed)) {
+                                if (candidate.score <= best_score) {
+                                    continue;
+                                }
+                                best_score = candidate.score;
+                                partners.clear();
+                                for (size_t idx : candidate.unpack_indices_vector(partner_size)) {
+                                    partners.push_back(ctx.sorted_to_original[idx]);
+                                }
+                            }
+                            // 阈值不低于基准最优, 完整搜索没有找到更好的组合即证明它不提升
+                            if (best_score != std::numeric_limits<int>::min() && !budget.Stopped() &&
+                                baseline_score != std::numeric_limits<int>::min() && best_score <= baseline_score) {
+                                std::lock_guard<std::mutex> lock(settled_mutex);
+                                settled_modules.push_back(fixed);
+                            }
+                        }
+                    }
+                    if (best_score == std::numeric_limits<int>::min()) {
+                        continue;
+                    }
+
+                    auto& result = results[task];
+                    result.best_score = best_score;
+                    if (baseline_score != std::numeric_limits<int>::min()) {
+                        result.gain = std::max(0, best_score - baseline_score);
+                    }
+                    result.best_uuids = locked_prefix;
+                    result.best_uuids.push_back(hypothetical_modules[task].uuid);
+                    for (size_t partner : partners) {
+                        result.best_uuids.push_back(free_modules[partner].uuid);
+                    }
+                }
+            }));
+    }
+    for (auto& future : futures) {
+        future.get();
+    }
+
+    // 重复的假设模组复制代表的结果, 组合中的uuid换成自身
+    for (size_t i = 0; i < hypothetical_modules.size(); ++i) {
+        const size_t source = representative[i];
+        if (source == i || results[source].best_uuids.empty()) {
+            continue;
+        }
+        results[i].best_score = results[source].best_score;
+        results[i].gain = results[source].gain;
+        results[i].best_uuids = results[source].best_uuids;
+        results[i].best_uuids[locked_prefix.size()] = hypothetical_modules[i].uuid;
+    }
+    // 到期或取消时未评估完的假设模组只有换入下界或没有结果, 全部标记为部分结果
+    int best_found = -1;
+    for (auto& result : results) {
+        result.partial = budget.Stopped();
+        best_found = std::max(best_found, result.best_score);
+    }
+    budget.Finish(best_found);
+    return results;
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyMeetInTheMiddle(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    if (static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    const auto dense_modules_raw = BuildDenseModuleData(plan.free_modules);
+
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        dense_modules_raw, slot_value_power, min_attr_requirements,
+        plan.free_size, max_solutions, ctx);
+
+    // 4模组为两两表x两两表, 5模组为前缀三元组x两两表
+    PairSumTable pair_table;
+    if (plan.free_size >= 3) {
+        BuildPairSumTable(ctx, pair_table);
+        ctx.pair_table = &pair_table;
+    }
+    return FinishSearch(budget, AttachLockedModules(
+        plan, RunBranchAndBound(plan.free_modules, ctx, max_workers, std::numeric_limits<int>::min(), nullptr, &budget)));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyCappedSumDp(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int max_workers,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return {};
+    }
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    if (plan.free_size == 0) {
+        return BuildLockedOnlySolutions(plan, slot_value_power, min_attr_requirements);
+    }
+    if (static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    const auto dense_modules = BuildDenseModuleData(plan.free_modules);
+    budget.SetTotalWork(static_cast<long long>(dense_modules.size()));
+
+    std::vector<CompactSolution> compact_solutions;
+    if (!RunCappedSumDp(
+            dense_modules, slot_value_power, min_attr_requirements,
+            plan.free_size, max_solutions, compact_solutions, &budget)) {
+        // 计分属性过多, 状态空间不再小于组合空间, 回退到分支定界, 只使用剩余的时间预算
+        return StrategyBranchAndBound(
+            modules, target_attributes, exclude_attributes,
+            min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+            locked_uuids, banned_uuids, budget.RemainingMs(), control);
+    }
+
+    std::vector<ModuleSolution> final_solutions;
+    final_solutions.reserve(compact_solutions.size());
+    for (const auto& solution : compact_solutions) {
+        auto indices = solution.unpack_indices_vector(plan.free_size);
+        std::vector<ModuleInfo> solution_modules;
+        solution_modules.reserve(indices.size());
+        for (size_t index : indices) {
+            solution_modules.push_back(plan.free_modules[index]);
+        }
+        auto result = CalculateCombatPower(solution_modules);
+        final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        final_solutions.back().certified = true;
+    }
+    return FinishSearch(budget, AttachLockedModules(plan, std::move(final_solutions)));
+}
+
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategySimulatedAnnealing(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int restarts,
+    int iterations,
+    uint64_t seed,
+    int combination_size,
+    int max_workers,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || restarts <= 0 || iterations <= 0) {
+        return {};
+    }
+    if (combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan) ||
+        static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    if (!plan.locked_modules.empty() && plan.free_size < kMinConstrainedSearchSize) {
+        return StrategyEnumeration(
+            modules, target_attributes, exclude_attributes, min_attr_sum_requirements,
+            max_solutions, max_workers, combination_size, locked_uuids, banned_uuids, deadline_ms, control);
+    }
+    SearchBudget budget(deadline_ms, control, restarts);
+
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto candidate_modules = FilterBySignatureBounds(
+        plan.free_modules, slot_value_power, min_attr_requirements, plan.free_size, max_solutions);
+    if (static_cast<size_t>(plan.free_size) > candidate_modules.size()) {
+        return {};
+    }
+    const auto dense_modules = BuildDenseModuleData(candidate_modules);
 
-    const auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
-    const auto dense_modules = BuildDenseModuleData(modules);
-    const auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
-    size_t n = modules.size();
-    size_t total_combinations = CombinationCount(n, static_cast<size_t>(combination_size));
+    AnnealingContext ctx;
+    ctx.dense_modules = &dense_modules;
+    ctx.slot_value_power = &slot_value_power;
+    ctx.min_attr_requirements = &min_attr_requirements;
+    for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+        if (min_attr_requirements[slot] > 0) {
+            ctx.required_slots.push_back(slot);
+        }
+    }
+    ctx.combination_size = plan.free_size;
+    ctx.max_solutions = max_solutions;
+    ctx.iterations = iterations;
+
+    uint64_t base_seed = seed;
+    if (base_seed == 0) {
+        std::random_device rd;
+        base_seed = (static_cast<uint64_t>(rd()) << 32) | rd();
+    }
 
-    size_t batch_size = std::max(static_cast<size_t>(1000), total_combinations / (max_workers * 4));
-    batch_size = std::min(batch_size, static_cast<size_t>(1307072));
-    size_t num_batches = (total_combinations + batch_size - 1) / batch_size;
-    // 创建线程池
-    auto pool = std::make_unique<SimpleThreadPool>(max_workers);
-    std::vector<std::future<std::vector<CompactSolution>>> futures;
-    futures.reserve(num_batches); 
-
-    // 提交任务
-    for (size_t batch_idx = 0; batch_idx < num_batches; ++batch_idx) {
-        size_t start_combination = batch_idx * batch_size;
-        size_t end_combination = std::min(start_combination + batch_size, total_combinations);
-        size_t range_size = end_combination - start_combination;
-        int oversample_factor = 2;
-        int local_top_capacity = static_cast<int>(std::min(range_size, static_cast<size_t>(max_solutions * oversample_factor)));
+    // 每次重启的结果单独保存, 合并顺序与线程数无关, 固定种子时结果可复现(到期提前结束除外)
+    std::vector<std::vector<CompactSolution>> restart_solutions(static_cast<size_t>(restarts));
+    std::atomic<int> next_restart{0};
+    const int worker_count = std::min(std::max(1, max_workers), restarts);
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<void>> futures;
+    futures.reserve(static_cast<size_t>(worker_count));
+    for (int worker = 0; worker < worker_count; ++worker) {
         futures.push_back(pool->enqueue(
-            [start_combination, end_combination, n, local_top_capacity, combination_size,
-             &dense_modules, &slot_value_power, &min_attr_requirements]() {
-                return ProcessCombinationRange(
-                    start_combination, end_combination, n,
-                    dense_modules, slot_value_power, min_attr_requirements,
-                    local_top_capacity, combination_size);
-            }
-        ));
-    }
-    
-    // 优先队列收集解保持真正占内存的只有最后的解+运行中线程创建的LightweightSolution
-    std::priority_queue<CompactSolution, std::vector<CompactSolution>, 
-                       std::greater<CompactSolution>> top_solutions;
-    while (!futures.empty()) {
-        auto completed_future = std::find_if(futures.begin(), futures.end(),
-            [](auto& f) { return f.wait_for(std::chrono::seconds(0)) == std::future_status::ready; });
-        
-        if (completed_future != futures.end()) {
-            auto batch_result = std::move(completed_future->get());
-            for (const auto& solution : batch_result) {
-                if (top_solutions.size() < static_cast<size_t>(max_solutions)) {
-                    top_solutions.push(solution);
-                } else if (solution.score > top_solutions.top().score) {
-                    top_solutions.pop();
-                    top_solutions.push(solution);
+            [&]() {
+                BudgetTicker ticker;
+                ticker.budget = &budget;
+                for (int restart = next_restart.fetch_add(1); restart < restarts && !ticker.stopped;
+                     restart = next_restart.fetch_add(1)) {
+                    RunAnnealingRestart(
+                        ctx, AnnealingRestartSeed(base_seed, static_cast<uint64_t>(restart)), ticker,
+                        restart_solutions[static_cast<size_t>(restart)]);
+                    ++ticker.pending_work;
                 }
-            }
-            
-            futures.erase(completed_future);
-        } else {
-            std::this_thread::sleep_for(std::chrono::milliseconds(1));
-        }
+                ticker.Flush();
+            }));
+    }
+    for (auto& future : futures) {
+        future.get();
     }
     pool.reset();
-    
-    
-    // 优先队列->vector
+
     std::vector<CompactSolution> all_solutions;
-    all_solutions.reserve(top_solutions.size());
-    
-    while (!top_solutions.empty()) {
-        all_solutions.push_back(top_solutions.top());
-        top_solutions.pop();
+    for (const auto& batch : restart_solutions) {
+        all_solutions.insert(all_solutions.end(), batch.begin(), batch.end());
     }
-    
-    // 降序提取前max_solutions结果, 构造完整解
-    std::reverse(all_solutions.begin(), all_solutions.end());
+    std::sort(all_solutions.begin(), all_solutions.end(),
+        [](const CompactSolution& lhs, const CompactSolution& rhs) {
+            if (lhs.score != rhs.score) {
+                return lhs.score > rhs.score;
+            }
+            return lhs.packed_indices < rhs.packed_indices;
+        });
+
+    PackedIndexSet seen_combinations(all_solutions.size());
     std::vector<ModuleSolution> final_solutions;
-    final_solutions.reserve(all_solutions.size());
     for (const auto& solution : all_solutions) {
-        auto indices = solution.unpack_indices_vector(combination_size);
+        if (!seen_combinations.Insert(solution.packed_indices)) {
+            continue;
+        }
         std::vector<ModuleInfo> solution_modules;
-        solution_modules.reserve(indices.size());
-        for (size_t index : indices) {
-            solution_modules.push_back(modules[index]);
+        solution_modules.reserve(static_cast<size_t>(plan.free_size));
+        for (int i = 0; i < plan.free_size; ++i) {
+            solution_modules.push_back(candidate_modules[solution.packed_indices.indices[static_cast<size_t>(i)]]);
         }
         auto result = CalculateCombatPower(solution_modules);
         final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        if (static_cast<int>(final_solutions.size()) >= max_solutions) {
+            break;
+        }
     }
-
-    return final_solutions;
+    return FinishSearch(budget, AttachLockedModules(plan, std::move(final_solutions)));
 }
 
-std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationCUDA(
+std::vector<std::vector<ModuleSolution>> ModuleOptimizerCpp::StrategyBatchEnumeration(
     const std::vector<ModuleInfo>& modules,
-    const std::unordered_set<int>& target_attributes,
-    const std::unordered_set<int>& exclude_attributes,
-    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    const std::vector<BatchQuery>& queries,
     int max_solutions,
     int max_workers,
-    int combination_size) {
-
-#ifdef USE_CUDA
-    (void)max_workers;
-    if (TestCuda()) {
-        printf("CUDA GPU acceleration enabled - dense LUT kernel\n");
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    std::vector<std::vector<ModuleSolution>> results(queries.size());
+    if (modules.empty() || queries.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return results;
+    }
+    // 查询数超过掩码位数时分批扫描
+    if (queries.size() > kMaxBatchQueries) {
+        for (size_t offset = 0; offset < queries.size(); offset += kMaxBatchQueries) {
+            const size_t end = std::min(queries.size(), offset + kMaxBatchQueries);
+            std::vector<BatchQuery> chunk(queries.begin() + offset, queries.begin() + end);
+            auto chunk_results = StrategyBatchEnumeration(
+                modules, chunk, max_solutions, max_workers, combination_size,
+                locked_uuids, banned_uuids, deadline_ms, control);
+            std::move(chunk_results.begin(), chunk_results.end(), results.begin() + offset);
+        }
+        return results;
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return results;
+    }
+    SearchBudget budget(deadline_ms, control);
+
+    // 计分表与约束相同的查询合并为一个计分配置
+    std::vector<BatchScoringProfile> profiles;
+    std::vector<size_t> query_profile(queries.size());
+    for (size_t q = 0; q < queries.size(); ++q) {
+        auto slot_value_power = BuildSlotValuePower(queries[q].target_attributes, queries[q].exclude_attributes);
+        auto min_attr_requirements = BuildMinAttrRequirementsDense(queries[q].min_attr_sum_requirements);
+        ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+        size_t p = 0;
+        while (p < profiles.size() && (profiles[p].slot_value_power != slot_value_power ||
+                                       profiles[p].min_attr_requirements != min_attr_requirements)) {
+            ++p;
+        }
+        if (p == profiles.size()) {
+            profiles.emplace_back();
+            profiles[p].slot_value_power = std::move(slot_value_power);
+            profiles[p].min_attr_requirements = std::move(min_attr_requirements);
+            for (int slot = 0; slot < Constants::CUDA_ATTR_DIM; ++slot) {
+                if (profiles[p].min_attr_requirements[slot] > 0) {
+                    profiles[p].required_slots.push_back(slot);
+                }
+            }
+        }
+        profiles[p].query_mask |= uint64_t{1} << q;
+        query_profile[q] = p;
+    }
+    if (plan.free_size == 0) {
+        for (size_t q = 0; q < queries.size(); ++q) {
+            const auto& profile = profiles[query_profile[q]];
+            results[q] = BuildLockedOnlySolutions(plan, profile.slot_value_power, profile.min_attr_requirements);
+        }
+        return results;
+    }
 
-        const auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
-        const auto dense_modules = BuildDenseModuleData(modules);
-        const auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
-        const auto module_matrix = BuildDenseModuleMatrix(dense_modules);
+    // 每个查询先在自己可用的模组上做签名上界筛选, 扫描在各查询保留模组的并集上进行
+    std::unordered_map<int, uint64_t> uuid_masks;
+    for (size_t q = 0; q < queries.size(); ++q) {
+        const auto& allowed = queries[q].module_uuids;
+        std::vector<ModuleInfo> query_modules;
+        for (const auto& module : plan.free_modules) {
+            if (allowed.empty() || allowed.find(module.uuid) != allowed.end()) {
+                query_modules.push_back(module);
+            }
+        }
+        if (static_cast<size_t>(plan.free_size) > query_modules.size()) {
+            continue;
+        }
+        const auto& profile = profiles[query_profile[q]];
+        for (const auto& module : FilterBySignatureBounds(
+                 query_modules, profile.slot_value_power, profile.min_attr_requirements,
+                 plan.free_size, max_solutions)) {
+            uuid_masks[module.uuid] |= uint64_t{1} << q;
+        }
+    }
+    std::vector<ModuleInfo> sweep_modules;
+    for (const auto& module : plan.free_modules) {
+        if (uuid_masks.find(module.uuid) != uuid_masks.end()) {
+            sweep_modules.push_back(module);
+        }
+    }
+    if (static_cast<size_t>(plan.free_size) > sweep_modules.size()) {
+        return results;
+    }
+    // 大类与属性完全相同的模组为同一等价类, 不论各查询能否使用它们; 类的掩码为成员掩码的并集
+    auto dense_modules = BuildDenseModuleData(sweep_modules);
+    std::map<std::pair<int, DenseSlotArray>, uint64_t> class_masks;
+    for (size_t i = 0; i < sweep_modules.size(); ++i) {
+        class_masks[{dense_modules[i].category, dense_modules[i].slot_values}] |= uuid_masks[sweep_modules[i].uuid];
+    }
+    // 按模组在类可参与的计分配置下的最高单模组分数降序排列, 后缀上界收紧得更快; 排序键只取决于类, 同类成员相邻
+    std::vector<int> contribution(sweep_modules.size(), 0);
+    std::vector<size_t> order(sweep_modules.size());
+    for (size_t i = 0; i < order.size(); ++i) {
+        order[i] = i;
+        const uint64_t mask = class_masks[{dense_modules[i].category, dense_modules[i].slot_values}];
+        for (const auto& profile : profiles) {
+            if ((mask & profile.query_mask) != 0) {
+                contribution[i] = std::max(contribution[i], CalculateDenseScore(
+                    dense_modules[i].slot_values, dense_modules[i].total_attr_value, profile.slot_value_power));
+            }
+        }
+    }
+    std::sort(order.begin(), order.end(), [&](size_t lhs, size_t rhs) {
+        if (contribution[lhs] != contribution[rhs]) {
+            return contribution[lhs] > contribution[rhs];
+        }
+        if (dense_modules[lhs].total_attr_value != dense_modules[rhs].total_attr_value) {
+            return dense_modules[lhs].total_attr_value > dense_modules[rhs].total_attr_value;
+        }
+        // 大类与属性完全相同的模组必须相邻, 便于合并为等价类
+        if (dense_modules[lhs].slot_values != dense_modules[rhs].slot_values) {
+            return dense_modules[lhs].slot_values < dense_modules[rhs].slot_values;
+        }
+        if (dense_modules[lhs].category != dense_modules[rhs].category) {
+            return dense_modules[lhs].category < dense_modules[rhs].category;
+        }
+        return lhs < rhs;
+    });
+    std::vector<std::vector<size_t>> class_members;
+    for (size_t pos = 0; pos < order.size(); ++pos) {
+        if (pos == 0 || !SameModuleClass(dense_modules[order[pos]], dense_modules[order[pos - 1]])) {
+            class_members.emplace_back();
+        }
+        class_members.back().push_back(order[pos]);
+    }
 
-        std::vector<int> gpu_scores(max_solutions);
-        std::vector<long long> gpu_indices(max_solutions);
+    // 每类按各查询可用的成员数(多重度)展开为若干副本: 第c个副本的掩码为多重度大于c的查询.
+    // 副本只能连续选取, 掩码沿路径按位与, 某查询从一类中选取的个数因此不超过它的多重度.
+    // 每类最多combination_size个副本参与扫描, 其余成员作为等价替换返回
+    std::vector<ModuleInfo> sorted_modules;
+    std::vector<DenseModuleData> sorted_dense;
+    std::vector<uint64_t> module_masks;
+    std::vector<int> class_offset;
+    std::vector<size_t> module_class;
+    for (size_t class_id = 0; class_id < class_members.size(); ++class_id) {
+        const auto& members = class_members[class_id];
+        std::array<int, kMaxBatchQueries> multiplicity = {};
+        for (size_t member : members) {
+            const uint64_t mask = uuid_masks[sweep_modules[member].uuid];
+            for (size_t q = 0; q < queries.size(); ++q) {
+                multiplicity[q] += static_cast<int>((mask >> q) & 1u);
+            }
+        }
+        for (int copy = 0; copy < plan.free_size && static_cast<size_t>(copy) < members.size(); ++copy) {
+            uint64_t mask = 0;
+            for (size_t q = 0; q < queries.size(); ++q) {
+                if (multiplicity[q] > copy) {
+                    mask |= uint64_t{1} << q;
+                }
+            }
+            if (mask == 0) {
+                break;
+            }
+            sorted_modules.push_back(sweep_modules[members[static_cast<size_t>(copy)]]);
+            sorted_dense.push_back(dense_modules[members[static_cast<size_t>(copy)]]);
+            module_masks.push_back(mask);
+            class_offset.push_back(copy);
+            module_class.push_back(class_id);
+        }
+    }
 
-        int gpu_result_count = GpuStrategyEnumeration(
-            module_matrix.data(),
-            static_cast<int>(modules.size()),
-            slot_value_power.data(),
-            min_attr_requirements.data(),
-            max_solutions,
-            gpu_scores.data(),
-            gpu_indices.data(),
-            combination_size);
+    std::vector<SparseModuleSlots> sparse_modules;
+    sparse_modules.reserve(sorted_dense.size());
+    for (const auto& dense : sorted_dense) {
+        sparse_modules.push_back(BuildSparseModuleSlots(dense));
+    }
 
-        return BuildGpuSolutions(modules, gpu_result_count, gpu_scores, gpu_indices, combination_size);
+    BatchSweepContext ctx;
+    ctx.dense_modules = &sorted_dense;
+    ctx.sparse_modules = &sparse_modules;
+    ctx.module_masks = &module_masks;
+    ctx.class_offset = &class_offset;
+    ctx.profiles = &profiles;
+    ctx.query_count = queries.size();
+    ctx.max_module_slots = CountMaxModuleSlots(sorted_dense);
+    ctx.combination_size = plan.free_size;
+    ctx.max_solutions = max_solutions;
+    ctx.shared_thresholds = std::make_unique<std::atomic<int>[]>(queries.size());
+    for (size_t q = 0; q < queries.size(); ++q) {
+        ctx.shared_thresholds[q].store(std::numeric_limits<int>::min(), std::memory_order_relaxed);
+    }
+    BuildSuffixUpperBounds(sorted_dense, plan.free_size, ctx.suffix_slot_best, ctx.suffix_total_best);
+
+    // 以第一个模组为单位分给工作线程, 每个线程为每个查询维护自己的top-K
+    const size_t root_count = sorted_dense.size() - static_cast<size_t>(plan.free_size) + 1;
+    budget.SetTotalWork(static_cast<long long>(root_count));
+    const uint64_t all_queries = queries.size() == kMaxBatchQueries
+        ? ~uint64_t{0}
+        : (uint64_t{1} << queries.size()) - 1;
+    const int worker_count = std::max(1, std::min(max_workers, static_cast<int>(root_count)));
+    std::vector<BatchSweepWorker> workers(static_cast<size_t>(worker_count));
+    std::atomic<size_t> next_root{0};
+    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(worker_count));
+    std::vector<std::future<void>> futures;
+    futures.reserve(workers.size());
+    for (auto& worker : workers) {
+        futures.push_back(pool->enqueue([&ctx, &budget, &next_root, &worker, root_count, all_queries]() {
+            worker.top_solutions.resize(ctx.query_count);
+            worker.nodes.resize(static_cast<size_t>(ctx.combination_size) * ctx.profiles->size());
+            worker.ticker.budget = &budget;
+            for (size_t root = next_root.fetch_add(1); root < root_count && !worker.ticker.stopped;
+                 root = next_root.fetch_add(1)) {
+                const auto& dense = (*ctx.dense_modules)[root];
+                const uint64_t root_mask = (*ctx.class_offset)[root] != 0 ? 0 : RecheckBatchQueries(
+                    ctx, worker, all_queries & (*ctx.module_masks)[root], dense.slot_values, dense.total_attr_value,
+                    root + 1, ctx.combination_size - 1);
+                if (root_mask != 0) {
+                    worker.indices[0] = static_cast<uint16_t>(root);
+                    SweepBatchCombinations(ctx, worker, 1, root + 1, root_mask, dense.slot_values, dense.total_attr_value);
+                }
+                ++worker.ticker.pending_work;
+            }
+            worker.ticker.Flush();
+        }));
     }
+    for (auto& future : futures) {
+        future.get();
+    }
+    pool.reset();
 
-    printf("CUDA not available, using CPU optimized version\n");
-    return StrategyEnumeration(
-        modules, target_attributes, exclude_attributes,
-        min_attr_sum_requirements, max_solutions, max_workers, combination_size);
-#else
-    return StrategyEnumeration(
-        modules, target_attributes, exclude_attributes,
-        min_attr_sum_requirements, max_solutions, max_workers, combination_size);
-#endif
-}
+    int best_score = -1;
+    for (size_t q = 0; q < queries.size(); ++q) {
+        std::vector<CompactSolution> query_solutions;
+        for (auto& worker : workers) {
+            auto& top_solutions = worker.top_solutions[q];
+            while (!top_solutions.empty()) {
+                query_solutions.push_back(top_solutions.top());
+                top_solutions.pop();
+            }
+        }
+        std::sort(query_solutions.begin(), query_solutions.end(),
+            [](const CompactSolution& lhs, const CompactSolution& rhs) {
+                if (lhs.score != rhs.score) {
+                    return lhs.score > rhs.score;
+                }
+                return lhs.packed_indices < rhs.packed_indices;
+            });
+        if (query_solutions.size() > static_cast<size_t>(max_solutions)) {
+            query_solutions.resize(static_cast<size_t>(max_solutions));
+        }
 
-#ifdef USE_OPENCL
-extern "C" int TestOpenCL();
-#endif
+        // 副本只代表"从该类选取第几个", 具体模组取该查询能使用的成员: 扫描用的成员在前, 其余成员作为等价替换
+        const uint64_t query_bit = uint64_t{1} << q;
+        const auto& allowed = queries[q].module_uuids;
+        std::map<size_t, std::vector<size_t>> query_members;
+        auto members_for_query = [&](size_t class_id) -> const std::vector<size_t>& {
+            auto inserted = query_members.emplace(class_id, std::vector<size_t>());
+            auto& usable = inserted.first->second;
+            if (inserted.second) {
+                std::vector<size_t> rest;
+                for (size_t member : class_members[class_id]) {
+                    const int uuid = sweep_modules[member].uuid;
+                    if ((uuid_masks[uuid] & query_bit) != 0) {
+                        usable.push_back(member);
+                    } else if (allowed.empty() || allowed.find(uuid) != allowed.end()) {
+                        rest.push_back(member);
+                    }
+                }
+                usable.insert(usable.end(), rest.begin(), rest.end());
+            }
+            return usable;
+        };
+
+        std::vector<ModuleSolution> final_solutions;
+        final_solutions.reserve(query_solutions.size());
+        for (const auto& solution : query_solutions) {
+            std::vector<ModuleInfo> solution_modules;
+            solution_modules.reserve(static_cast<size_t>(plan.free_size));
+            std::vector<size_t> solution_classes;
+            std::map<size_t, size_t> class_pick_count;
+            for (int i = 0; i < plan.free_size; ++i) {
+                const size_t class_id = module_class[solution.packed_indices.indices[static_cast<size_t>(i)]];
+                solution_modules.push_back(sweep_modules[members_for_query(class_id)[class_pick_count[class_id]++]]);
+                solution_classes.push_back(class_id);
+            }
+            auto result = CalculateCombatPower(solution_modules);
+            final_solutions.emplace_back(solution_modules, solution.score, result.second);
+            final_solutions.back().certified = true;
+            best_score = std::max(best_score, solution.score);
+
+            // 等价类中该查询可用但未被选中的模组可以与所选模组任意互换, 分数不变
+            auto& equivalent_uuids = final_solutions.back().equivalent_uuids;
+            equivalent_uuids.resize(static_cast<size_t>(plan.free_size));
+            for (int i = 0; i < plan.free_size; ++i) {
+                const size_t class_id = solution_classes[static_cast<size_t>(i)];
+                const auto& members = members_for_query(class_id);
+                for (size_t member = class_pick_count[class_id]; member < members.size(); ++member) {
+                    equivalent_uuids[static_cast<size_t>(i)].push_back(sweep_modules[members[member]].uuid);
+                }
+            }
+        }
+        results[q] = AttachLockedModules(plan, std::move(final_solutions));
+    }
+    // 预算耗尽时的结果只是已扫描部分的top-K
+    if (budget.Stopped()) {
+        for (auto& query_results : results) {
+            for (auto& solution : query_results) {
+                solution.partial = true;
+                solution.certified = false;
+            }
+        }
+    }
+    budget.Finish(best_score);
+    return results;
+}
 
-std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationGPU(
+std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBeamThenExact(
     const std::vector<ModuleInfo>& modules,
     const std::unordered_set<int>& target_attributes,
     const std::unordered_set<int>& exclude_attributes,
     const std::unordered_map<int, int>& min_attr_sum_requirements,
     int max_solutions,
+    int beam_width,
+    int expand_per_state,
+    int combination_size,
     int max_workers,
-    int combination_size) {
-#ifdef USE_CUDA
-    if (TestCuda()) {
-        return StrategyEnumerationCUDA(
-            modules, target_attributes, exclude_attributes,
-            min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0 || combination_size > 5) {
+        return {};
+    }
+    SearchBudget budget(deadline_ms, control);
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan) ||
+        static_cast<size_t>(plan.free_size) > plan.free_modules.size()) {
+        return {};
+    }
+    if (!plan.locked_modules.empty() && plan.free_size < kMinConstrainedSearchSize) {
+        return StrategyEnumeration(
+            modules, target_attributes, exclude_attributes, min_attr_sum_requirements,
+            max_solutions, max_workers, combination_size, locked_uuids, banned_uuids, deadline_ms, control);
     }
-#endif
 
-#ifdef USE_OPENCL
-    if (combination_size <= 4 && TestOpenCL()) {
-        return StrategyEnumerationOpenCL(
-            modules, target_attributes, exclude_attributes,
-            min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+    auto beam_solutions = StrategyBeamSearch(
+        modules, target_attributes, exclude_attributes, min_attr_sum_requirements,
+        max_solutions, beam_width, expand_per_state, combination_size, max_workers,
+        locked_uuids, banned_uuids, budget.RemainingMs(), control);
+    // beam阶段已到期或被取消, 直接返回beam的部分结果
+    if (!beam_solutions.empty() && beam_solutions.front().partial) {
+        return beam_solutions;
     }
-#endif
-    return StrategyEnumeration(
-        modules, target_attributes, exclude_attributes,
-        min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto dense_modules_raw = BuildDenseModuleData(plan.free_modules);
+    BranchAndBoundContext ctx;
+    BuildBranchAndBoundContext(
+        dense_modules_raw, slot_value_power, min_attr_requirements,
+        plan.free_size, max_solutions, ctx);
+
+    // 全局上界: 任何组合都不可能超过它, 分数达到上界的beam解无需精确搜索即可确认最优
+    const int global_bound = CalculateBranchAndBoundBound(ctx, DenseSlotArray{}, 0, 0, plan.free_size);
+    for (auto& solution : beam_solutions) {
+        solution.certified = solution.certified || solution.score >= global_bound;
+    }
+    const bool beam_full = beam_solutions.size() == static_cast<size_t>(max_solutions);
+    if (beam_full && beam_solutions.back().certified) {
+        return FinishSearch(budget, std::move(beam_solutions));
+    }
+
+    // beam的第K名分数作为精确搜索的初始阈值, 只需寻找不低于该分数的组合
+    const int seed_threshold = beam_full ? beam_solutions.back().score : std::numeric_limits<int>::min();
+    auto exact_solutions = AttachLockedModules(
+        plan, RunBranchAndBound(plan.free_modules, ctx, max_workers, seed_threshold, nullptr, &budget));
+    // 精确搜索被截断时, 其部分结果不一定优于beam结果, 合并两者取top-K
+    if (budget.Stopped()) {
+        exact_solutions.insert(exact_solutions.end(), beam_solutions.begin(), beam_solutions.end());
+        std::stable_sort(exact_solutions.begin(), exact_solutions.end(),
+            [](const ModuleSolution& lhs, const ModuleSolution& rhs) {
+                return lhs.score > rhs.score;
+            });
+        std::set<std::vector<int>> seen_combinations;
+        std::vector<ModuleSolution> merged;
+        for (auto& solution : exact_solutions) {
+            std::vector<int> uuids;
+            uuids.reserve(solution.modules.size());
+            for (const auto& module : solution.modules) {
+                uuids.push_back(module.uuid);
+            }
+            std::sort(uuids.begin(), uuids.end());
+            if (seen_combinations.insert(std::move(uuids)).second) {
+                merged.push_back(std::move(solution));
+            }
+            if (merged.size() >= static_cast<size_t>(max_solutions)) {
+                break;
+            }
+        }
+        return FinishSearch(budget, std::move(merged));
+    }
+    if (exact_solutions.empty()) {
+        return FinishSearch(budget, std::move(beam_solutions));
+    }
+    return FinishSearch(budget, std::move(exact_solutions));
 }
 
-std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBeamSearch(
+std::vector<ModuleSolution> ModuleOptimizerCpp::LocalSearchSwap(
     const std::vector<ModuleInfo>& modules,
+    const std::vector<std::vector<int>>& seed_uuids,
     const std::unordered_set<int>& target_attributes,
     const std::unordered_set<int>& exclude_attributes,
     const std::unordered_map<int, int>& min_attr_sum_requirements,
     int max_solutions,
-    int beam_width,
-    int expand_per_state,
-    int combination_size,
-    int max_workers) {
+    int max_workers,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
 
-    if (modules.empty() || max_solutions <= 0 || beam_width <= 0) {
+    if (modules.empty() || seed_uuids.empty() || max_solutions <= 0) {
         return {};
     }
-    if (combination_size <= 0 || combination_size > 5 ||
-        static_cast<size_t>(combination_size) > modules.size()) {
+    SearchBudget budget(deadline_ms, control, static_cast<long long>(seed_uuids.size()));
+    // 组合长度由起点决定, 锁定模组数量不能超过它
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, 5, plan)) {
         return {};
     }
-    const int worker_count = std::max(1, max_workers);
 
-    const auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
-    const auto dense_modules_raw = BuildDenseModuleData(modules);
-    const auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
-    constexpr int kBeamStrategyCount = 3;
-    auto pool = std::make_unique<SimpleThreadPool>(static_cast<size_t>(std::min(worker_count, kBeamStrategyCount)));
-    std::vector<std::future<std::vector<LightweightSolution>>> futures;
-    futures.reserve(kBeamStrategyCount);
+    std::unordered_map<int, size_t> uuid_to_index;
+    for (size_t i = 0; i < plan.free_modules.size(); ++i) {
+        uuid_to_index.emplace(plan.free_modules[i].uuid, i);
+    }
 
-    for (int strategy = 0; strategy < kBeamStrategyCount; ++strategy) {
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto dense_modules_raw = BuildDenseModuleData(plan.free_modules);
+    SwapSearchContext ctx;
+    BuildSwapSearchContext(dense_modules_raw, slot_value_power, min_attr_requirements, ctx);
+
+    // 起点去掉锁定模组后转换为排序后的下标; 缺少锁定模组, 含禁用/未知uuid或重复模组的起点直接跳过
+    std::vector<std::vector<size_t>> seeds;
+    seeds.reserve(seed_uuids.size());
+    for (const auto& uuids : seed_uuids) {
+        if (uuids.size() <= plan.locked_modules.size() || uuids.size() > 5) {
+            continue;
+        }
+        std::vector<size_t> indices;
+        indices.reserve(uuids.size());
+        size_t locked_count = 0;
+        bool known = true;
+        for (int uuid : uuids) {
+            if (locked_uuids.find(uuid) != locked_uuids.end()) {
+                ++locked_count;
+                continue;
+            }
+            auto it = uuid_to_index.find(uuid);
+            if (it == uuid_to_index.end()) {
+                known = false;
+                break;
+            }
+            indices.push_back(ctx.original_to_sorted[it->second]);
+        }
+        if (!known || locked_count != plan.locked_modules.size()) {
+            continue;
+        }
+        std::vector<size_t> sorted_indices = indices;
+        std::sort(sorted_indices.begin(), sorted_indices.end());
+        if (std::adjacent_find(sorted_indices.begin(), sorted_indices.end()) != sorted_indices.end()) {
+            continue;
+        }
+        seeds.push_back(std::move(indices));
+    }
+    if (seeds.empty()) {
+        return {};
+    }
+
+    const size_t worker_count = std::min(static_cast<size_t>(std::max(1, max_workers)), seeds.size());
+    const size_t batch_size = (seeds.size() + worker_count - 1) / worker_count;
+    auto pool = std::make_unique<SimpleThreadPool>(worker_count);
+    std::vector<std::future<std::vector<LightweightSolution>>> futures;
+    futures.reserve(worker_count);
+    for (size_t begin = 0; begin < seeds.size(); begin += batch_size) {
+        const size_t end = std::min(seeds.size(), begin + batch_size);
         futures.push_back(pool->enqueue(
-            [&, strategy]() {
-                return RunSingleBeam(
-                    modules,
-                    dense_modules_raw,
-                    slot_value_power,
-                    min_attr_requirements,
-                    strategy,
-                    beam_width,
-                    max_solutions,
-                    expand_per_state,
-                    combination_size);
+            [&ctx, &seeds, &budget, begin, end]() {
+                std::vector<LightweightSolution> visited;
+                std::set<std::vector<size_t>> climbed;
+                BudgetTicker ticker;
+                ticker.budget = &budget;
+                // 到期后剩余起点不再爬山, ClimbBySwaps只返回起点本身
+                for (size_t seed_idx = begin; seed_idx < end; ++seed_idx) {
+                    auto path = ClimbBySwaps(ctx, seeds[seed_idx], climbed, ticker);
+                    visited.insert(visited.end(), path.begin(), path.end());
+                    ++ticker.pending_work;
+                }
+                ticker.Flush();
+                return visited;
             }));
     }
 
@@ -1191,38 +5922,82 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyBeamSearch(
     }
     pool.reset();
 
-    std::set<std::vector<size_t>> seen_combinations;
-    std::vector<LightweightSolution> unique_solutions;
-    unique_solutions.reserve(all_solutions.size());
-    std::sort(all_solutions.begin(), all_solutions.end(),
+    std::stable_sort(all_solutions.begin(), all_solutions.end(),
         [](const LightweightSolution& lhs, const LightweightSolution& rhs) {
             return lhs.score > rhs.score;
         });
+
+    std::set<std::vector<size_t>> seen_combinations;
+    std::vector<ModuleSolution> final_solutions;
     for (const auto& solution : all_solutions) {
-        if (IsCombinationUnique(solution.module_indices, seen_combinations)) {
-            std::vector<size_t> sorted_indices = solution.module_indices;
-            std::sort(sorted_indices.begin(), sorted_indices.end());
-            seen_combinations.insert(sorted_indices);
-            unique_solutions.push_back(solution);
-            if (static_cast<int>(unique_solutions.size()) >= max_solutions) {
-                break;
-            }
+        if (!IsCombinationUnique(solution.module_indices, seen_combinations)) {
+            continue;
         }
-    }
+        std::vector<size_t> sorted_indices = solution.module_indices;
+        std::sort(sorted_indices.begin(), sorted_indices.end());
+        seen_combinations.insert(sorted_indices);
 
-    std::vector<ModuleSolution> final_solutions;
-    final_solutions.reserve(unique_solutions.size());
-    for (const auto& solution : unique_solutions) {
         std::vector<ModuleInfo> solution_modules;
         solution_modules.reserve(solution.module_indices.size());
-        for (size_t original_index : solution.module_indices) {
-            solution_modules.push_back(modules[original_index]);
+        for (size_t sorted_idx : solution.module_indices) {
+            solution_modules.push_back(plan.free_modules[ctx.sorted_to_original[sorted_idx]]);
         }
         auto result = CalculateCombatPower(solution_modules);
         final_solutions.emplace_back(solution_modules, solution.score, result.second);
+        if (static_cast<int>(final_solutions.size()) >= max_solutions) {
+            break;
+        }
     }
+    return FinishSearch(budget, AttachLockedModules(plan, std::move(final_solutions)));
+}
 
-    return final_solutions;
+std::vector<ModuleInfo> ModuleOptimizerCpp::PrefilterDominatedModules(
+    const std::vector<ModuleInfo>& modules,
+    const std::unordered_set<int>& target_attributes,
+    const std::unordered_set<int>& exclude_attributes,
+    const std::unordered_map<int, int>& min_attr_sum_requirements,
+    int max_solutions,
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
+
+    if (modules.empty() || max_solutions <= 0 || combination_size <= 0) {
+        return modules;
+    }
+    ModuleConstraintPlan plan;
+    if (!BuildModuleConstraintPlan(modules, locked_uuids, banned_uuids, combination_size, plan)) {
+        return modules;
+    }
+    if (plan.free_size == 0 || plan.free_modules.empty()) {
+        return plan.locked_modules;
+    }
+
+    auto slot_value_power = BuildSlotValuePower(target_attributes, exclude_attributes);
+    auto min_attr_requirements = BuildMinAttrRequirementsDense(min_attr_sum_requirements);
+    ApplyLockedBase(plan.locked_base, slot_value_power, min_attr_requirements);
+    const auto dense_modules = BuildDenseModuleData(plan.free_modules);
+
+    // 组合中其余free_size-1个位置最多占用同样数量的支配者, 再留出max_solutions个替换解
+    const int keep_threshold = plan.free_size - 1 + max_solutions;
+    SearchBudget budget(deadline_ms, control);
+    const auto survivors = FindUndominatedModules(
+        dense_modules, slot_value_power, min_attr_requirements, keep_threshold, &budget);
+
+    // 锁定模组始终保留, 与幸存模组一起按原始顺序输出
+    std::unordered_set<int> kept_uuids(locked_uuids);
+    for (size_t module_idx : survivors) {
+        kept_uuids.insert(plan.free_modules[module_idx].uuid);
+    }
+    std::vector<ModuleInfo> filtered_modules;
+    filtered_modules.reserve(kept_uuids.size());
+    for (const auto& module : modules) {
+        if (kept_uuids.find(module.uuid) != kept_uuids.end()) {
+            filtered_modules.push_back(module);
+        }
+    }
+    return filtered_modules;
 }
 
 bool ModuleOptimizerCpp::IsCombinationUnique(
@@ -9,6 +9,10 @@
 #include <future>
 #include <atomic>
 #include <mutex>
+#include <condition_variable>
+#include <deque>
+#include <chrono>
+#include <functional>
 #include <unordered_set>
 #include <unordered_map>
 #include <random>
@@ -86,6 +90,9 @@ namespace Constants {
         1, 1, 1, 1, 1, 1, 1, 1,
         0, 0, 0
     };
+
+    /// @brief 单次搜索支持的最大模组数, 组合中的模组下标以16位存储
+    constexpr size_t MAX_SEARCH_MODULES = 65536;
 }
 
 /// @brief 计算组合数 C(n,r)
@@ -176,17 +183,59 @@ struct LightweightSolution {
     }
 };
 
+/// @brief 打包的组合下标
+/// @details 最多5个16位下标, 单次搜索最多支持Constants::MAX_SEARCH_MODULES个模组;
+///          与分数一起恰好占16字节, 和原先64位编码的CompactSolution大小相同
+struct PackedIndices {
+    /// @brief 各位置的模组下标, 未使用的位置为0
+    std::array<uint16_t, 5> indices = {};
+    
+    /// @brief 相等比较运算符
+    bool operator==(const PackedIndices& other) const {
+        return indices == other.indices;
+    }
+    
+    /// @brief 不等比较运算符
+    bool operator!=(const PackedIndices& other) const {
+        return indices != other.indices;
+    }
+    
+    /// @brief 小于比较运算符, 按下标字典序, 用于同分组合的稳定排序
+    bool operator<(const PackedIndices& other) const {
+        return indices < other.indices;
+    }
+};
+
+/// @brief PackedIndices的哈希函数
+struct PackedIndicesHash {
+    size_t operator()(const PackedIndices& key) const {
+        uint64_t hash = 0;
+        for (uint16_t index : key.indices) {
+            hash = hash * 0x9E3779B97F4A7C15ull + index + 1;
+        }
+        return static_cast<size_t>(hash ^ (hash >> 29));
+    }
+};
+
+/// @brief GPU内核结果的64位组合编码中每个下标所占位数
+/// @details 4个以内的模组每个下标16位, 与PackedIndices的上限相同; 5个模组只能各占12位, 最多4096个模组
+/// @param combination_size 组合长度
+/// @return 每个下标的位数
+constexpr int GpuPackedIndexBits(int combination_size) {
+    return combination_size <= 4 ? 16 : 12;
+}
+
 /// @brief 更加紧凑的模组解
-/// @details 用于中间计算, 将最多5个模组的索引以12位编码打包进64位整数中
+/// @details 用于中间计算, 将最多5个模组的16位下标与分数打包进16字节
 struct CompactSolution {
     /// @brief 打包的模组索引
-    uint64_t packed_indices;
+    PackedIndices packed_indices;
     
     /// @brief 分数
     int score;
     
     /// @brief 默认构造函数
-    CompactSolution() : packed_indices(0), score(0) {}
+    CompactSolution() : score(0) {}
     
     /// @brief 从数组构造
     /// @param indices 模组索引数组
@@ -200,10 +249,10 @@ struct CompactSolution {
     /// @param indices 模组索引数组
     /// @param combination_size 组合长度
     void pack_indices(const uint16_t* indices, int combination_size) {
-        packed_indices = 0;
-        for (int i = 0; i < combination_size; ++i) {
-            packed_indices |= (static_cast<uint64_t>(indices[i] & 0x0FFFu) << (i * 12));
-        }
+        packed_indices = PackedIndices();
+        const size_t length = std::min<size_t>(
+            static_cast<size_t>(std::max(0, combination_size)), packed_indices.indices.size());
+        std::copy(indices, indices + length, packed_indices.indices.begin());
     }
     
     /// @brief 解包索引
@@ -211,10 +260,10 @@ struct CompactSolution {
     /// @return 模组索引
     std::vector<size_t> unpack_indices_vector(int combination_size) const {
         std::vector<size_t> indices;
-        indices.reserve(static_cast<size_t>(combination_size));
-        for (int i = 0; i < combination_size; ++i) {
-            uint16_t idx = static_cast<uint16_t>((packed_indices >> (i * 12)) & 0x0FFFu);
-            indices.push_back(static_cast<size_t>(idx));
+        const int length = std::min(std::max(0, combination_size), static_cast<int>(packed_indices.indices.size()));
+        indices.reserve(static_cast<size_t>(length));
+        for (int i = 0; i < length; ++i) {
+            indices.push_back(static_cast<size_t>(packed_indices.indices[static_cast<size_t>(i)]));
         }
         return indices;
     }
@@ -246,6 +295,15 @@ struct ModuleSolution {
     /// @brief 组合属性值
     std::map<std::string, int> attr_breakdown;
     
+    /// @brief 每个位置上可等价替换的模组uuid(同一大类且属性完全相同, 未被本解选中)
+    std::vector<std::vector<int>> equivalent_uuids;
+    
+    /// @brief 是否已证明最优(精确搜索或全局上界校验), false表示启发式结果
+    bool certified = false;
+    
+    /// @brief 是否为截止时间/取消前的部分结果(已搜索部分的top-K), 部分结果不会标记为已证明最优
+    bool partial = false;
+    
     /// @brief 默认构造函数
     ModuleSolution() : score(0) {}
     
@@ -258,6 +316,258 @@ struct ModuleSolution {
         : modules(modules), score(score), attr_breakdown(attr_breakdown) {}
 };
 
+/// @brief 搜索进度快照
+struct SearchProgress {
+    /// @brief 已评估的组合数(搜索树类策略含被整体剪枝前访问的内部节点)
+    long long processed = 0;
+    
+    /// @brief 当前找到的最高分数, 尚未找到满足约束的组合时为-1
+    int best_score = -1;
+    
+    /// @brief 已用时间(秒)
+    double elapsed_seconds = 0.0;
+    
+    /// @brief 预计剩余时间(秒), 按已完成的工作比例估计, 不超过截止时间; 无法估计时为-1
+    double eta_seconds = -1.0;
+    
+    /// @brief 是否为搜索结束时的最后一次汇报
+    bool finished = false;
+};
+
+/// @brief 搜索过程中逐步改进的top-K快照通道
+/// @details 搜索线程按间隔推送当前top-K, 消费线程阻塞等待取走; 快照按推送顺序排队,
+///          搜索结束后由消费方关闭通道, 关闭后仍可取走剩余快照
+class SolutionChannel {
+public:
+    /// @brief 推送一份快照, 通道已关闭时丢弃
+    /// @param snapshot 按分数降序的解列表
+    void Push(std::vector<ModuleSolution> snapshot) {
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            if (closed_) {
+                return;
+            }
+            snapshots_.push_back(std::move(snapshot));
+        }
+        ready_.notify_one();
+    }
+
+    /// @brief 取走最早的一份快照
+    /// @param snapshot 输出快照
+    /// @param timeout_ms 最长等待时间(毫秒)
+    /// @return 取到快照返回true; 超时或通道已关闭且为空返回false
+    bool Pop(std::vector<ModuleSolution>& snapshot, int timeout_ms) {
+        std::unique_lock<std::mutex> lock(mutex_);
+        ready_.wait_for(lock, std::chrono::milliseconds(std::max(0, timeout_ms)),
+            [this]() { return closed_ || !snapshots_.empty(); });
+        if (snapshots_.empty()) {
+            return false;
+        }
+        snapshot = std::move(snapshots_.front());
+        snapshots_.pop_front();
+        return true;
+    }
+
+    /// @brief 关闭通道, 唤醒等待中的消费线程
+    void Close() {
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            closed_ = true;
+        }
+        ready_.notify_all();
+    }
+
+    /// @brief 通道是否已关闭
+    bool IsClosed() const {
+        std::lock_guard<std::mutex> lock(mutex_);
+        return closed_;
+    }
+
+private:
+    mutable std::mutex mutex_;
+    std::condition_variable ready_;
+    std::deque<std::vector<ModuleSolution>> snapshots_;
+    bool closed_ = false;
+};
+
+/// @brief 搜索控制: 跨线程取消、进度回调与结果快照
+/// @details 同一个控制对象可以依次用于多次搜索, 取消后需要Reset才能重新使用.
+///          工作线程只在局部计数攒够一批后检查取消标志, 不影响内层循环;
+///          进度回调由某个工作线程按间隔调用, 各次调用互斥, 回调抛出异常时视为取消
+class SearchControl {
+public:
+    /// @brief 进度回调类型
+    using ProgressCallback = std::function<void(const SearchProgress&)>;
+
+    /// @brief 请求取消, 正在运行的搜索尽快返回已找到的部分结果
+    void Cancel() {
+        cancelled_.store(true, std::memory_order_relaxed);
+    }
+
+    /// @brief 是否已请求取消
+    bool IsCancelled() const {
+        return cancelled_.load(std::memory_order_relaxed);
+    }
+
+    /// @brief 清除取消标志
+    void Reset() {
+        cancelled_.store(false, std::memory_order_relaxed);
+    }
+
+    /// @brief 设置进度回调
+    /// @param callback 进度回调, 为空表示不汇报
+    /// @param interval_ms 两次汇报的最小间隔(毫秒)
+    void SetProgressCallback(ProgressCallback callback, int interval_ms = 200) {
+        std::lock_guard<std::mutex> lock(callback_mutex_);
+        callback_ = std::move(callback);
+        interval_ms_.store(std::max(1, interval_ms), std::memory_order_relaxed);
+    }
+
+    /// @brief 两次汇报的最小间隔(毫秒)
+    int ProgressIntervalMs() const {
+        return interval_ms_.load(std::memory_order_relaxed);
+    }
+
+    /// @brief 设置快照通道, 设置后支持快照的策略按间隔推送当前top-K, 并在结束时推送最终结果
+    /// @param channel 快照通道, 为空表示不推送
+    /// @param interval_ms 两次中间快照的最小间隔(毫秒)
+    void SetSnapshotChannel(std::shared_ptr<SolutionChannel> channel, int interval_ms = 100) {
+        std::lock_guard<std::mutex> lock(callback_mutex_);
+        snapshot_channel_ = std::move(channel);
+        snapshot_interval_ms_.store(std::max(1, interval_ms), std::memory_order_relaxed);
+    }
+
+    /// @brief 当前的快照通道, 未设置时为空
+    std::shared_ptr<SolutionChannel> SnapshotChannel() {
+        std::lock_guard<std::mutex> lock(callback_mutex_);
+        return snapshot_channel_;
+    }
+
+    /// @brief 两次中间快照的最小间隔(毫秒)
+    int SnapshotIntervalMs() const {
+        return snapshot_interval_ms_.load(std::memory_order_relaxed);
+    }
+
+    /// @brief 调用进度回调
+    /// @param progress 进度快照
+    void Report(const SearchProgress& progress) {
+        std::lock_guard<std::mutex> lock(callback_mutex_);
+        if (!callback_) {
+            return;
+        }
+        try {
+            callback_(progress);
+        } catch (...) {
+            Cancel();
+        }
+    }
+
+private:
+    std::atomic<bool> cancelled_{false};
+    std::mutex callback_mutex_;
+    ProgressCallback callback_;
+    std::atomic<int> interval_ms_{200};
+    std::shared_ptr<SolutionChannel> snapshot_channel_;
+    std::atomic<int> snapshot_interval_ms_{100};
+};
+
+/// @brief 分页搜索游标
+/// @details 记录已返回结果的分数上限与上限处已返回的组合, 以及上一页多找到但未返回的解.
+///          下一页只接受排在已返回结果之后的组合, 并以缓存解的第K名分数作为初始剪枝阈值
+struct SearchCursor {
+    /// @brief 已返回结果中的最低分数, 下一页的解不高于该分数
+    int score_ceiling = std::numeric_limits<int>::max();
+    
+    /// @brief 分数等于score_ceiling且已返回的组合(模组uuid列表)
+    std::vector<std::vector<int>> ceiling_uuids;
+    
+    /// @brief 上一页搜索中找到但未返回的解, 按分数降序
+    std::vector<ModuleSolution> pending;
+    
+    /// @brief 已返回的页数
+    int page = 0;
+    
+    /// @brief 是否已没有更多结果
+    bool exhausted = false;
+};
+
+/// @brief 批量搜索中的一个查询
+/// @details 同一库存按不同属性配置搜索时, 各查询共享一次组合扫描, 每个查询有自己的计分表、约束与可用模组
+struct BatchQuery {
+    /// @brief 目标属性ID集合
+    std::unordered_set<int> target_attributes;
+    
+    /// @brief 排除属性ID集合
+    std::unordered_set<int> exclude_attributes;
+    
+    /// @brief 最小属性和约束
+    std::unordered_map<int, int> min_attr_sum_requirements;
+    
+    /// @brief 可参与该查询的模组uuid(如按类别筛选), 为空表示全部模组
+    std::unordered_set<int> module_uuids;
+};
+
+/// @brief 自适应宽度beam search的统计
+/// @details beam从窄宽度开始逐轮放大, 直到被宽度淘汰的状态的分数上界都不超过第K名分数(此时结果是精确top-K)
+///          或达到宽度上限; 多起点时取已证明精确的起点, 否则取剩余差距最小的起点
+struct BeamSearchStats {
+    /// @brief 最后一轮使用的beam宽度
+    int final_width = 0;
+    
+    /// @brief 被宽度淘汰的状态的最高分数上界超出第K名分数的部分, 不足K个解时按第K名为-1计算, 0表示没有被淘汰的状态能进入top-K
+    int bound_gap = 0;
+    
+    /// @brief 运行的轮数
+    int passes = 0;
+    
+    /// @brief 结果是否已证明为精确top-K(未到期且bound_gap为0)
+    bool exact = false;
+};
+
+/// @brief 单个模组的重要性统计
+/// @details 分数均为当前优化目标(目标属性/排除属性/锁定模组)下的评分
+struct ModuleImportance {
+    /// @brief 模组uuid
+    int uuid = 0;
+    
+    /// @brief 包含该模组的最优组合分数, 不存在满足约束的组合时为-1
+    int best_score = -1;
+    
+    /// @brief 包含该模组的最优组合(模组uuid列表)
+    std::vector<int> best_uuids;
+    
+    /// @brief 移除该模组后全局最优分数的下降值, 只有全部最优组合都离不开的模组大于0
+    int loss_if_removed = 0;
+    
+    /// @brief 是否出现在top-K组合中(含等价副本)
+    bool in_top_k = false;
+    
+    /// @brief 是否被至少组合长度个模组支配, 这类模组总能换成组合外的支配者且分数不降
+    bool dominated = false;
+    
+    /// @brief 是否为截止时间/取消前的部分结果, 此时各项只覆盖已完成的搜索
+    bool partial = false;
+};
+
+/// @brief 假设模组的评估结果
+/// @details 分数均为当前优化目标(目标属性/排除属性/锁定模组)下的评分
+struct WhatIfResult {
+    /// @brief 假设模组的uuid
+    int uuid = 0;
+    
+    /// @brief 包含假设模组的最优组合分数; gain为0时只保证不低于换入基准组合的最好结果, 不存在满足约束的组合时为-1
+    int best_score = -1;
+    
+    /// @brief 相对基准最优分数的提升, 不提升时为0
+    int gain = 0;
+    
+    /// @brief best_score对应的组合(模组uuid列表, 含假设模组)
+    std::vector<int> best_uuids;
+    
+    /// @brief 是否为截止时间/取消前的部分结果, 此时best_score可能只是换入基准组合的下界
+    bool partial = false;
+};
+
 /// @brief 模组优化器主类
 /// @details 提供模组组合优化功能，包括战斗力计算、策略枚举和贪心优化算法
 class ModuleOptimizerCpp {
@@ -274,6 +584,10 @@ public:
     /// @param exclude_attributes 排除属性名称集合
     /// @param max_solutions 最大解决方案数量，默认为60
     /// @param max_workers 最大工作线程数，默认为8
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
     /// @return 返回模组解决方案列表
     static std::vector<ModuleSolution> StrategyEnumeration(
         const std::vector<ModuleInfo>& modules,
@@ -282,7 +596,11 @@ public:
         const std::unordered_map<int, int>& min_attr_sum_requirements = {},
         int max_solutions = 60,
         int max_workers = 8,
-        int combination_size = 4);
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
 
     /// @brief 策略枚举算法, CUDA
     /// @param modules 模组信息列表
@@ -290,6 +608,10 @@ public:
     /// @param exclude_attributes 排除属性名称集合
     /// @param max_solutions 最大解决方案数量，默认为60
     /// @param max_workers 最大工作线程数, GPU忽略, 保持接口统一
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
     /// @return 返回模组解决方案列表
     static std::vector<ModuleSolution> StrategyEnumerationCUDA(
         const std::vector<ModuleInfo>& modules,
@@ -298,7 +620,11 @@ public:
         const std::unordered_map<int, int>& min_attr_sum_requirements = {},
         int max_solutions = 60,
         int max_workers = 8,
-        int combination_size = 4);
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
 
     /// @brief 策略枚举算法, OpenCL
     /// @param modules 模组信息列表
@@ -306,6 +632,10 @@ public:
     /// @param exclude_attributes 排除属性名称集合
     /// @param max_solutions 最大解决方案数量，默认为60
     /// @param max_workers 最大工作线程数, GPU忽略, 保持接口统一
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
     /// @return 返回模组解决方案列表
     static std::vector<ModuleSolution> StrategyEnumerationOpenCL(
         const std::vector<ModuleInfo>& modules,
@@ -314,7 +644,11 @@ public:
         const std::unordered_map<int, int>& min_attr_sum_requirements = {},
         int max_solutions = 60,
         int max_workers = 8,
-        int combination_size = 4);
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
 
     /// @brief 统一GPU入口：优先CUDA，其次OpenCL，不可用则回退CPU
     /// @param modules 模组信息列表
@@ -322,6 +656,10 @@ public:
     /// @param exclude_attributes 排除属性名称集合
     /// @param max_solutions 最大解决方案数量，默认为60
     /// @param max_workers 最大工作线程数, GPU忽略, 保持接口统一
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
     /// @return 返回模组解决方案列表
     static std::vector<ModuleSolution> StrategyEnumerationGPU(
         const std::vector<ModuleInfo>& modules,
@@ -330,7 +668,11 @@ public:
         const std::unordered_map<int, int>& min_attr_sum_requirements = {},
         int max_solutions = 60,
         int max_workers = 8,
-        int combination_size = 4);
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
 
     /// @brief Beam Search 近似求解
     /// @param modules 模组信息列表
@@ -341,7 +683,16 @@ public:
     /// @param beam_width 每层保留的beam宽度，默认为128
     /// @param expand_per_state 每个状态最多扩展的子节点数，0表示不限制
     /// @param combination_size 组合长度，默认为4
-    /// @param max_workers 多起点并行时的最大工作线程数，默认为3
+    /// @param max_workers 最大工作线程数，默认为3; 多于起点数(3)时每层扩展再分给全部线程并行
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @param adaptive_width 是否自适应宽度: 从窄beam开始逐轮放大, beam_width为宽度上限,
+    ///        每次放大都从根状态重跑整个beam(不是逐层加宽), 被宽度淘汰的状态都不可能进入top-K时停止,
+    ///        此时结果标记为已证明最优; 窄beam最多跑2轮, 某层状态数超过beam_width时也跳过中间宽度,
+    ///        直接进行beam_width这一轮
+    /// @param stats 自适应宽度的统计输出, 可为空
     /// @return 返回模组解决方案列表
     static std::vector<ModuleSolution> StrategyBeamSearch(
         const std::vector<ModuleInfo>& modules,
@@ -352,7 +703,366 @@ public:
         int beam_width = 128,
         int expand_per_state = 0,
         int combination_size = 4,
-        int max_workers = 3);
+        int max_workers = 3,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr,
+        bool adaptive_width = false,
+        BeamSearchStats* stats = nullptr);
+
+    /// @brief 分支定界精确求解
+    /// @details 模组按单体贡献度降序排列后深度优先搜索, 以后缀上界对比当前第K名分数剪枝,
+    ///          结果是全部模组上的精确top-K, 不需要截断模组数量
+    ///          同一大类且属性完全相同的模组合并为等价类, 只枚举类的多重集, 互换副本记录在equivalent_uuids中
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表
+    static std::vector<ModuleSolution> StrategyBranchAndBound(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 分支定界分页精确求解
+    /// @details 每次返回排在游标之后的下一页max_solutions个解, 并原地更新游标.
+    ///          各页按分数降序衔接, 与一次性求更大的top-K结果一致, 但每页只需保留max_solutions大小的堆
+    /// @param modules 模组信息列表, 各页调用须保持一致
+    /// @param cursor 分页游标, 首页传入默认构造的游标
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 每页解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回本页模组解决方案列表
+    static std::vector<ModuleSolution> StrategyBranchAndBoundPage(
+        const std::vector<ModuleInfo>& modules,
+        SearchCursor& cursor,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 帕累托前沿求解
+    /// @details 在分数与所选属性和构成的空间中求全部非支配组合, 一次搜索代替多次调整最小属性和约束.
+    ///          复用分支定界的后缀上界, 乐观分数与属性和被前沿中某点同时覆盖的分支整体剪枝;
+    ///          取值完全相同的组合只保留一个代表, 其余互换副本记录在equivalent_uuids中
+    /// @param modules 模组信息列表
+    /// @param frontier_attributes 前沿属性ID列表, 最多3个
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 按分数降序的前沿组合列表
+    static std::vector<ModuleSolution> StrategyParetoFrontier(
+        const std::vector<ModuleInfo>& modules,
+        const std::vector<int>& frontier_attributes,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 模组重要性报告
+    /// @details 一次精确top-K搜索给出top-K中出现的模组的最优分数与移除损失; 其余模组按等价类
+    ///          共用同一份排序与后缀上界, 各自求包含该模组的最优补全, 不需要逐个模组重新优化
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions top-K的K，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中, 不出现在报告中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合, 不出现在报告中
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已完成部分的报告并标记为部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 按best_score降序的模组重要性列表
+    static std::vector<ModuleImportance> ModuleImportanceReport(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 批量评估假设模组(合成/购买前的候选)对当前最优搭配的提升
+    /// @details 基准top-K组合换入假设模组作为初始下界, 阈值取其与基准最优分数的较大者;
+    ///          库存的排序与后缀上界只构建一次, 每个假设模组只搜索包含它的组合. 重复的假设模组只评估一次,
+    ///          被足够多库存模组或已证明不提升的假设模组支配的模组无需搜索
+    /// @param modules 模组信息列表(现有库存)
+    /// @param baseline_uuids 缓存的精确top-K组合(模组uuid列表), 含禁用/未知模组或缺少锁定模组的组合被忽略;
+    ///        没有可用组合时内部求一次精确最优作为基准
+    /// @param hypothetical_modules 待评估的假设模组列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已完成部分的评估并标记为部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 与hypothetical_modules顺序一致的评估结果
+    static std::vector<WhatIfResult> EvaluateHypotheticalModules(
+        const std::vector<ModuleInfo>& modules,
+        const std::vector<std::vector<int>>& baseline_uuids,
+        const std::vector<ModuleInfo>& hypothetical_modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 两两属性和表合并的精确求解
+    /// @details 预先计算所有两两模组的属性和, 4模组为两两表x两两表, 5模组为前缀三元组x两两表;
+    ///          前缀按分支定界上界剪枝, 两两表组内按后缀上界提前终止. 作为无GPU时枚举的CPU回退
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表
+    static std::vector<ModuleSolution> StrategyMeetInTheMiddle(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 截断属性和动态规划精确求解
+    /// @details 状态为(已选数量, 各计分属性的截断属性和, 截断总属性值), 战斗力只由终态决定,
+    ///          每个状态保留max_solutions个回溯指针即可还原top-K. 适用于计分属性很少的场景
+    ///          (如排除了大部分属性), 计分属性过多导致状态爆炸时回退到分支定界
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数(仅回退时使用)，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表
+    static std::vector<ModuleSolution> StrategyCappedSumDp(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief Beam Search与精确搜索的流水线
+    /// @details 先运行beam search, 用全局上界校验beam结果: 第K名已达到上界时直接返回, 全部标记为已证明最优;
+    ///          否则以beam的第K名分数作为分支定界的初始阈值进行精确搜索, 精确结果全部标记为已证明最优
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param beam_width 每层保留的beam宽度，默认为128
+    /// @param expand_per_state 每个状态最多扩展的子节点数，0表示不限制
+    /// @param combination_size 组合长度，默认为4
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表, certified字段标明是否已证明最优
+    static std::vector<ModuleSolution> StrategyBeamThenExact(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int beam_width = 128,
+        int expand_per_state = 0,
+        int combination_size = 4,
+        int max_workers = 8,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 多查询批量精确搜索
+    /// @details 同一库存按多组属性配置搜索时只扫描一次组合: 每个组合的属性和只累加一次,
+    ///          再按各查询的计分表分别打分并放入该查询的top-K. 模组掩码记录可参与的查询,
+    ///          前缀掩码为0或各查询的分数上界都达不到其第K名时跳过整个子树
+    /// @param modules 模组信息列表
+    /// @param queries 查询列表, 超过64个时分批扫描
+    /// @param max_solutions 每个查询的最大解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 与queries一一对应的解决方案列表
+    static std::vector<std::vector<ModuleSolution>> StrategyBatchEnumeration(
+        const std::vector<ModuleInfo>& modules,
+        const std::vector<BatchQuery>& queries,
+        int max_solutions = 60,
+        int max_workers = 8,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 模拟退火近似求解
+    /// @details 面向模组很多(数千个)的5模组搭配, 此时穷举不可行, beam search又容易困在排序策略偏好的区域.
+    ///          每次重启从随机组合出发, 每步随机替换一个位置, 在稠密属性和上增量计算新分数并按Metropolis准则接受,
+    ///          温度按几何级数降到接近0; 未满足最小属性和约束的组合按缺口罚分, 只有满足约束的组合计入结果.
+    ///          各重启在线程池上独立运行, 合并后去重返回top-K
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param restarts 独立重启次数，默认为64
+    /// @param iterations 每次重启的移动次数，默认为100000
+    /// @param seed 随机数种子, 非0时结果可复现(与线程数无关, 到期提前结束除外), 0表示每次随机
+    /// @param combination_size 组合长度，默认为5
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表
+    static std::vector<ModuleSolution> StrategySimulatedAnnealing(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int restarts = 64,
+        int iterations = 100000,
+        uint64_t seed = 0,
+        int combination_size = 5,
+        int max_workers = 8,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 全量1-交换/2-交换局部搜索
+    /// @details 以给定组合为起点, 在全部模组上做爬山: 每轮枚举替换1个或2个模组的所有交换, 采用分数提升最大的一步,
+    ///          补全搜索按后缀上界截断. 各起点并行处理, 返回起点与改进组合合并去重后的top-K
+    /// @param modules 模组信息列表(完整库存)
+    /// @param seed_uuids 初始组合列表, 每个组合为模组uuid列表, 长度即组合长度
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param max_workers 最大工作线程数，默认为8
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回模组解决方案列表
+    static std::vector<ModuleSolution> LocalSearchSwap(
+        const std::vector<ModuleInfo>& modules,
+        const std::vector<std::vector<int>>& seed_uuids,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int max_workers = 8,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
+
+    /// @brief 支配关系预筛选
+    /// @details 若一个模组在所有计分槽位(含最小属性和约束槽位)及总属性值上都不优于至少
+    ///          combination_size-1+max_solutions个其它模组, 则它不可能出现在任何top-K解中, 予以丢弃.
+    ///          同一大类且属性完全相同的模组作为整体判断, 保留的模组集合可直接交给精确枚举
+    /// @param modules 模组信息列表
+    /// @param target_attributes 目标属性名称集合
+    /// @param exclude_attributes 排除属性名称集合
+    /// @param min_attr_sum_requirements 最小属性和约束
+    /// @param max_solutions 最大解决方案数量，默认为60
+    /// @param combination_size 组合长度，默认为4
+    /// @param locked_uuids 锁定的模组uuid, 必须出现在每个组合中
+    /// @param banned_uuids 禁用的模组uuid, 不参与任何组合
+    /// @param deadline_ms 截止时间(毫秒), 到期后尚未检查的模组全部保留, 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @return 返回保留的模组列表, 保持原有顺序
+    static std::vector<ModuleInfo> PrefilterDominatedModules(
+        const std::vector<ModuleInfo>& modules,
+        const std::unordered_set<int>& target_attributes = {},
+        const std::unordered_set<int>& exclude_attributes = {},
+        const std::unordered_map<int, int>& min_attr_sum_requirements = {},
+        int max_solutions = 60,
+        int combination_size = 4,
+        const std::unordered_set<int>& locked_uuids = {},
+        const std::unordered_set<int>& banned_uuids = {},
+        int deadline_ms = 0,
+        SearchControl* control = nullptr);
 
 private:
     /// @brief 检查组合是否唯一
@@ -404,10 +404,13 @@ __global__ void GpuEnumerationKernel(
         int total_attr_power = D_TOTAL_ATTR_POWER_VALUES[min(total_attr_value, 120)];
         int combat_power = threshold_power + total_attr_power;
 
+        // 与主机端GpuPackedIndexBits一致: 4模组每个下标16位, 5模组只能各占12位
+        constexpr int kIndexBits = R <= 4 ? 16 : 12;
+        constexpr long long kIndexMask = (1LL << kIndexBits) - 1;
         long long packed = 0;
         for (int i = 0; i < R; ++i)
         {
-            packed |= ((long long)(combo[i] & 0x0FFF) << (i * 12));
+            packed |= ((long long)(combo[i] & kIndexMask) << (i * kIndexBits));
         }
 
         scores[output_idx] = combat_power * valid_mask;
@@ -594,7 +597,9 @@ extern "C" int GpuStrategyEnumeration(
     int max_solutions,
     int *result_scores,
     long long *result_indices,
-    int combination_size)
+    int combination_size,
+    int (*poll)(void *, long long, long long, int),
+    void *poll_context)
 {
     long long total_combinations = CpuCombinationCount(module_count, combination_size);
 
@@ -638,6 +643,17 @@ extern "C" int GpuStrategyEnumeration(
         return 0;
     }
 
+    // slot_value_power末尾附带总属性值战斗力表(锁定模组时已平移)
+    err = cudaMemcpyToSymbol(
+        D_TOTAL_ATTR_POWER_VALUES,
+        slot_value_power + CUDA_ATTR_DIM * 21,
+        121 * sizeof(int));
+    if (err != cudaSuccess)
+    {
+        printf("ERROR: CUDA memcpy to constant failed(total_attr_power): %s\n", cudaGetErrorString(err));
+        return 0;
+    }
+
     err = cudaMemcpyToSymbol(
         D_MIN_ATTR_REQUIREMENTS,
         min_attr_requirements,
@@ -822,6 +838,13 @@ extern "C" int GpuStrategyEnumeration(
                 global_best_indices[insert_pos] = batch_indices[i];
             }
         }
+
+        // 截止时间或取消: 保留已处理批次的top-K
+        if (poll != nullptr &&
+            poll(poll_context, batch_start + current_batch_size, total_combinations, global_best_scores[0]) != 0)
+        {
+            break;
+        }
     }
 
     for (int i = 0; i < max_solutions; ++i)
@@ -1,4 +1,5 @@
 #include "module_optimizer.h"
+#include "search_budget.h"
 
 #ifdef USE_OPENCL
 #ifndef CL_TARGET_OPENCL_VERSION
@@ -150,7 +151,9 @@ extern "C" int GpuStrategyEnumerationOpenCL(
     int min_attr_count,
     int max_solutions,
     int *result_scores,
-    long long *result_indices) {
+    long long *result_indices,
+    int (*poll)(void*, long long, long long, int),
+    void *poll_context) {
     cl_platform_id platform = nullptr;
     cl_device_id device = nullptr;
     if (!SelectDiscreteGpu(platform, device)) {
@@ -194,6 +197,7 @@ extern "C" int GpuStrategyEnumerationOpenCL(
 
     const char *kernel_src = R"CLC(
 #define RADIX_BINS 256
+#define MAX_MIN_PRUNE_ATTRS 8
 __constant int ATTR_THRESHOLDS[6] = {1,4,8,12,16,20};
 __constant int BASIC_POWER_VALUES[6] = {7,14,29,44,167,254};
 __constant int SPECIAL_POWER_VALUES[6] = {14,29,59,89,298,448};
@@ -232,6 +236,7 @@ void get_combination_by_index(uint n, uint r, ulong idx, uint comb_out[4]) {
     }
 }
 
+// 返回发生变化的最左位置, 已是最后一个组合时返回-1
 int next_combination(uint n, uint r, uint comb[4]) {
     for (int pos = (int)r - 1; pos >= 0; --pos) {
         uint limit = n - r + (uint)pos;
@@ -240,10 +245,20 @@ int next_combination(uint n, uint r, uint comb[4]) {
             for (uint k = (uint)pos + 1U; k < r; ++k) {
                 comb[k] = comb[k - 1U] + 1U;
             }
-            return 1;
+            return pos;
         }
     }
-    return 0;
+    return -1;
+}
+
+// 前depth+1个位置固定时, 从当前组合(含)到该前缀最后一个组合的数量
+ulong remaining_with_prefix(uint n, uint comb[4], int depth) {
+    ulong remaining = comb_count((ulong)(n - comb[depth] - 1U), (ulong)(3 - depth));
+    for (int j = depth + 1; j < 4; ++j) {
+        remaining -= comb_count((ulong)(n - comb[j - 1] - 1U), (ulong)(4 - j)) -
+                     comb_count((ulong)(n - comb[j]), (ulong)(4 - j));
+    }
+    return remaining;
 }
 
 __kernel void score_range(
@@ -260,6 +275,8 @@ __kernel void score_range(
     __global const int * restrict min_attr_ids,
     __global const int * restrict min_attr_values,
     int min_attr_count,
+    __global const int * restrict min_module_values,
+    __global const int * restrict min_suffix_best,
     ulong range_start,
     ulong range_len,
     __global int * restrict out_scores,
@@ -278,10 +295,43 @@ __kernel void score_range(
     
     uint comb[4];
     get_combination_by_index((uint)module_count, 4U, seg_start, comb);
+
+    // 最低属性要求的前缀剪枝: min_prefix[d]为前d个模组在各要求属性上的和,
+    // 加上剩余位置可取得的最大值仍不够时, 跳过该前缀下的所有组合
+    const int min_prune = min_attr_count > 0 && min_attr_count <= MAX_MIN_PRUNE_ATTRS;
+    int min_prefix[4][MAX_MIN_PRUNE_ATTRS];
+    for (int m = 0; m < MAX_MIN_PRUNE_ATTRS; ++m) min_prefix[0][m] = 0;
+    int dirty_from = 0;
     
     for (ulong combo_idx = seg_start; combo_idx < seg_end; ++combo_idx) {
         ulong gid_local = combo_idx - range_start;
 
+        if (min_prune) {
+            int fail_depth = -1;
+            for (int d = dirty_from; d < 3 && fail_depth < 0; ++d) {
+                int mi = (int)comb[d];
+                for (int m = 0; m < min_attr_count; ++m) {
+                    min_prefix[d + 1][m] = min_prefix[d][m] + min_module_values[mi * min_attr_count + m];
+                    int best_rest = min_suffix_best[((mi + 1) * min_attr_count + m) * 4 + (3 - d)];
+                    if (min_prefix[d + 1][m] + best_rest < min_attr_values[m]) fail_depth = d;
+                }
+            }
+            if (fail_depth >= 0) {
+                ulong stop = combo_idx + remaining_with_prefix((uint)module_count, comb, fail_depth);
+                if (stop > seg_end) stop = seg_end;
+                for (ulong skip_idx = combo_idx; skip_idx < stop; ++skip_idx) {
+                    out_scores[skip_idx - range_start] = 0;
+                    out_indices[skip_idx - range_start] = 0UL;
+                }
+                combo_idx = stop - 1UL;
+                for (int k = fail_depth + 1; k < 4; ++k) comb[k] = (uint)module_count - 4U + (uint)k;
+                dirty_from = next_combination((uint)module_count, 4U, comb);
+                if (dirty_from < 0) break;
+                continue;
+            }
+            dirty_from = 3;
+        }
+
         int attr_ids[20];
         int attr_vals[20];
         int attr_cnt = 0;
@@ -328,7 +378,8 @@ __kernel void score_range(
         if (!pass_min_filter) {
             out_scores[gid_local] = 0;
             out_indices[gid_local] = 0UL;
-            if (!next_combination((uint)module_count, 4U, comb)) {
+            dirty_from = next_combination((uint)module_count, 4U, comb);
+            if (dirty_from < 0) {
                 break;
             }
             continue;
@@ -356,7 +407,8 @@ __kernel void score_range(
         out_scores[gid_local] = total_power;
         out_indices[gid_local] = ((ulong)comb[0]) | ((ulong)comb[1] << 16) | ((ulong)comb[2] << 32) | ((ulong)comb[3] << 48);
         
-        if (!next_combination((uint)module_count, 4U, comb)) {
+        dirty_from = next_combination((uint)module_count, 4U, comb);
+        if (dirty_from < 0) {
             break;
         }
     }
@@ -492,7 +544,39 @@ __kernel void compact_selected(
     cl_mem d_min_ids = min_attr_count > 0 ? clCreateBuffer(ctx, CL_MEM_READ_ONLY | CL_MEM_COPY_HOST_PTR, sizeof(int) * min_attr_count, (void*)min_attr_ids, &err) : nullptr;
     cl_mem d_min_vals = min_attr_count > 0 ? clCreateBuffer(ctx, CL_MEM_READ_ONLY | CL_MEM_COPY_HOST_PTR, sizeof(int) * min_attr_count, (void*)min_attr_values, &err) : nullptr;
 
+    // 最低属性要求的前缀剪枝表: 各模组在要求属性上的值, 以及从第i个模组起再选p个模组可取得的最大和
+    std::vector<int> min_module_values;
+    std::vector<int> min_suffix_best;
+    if (min_attr_count > 0) {
+        min_module_values.assign(static_cast<size_t>(module_count) * min_attr_count, 0);
+        for (int mi = 0; mi < module_count; ++mi) {
+            for (int k = 0; k < module_attr_counts[mi]; ++k) {
+                for (int m = 0; m < min_attr_count; ++m) {
+                    if (module_attr_ids[module_offsets[mi] + k] == min_attr_ids[m]) {
+                        min_module_values[static_cast<size_t>(mi) * min_attr_count + m] += module_attr_values[module_offsets[mi] + k];
+                    }
+                }
+            }
+        }
+        min_suffix_best.assign(static_cast<size_t>(module_count + 1) * min_attr_count * 4, 0);
+        for (int mi = module_count - 1; mi >= 0; --mi) {
+            for (int m = 0; m < min_attr_count; ++m) {
+                const size_t cur = (static_cast<size_t>(mi) * min_attr_count + m) * 4;
+                const size_t next = (static_cast<size_t>(mi + 1) * min_attr_count + m) * 4;
+                for (int picks = 1; picks < 4; ++picks) {
+                    min_suffix_best[cur + picks] = std::max(
+                        min_suffix_best[next + picks],
+                        min_module_values[static_cast<size_t>(mi) * min_attr_count + m] + min_suffix_best[next + picks - 1]);
+                }
+            }
+        }
+    }
+    cl_mem d_min_module_vals = min_attr_count > 0 ? clCreateBuffer(ctx, CL_MEM_READ_ONLY | CL_MEM_COPY_HOST_PTR, sizeof(int) * min_module_values.size(), (void*)min_module_values.data(), &err) : nullptr;
+    cl_mem d_min_suffix = min_attr_count > 0 ? clCreateBuffer(ctx, CL_MEM_READ_ONLY | CL_MEM_COPY_HOST_PTR, sizeof(int) * min_suffix_best.size(), (void*)min_suffix_best.data(), &err) : nullptr;
+
     if (total_combinations == 0ULL) {
+        if (d_min_suffix) clReleaseMemObject(d_min_suffix);
+        if (d_min_module_vals) clReleaseMemObject(d_min_module_vals);
         if (d_min_vals) clReleaseMemObject(d_min_vals);
         if (d_min_ids) clReleaseMemObject(d_min_ids);
         if (d_excludes) clReleaseMemObject(d_excludes);
@@ -512,6 +596,7 @@ __kernel void compact_selected(
     std::priority_queue<Item> topk;
 
     unsigned long long processed = 0ULL;
+    int best_score = -1;
     while (processed < total_combinations) {
         unsigned long long batch = std::min(gpu_config.optimal_batch_size, total_combinations - processed);
         size_t outN = (size_t)batch;
@@ -533,6 +618,8 @@ __kernel void compact_selected(
         clSetKernelArg(kernel, arg++, sizeof(cl_mem), &d_min_ids);
         clSetKernelArg(kernel, arg++, sizeof(cl_mem), &d_min_vals);
         clSetKernelArg(kernel, arg++, sizeof(int), &min_attr_count);
+        clSetKernelArg(kernel, arg++, sizeof(cl_mem), &d_min_module_vals);
+        clSetKernelArg(kernel, arg++, sizeof(cl_mem), &d_min_suffix);
         unsigned long long range_start = processed;
         clSetKernelArg(kernel, arg++, sizeof(unsigned long long), &range_start);
         cl_ulong range_len = (cl_ulong)batch;
@@ -683,6 +770,7 @@ __kernel void compact_selected(
             for (size_t i = 0; i < selN; ++i) {
                 int sc = h_scores_sel[i];
                 if (sc < 0) continue;
+                best_score = std::max(best_score, sc);
                 if (topk.size() < (size_t)max_solutions) { 
                     topk.push(Item{sc, h_indices_sel[i]}); 
                 }
@@ -701,6 +789,11 @@ __kernel void compact_selected(
         clReleaseMemObject(d_scores);
 
         processed += batch;
+        // 截止时间或取消: 保留已处理批次的top-K
+        if (poll != nullptr &&
+            poll(poll_context, (long long)processed, (long long)total_combinations, best_score) != 0) {
+            break;
+        }
     }
 
     std::vector<Item> items; items.reserve(topk.size());
@@ -712,6 +805,8 @@ __kernel void compact_selected(
         result_indices[i] = (long long)items[i].idx; 
     }
 
+    if (d_min_suffix) clReleaseMemObject(d_min_suffix);
+    if (d_min_module_vals) clReleaseMemObject(d_min_module_vals);
     if (d_min_vals) clReleaseMemObject(d_min_vals);
     if (d_min_ids) clReleaseMemObject(d_min_ids);
     if (d_excludes) clReleaseMemObject(d_excludes);
@@ -739,17 +834,34 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationOpenCL(
     const std::unordered_map<int, int>& min_attr_sum_requirements,
     int max_solutions,
     int max_workers,
-    int combination_size) {
+    int combination_size,
+    const std::unordered_set<int>& locked_uuids,
+    const std::unordered_set<int>& banned_uuids,
+    int deadline_ms,
+    SearchControl* control) {
 #ifdef USE_OPENCL
-    if (combination_size > 4) {
+    // 核函数按属性id计分, 无法叠加锁定模组的属性基底, 锁定时交给CPU枚举;
+    // 结果按16位下标编码, 超出上限的模组池同样交给CPU路径处理
+    if (combination_size > 4 || !locked_uuids.empty() || modules.size() > Constants::MAX_SEARCH_MODULES) {
         return StrategyEnumeration(modules, target_attributes, exclude_attributes,
-                                   min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+                                   min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+                                   locked_uuids, banned_uuids, deadline_ms, control);
     }
 
     if (!TestOpenCL()) {
         printf("OpenCL not available, using CPU optimized version\n");
         return StrategyEnumeration(modules, target_attributes, exclude_attributes,
-                                   min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+                                   min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+                                   locked_uuids, banned_uuids, deadline_ms, control);
+    }
+
+    // 禁用模组在上传前剔除
+    std::vector<ModuleInfo> active_modules;
+    active_modules.reserve(modules.size());
+    for (const auto& module : modules) {
+        if (banned_uuids.find(module.uuid) == banned_uuids.end()) {
+            active_modules.push_back(module);
+        }
     }
 
     printf("OpenCL GPU acceleration enabled - all calculations performed on GPU\n");
@@ -760,7 +872,7 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationOpenCL(
     std::vector<int> module_offsets;
 
     size_t current_offset = 0;
-    for (const auto& module : modules) {
+    for (const auto& module : active_modules) {
         module_offsets.push_back(static_cast<int>(current_offset));
         module_attr_counts.push_back(static_cast<int>(module.parts.size()));
         for (const auto& part : module.parts) {
@@ -783,13 +895,14 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationOpenCL(
     std::vector<long long> gpu_indices(max_solutions);
 
     int gpu_result_count = 0;
+    SearchBudget budget(deadline_ms, control);
 #ifdef USE_OPENCL
     gpu_result_count = GpuStrategyEnumerationOpenCL(
         all_attr_ids.data(),
         all_attr_values.data(),
         module_attr_counts.data(),
         module_offsets.data(),
-        static_cast<int>(modules.size()),
+        static_cast<int>(active_modules.size()),
         static_cast<int>(all_attr_ids.size()),
         target_attrs_vec.empty() ? nullptr : target_attrs_vec.data(),
         static_cast<int>(target_attrs_vec.size()),
@@ -800,29 +913,35 @@ std::vector<ModuleSolution> ModuleOptimizerCpp::StrategyEnumerationOpenCL(
         static_cast<int>(min_attr_ids.size()),
         max_solutions,
         gpu_scores.data(),
-        gpu_indices.data());
+        gpu_indices.data(),
+        &SearchBudget::PollCallback,
+        &budget);
 #endif
 
     std::vector<ModuleSolution> final_solutions;
     final_solutions.reserve(static_cast<size_t>(gpu_result_count));
+    const int index_bits = GpuPackedIndexBits(4);
+    const unsigned long long index_mask = (1ull << index_bits) - 1;
     for (int i = 0; i < gpu_result_count; ++i) {
-        long long packed = gpu_indices[i];
+        const unsigned long long packed = static_cast<unsigned long long>(gpu_indices[i]);
         std::vector<ModuleInfo> solution_modules;
         solution_modules.reserve(4);
         for (int j = 0; j < 4; ++j) {
-            size_t module_idx = static_cast<size_t>((packed >> (j * 16)) & 0xFFFF);
-            if (module_idx < modules.size()) {
-                solution_modules.push_back(modules[module_idx]);
+            size_t module_idx = static_cast<size_t>((packed >> (j * index_bits)) & index_mask);
+            if (module_idx < active_modules.size()) {
+                solution_modules.push_back(active_modules[module_idx]);
             }
         }
         auto result = CalculateCombatPower(solution_modules);
         final_solutions.emplace_back(solution_modules, gpu_scores[i], result.second);
+        final_solutions.back().certified = true;
     }
-    return final_solutions;
+    return FinishSearch(budget, std::move(final_solutions));
 #else
     (void)modules; (void)target_attributes; (void)exclude_attributes; (void)min_attr_sum_requirements; (void)max_solutions; (void)max_workers; (void)combination_size;
     return StrategyEnumeration(modules, target_attributes, exclude_attributes,
-                               min_attr_sum_requirements, max_solutions, max_workers, combination_size);
+                               min_attr_sum_requirements, max_solutions, max_workers, combination_size,
+                               locked_uuids, banned_uuids, deadline_ms, control);
 #endif
 }
 
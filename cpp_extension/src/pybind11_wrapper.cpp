@@ -14,6 +14,8 @@ namespace py = pybind11;
 
 PYBIND11_MODULE(module_optimizer_cpp, m) {
     m.doc() = "C++ implementation of module optimizer for performance optimization";
+    // 单次搜索支持的最大模组数
+    m.attr("MAX_SEARCH_MODULES") = Constants::MAX_SEARCH_MODULES;
     
     // 绑定ModulePart结构体
     py::class_<ModulePart>(m, "ModulePart")
@@ -44,11 +46,119 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         .def_readwrite("modules", &ModuleSolution::modules)
         .def_readwrite("score", &ModuleSolution::score)
         .def_readwrite("attr_breakdown", &ModuleSolution::attr_breakdown)
+        .def_readwrite("equivalent_uuids", &ModuleSolution::equivalent_uuids)
+        .def_readwrite("certified", &ModuleSolution::certified)
+        .def_readwrite("partial", &ModuleSolution::partial)
         .def("__repr__", [](const ModuleSolution& self) {
             return "ModuleSolution(score=" + std::to_string(self.score) + 
                    ", modules_count=" + std::to_string(self.modules.size()) + ")";
         });
     
+    // 绑定SearchProgress结构体
+    py::class_<SearchProgress>(m, "SearchProgress")
+        .def(py::init<>())
+        .def_readwrite("processed", &SearchProgress::processed)
+        .def_readwrite("best_score", &SearchProgress::best_score)
+        .def_readwrite("elapsed_seconds", &SearchProgress::elapsed_seconds)
+        .def_readwrite("eta_seconds", &SearchProgress::eta_seconds)
+        .def_readwrite("finished", &SearchProgress::finished)
+        .def("__repr__", [](const SearchProgress& self) {
+            return "SearchProgress(processed=" + std::to_string(self.processed) +
+                   ", best_score=" + std::to_string(self.best_score) +
+                   ", elapsed_seconds=" + std::to_string(self.elapsed_seconds) +
+                   ", eta_seconds=" + std::to_string(self.eta_seconds) + ")";
+        });
+
+    // 绑定SolutionChannel, pop等待期间释放GIL, 超时或通道关闭且为空时返回None
+    py::class_<SolutionChannel, std::shared_ptr<SolutionChannel>>(m, "SolutionChannel")
+        .def(py::init<>())
+        .def("pop", [](SolutionChannel& self, int timeout_ms) -> py::object {
+                std::vector<ModuleSolution> snapshot;
+                bool popped = false;
+                {
+                    py::gil_scoped_release release;
+                    popped = self.Pop(snapshot, timeout_ms);
+                }
+                if (!popped) {
+                    return py::none();
+                }
+                return py::cast(std::move(snapshot));
+            },
+            py::arg("timeout_ms") = 100)
+        .def("close", &SolutionChannel::Close)
+        .def("is_closed", &SolutionChannel::IsClosed);
+
+    // 绑定SearchControl, 搜索期间释放GIL, 可在其它Python线程中取消; 进度回调在工作线程中获取GIL后调用
+    py::class_<SearchControl>(m, "SearchControl")
+        .def(py::init<>())
+        .def("cancel", &SearchControl::Cancel)
+        .def("is_cancelled", &SearchControl::IsCancelled)
+        .def("reset", &SearchControl::Reset)
+        .def("set_progress_callback", &SearchControl::SetProgressCallback,
+            py::arg("callback"),
+            py::arg("interval_ms") = 200,
+            py::call_guard<py::gil_scoped_release>())
+        .def("set_snapshot_channel", &SearchControl::SetSnapshotChannel,
+            py::arg("channel"),
+            py::arg("interval_ms") = 100,
+            py::call_guard<py::gil_scoped_release>());
+    
+    // 绑定SearchCursor结构体
+    py::class_<SearchCursor>(m, "SearchCursor")
+        .def(py::init<>())
+        .def_readwrite("score_ceiling", &SearchCursor::score_ceiling)
+        .def_readwrite("ceiling_uuids", &SearchCursor::ceiling_uuids)
+        .def_readwrite("pending", &SearchCursor::pending)
+        .def_readwrite("page", &SearchCursor::page)
+        .def_readwrite("exhausted", &SearchCursor::exhausted)
+        .def("__repr__", [](const SearchCursor& self) {
+            return "SearchCursor(page=" + std::to_string(self.page) +
+                   ", score_ceiling=" + std::to_string(self.score_ceiling) +
+                   ", exhausted=" + (self.exhausted ? std::string("True") : std::string("False")) + ")";
+        });
+    
+    // 绑定BatchQuery结构体
+    py::class_<BatchQuery>(m, "BatchQuery")
+        .def(py::init<>())
+        .def_readwrite("target_attributes", &BatchQuery::target_attributes)
+        .def_readwrite("exclude_attributes", &BatchQuery::exclude_attributes)
+        .def_readwrite("min_attr_sum_requirements", &BatchQuery::min_attr_sum_requirements)
+        .def_readwrite("module_uuids", &BatchQuery::module_uuids);
+    
+    // 绑定BeamSearchStats结构体
+    py::class_<BeamSearchStats>(m, "BeamSearchStats")
+        .def(py::init<>())
+        .def_readwrite("final_width", &BeamSearchStats::final_width)
+        .def_readwrite("bound_gap", &BeamSearchStats::bound_gap)
+        .def_readwrite("passes", &BeamSearchStats::passes)
+        .def_readwrite("exact", &BeamSearchStats::exact)
+        .def("__repr__", [](const BeamSearchStats& self) {
+            return "BeamSearchStats(final_width=" + std::to_string(self.final_width) +
+                   ", bound_gap=" + std::to_string(self.bound_gap) +
+                   ", passes=" + std::to_string(self.passes) +
+                   ", exact=" + (self.exact ? std::string("True") : std::string("False")) + ")";
+        });
+    
+    // 绑定ModuleImportance结构体
+    py::class_<ModuleImportance>(m, "ModuleImportance")
+        .def(py::init<>())
+        .def_readwrite("uuid", &ModuleImportance::uuid)
+        .def_readwrite("best_score", &ModuleImportance::best_score)
+        .def_readwrite("best_uuids", &ModuleImportance::best_uuids)
+        .def_readwrite("loss_if_removed", &ModuleImportance::loss_if_removed)
+        .def_readwrite("in_top_k", &ModuleImportance::in_top_k)
+        .def_readwrite("dominated", &ModuleImportance::dominated)
+        .def_readwrite("partial", &ModuleImportance::partial);
+
+    // 绑定WhatIfResult结构体
+    py::class_<WhatIfResult>(m, "WhatIfResult")
+        .def(py::init<>())
+        .def_readwrite("uuid", &WhatIfResult::uuid)
+        .def_readwrite("best_score", &WhatIfResult::best_score)
+        .def_readwrite("gain", &WhatIfResult::gain)
+        .def_readwrite("best_uuids", &WhatIfResult::best_uuids)
+        .def_readwrite("partial", &WhatIfResult::partial);
+    
     m.def("strategy_enumeration_cpp", &ModuleOptimizerCpp::StrategyEnumeration,
         "枚举",
         py::arg("modules"),
@@ -57,7 +167,12 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
         py::arg("max_solutions") = 60,
         py::arg("max_workers") = 8,
-        py::arg("combination_size") = 4);
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
 
     m.def("strategy_enumeration_cuda_cpp", &ModuleOptimizerCpp::StrategyEnumerationCUDA,
         "CUDA GPU加速枚举",
@@ -67,7 +182,12 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
         py::arg("max_solutions") = 60,
         py::arg("max_workers") = 8,
-        py::arg("combination_size") = 4);
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
 
     m.def("strategy_enumeration_opencl_cpp", &ModuleOptimizerCpp::StrategyEnumerationOpenCL,
         "OpenCL GPU加速枚举",
@@ -77,7 +197,12 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
         py::arg("max_solutions") = 60,
         py::arg("max_workers") = 8,
-        py::arg("combination_size") = 4);
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
   
     m.def("strategy_enumeration_gpu_cpp", &ModuleOptimizerCpp::StrategyEnumerationGPU,
         "CUDA优先, 其次OpenCL; 均不可用回退CPU)",
@@ -87,7 +212,12 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
         py::arg("max_solutions") = 60,
         py::arg("max_workers") = 8,
-        py::arg("combination_size") = 4);
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
 
     m.def("strategy_beam_search_cpp", &ModuleOptimizerCpp::StrategyBeamSearch,
         "Beam Search 近似求解",
@@ -99,7 +229,198 @@ PYBIND11_MODULE(module_optimizer_cpp, m) {
         py::arg("beam_width") = 128,
         py::arg("expand_per_state") = 0,
         py::arg("combination_size") = 4,
-        py::arg("max_workers") = 3);
+        py::arg("max_workers") = 3,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::arg("adaptive_width") = false,
+        py::arg("stats") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_branch_and_bound_cpp", &ModuleOptimizerCpp::StrategyBranchAndBound,
+        "分支定界精确求解",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_branch_and_bound_page_cpp", &ModuleOptimizerCpp::StrategyBranchAndBoundPage,
+        "分支定界分页精确求解, 原地更新游标",
+        py::arg("modules"),
+        py::arg("cursor"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_pareto_frontier_cpp", &ModuleOptimizerCpp::StrategyParetoFrontier,
+        "分数与属性和的帕累托前沿",
+        py::arg("modules"),
+        py::arg("frontier_attributes"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("module_importance_report_cpp", &ModuleOptimizerCpp::ModuleImportanceReport,
+        "模组重要性报告",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("evaluate_hypothetical_modules_cpp", &ModuleOptimizerCpp::EvaluateHypotheticalModules,
+        "批量评估假设模组",
+        py::arg("modules"),
+        py::arg("baseline_uuids"),
+        py::arg("hypothetical_modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_meet_in_the_middle_cpp", &ModuleOptimizerCpp::StrategyMeetInTheMiddle,
+        "两两属性和表合并精确求解",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_capped_sum_dp_cpp", &ModuleOptimizerCpp::StrategyCappedSumDp,
+        "截断属性和动态规划精确求解",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_beam_then_exact_cpp", &ModuleOptimizerCpp::StrategyBeamThenExact,
+        "Beam Search结果校验与精确搜索流水线",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("beam_width") = 128,
+        py::arg("expand_per_state") = 0,
+        py::arg("combination_size") = 4,
+        py::arg("max_workers") = 8,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_batch_enumeration_cpp", &ModuleOptimizerCpp::StrategyBatchEnumeration,
+        "多查询批量精确搜索",
+        py::arg("modules"),
+        py::arg("queries"),
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("strategy_simulated_annealing_cpp", &ModuleOptimizerCpp::StrategySimulatedAnnealing,
+        "模拟退火近似求解",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("restarts") = 64,
+        py::arg("iterations") = 100000,
+        py::arg("seed") = 0,
+        py::arg("combination_size") = 5,
+        py::arg("max_workers") = 8,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("local_search_swap_cpp", &ModuleOptimizerCpp::LocalSearchSwap,
+        "全量1-交换/2-交换局部搜索",
+        py::arg("modules"),
+        py::arg("seed_uuids"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("max_workers") = 8,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
+
+    m.def("prefilter_dominated_modules_cpp", &ModuleOptimizerCpp::PrefilterDominatedModules,
+        "支配关系预筛选, 保留可能进入top-K的模组",
+        py::arg("modules"),
+        py::arg("target_attributes") = std::unordered_set<int>{},
+        py::arg("exclude_attributes") = std::unordered_set<int>{},
+        py::arg("min_attr_sum_requirements") = std::unordered_map<int,int>{},
+        py::arg("max_solutions") = 60,
+        py::arg("combination_size") = 4,
+        py::arg("locked_uuids") = std::unordered_set<int>{},
+        py::arg("banned_uuids") = std::unordered_set<int>{},
+        py::arg("deadline_ms") = 0,
+        py::arg("control") = py::none(),
+        py::call_guard<py::gil_scoped_release>());
 
     // N卡加速是否可用
 #ifdef USE_CUDA
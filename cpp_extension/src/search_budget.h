@@ -0,0 +1,259 @@
+#pragma once
+
+#include <atomic>
+#include <chrono>
+#include <memory>
+
+#include "module_optimizer.h"
+
+/// @brief 单次搜索的截止时间/取消/进度/快照状态, 由该次搜索的全部工作线程共享
+/// @details 工作线程用BudgetTicker在局部计数, 攒够一批才调用Poll访问共享状态;
+///          Poll负责检查取消标志与截止时间, 并按间隔由其中一个线程汇报进度.
+///          控制对象设置了快照通道时, 策略可按SnapshotDue的节奏推送当前top-K
+class SearchBudget {
+public:
+    /// @param deadline_ms 截止时间(毫秒), 0表示不限时
+    /// @param control 取消标志与进度回调, 可为空
+    /// @param total_work 估计的总工作量, 用于计算ETA, 0表示未知
+    SearchBudget(int deadline_ms, SearchControl* control, long long total_work = 0)
+        : start_(Clock::now()),
+          has_deadline_(deadline_ms > 0),
+          control_(control),
+          total_work_(total_work) {
+        deadline_ = start_ + std::chrono::milliseconds(has_deadline_ ? deadline_ms : 0);
+        if (control_ != nullptr) {
+            report_interval_ns_ = static_cast<long long>(control_->ProgressIntervalMs()) * 1000000LL;
+            next_report_ns_.store(report_interval_ns_, std::memory_order_relaxed);
+            snapshot_channel_ = control_->SnapshotChannel();
+            snapshot_interval_ns_ = static_cast<long long>(control_->SnapshotIntervalMs()) * 1000000LL;
+        }
+    }
+
+    SearchBudget(const SearchBudget&) = delete;
+    SearchBudget& operator=(const SearchBudget&) = delete;
+
+    /// @brief 设置估计的总工作量
+    void SetTotalWork(long long total_work) {
+        total_work_.store(total_work, std::memory_order_relaxed);
+    }
+
+    /// @brief 累加已完成的工作量(如已处理的根节点数), 只用于计算ETA
+    void AddWork(long long work) {
+        work_done_.fetch_add(work, std::memory_order_relaxed);
+    }
+
+    /// @brief 汇总一批局部计数并检查是否应停止
+    /// @param processed 本批评估的组合数
+    /// @param best_score 调用线程当前的最高分数
+    /// @param work 本批完成的工作量
+    /// @return 已取消或超时返回true
+    bool Poll(long long processed, int best_score, long long work = 0) {
+        processed_.fetch_add(processed, std::memory_order_relaxed);
+        if (work != 0) {
+            work_done_.fetch_add(work, std::memory_order_relaxed);
+        }
+        UpdateBestScore(best_score);
+        if (stopped_.load(std::memory_order_relaxed)) {
+            return true;
+        }
+        if (!has_deadline_ && control_ == nullptr) {
+            return false;
+        }
+
+        const auto now = Clock::now();
+        if ((control_ != nullptr && control_->IsCancelled()) || (has_deadline_ && now >= deadline_)) {
+            stopped_.store(true, std::memory_order_relaxed);
+            return true;
+        }
+        if (control_ != nullptr) {
+            const long long elapsed_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(now - start_).count();
+            long long next_report = next_report_ns_.load(std::memory_order_relaxed);
+            // 只有抢到本次汇报时刻的线程调用回调
+            if (elapsed_ns >= next_report &&
+                next_report_ns_.compare_exchange_strong(
+                    next_report, elapsed_ns + report_interval_ns_, std::memory_order_relaxed)) {
+                control_->Report(Snapshot(now, false));
+            }
+        }
+        return false;
+    }
+
+    /// @brief 是否已停止, 只读取标志, 不检查时钟
+    bool Stopped() const {
+        return stopped_.load(std::memory_order_relaxed);
+    }
+
+    /// @brief 剩余时间(毫秒), 不限时返回0, 已到期返回1, 用于把剩余预算交给嵌套的策略调用
+    int RemainingMs() const {
+        if (!has_deadline_) {
+            return 0;
+        }
+        const auto remaining = std::chrono::duration_cast<std::chrono::milliseconds>(deadline_ - Clock::now()).count();
+        return static_cast<int>(std::max<long long>(1, remaining));
+    }
+
+    /// @brief 是否需要推送快照
+    bool WantsSnapshots() const {
+        return snapshot_channel_ != nullptr;
+    }
+
+    /// @brief 是否到了推送下一份中间快照的时刻, 第一次调用立即到期; 每个时刻只有一个线程得到true
+    bool SnapshotDue() {
+        if (snapshot_channel_ == nullptr) {
+            return false;
+        }
+        const long long elapsed_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(Clock::now() - start_).count();
+        long long next_snapshot = next_snapshot_ns_.load(std::memory_order_relaxed);
+        return elapsed_ns >= next_snapshot &&
+            next_snapshot_ns_.compare_exchange_strong(
+                next_snapshot, elapsed_ns + snapshot_interval_ns_, std::memory_order_relaxed);
+    }
+
+    /// @brief 推送一份快照
+    /// @param solutions 按分数降序的解列表
+    /// @param final 是否为策略的最终结果; 中间快照一律标记为部分结果且未证明最优
+    void PublishSnapshot(std::vector<ModuleSolution> solutions, bool final) {
+        if (snapshot_channel_ == nullptr || solutions.empty()) {
+            return;
+        }
+        if (!final) {
+            for (auto& solution : solutions) {
+                solution.partial = true;
+                solution.certified = false;
+            }
+        }
+        snapshot_channel_->Push(std::move(solutions));
+    }
+
+    /// @brief 搜索结束时的最后一次汇报
+    /// @param best_score 最终结果的最高分数, 没有结果时为-1
+    void Finish(int best_score) {
+        UpdateBestScore(best_score);
+        if (control_ != nullptr) {
+            control_->Report(Snapshot(Clock::now(), true));
+        }
+    }
+
+    /// @brief 供GPU批处理循环使用的C风格轮询函数, context为SearchBudget指针
+    /// @param processed 已处理的组合总数
+    /// @param total 组合总数
+    /// @param best_score 当前最高分数
+    /// @return 应停止时返回非0
+    static int PollCallback(void* context, long long processed, long long total, int best_score) {
+        auto* budget = static_cast<SearchBudget*>(context);
+        budget->SetTotalWork(total);
+        const long long delta = processed - budget->processed_.load(std::memory_order_relaxed);
+        return budget->Poll(delta, best_score, processed - budget->work_done_.load(std::memory_order_relaxed)) ? 1 : 0;
+    }
+
+private:
+    using Clock = std::chrono::steady_clock;
+
+    void UpdateBestScore(int best_score) {
+        int current = best_score_.load(std::memory_order_relaxed);
+        while (best_score > current &&
+               !best_score_.compare_exchange_weak(current, best_score, std::memory_order_relaxed)) {
+        }
+    }
+
+    SearchProgress Snapshot(Clock::time_point now, bool finished) const {
+        SearchProgress progress;
+        progress.processed = processed_.load(std::memory_order_relaxed);
+        progress.best_score = best_score_.load(std::memory_order_relaxed);
+        progress.elapsed_seconds = std::chrono::duration<double>(now - start_).count();
+        progress.finished = finished;
+        if (finished) {
+            progress.eta_seconds = 0.0;
+            return progress;
+        }
+        const long long total = total_work_.load(std::memory_order_relaxed);
+        const long long done = work_done_.load(std::memory_order_relaxed);
+        if (total > 0 && done > 0) {
+            const double fraction = std::min(1.0, static_cast<double>(done) / static_cast<double>(total));
+            progress.eta_seconds = progress.elapsed_seconds * (1.0 - fraction) / fraction;
+        }
+        if (has_deadline_) {
+            const double remaining = std::max(0.0, std::chrono::duration<double>(deadline_ - now).count());
+            progress.eta_seconds = progress.eta_seconds < 0.0 ? remaining : std::min(progress.eta_seconds, remaining);
+        }
+        return progress;
+    }
+
+    Clock::time_point start_;
+    Clock::time_point deadline_;
+    bool has_deadline_ = false;
+    SearchControl* control_ = nullptr;
+    std::shared_ptr<SolutionChannel> snapshot_channel_;
+    long long report_interval_ns_ = 0;
+    long long snapshot_interval_ns_ = 0;
+    std::atomic<bool> stopped_{false};
+    std::atomic<long long> processed_{0};
+    std::atomic<long long> work_done_{0};
+    std::atomic<long long> total_work_{0};
+    std::atomic<int> best_score_{-1};
+    std::atomic<long long> next_report_ns_{0};
+    std::atomic<long long> next_snapshot_ns_{0};
+};
+
+/// @brief 工作线程局部的预算计数
+/// @details 内层循环只做局部自增, 攒够kPollInterval才调用一次SearchBudget::Poll;
+///          budget为空时Tick永远返回false. on_flush在每次轮询后调用, 供策略同步快照
+struct BudgetTicker {
+    static constexpr long long kPollInterval = 4096;
+
+    SearchBudget* budget = nullptr;
+    long long pending = 0;
+    long long pending_work = 0;
+    int best_score = -1;
+    bool stopped = false;
+    void (*on_flush)(void* context) = nullptr;
+    void* on_flush_context = nullptr;
+
+    /// @brief 累加评估数, 攒够一批时轮询
+    /// @return 应停止时返回true
+    bool Tick(long long processed) {
+        pending += processed;
+        if (pending < kPollInterval || budget == nullptr) {
+            return stopped;
+        }
+        return Flush();
+    }
+
+    /// @brief 立即汇总局部计数并轮询
+    /// @return 应停止时返回true
+    bool Flush() {
+        if (budget == nullptr) {
+            return false;
+        }
+        stopped = budget->Poll(pending, best_score, pending_work) || stopped;
+        pending = 0;
+        pending_work = 0;
+        if (on_flush != nullptr) {
+            on_flush(on_flush_context);
+        }
+        return stopped;
+    }
+
+    /// @brief 记录找到的分数
+    void Offer(int score) {
+        best_score = std::max(best_score, score);
+    }
+};
+
+/// @brief 结束一次搜索: 预算耗尽时的结果只是已搜索部分的top-K, 标记为部分结果且不再视为已证明最优,
+///        并发出最后一次进度汇报与最终快照
+inline std::vector<ModuleSolution> FinishSearch(SearchBudget& budget, std::vector<ModuleSolution> solutions) {
+    if (budget.Stopped()) {
+        for (auto& solution : solutions) {
+            solution.partial = true;
+            solution.certified = false;
+        }
+    }
+    int best_score = -1;
+    for (const auto& solution : solutions) {
+        best_score = std::max(best_score, solution.score);
+    }
+    budget.Finish(best_score);
+    budget.PublishSnapshot(solutions, true);
+    return solutions;
+}
@@ -2,12 +2,15 @@
 模组搭配优化器 - 多策略并行, 使用C++进行核心运算
 """
 
+import copy
 import logging
 import os
 import random
-import multiprocessing as mp
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
 from itertools import combinations
 from logging_config import get_logger
 import psutil
@@ -21,9 +24,30 @@ from cpp_extension.module_optimizer_cpp import (
     ModulePart as CppModulePart,
     ModuleInfo as CppModuleInfo,
     ModuleSolution as CppModuleSolution,
+    BatchQuery as CppBatchQuery,
+    SearchCursor,
+    SearchControl,
+    BeamSearchStats,
+    SolutionChannel,
     strategy_enumeration_gpu_cpp,
     strategy_beam_search_cpp,
+    strategy_branch_and_bound_cpp,
+    strategy_branch_and_bound_page_cpp,
+    strategy_pareto_frontier_cpp,
+    strategy_beam_then_exact_cpp,
+    strategy_meet_in_the_middle_cpp,
+    strategy_capped_sum_dp_cpp,
+    strategy_simulated_annealing_cpp,
+    strategy_batch_enumeration_cpp,
+    local_search_swap_cpp,
+    prefilter_dominated_modules_cpp,
+    module_importance_report_cpp,
+    evaluate_hypothetical_modules_cpp,
     test_cuda,
+    MAX_SEARCH_MODULES,
+)
+from strategy_planner import (
+    StrategyPlanner, StrategyPlan, ENGINE_MEET_IN_THE_MIDDLE, ENGINE_CAPPED_SUM_DP, ENGINE_GPU_ENUMERATION,
 )
 
 # 多进程保护, 延迟初始化日志器
@@ -45,10 +69,77 @@ class ModuleSolution:
         modules: 模组列表
         score: 综合评分
         attr_breakdown: 属性分布
+        equivalent_uuids: 每个模组可等价替换的其它模组uuid(同一大类且属性完全相同)
+        certified: 是否已证明最优, False表示启发式结果
+        partial: 是否为截止时间/取消前已找到的部分结果
     """
     modules: List[ModuleInfo]
     score: float
     attr_breakdown: Dict[str, int]
+    equivalent_uuids: List[List[int]] = field(default_factory=list)
+    certified: bool = False
+    partial: bool = False
+
+
+@dataclass
+class OptimizationQuery:
+    """批量优化中的一个查询
+    
+    Attributes:
+        category: 目标模组类型
+        target_attributes: 目标属性列表
+        exclude_attributes: 排除属性列表
+        min_attr_sum_requirements: 最小属性和约束(键为中文属性名)
+    """
+    category: ModuleCategory
+    target_attributes: List[str] = field(default_factory=list)
+    exclude_attributes: List[str] = field(default_factory=list)
+    min_attr_sum_requirements: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ModuleImportance:
+    """单个模组的重要性报告
+    
+    Attributes:
+        module: 模组信息
+        best_score: 包含该模组的最优搭配评分(目标函数口径), -1表示无法组成满足约束的搭配
+        best_modules: 包含该模组的最优搭配
+        loss_if_removed: 移除该模组后最优评分的下降量, 0表示可被替代
+        in_top_k: 是否出现在前max_solutions个搭配中
+        dominated: 是否被其它模组支配(任何搭配中都可被不差的模组替换)
+        partial: 是否为截止时间或取消前的部分结果
+    """
+    module: ModuleInfo
+    best_score: int
+    best_modules: List[ModuleInfo]
+    loss_if_removed: int
+    in_top_k: bool
+    dominated: bool
+    partial: bool = False
+    
+    @property
+    def safe_to_dismantle(self) -> bool:
+        """不在任何前K搭配中且移除后不影响最优解; 部分结果无法保证, 一律视为不可拆解"""
+        return not self.partial and not self.in_top_k and self.loss_if_removed == 0
+
+
+@dataclass
+class WhatIfResult:
+    """假设模组(合成/购买前的候选)的评估结果
+    
+    Attributes:
+        module: 假设模组
+        best_score: 包含该模组的最优搭配评分(目标函数口径); gain为0时只保证不低于换入基准搭配的最好结果, -1表示无法组成搭配
+        gain: 相对当前最优搭配的评分提升, 0表示不提升
+        best_modules: best_score对应的搭配, 含假设模组
+        partial: 是否为截止时间或取消前的部分结果, 此时best_score可能只是下界
+    """
+    module: ModuleInfo
+    best_score: int
+    gain: int
+    best_modules: List[ModuleInfo]
+    partial: bool = False
 
 
 class ModuleOptimizer:
@@ -61,12 +152,25 @@ class ModuleOptimizer:
         min_attr_sum_requirements: dict | None = None,
         lang: str = 'zh',
         combination_size: int = 4,
+        pipeline_mode: bool = False,
+        locked_uuids: List[int] | None = None,
+        banned_uuids: List[int] | None = None,
+        latency_budget: float | None = 10.0,
+        deadline_ms: int = 0,
+        progress_callback=None,
     ):
         """初始化模组搭配优化器
         
         Args:
             target_attributes: 目标属性列表，用于优先筛选
             exclude_attributes: 排除属性列表, 用于权重为0
+            pipeline_mode: 流水线模式, beam结果先经全局上界校验, 未能证明最优时以其第K名分数为阈值做精确搜索
+            locked_uuids: 锁定的模组uuid, 必须出现在每个搭配中, 搜索只在剩余位置上进行
+            banned_uuids: 禁用的模组uuid, 不参与任何搭配
+            latency_budget: 时延预算(秒), 规划器按本机与本次库存上实测的吞吐选择能在预算内完成的引擎组合,
+                规划的引擎到预算截断点返回已找到的结果, None表示始终全量精确搜索
+            deadline_ms: 单次优化的截止时间(毫秒), 到期后返回已找到的部分结果, 0表示不限时
+            progress_callback: 进度回调, 参数为SearchProgress(已处理组合数、当前最高分、已用时间与预计剩余时间)
         """
         self.logger = _get_logger()
         self._result_log_file = None
@@ -77,17 +181,80 @@ class ModuleOptimizer:
         self.combination_size = int(combination_size)
         if self.combination_size not in (4, 5):
             raise ValueError("combination_size only supports 4 or 5")
+        self.pipeline_mode = bool(pipeline_mode)
+        self.locked_uuids = set(locked_uuids or [])
+        self.banned_uuids = set(banned_uuids or [])
+        if len(self.locked_uuids) > self.combination_size:
+            raise ValueError("locked_uuids cannot exceed combination_size")
+        self.latency_budget = None if latency_budget is None else float(latency_budget)
+        self._planner: Optional[StrategyPlanner] = None
+        self.deadline_ms = max(0, int(deadline_ms))
+        self._deadline_at: Optional[float] = None
+        self._budget_cutoff_at: Optional[float] = None
+        self._search_started_at = time.perf_counter()
+        self._search_control = SearchControl()
+        if progress_callback is not None:
+            self._search_control.set_progress_callback(progress_callback)
         
-        self.beam_width = 5096              # Beam Search 每层保留宽度
+        self.beam_width = 5096              # Beam Search 每层保留宽度(自适应时为宽度上限)
+        self.beam_adaptive_width = True     # Beam Search 从窄宽度开始逐轮放大(每轮从根重跑, 最多2轮窄beam), 证明结果精确即停止
+        self.last_beam_stats: Optional[BeamSearchStats] = None  # 最近一次Beam Search的宽度统计
         self.beam_expand_per_state = 0     # 0 表示不限制单状态扩展数
         self.beam_max_workers = 3          # Beam Search 多起点并行线程数
+        self.beam_level_parallel = True    # Beam Search 每层扩展分给全部核心并行
+        self.annealing_enabled = True      # 5模组且模组很多时与beam search并行运行模拟退火
+        self.annealing_min_modules = 1000  # 运行模拟退火的最少模组数
+        self.annealing_restarts = 64       # 模拟退火独立重启次数
+        self.annealing_iterations = 100000 # 模拟退火每次重启的移动次数
+        self.annealing_seed = 0            # 模拟退火随机数种子, 非0时结果可复现
         self.max_solutions = 100           # 最大解数量
         self.max_workers = 8               # 最大线程数
-        self.enumeration_num = 500         # 并行策略中最大枚举模组数
+        self.local_search_budget_share = 0.15  # 时延预算中留给结果合并与交换局部搜索的比例, 其余为规划引擎的截止时间
+        self.loadout_exchange_rounds = 4   # 多套搭配交换改进最大轮数
+        self.loadout_search_nodes = 200000 # 多套搭配有界搜索最大节点数
+        self.snapshot_interval_ms = 100    # 流式优化中间快照最小间隔(毫秒)
     
     def _t(self, zh: str, en: str) -> str:
         return en if self.lang == 'en' else zh
     
+    def cancel(self):
+        """取消正在进行的优化, 各策略尽快返回已找到的部分结果, 可从其它线程调用"""
+        self._search_control.cancel()
+    
+    def _begin_search(self):
+        """开始一次优化: 清除上次的取消标志并从当前时刻计算截止时间"""
+        self._search_control.reset()
+        self._search_started_at = time.perf_counter()
+        self._budget_cutoff_at = None
+        self._deadline_at = None if self.deadline_ms <= 0 else self._search_started_at + self.deadline_ms / 1000.0
+    
+    def _remaining_deadline_ms(self) -> int:
+        """本次优化剩余的截止时间(毫秒), 时延预算的截断点早于截止时间时以截断点为准; 不限时返回0, 已到期返回1使策略立即返回"""
+        deadlines = [at for at in (self._deadline_at, self._budget_cutoff_at) if at is not None]
+        if not deadlines:
+            return 0
+        return max(1, int((min(deadlines) - time.perf_counter()) * 1000))
+    
+    def _planning_budget(self) -> Optional[float]:
+        """规划可用的剩余时间(秒): 时延预算扣除留给局部搜索的部分与本次优化已用的时间(预筛选、校准等), 且不超过截止时间"""
+        budget = self.latency_budget
+        if budget is not None:
+            budget = max(0.0, budget * (1.0 - self.local_search_budget_share)
+                         - (time.perf_counter() - self._search_started_at))
+        if self._deadline_at is not None:
+            remaining = self._remaining_deadline_ms() / 1000.0
+            budget = remaining if budget is None else min(budget, remaining)
+        return budget
+    
+    def _set_budget_cutoff(self, share: float):
+        """把时延预算的截断点设在本次优化开始后预算的share处, 不限时延时不截断"""
+        if self.latency_budget is not None and not self.pipeline_mode:
+            self._budget_cutoff_at = self._search_started_at + self.latency_budget * share
+    
+    def _search_kwargs(self) -> dict:
+        """传给C++策略的截止时间与取消/进度控制参数"""
+        return {'deadline_ms': self._remaining_deadline_ms(), 'control': self._search_control}
+    
     def _get_current_log_file(self) -> Optional[str]:
         """获取当前日志文件路径
         
@@ -134,6 +301,13 @@ class ModuleOptimizer:
             pass
         return 8
     
+    def _beam_worker_count(self) -> int:
+        """Beam Search线程数: 开启逐层并行且核心数多于起点数时使用全部核心, 否则只按起点数并行"""
+        cpu_count = self.get_cpu_count()
+        if self.beam_level_parallel and cpu_count > self.beam_max_workers:
+            return cpu_count
+        return min(self.beam_max_workers, cpu_count)
+    
     def check_cuda_availability(self) -> bool:
         """检查N卡加速是否可用"""
 
@@ -156,11 +330,12 @@ class ModuleOptimizer:
         """
         return MODULE_CATEGORY_MAP.get(module.config_id, ModuleCategory.ATTACK)
     
-    def _prefilter_modules(self, modules: List[ModuleInfo]) -> Tuple[List[ModuleInfo], List[ModuleInfo]]:
+    def _prefilter_modules(self, modules: List[ModuleInfo], top_num: int) -> Tuple[List[ModuleInfo], List[ModuleInfo]]:
         """预筛选模组，选择高质量候选
         
         Args:
-            modules: 所有模组列表
+            modules: 支配预筛选后的模组列表
+            top_num: 精确搜索覆盖的模组数量
             
         Returns:
             Tuple[List[ModuleInfo], List[ModuleInfo]]: (top_modules, candidate_modules)
@@ -168,8 +343,40 @@ class ModuleOptimizer:
                 - candidate_modules: 第二轮筛选出的候选模组, 基于各属性值分布
         """
         # 基于总属性值
-        top_modules = self._prefilter_modules_by_total_scores(modules, self.enumeration_num)
+        top_modules = self._top_modules_with_locked(modules, top_num)
         
+        attr_modules = self._prefilter_modules_by_attr_values(modules)
+        candidate_modules = top_modules.copy()
+        for top_attr_modules in attr_modules.values():
+            candidate_modules.extend(top_attr_modules)
+        
+        candidate_modules = list(set(candidate_modules))
+        
+        self.logger.info(self._t(
+            f"筛选后模组数量: candidate_modules={len(candidate_modules)} top_modules={len(top_modules)}",
+            f"After prefilter: candidate_modules={len(candidate_modules)} top_modules={len(top_modules)}"
+        ))
+        attrs_disp = list(attr_modules.keys()) if self.lang != 'en' else [to_english_attr(a) for a in attr_modules.keys()]
+        self.logger.info(self._t(f"涉及的属性类型: {list(attr_modules.keys())}", f"Involved attributes: {attrs_disp}"))
+        return top_modules, candidate_modules
+    
+    def _top_modules_with_locked(self, modules: List[ModuleInfo], top_num: int) -> List[ModuleInfo]:
+        """总属性值最高的top_num个模组, 锁定模组必须出现在每个搭配中, 不受数量截断影响"""
+        top_modules = self._prefilter_modules_by_total_scores(modules, top_num)
+        top_uuids = {module.uuid for module in top_modules}
+        top_modules.extend(
+            module for module in modules if module.uuid in self.locked_uuids and module.uuid not in top_uuids)
+        return top_modules
+    
+    def _prefilter_modules_by_attr_values(self, modules: List[ModuleInfo]) -> Dict[str, List[ModuleInfo]]:
+        """按单项属性值预筛选模组
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            Dict[str, List[ModuleInfo]]: 属性名 -> 该属性值最高的模组
+        """
         attr_modules = {}
         for module in modules:
             for part in module.parts:
@@ -187,21 +394,11 @@ class ModuleOptimizer:
         attr_count = len(attr_modules.keys())
         single_attr_num = 120 if attr_count <= 5 else 60
 
-        candidate_modules = top_modules.copy()
+        top_attr_modules = {}
         for attr_name, module_values in attr_modules.items():
             sorted_by_attr = sorted(module_values, key=lambda x: x[1], reverse=True)
-            top_attr_modules = [item[0] for item in sorted_by_attr[:single_attr_num]]
-            candidate_modules.extend(top_attr_modules)
-        
-        candidate_modules = list(set(candidate_modules))
-        
-        self.logger.info(self._t(
-            f"筛选后模组数量: candidate_modules={len(candidate_modules)} top_modules={len(top_modules)}",
-            f"After prefilter: candidate_modules={len(candidate_modules)} top_modules={len(top_modules)}"
-        ))
-        attrs_disp = list(attr_modules.keys()) if self.lang != 'en' else [to_english_attr(a) for a in attr_modules.keys()]
-        self.logger.info(self._t(f"涉及的属性类型: {list(attr_modules.keys())}", f"Involved attributes: {attrs_disp}"))
-        return top_modules, candidate_modules
+            top_attr_modules[attr_name] = [item[0] for item in sorted_by_attr[:single_attr_num]]
+        return top_attr_modules
     
     def _prefilter_modules_by_total_scores(self, modules: List[ModuleInfo], num: int) -> List[ModuleInfo]:
         """预筛选模组，选择高质量候选
@@ -241,71 +438,66 @@ class ModuleOptimizer:
         Returns:
             List[ModuleSolution]: 最优解列表
         """
+        self._begin_search()
         cat_disp = category.value if self.lang != 'en' else CATEGORY_CN_TO_EN.get(category.value, category.value)
         self.logger.info(self._t(f"开始优化{category.value}类型模组搭配, cpu_count={self.get_cpu_count()}", f"Start optimizing {cat_disp} modules, cpu_count={self.get_cpu_count()}"))
         
-        # 过滤指定类型的模组
-        if category == ModuleCategory.ALL:
-            filtered_modules = modules
-            self.logger.info(self._t(f"使用全部模组，共{len(filtered_modules)}个", f"Using all modules, total={len(filtered_modules)}"))
-        else:
-            filtered_modules = [
-                module for module in modules 
-                if self.get_module_category(module) == category
-            ]
-            self.logger.info(self._t(f"找到{len(filtered_modules)}个{category.value}类型模组", f"Found {len(filtered_modules)} {cat_disp} modules"))
-        
-        if len(filtered_modules) < self.combination_size:
-            self.logger.warning(self._t(
-                f"{category.value}类型模组数量不足{self.combination_size}个, 无法形成完整搭配",
-                f"Not enough {cat_disp} modules (<{self.combination_size}) to form a combination"))
+        filtered_modules = self._filter_category_modules(modules, category)
+        if filtered_modules is None:
             return []
         
-        # 筛选模组
-        top_modules, candidate_modules = self._prefilter_modules(filtered_modules)
+        # 先移除被支配的模组, 该步骤不会丢失任何top-K解
+        kept_modules = self._prefilter_dominated_modules(filtered_modules)
         beam_solutions = []
         enum_solutions = []
+        anneal_solutions = []
 
-        if self.combination_size == 5:
-            if self.check_cuda_availability():
-                self.logger.info(self._t(
-                    "5模组且CUDA可用，启用并行策略枚举+beam search",
-                    "5-module mode with CUDA available, enabling parallel enumeration + beam search"))
-                num_processes = min(2, mp.cpu_count())
-
-                # 创建进程池, spawn兼容打包环境
-                ctx = mp.get_context('spawn')
-                with ctx.Pool(processes=num_processes) as pool:
-                    beam_future = pool.apply_async(self._strategy_beam_search, (candidate_modules,))
-                    enum_future = pool.apply_async(self._strategy_enumeration, (top_modules,))
-
-                    beam_solutions = beam_future.get()
-                    enum_solutions = enum_future.get()
-            else:
-                self.logger.info(self._t(
-                    "5模组且CUDA不可用，仅执行beam search",
-                    "5-module mode without CUDA, running beam search only"))
-                beam_solutions = self._strategy_beam_search(candidate_modules)
-        elif len(candidate_modules) > self.enumeration_num:
-            self.logger.info(self._t("并行策略开始", "Parallel strategies start"))
-            num_processes = min(2, mp.cpu_count())
-
-            # 创建进程池, spawn兼容打包环境
-            ctx = mp.get_context('spawn')
-            with ctx.Pool(processes=num_processes) as pool:
-                # Beam Search 近似策略
-                beam_future = pool.apply_async(self._strategy_beam_search, (candidate_modules,))
-                # 枚举策略
-                enum_future = pool.apply_async(self._strategy_enumeration, (top_modules,))
-                
-                beam_solutions = beam_future.get()
-                enum_solutions = enum_future.get()
+        if self.pipeline_mode:
+            # 流水线在支配预筛选后的全部模组上运行, 结果可以给出最优性证明
+            enum_solutions = self._strategy_beam_then_exact(kept_modules)
         else:
-            # 枚举开始
-            enum_solutions = self._strategy_enumeration(top_modules)
+            plan = self._plan_strategies(kept_modules)
+            top_modules, candidate_modules = self._prefilter_modules(kept_modules, plan.exact_module_count)
+            # 代价模型外推有误差, 规划的引擎到预算的截断点即返回已找到的结果, 不拖累后续的局部搜索
+            self._set_budget_cutoff(1.0 - self.local_search_budget_share)
+            if plan.run_beam:
+                self.logger.info(self._t("并行策略开始", "Parallel strategies start"))
+                # C++策略运行时释放GIL, 几个线程即可并行; 线程共享同一个取消标志, 进程池做不到
+                with ThreadPoolExecutor(max_workers=3) as pool:
+                    # Beam Search 近似策略
+                    beam_future = pool.submit(self._strategy_beam_search, candidate_modules, plan.beam_width)
+                    # 精确策略, 只覆盖总属性值最高的部分模组
+                    enum_future = pool.submit(self._run_exact_engine, plan.exact_engine, top_modules)
+                    # 模拟退火在全部模组上随机游走, 不受beam排序与候选筛选的偏好限制
+                    anneal_future = None
+                    if plan.run_annealing:
+                        anneal_future = pool.submit(self._strategy_simulated_annealing, kept_modules)
+
+                    beam_solutions = beam_future.result()
+                    enum_solutions = enum_future.result()
+                    if anneal_future is not None:
+                        anneal_solutions = anneal_future.result()
+            else:
+                start_time = time.perf_counter()
+                enum_solutions = self._run_exact_engine(plan.exact_engine, top_modules)
+                # 部分结果的耗时不代表引擎吞吐, 不用于校准
+                if not any(solution.partial for solution in enum_solutions):
+                    self._get_planner().record_exact_run(plan, time.perf_counter() - start_time)
+
+            # 精确引擎只覆盖部分模组时, 其结果不能视为全局最优
+            if len(top_modules) < len(kept_modules):
+                for solution in enum_solutions:
+                    solution.certified = False
 
-        all_solution = beam_solutions + enum_solutions
-        unique_solutions = self._complete_deduplicate(all_solution)
+        # 精确结果在前, 去重时保留带最优证明的版本
+        all_solution = enum_solutions + beam_solutions + anneal_solutions
+        unique_solutions = self._complete_deduplicate(all_solution, filtered_modules)
+        # 近似结果在全部模组上做交换局部搜索, 已证明最优的结果无需再改进
+        if unique_solutions and not all(solution.certified for solution in unique_solutions):
+            self._set_budget_cutoff(1.0)
+            unique_solutions = self._complete_deduplicate(
+                unique_solutions + self._local_search_swap(unique_solutions, filtered_modules), filtered_modules)
+        self._budget_cutoff_at = None
         unique_solutions = self._filter_by_min_attr(unique_solutions)
         unique_solutions.sort(key=lambda x: x.score, reverse=True)
         # 返回前top_n个解
@@ -315,10 +507,36 @@ class ModuleOptimizer:
         if self.target_attributes or self.min_attr_sum_requirements:
             result = self._restore_original_scores(result)
         
+        self._log_partial(result)
         self.logger.info(self._t(f"优化完成，返回{len(result)}个最优解", f"Optimization finished, returning {len(result)} best solutions"))
         
         return result
     
+    def _log_partial(self, solutions: List[ModuleSolution]):
+        """结果包含截止时间/取消前的部分结果时给出提示"""
+        if any(solution.partial for solution in solutions):
+            self.logger.warning(self._t(
+                "搜索因截止时间或取消提前结束, 返回已找到的部分结果",
+                "Search stopped early by deadline or cancellation, returning the best results found so far"))
+    
+    def _drop_banned_modules(self, modules: List[ModuleInfo]) -> List[ModuleInfo]:
+        """移除禁用的模组, 锁定的模组不存在时给出提示
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleInfo]: 移除禁用模组后的列表
+        """
+        if self.banned_uuids:
+            modules = [module for module in modules if module.uuid not in self.banned_uuids]
+        missing = self.locked_uuids - {module.uuid for module in modules}
+        if missing:
+            self.logger.warning(self._t(
+                f"锁定的模组不存在或已被禁用: {sorted(missing)}",
+                f"Locked modules not found or banned: {sorted(missing)}"))
+        return modules
+    
     def _filter_by_min_attr(self, solutions: List[ModuleSolution]) -> List[ModuleSolution]:
         """按硬性总和约束过滤解；约束来自 self.min_attr_sum_requirements（键为中文属性名）"""
         if not self.min_attr_sum_requirements:
@@ -337,6 +555,172 @@ class ModuleOptimizer:
         return out
 
 
+    def optimize_modules_stream(self, modules: List[ModuleInfo], category: ModuleCategory,
+                                top_n: int = 40) -> Iterator[List[ModuleSolution]]:
+        """边搜索边产出逐步改进的最优解快照, 最后产出与optimize_modules相同的最终结果
+        
+        优化在后台线程运行, C++策略把当前top-K推入快照通道; 中间快照标记为部分结果且未证明最优.
+        提前结束迭代会取消后台搜索.
+        
+        Args:
+            modules: 所有模组列表
+            category: 目标模组类型
+            top_n: 每次产出前N个最优解, 默认40
+            
+        Yields:
+            List[ModuleSolution]: 当前最优解列表, 每次产出都优于上一次
+        """
+        channel = SolutionChannel()
+        self._search_control.set_snapshot_channel(channel, self.snapshot_interval_ms)
+        outcome = {}
+        
+        def run():
+            try:
+                outcome['result'] = self.optimize_modules(modules, category, top_n)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                channel.close()
+        
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        # 各策略的快照合并到同一个解池, 池只增不减, 前N名只会变好
+        found: Dict[frozenset, ModuleSolution] = {}
+        last_key = None
+        try:
+            while True:
+                snapshot = channel.pop(self.snapshot_interval_ms)
+                if snapshot is None:
+                    if channel.is_closed():
+                        break
+                    continue
+                for solution in self._convert_from_cpp_solutions(snapshot):
+                    found.setdefault(frozenset(module.uuid for module in solution.modules), solution)
+                current = self._filter_by_min_attr(list(found.values()))
+                current.sort(key=lambda x: x.score, reverse=True)
+                current = current[:top_n]
+                key = [(frozenset(module.uuid for module in solution.modules), solution.score) for solution in current]
+                if not current or key == last_key:
+                    continue
+                last_key = key
+                for solution in current:
+                    solution.certified = False
+                    solution.partial = True
+                if self.target_attributes or self.min_attr_sum_requirements:
+                    current = self._restore_original_scores(current)
+                yield current
+            worker.join()
+        finally:
+            if worker.is_alive():
+                self.cancel()
+                worker.join()
+            self._search_control.set_snapshot_channel(None)
+        
+        if 'error' in outcome:
+            raise outcome['error']
+        yield outcome['result']
+    
+    def optimize_modules_batch(self, modules: List[ModuleInfo], queries: List[OptimizationQuery],
+                               top_n: int = 40) -> List[List[ModuleSolution]]:
+        """一次组合扫描同时求解多个查询, 如同一库存的几套职业属性配置, 或各类别加上全部
+        
+        模组只转换一次, 每个组合的属性和只累加一次, 再按各查询的计分表打分;
+        计分表与约束相同的查询(如同一配置的不同类别)共享分数与上界计算.
+        每个查询的精确搜索覆盖规划器按时延预算选出的模组, 未覆盖全部模组时结果不标记为已证明最优.
+        优化器自身的目标属性/排除属性/最小属性和不参与批量查询.
+        
+        Args:
+            modules: 所有模组列表
+            queries: 查询列表
+            top_n: 每个查询返回前N个最优解, 默认40
+            
+        Returns:
+            List[List[ModuleSolution]]: 与queries一一对应的最优解列表
+        """
+        self._begin_search()
+        self.logger.info(self._t(
+            f"开始批量优化, 查询数量: {len(queries)}, cpu_count={self.get_cpu_count()}",
+            f"Start batch optimization, {len(queries)} queries, cpu_count={self.get_cpu_count()}"))
+        # 各查询视图共享同一个规划器
+        self._get_planner()
+        
+        # 每个查询: (属性配置视图, 类别筛选后的模组, 精确搜索是否只覆盖部分模组), 模组不足时为None
+        query_inputs: List[Optional[Tuple[ModuleOptimizer, List[ModuleInfo], bool]]] = []
+        cpp_queries = []
+        sweep_modules: Dict[int, ModuleInfo] = {}
+        for query in queries:
+            view = self._query_view(query)
+            filtered_modules = self._filter_category_modules(modules, query.category)
+            if filtered_modules is None:
+                query_inputs.append(None)
+                continue
+            
+            kept_modules = view._prefilter_dominated_modules(filtered_modules)
+            plan = view._plan_strategies(kept_modules)
+            top_modules, _ = view._prefilter_modules(kept_modules, plan.exact_module_count)
+            target_attrs_set, exclude_attrs_set, min_attr_id_requirements = view._build_attr_id_args()
+            cpp_query = CppBatchQuery()
+            cpp_query.target_attributes = target_attrs_set
+            cpp_query.exclude_attributes = exclude_attrs_set
+            cpp_query.min_attr_sum_requirements = min_attr_id_requirements
+            cpp_query.module_uuids = {module.uuid for module in top_modules}
+            cpp_queries.append(cpp_query)
+            for module in top_modules:
+                sweep_modules.setdefault(module.uuid, module)
+            query_inputs.append((view, filtered_modules, len(top_modules) < len(kept_modules)))
+        
+        cpp_results = []
+        if cpp_queries:
+            self.logger.info(self._t(
+                f"批量精确搜索, 查询数量: {len(cpp_queries)}, 模组数量: {len(sweep_modules)}",
+                f"Batch exact search, {len(cpp_queries)} queries over {len(sweep_modules)} modules"))
+            cpp_results = strategy_batch_enumeration_cpp(
+                self._convert_to_cpp_modules(list(sweep_modules.values())),
+                cpp_queries,
+                self.max_solutions,
+                self.get_cpu_count(),
+                self.combination_size,
+                self.locked_uuids,
+                self.banned_uuids,
+                **self._search_kwargs(),
+            )
+        
+        results: List[List[ModuleSolution]] = []
+        next_result = iter(cpp_results)
+        for query_input in query_inputs:
+            if query_input is None:
+                results.append([])
+                continue
+            view, filtered_modules, truncated = query_input
+            solutions = self._convert_from_cpp_solutions(next(next_result))
+            # 精确搜索只覆盖部分模组时, 其结果不能视为全局最优, 与optimize_modules一样在全部模组上做交换局部搜索
+            if truncated:
+                for solution in solutions:
+                    solution.certified = False
+                if solutions:
+                    solutions = view._complete_deduplicate(
+                        solutions + view._local_search_swap(solutions, filtered_modules), filtered_modules)
+            solutions = view._filter_by_min_attr(view._complete_deduplicate(solutions, filtered_modules))
+            solutions.sort(key=lambda x: x.score, reverse=True)
+            result = solutions[:top_n]
+            if view.target_attributes or view.min_attr_sum_requirements:
+                result = view._restore_original_scores(result)
+            results.append(result)
+        
+        self._log_partial([solution for result in results for solution in result])
+        self.logger.info(self._t(
+            f"批量优化完成, 共{len(results)}个查询",
+            f"Batch optimization finished, {len(results)} queries"))
+        return results
+    
+    def _query_view(self, query: OptimizationQuery) -> 'ModuleOptimizer':
+        """批量查询使用的优化器视图, 与本优化器共享取消标志、规划器与日志, 只替换属性配置"""
+        view = copy.copy(self)
+        view.target_attributes = list(query.target_attributes)
+        view.exclude_attributes = list(query.exclude_attributes)
+        view.min_attr_sum_requirements = dict(query.min_attr_sum_requirements)
+        return view
+    
     def enumerate_modules(self, modules: List[ModuleInfo], category: ModuleCategory, top_n: int = 40) -> List[ModuleSolution]:
         """只进行枚举运算
         
@@ -348,57 +732,611 @@ class ModuleOptimizer:
         Returns:
             List[ModuleSolution]: 最优解列表
         """
+        self._begin_search()
         cat_disp = category.value if self.lang != 'en' else CATEGORY_CN_TO_EN.get(category.value, category.value)
         self.logger.info(self._t(f"开始优化{category.value}类型模组搭配 cpu_count={self.get_cpu_count()}", f"Start optimizing {cat_disp} modules cpu_count={self.get_cpu_count()}"))
         
-        # 过滤指定类型的模组
-        if category == ModuleCategory.ALL:
-            filtered_modules = modules
-            self.logger.info(self._t(f"使用全部模组，共{len(filtered_modules)}个", f"Using all modules, total={len(filtered_modules)}"))
-        else:
-            filtered_modules = [
-                module for module in modules 
-                if self.get_module_category(module) == category
-            ]
-            self.logger.info(self._t(f"找到{len(filtered_modules)}个{category.value}类型模组", f"Found {len(filtered_modules)} {cat_disp} modules"))
-        
-        if len(filtered_modules) < self.combination_size:
-            self.logger.warning(self._t(
-                f"{category.value}类型模组数量不足{self.combination_size}个, 无法形成完整搭配",
-                f"Not enough {cat_disp} modules (<{self.combination_size}) to form a combination"))
+        filtered_modules = self._filter_category_modules(modules, category)
+        if filtered_modules is None:
             return []
         
-        cuda_limit = 1000
-        cpu_limit = 800
-
-        if self.check_cuda_availability():
-            if len(filtered_modules) > cuda_limit:
-                filtered_modules = self._prefilter_modules_by_total_scores(filtered_modules, cuda_limit)
-                self.logger.info(self._t(
-                    f"枚举数量超过{cuda_limit}, 进行筛选, 筛选后模组数量: {len(filtered_modules)}",
-                    f"Enumeration exceeds {cuda_limit}, prefilter applied: {len(filtered_modules)} remain"))
-        else:
-            if len(filtered_modules) > cpu_limit:
-                filtered_modules = self._prefilter_modules_by_total_scores(filtered_modules, cpu_limit)
-                self.logger.info(self._t(
-                    f"枚举数量超过{cpu_limit}, 进行筛选, 筛选后模组数量: {len(filtered_modules)}",
-                    f"Enumeration exceeds {cpu_limit}, prefilter applied: {len(filtered_modules)} remain"))
-        
-        enum_solutions = self._strategy_enumeration(filtered_modules)
-        unique_solutions = self._complete_deduplicate(enum_solutions)
+        # 支配关系预筛选后分支定界在全部模组上求精确top-K, 不再截断模组数量
+        filtered_modules = self._prefilter_dominated_modules(filtered_modules)
+        enum_solutions = self._strategy_branch_and_bound(filtered_modules)
+        unique_solutions = self._complete_deduplicate(enum_solutions, filtered_modules)
         unique_solutions = self._filter_by_min_attr(unique_solutions)
         unique_solutions.sort(key=lambda x: x.score, reverse=True)
         # 返回前top_n个解
         result = unique_solutions[:top_n]
         
         # 如果使用了目标属性，在最终返回前恢复原始评分
-        if self.target_attributes:
+        if self.target_attributes or self.min_attr_sum_requirements:
             result = self._restore_original_scores(result)
         
+        self._log_partial(result)
         self.logger.info(self._t(f"优化完成，返回{len(result)}个最优解", f"Optimization finished, returning {len(result)} best solutions"))
         
         return result
     
+    def enumerate_modules_page(self, modules: List[ModuleInfo], category: ModuleCategory,
+                               cursor: Optional[SearchCursor] = None,
+                               page_size: Optional[int] = None) -> Tuple[List[ModuleSolution], SearchCursor]:
+        """分页精确求解, 每次返回排在游标之后的下一页解
+        
+        Args:
+            modules: 所有模组列表, 各页调用须保持一致
+            category: 目标模组类型
+            cursor: 上一页返回的游标, None表示从第一页开始
+            page_size: 每页解数量, 默认为max_solutions
+            
+        Returns:
+            Tuple[List[ModuleSolution], SearchCursor]: 本页解列表和更新后的游标, cursor.exhausted为True表示没有更多结果
+        """
+        self._begin_search()
+        if cursor is None:
+            cursor = SearchCursor()
+        page_size = self.max_solutions if page_size is None else int(page_size)
+        filtered_modules = self._filter_category_modules(modules, category)
+        if filtered_modules is None:
+            cursor.exhausted = True
+            return [], cursor
+        
+        # 支配预筛选的保留阈值依赖名次, 后续页可能需要被筛掉的模组, 因此分页时不做预筛选
+        cpp_modules = self._convert_to_cpp_modules(filtered_modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        self.logger.info(self._t(
+            f"分页精确搜索第{cursor.page + 1}页, 每页{page_size}个解, 模组数量: {len(filtered_modules)}",
+            f"Paged exact search, page {cursor.page + 1}, {page_size} per page over {len(filtered_modules)} modules"))
+        cpp_solutions = strategy_branch_and_bound_page_cpp(
+            cpp_modules,
+            cursor,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            page_size,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        result = self._filter_by_min_attr(self._convert_from_cpp_solutions(cpp_solutions))
+        if self.target_attributes or self.min_attr_sum_requirements:
+            result = self._restore_original_scores(result)
+        
+        self._log_partial(result)
+        return result, cursor
+    
+    def pareto_frontier(self, modules: List[ModuleInfo], category: ModuleCategory,
+                        frontier_attributes: List[str]) -> List[ModuleSolution]:
+        """一次搜索求出战斗力与所选属性和之间的帕累托前沿, 代替多次调整最小属性和约束
+        
+        Args:
+            modules: 所有模组列表
+            category: 目标模组类型
+            frontier_attributes: 前沿属性名称列表, 最多3个
+            
+        Returns:
+            List[ModuleSolution]: 前沿上的搭配, 按战斗力降序; 任一搭配都不存在战斗力与这些属性和都不低于它的其它搭配
+        """
+        frontier_ids = []
+        for attr_str in frontier_attributes:
+            aid = MODULE_ATTR_IDS.get(attr_str)
+            if aid is None:
+                raise ValueError(f"unknown frontier attribute: {attr_str}")
+            if aid not in frontier_ids:
+                frontier_ids.append(aid)
+        if not frontier_ids or len(frontier_ids) > 3:
+            raise ValueError("frontier_attributes supports 1 to 3 attributes")
+        self._begin_search()
+        filtered_modules = self._filter_category_modules(modules, category)
+        if filtered_modules is None:
+            return []
+        
+        # 前沿搜索内部按前沿属性做支配预筛选, 这里不再调用top-K的预筛选
+        cpp_modules = self._convert_to_cpp_modules(filtered_modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        
+        frontier_disp = frontier_attributes if self.lang != 'en' else [to_english_attr(a) for a in frontier_attributes]
+        self.logger.info(self._t(
+            f"帕累托前沿搜索, 前沿属性: {frontier_attributes}, 模组数量: {len(filtered_modules)}",
+            f"Pareto frontier search on {frontier_disp} over {len(filtered_modules)} modules"))
+        cpp_solutions = strategy_pareto_frontier_cpp(
+            cpp_modules,
+            frontier_ids,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        result = self._filter_by_min_attr(self._convert_from_cpp_solutions(cpp_solutions))
+        if self.target_attributes or self.min_attr_sum_requirements:
+            result = self._restore_original_scores(result)
+            result.sort(key=lambda x: x.score, reverse=True)
+        
+        self._log_partial(result)
+        self.logger.info(self._t(f"帕累托前沿包含{len(result)}个搭配", f"Pareto frontier holds {len(result)} combinations"))
+        return result
+    
+    def module_importance_report(self, modules: List[ModuleInfo], category: ModuleCategory) -> List[ModuleImportance]:
+        """为每个模组给出包含它的最优搭配、移除损失与是否进入前K, 用于判断哪些模组可以放心拆解
+        
+        评分为目标函数口径(含目标属性加权与最小属性和约束), 与_strategy_branch_and_bound一致
+        
+        Args:
+            modules: 所有模组列表
+            category: 目标模组类型
+            
+        Returns:
+            List[ModuleImportance]: 按包含该模组的最优评分降序
+        """
+        self._begin_search()
+        filtered_modules = self._filter_category_modules(modules, category)
+        if filtered_modules is None:
+            return []
+        
+        cpp_modules = self._convert_to_cpp_modules(filtered_modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        
+        self.logger.info(self._t(
+            f"模组重要性分析, 模组数量: {len(filtered_modules)}",
+            f"Module importance report over {len(filtered_modules)} modules"))
+        entries = module_importance_report_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        by_uuid = {module.uuid: module for module in filtered_modules}
+        result = [
+            ModuleImportance(
+                module=by_uuid[entry.uuid],
+                best_score=entry.best_score,
+                best_modules=[by_uuid[uuid] for uuid in entry.best_uuids],
+                loss_if_removed=entry.loss_if_removed,
+                in_top_k=entry.in_top_k,
+                dominated=entry.dominated,
+                partial=entry.partial,
+            )
+            for entry in entries
+        ]
+        
+        self._log_partial(result)
+        dismantle = sum(1 for item in result if item.safe_to_dismantle)
+        self.logger.info(self._t(
+            f"重要性分析完成, {dismantle}/{len(result)}个模组可安全拆解",
+            f"Importance report done, {dismantle}/{len(result)} modules are safe to dismantle"))
+        return result
+    
+    def evaluate_hypothetical_modules(self, modules: List[ModuleInfo], category: ModuleCategory,
+                                      hypothetical_modules: List[ModuleInfo],
+                                      baseline: Optional[List[ModuleSolution]] = None) -> List[WhatIfResult]:
+        """批量评估假设模组对当前最优搭配的提升, 适合合成/购买前的比较和随机词条的蒙特卡洛模拟
+        
+        评分为目标函数口径(含目标属性加权与最小属性和约束), 与_strategy_branch_and_bound一致
+        
+        Args:
+            modules: 所有模组列表(现有库存)
+            category: 目标模组类型
+            hypothetical_modules: 待评估的假设模组列表, 不加入库存
+            baseline: 缓存的精确最优搭配(如_strategy_branch_and_bound的结果), 为空时内部求一次
+            
+        Returns:
+            List[WhatIfResult]: 与hypothetical_modules顺序一致的评估结果
+        """
+        if not hypothetical_modules:
+            return []
+        self._begin_search()
+        
+        # 每个假设模组与现有的组合长度-1个模组组成搭配
+        filtered_modules = self._filter_category_modules(modules, category, self.combination_size - 1)
+        if filtered_modules is None:
+            return []
+        
+        # 被支配的模组换成支配者不会降低任何包含假设模组的搭配, 可以安全移除
+        inventory = self._prefilter_dominated_modules(filtered_modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        baseline_uuids = [[module.uuid for module in solution.modules] for solution in (baseline or [])]
+        
+        self.logger.info(self._t(
+            f"评估{len(hypothetical_modules)}个假设模组, 库存模组数量: {len(inventory)}",
+            f"Evaluating {len(hypothetical_modules)} hypothetical modules against {len(inventory)} modules"))
+        cpp_results = evaluate_hypothetical_modules_cpp(
+            self._convert_to_cpp_modules(inventory),
+            baseline_uuids,
+            self._convert_to_cpp_modules(hypothetical_modules),
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        by_uuid = {module.uuid: module for module in inventory}
+        result = []
+        for hypothetical, cpp_result in zip(hypothetical_modules, cpp_results):
+            # 搭配依次为锁定模组, 假设模组与库存模组; 假设模组的uuid可能与库存重复, 按位置识别
+            best_modules = [
+                hypothetical if pos == len(self.locked_uuids) else by_uuid[uuid]
+                for pos, uuid in enumerate(cpp_result.best_uuids)
+            ]
+            result.append(WhatIfResult(
+                module=hypothetical,
+                best_score=cpp_result.best_score,
+                gain=cpp_result.gain,
+                best_modules=best_modules,
+                partial=cpp_result.partial,
+            ))
+        
+        self._log_partial(result)
+        improving = sum(1 for item in result if item.gain > 0)
+        self.logger.info(self._t(
+            f"假设模组评估完成, {improving}/{len(result)}个可以提升当前最优搭配",
+            f"Hypothetical evaluation done, {improving}/{len(result)} improve the current best"))
+        return result
+    
+    def optimize_loadouts(self, modules: List[ModuleInfo], category: ModuleCategory,
+                          loadouts: int | List[dict] = 2) -> List[Optional[ModuleSolution]]:
+        """多套互不重叠的搭配联合优化, 每个模组最多被一套搭配使用
+        
+        Args:
+            modules: 所有模组列表
+            category: 目标模组类型
+            loadouts: 搭配套数, 或每套搭配的配置列表. 配置为dict, 可包含target_attributes/
+                exclude_attributes/min_attr_sum_requirements/locked_uuids, 缺省项沿用当前优化器设置;
+                锁定模组只能属于一套, 需在对应配置中指定, 当前优化器的locked_uuids不参与
+            
+        Returns:
+            List[Optional[ModuleSolution]]: 与配置顺序一致的搭配, 无法组成的位置为None
+        """
+        profiles = [{} for _ in range(loadouts)] if isinstance(loadouts, int) else list(loadouts)
+        if not profiles:
+            return []
+        self._begin_search()
+        cat_disp = category.value if self.lang != 'en' else CATEGORY_CN_TO_EN.get(category.value, category.value)
+        
+        # 模组不足以组成全部套数时仍尽量组成, 只给出提示
+        filtered_modules = self._filter_category_modules(modules, category, 0)
+        if len(filtered_modules) < self.combination_size * len(profiles):
+            self.logger.warning(self._t(
+                f"{category.value}类型模组数量不足以组成{len(profiles)}套搭配",
+                f"Not enough {cat_disp} modules to form {len(profiles)} loadouts"))
+        
+        # 各套的锁定模组对其它套禁用, 也不能作为等价替换的候选
+        profile_locked = [set(profile.get('locked_uuids') or []) for profile in profiles]
+        all_locked = set().union(*profile_locked)
+        loadout_optimizers = []
+        for index, profile in enumerate(profiles):
+            optimizer = ModuleOptimizer(
+                target_attributes=profile.get('target_attributes', self.target_attributes),
+                exclude_attributes=profile.get('exclude_attributes', self.exclude_attributes),
+                min_attr_sum_requirements=profile.get('min_attr_sum_requirements', self.min_attr_sum_requirements),
+                lang=self.lang,
+                combination_size=self.combination_size,
+                locked_uuids=profile_locked[index],
+                banned_uuids=self.banned_uuids | (all_locked - profile_locked[index]),
+            )
+            optimizer.max_solutions = self.max_solutions
+            optimizer.max_workers = self.max_workers
+            # 各套共用本次优化的截止时间与取消标志
+            optimizer._search_control = self._search_control
+            optimizer._deadline_at = self._deadline_at
+            loadout_optimizers.append(optimizer)
+        
+        # 其它套最多占用(套数-1)*组合长度个模组, 支配预筛选的保留阈值相应放宽, 禁用这些模组后仍是精确的
+        extra_slots = (len(profiles) - 1) * self.combination_size
+        loadout_pools = []
+        candidate_lists = []
+        # 配置相同的套共用模组池与候选列表
+        searched: Dict[tuple, Tuple[List[ModuleInfo], List[ModuleSolution]]] = {}
+        for optimizer in loadout_optimizers:
+            profile_key = (
+                tuple(sorted(optimizer.target_attributes)), tuple(sorted(optimizer.exclude_attributes)),
+                tuple(sorted(optimizer.min_attr_sum_requirements.items())),
+                frozenset(optimizer.locked_uuids), frozenset(optimizer.banned_uuids),
+            )
+            if profile_key not in searched:
+                pool = optimizer._drop_banned_modules(filtered_modules)
+                optimizer.max_solutions = self.max_solutions + extra_slots
+                pool = optimizer._prefilter_dominated_modules(pool)
+                optimizer.max_solutions = self.max_solutions
+                searched[profile_key] = (pool, self._search_loadout(optimizer, pool, set(), self.max_solutions))
+            pool, candidates = searched[profile_key]
+            loadout_pools.append(pool)
+            candidate_lists.append(candidates)
+        
+        modules_by_signature: Dict[tuple, List[ModuleInfo]] = {}
+        for module in filtered_modules:
+            if module.uuid not in all_locked:
+                modules_by_signature.setdefault(self._module_signature(module), []).append(module)
+        
+        # 先在各套已有的top-K列表中做有界搜索, 找不到完整组合时逐套贪心并对冲突的套重新搜索
+        assignment = self._assign_disjoint_loadouts(candidate_lists, modules_by_signature)
+        if assignment is None:
+            assignment = []
+            used_uuids = set()
+            for index, candidates in enumerate(candidate_lists):
+                chosen = None
+                for solution in candidates:
+                    chosen = self._resolve_disjoint_modules(solution, used_uuids, modules_by_signature)
+                    if chosen is not None:
+                        chosen = self._with_modules(solution, chosen)
+                        break
+                if chosen is None:
+                    rerun = self._search_loadout(
+                        loadout_optimizers[index], loadout_pools[index], used_uuids, 1)
+                    chosen = rerun[0] if rerun else None
+                if chosen is not None:
+                    used_uuids.update(module.uuid for module in chosen.modules)
+                assignment.append(chosen)
+        
+        # 交换改进: 固定其它套, 对每套禁用其它套模组后精确重算, 总分严格提升时接受.
+        # 已取得该套无约束最优分的套无法再提升, 直接跳过
+        for _ in range(self.loadout_exchange_rounds):
+            improved = False
+            for index, optimizer in enumerate(loadout_optimizers):
+                current = assignment[index]
+                if current is not None and candidate_lists[index] and current.score >= candidate_lists[index][0].score:
+                    continue
+                others = {
+                    module.uuid
+                    for other_index, solution in enumerate(assignment)
+                    if other_index != index and solution is not None
+                    for module in solution.modules
+                }
+                best = self._search_loadout(optimizer, loadout_pools[index], others, 1)
+                if best and (current is None or best[0].score > current.score):
+                    assignment[index] = best[0]
+                    improved = True
+            if not improved:
+                break
+        
+        result = []
+        for optimizer, solution in zip(loadout_optimizers, assignment):
+            if solution is not None and (optimizer.target_attributes or optimizer.min_attr_sum_requirements):
+                solution = optimizer._restore_original_scores([solution])[0]
+            result.append(solution)
+        
+        self.logger.info(self._t(
+            f"多套搭配优化完成: {sum(1 for s in result if s is not None)}/{len(result)}套, "
+            f"总战斗力{sum(s.score for s in result if s is not None)}",
+            f"Loadout optimization finished: {sum(1 for s in result if s is not None)}/{len(result)} loadouts, "
+            f"total score {sum(s.score for s in result if s is not None)}"))
+        return result
+    
+    @staticmethod
+    def _module_signature(module: ModuleInfo) -> tuple:
+        """同一大类(config_id去掉品质位)且属性完全相同的模组签名相同, 可以互相替换"""
+        return (module.config_id // 100, tuple(sorted((part.id, part.value) for part in module.parts)))
+    
+    @staticmethod
+    def _with_modules(solution: ModuleSolution, modules: List[ModuleInfo]) -> ModuleSolution:
+        """用等价模组替换后的解, 分数与属性不变"""
+        return ModuleSolution(modules, solution.score, solution.attr_breakdown, [], solution.certified,
+                              solution.partial)
+    
+    def _resolve_disjoint_modules(self, solution: ModuleSolution, used_uuids: set,
+                                  modules_by_signature: Dict[tuple, List[ModuleInfo]]) -> Optional[List[ModuleInfo]]:
+        """将解中已被占用的模组换成属性相同的空闲模组, 无法替换时返回None
+        
+        Args:
+            solution: 候选解
+            used_uuids: 其它套已占用的模组uuid
+            modules_by_signature: 按属性签名分组的可替换模组
+            
+        Returns:
+            Optional[List[ModuleInfo]]: 替换后的模组列表
+        """
+        taken = used_uuids | {module.uuid for module in solution.modules}
+        chosen = []
+        for module in solution.modules:
+            if module.uuid not in used_uuids:
+                chosen.append(module)
+                continue
+            substitute = next(
+                (other for other in modules_by_signature.get(self._module_signature(module), [])
+                 if other.uuid not in taken), None)
+            if substitute is None:
+                return None
+            taken.add(substitute.uuid)
+            chosen.append(substitute)
+        return chosen
+    
+    def _assign_disjoint_loadouts(self, candidate_lists: List[List[ModuleSolution]],
+                                  modules_by_signature: Dict[tuple, List[ModuleInfo]]) -> Optional[List[ModuleSolution]]:
+        """在各套的top-K列表上做分支定界, 选出总分最高且互不重叠的组合
+        
+        Args:
+            candidate_lists: 每套按分数降序的候选解
+            modules_by_signature: 按属性签名分组的可替换模组
+            
+        Returns:
+            Optional[List[ModuleSolution]]: 每套选中的解, 列表内不存在完整组合时返回None
+        """
+        if any(not candidates for candidates in candidate_lists):
+            return None
+        # 剩余各套取列表首位之和作为上界
+        suffix_bound = [0] * (len(candidate_lists) + 1)
+        for index in range(len(candidate_lists) - 1, -1, -1):
+            suffix_bound[index] = suffix_bound[index + 1] + candidate_lists[index][0].score
+        
+        best_total = float('-inf')
+        best_assignment = None
+        nodes = 0
+        
+        def search(index: int, used_uuids: set, total: int, picked: List[ModuleSolution]):
+            nonlocal best_total, best_assignment, nodes
+            if index == len(candidate_lists):
+                if total > best_total:
+                    best_total = total
+                    best_assignment = list(picked)
+                return
+            for solution in candidate_lists[index]:
+                if total + solution.score + suffix_bound[index + 1] <= best_total:
+                    break
+                nodes += 1
+                if nodes > self.loadout_search_nodes:
+                    return
+                chosen = self._resolve_disjoint_modules(solution, used_uuids, modules_by_signature)
+                if chosen is None:
+                    continue
+                picked.append(self._with_modules(solution, chosen))
+                search(index + 1, used_uuids | {module.uuid for module in chosen}, total + solution.score, picked)
+                picked.pop()
+        
+        search(0, set(), 0, [])
+        return best_assignment
+    
+    def _search_loadout(self, optimizer: 'ModuleOptimizer', modules: List[ModuleInfo],
+                        extra_banned: set, max_solutions: int) -> List[ModuleSolution]:
+        """按单套配置在模组池上精确求解, 临时禁用其它套占用的模组
+        
+        Args:
+            optimizer: 单套配置对应的优化器
+            modules: 该套的模组池
+            extra_banned: 额外禁用的模组uuid
+            max_solutions: 返回解数量
+            
+        Returns:
+            List[ModuleSolution]: 按分数降序的解列表, 分数为该套配置下的评分
+        """
+        banned_uuids, solution_count = optimizer.banned_uuids, optimizer.max_solutions
+        optimizer.banned_uuids = banned_uuids | extra_banned
+        optimizer.max_solutions = max_solutions
+        try:
+            pool = [module for module in modules if module.uuid not in extra_banned]
+            if len(pool) < self.combination_size:
+                return []
+            solutions = optimizer._filter_by_min_attr(optimizer._strategy_branch_and_bound(pool))
+        finally:
+            optimizer.banned_uuids, optimizer.max_solutions = banned_uuids, solution_count
+        solutions.sort(key=lambda x: x.score, reverse=True)
+        return solutions
+    
+    def _get_planner(self) -> StrategyPlanner:
+        """获取策略规划器, 首次使用时读取或运行本机校准"""
+        if self._planner is None:
+            self._planner = StrategyPlanner(
+                self.get_cpu_count(), self._beam_worker_count(), self.beam_width, lang=self.lang)
+        return self._planner
+    
+    def _plan_strategies(self, modules: List[ModuleInfo]) -> StrategyPlan:
+        """按模组数量、重复度与计分属性估计各引擎耗时, 选择能在时延预算内完成的引擎组合
+        
+        Args:
+            modules: 支配预筛选后的模组列表
+            
+        Returns:
+            StrategyPlan: 执行计划
+        """
+        _, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        scored_attrs = {part.id for module in modules for part in module.parts if part.id not in exclude_attrs_set}
+        scored_attrs.update(min_attr_id_requirements)
+        locked_count = sum(1 for module in modules if module.uuid in self.locked_uuids)
+        distinct_count = len({self._module_signature(module) for module in modules})
+        # beam候选为单项属性筛选结果加上精确引擎覆盖的模组, 规划器按两者之和估计beam耗时
+        candidate_count = len({
+            module.uuid for attr_modules in self._prefilter_modules_by_attr_values(modules).values()
+            for module in attr_modules})
+        
+        planner = self._get_planner()
+        free_size = self.combination_size - locked_count
+        # 首次运行的校准计入本次优化的耗时, 先完成校准再计算剩余预算
+        planner.ensure_calibrated()
+        budget = self._planning_budget()
+        exact_fit = planner.fit_exact_search(
+            len(modules), free_size, budget, lambda count: self._probe_branch_and_bound(modules, count))
+        budget = self._planning_budget()
+        plan = planner.plan(
+            len(modules), distinct_count, max(candidate_count, self.combination_size), free_size,
+            len(scored_attrs), self.beam_width, budget, locked_count, self.beam_adaptive_width,
+            exact_fit, self._should_run_annealing(modules))
+        if plan.run_beam and plan.beam_width < self.beam_width:
+            self.logger.info(self._t(
+                f"策略规划: beam search在宽度{self.beam_width}下超出时延预算, 缩小为{plan.beam_width}",
+                f"Strategy plan: beam search at width {self.beam_width} exceeds the latency budget, narrowed to {plan.beam_width}"))
+        if plan.run_beam:
+            self.logger.info(self._t(
+                f"策略规划: 全量精确搜索超出时延预算{budget:.1f}s, {plan.exact_engine}覆盖前{plan.exact_module_count}个模组并行beam search, 预计{plan.estimated_seconds:.1f}s",
+                f"Strategy plan: full exact search exceeds the {budget:.1f}s budget, {plan.exact_engine} over top {plan.exact_module_count} modules in parallel with beam search, estimated {plan.estimated_seconds:.1f}s"))
+        elif not plan.certified:
+            self.logger.info(self._t(
+                f"策略规划: 全量精确搜索与beam search均超出时延预算{budget:.1f}s, {plan.exact_engine}只覆盖前{plan.exact_module_count}个模组, 预计{plan.estimated_seconds:.1f}s",
+                f"Strategy plan: both full exact search and beam search exceed the {budget:.1f}s budget, {plan.exact_engine} over top {plan.exact_module_count} modules only, estimated {plan.estimated_seconds:.1f}s"))
+        else:
+            self.logger.info(self._t(
+                f"策略规划: {plan.exact_engine}在全部{plan.exact_module_count}个模组上精确搜索, 预计{plan.estimated_seconds:.1f}s",
+                f"Strategy plan: {plan.exact_engine} exact search over all {plan.exact_module_count} modules, estimated {plan.estimated_seconds:.1f}s"))
+        if plan.run_annealing:
+            self.logger.info(self._t("策略规划: 模拟退火与beam search并行", "Strategy plan: simulated annealing runs alongside beam search"))
+        if self._deadline_at is not None and plan.estimated_seconds > self._remaining_deadline_ms() / 1000.0:
+            self.logger.warning(self._t(
+                "策略规划: 计划预计耗时超出剩余截止时间, 各策略到期后返回已找到的部分结果",
+                "Strategy plan: the estimate exceeds the remaining deadline, strategies will return partial results when it expires"))
+        return plan
+    
+    def _probe_branch_and_bound(self, modules: List[ModuleInfo], count: int) -> Tuple[int, float]:
+        """在总属性最高的count个模组上运行一次分支定界, 供规划器拟合本次库存的精确搜索耗时
+        
+        Args:
+            modules: 支配预筛选后的模组列表
+            count: 探测覆盖的模组数量
+            
+        Returns:
+            Tuple[int, float]: (访问的节点数, 耗时秒数)
+        """
+        cpp_modules = self._convert_to_cpp_modules(self._top_modules_with_locked(modules, count))
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        deadline_ms = self._remaining_deadline_ms()
+        return StrategyPlanner.run_probe(lambda control: strategy_branch_and_bound_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            deadline_ms=deadline_ms,
+            control=control,
+        ))
+    
+    def _run_exact_engine(self, engine: str, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """运行规划器选出的精确引擎
+        
+        Args:
+            engine: 引擎名称
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        if engine == ENGINE_MEET_IN_THE_MIDDLE:
+            return self._strategy_meet_in_the_middle(modules)
+        if engine == ENGINE_CAPPED_SUM_DP:
+            return self._strategy_capped_sum_dp(modules)
+        if engine == ENGINE_GPU_ENUMERATION:
+            return self._strategy_enumeration(modules)
+        return self._strategy_branch_and_bound(modules)
+    
     def _strategy_enumeration(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
         """枚举
         
@@ -410,82 +1348,313 @@ class ModuleOptimizer:
         """
         
         cpp_modules = self._convert_to_cpp_modules(modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        cpp_solutions = strategy_enumeration_gpu_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,    
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        result = self._convert_from_cpp_solutions(cpp_solutions)
+
+        return result
+    
+    def _build_attr_id_args(self) -> Tuple[set, set, Dict[int, int]]:
+        """将目标属性/排除属性/最小属性和约束转换为C++接口使用的属性ID
+        
+        Returns:
+            Tuple[set, set, Dict[int, int]]: (目标属性ID集合, 排除属性ID集合, 最小属性和约束)
+        """
+        target_attrs_set = set()
+        for attr_str in self.target_attributes:
+            aid = MODULE_ATTR_IDS.get(attr_str)
+            if aid is not None:
+                target_attrs_set.add(aid)
         
-        # 将目标属性列表转换为集合
-        target_attributes_id = []
-        if self.target_attributes:
-            for attr_str in self.target_attributes:
-                aid = MODULE_ATTR_IDS.get(attr_str)
-                if aid is not None:
-                    target_attributes_id.append(aid)
-        target_attrs_set = set(target_attributes_id)
-        
-        # 将排除属性列表转换为集合
-        exclude_attributes_id = []
-        if self.exclude_attributes:
-            for attr_str in self.exclude_attributes:
-                exclude_attributes_id.append(MODULE_ATTR_IDS.get(attr_str))
-        exclude_attrs_set = set(exclude_attributes_id)
+        exclude_attrs_set = set()
+        for attr_str in self.exclude_attributes:
+            aid = MODULE_ATTR_IDS.get(attr_str)
+            if aid is not None:
+                exclude_attrs_set.add(aid)
         
         min_attr_id_requirements: Dict[int, int] = {}
-        if self.min_attr_sum_requirements:
-            for name, val in self.min_attr_sum_requirements.items():
-                aid = MODULE_ATTR_IDS.get(name)
-                if aid is not None:
-                    min_attr_id_requirements[aid] = int(val)
+        for name, val in self.min_attr_sum_requirements.items():
+            aid = MODULE_ATTR_IDS.get(name)
+            if aid is not None:
+                min_attr_id_requirements[aid] = int(val)
+        
+        return target_attrs_set, exclude_attrs_set, min_attr_id_requirements
+    
+    def _filter_category_modules(self, modules: List[ModuleInfo], category: ModuleCategory,
+                                 required: Optional[int] = None) -> Optional[List[ModuleInfo]]:
+        """筛选指定类型的模组并移除禁用的模组
+        
+        Args:
+            modules: 所有模组列表
+            category: 目标模组类型
+            required: 至少需要的模组数量, 默认为组合长度
+            
+        Returns:
+            Optional[List[ModuleInfo]]: 筛选后的模组列表, 数量不足required个时给出提示并返回None
+        """
+        cat_disp = category.value if self.lang != 'en' else CATEGORY_CN_TO_EN.get(category.value, category.value)
+        if category == ModuleCategory.ALL:
+            filtered_modules = modules
+            self.logger.info(self._t(f"使用全部模组，共{len(filtered_modules)}个", f"Using all modules, total={len(filtered_modules)}"))
+        else:
+            filtered_modules = [
+                module for module in modules 
+                if self.get_module_category(module) == category
+            ]
+            self.logger.info(self._t(f"找到{len(filtered_modules)}个{category.value}类型模组", f"Found {len(filtered_modules)} {cat_disp} modules"))
+        filtered_modules = self._drop_banned_modules(filtered_modules)
+        
+        required = self.combination_size if required is None else required
+        if len(filtered_modules) < required:
+            self.logger.warning(self._t(
+                f"{category.value}类型模组数量不足{required}个, 无法形成完整搭配",
+                f"Not enough {cat_disp} modules (<{required}) to form a combination"))
+            return None
+        return filtered_modules
+    
+    def _prefilter_dominated_modules(self, modules: List[ModuleInfo]) -> List[ModuleInfo]:
+        """支配关系预筛选, 丢弃的模组不可能出现在任何top-K解中
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleInfo]: 保留的模组列表
+        """
+        if len(modules) <= self.combination_size:
+            return modules
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+        kept_uuids = {
+            cpp_module.uuid for cpp_module in prefilter_dominated_modules_cpp(
+                self._convert_to_cpp_modules(modules),
+                target_attrs_set,
+                exclude_attrs_set,
+                min_attr_id_requirements,
+                self.max_solutions,
+                self.combination_size,
+                self.locked_uuids,
+                self.banned_uuids,
+                **self._search_kwargs(),
+            )
+        }
+        kept_modules = [module for module in modules if module.uuid in kept_uuids]
+        
+        self.logger.info(self._t(
+            f"支配关系预筛选: 移除{len(modules) - len(kept_modules)}个模组, 保留{len(kept_modules)}个",
+            f"Dominance prefilter: removed {len(modules) - len(kept_modules)} modules, {len(kept_modules)} remain"))
+        return kept_modules
+    
+    def _strategy_branch_and_bound(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """分支定界精确求解, 按后缀上界剪枝, 结果与全量枚举一致
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
 
-        cpp_solutions = strategy_enumeration_gpu_cpp(
+        self.logger.info(self._t(
+            f"分支定界精确搜索, 模组数量: {len(modules)}",
+            f"Branch-and-bound exact search over {len(modules)} modules"))
+        cpp_solutions = strategy_branch_and_bound_cpp(
             cpp_modules,
             target_attrs_set,
             exclude_attrs_set,
-            min_attr_id_requirements,    
+            min_attr_id_requirements,
             self.max_solutions,
             self.get_cpu_count(),
             self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
         )
         
         result = self._convert_from_cpp_solutions(cpp_solutions)
 
         return result
     
-    def _strategy_beam_search(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+    def _strategy_meet_in_the_middle(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """两两属性和表合并精确求解, 结果与全量枚举一致
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        self.logger.info(self._t(
+            f"两两表精确搜索, 模组数量: {len(modules)}",
+            f"Pair-table exact search over {len(modules)} modules"))
+        cpp_solutions = strategy_meet_in_the_middle_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        return self._convert_from_cpp_solutions(cpp_solutions)
+    
+    def _strategy_capped_sum_dp(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """截断属性和动态规划精确求解, 适用于大部分属性被排除的场景
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        self.logger.info(self._t(
+            f"截断属性和动态规划精确搜索, 模组数量: {len(modules)}",
+            f"Capped-sum DP exact search over {len(modules)} modules"))
+        cpp_solutions = strategy_capped_sum_dp_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.combination_size,
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        return self._convert_from_cpp_solutions(cpp_solutions)
+    
+    def _strategy_beam_search(self, modules: List[ModuleInfo], beam_width: Optional[int] = None) -> List[ModuleSolution]:
         """Beam Search 近似求解
         
         Args:
             modules: 所有模组列表
+            beam_width: 本次使用的beam宽度, 默认为self.beam_width
             
         Returns:
             List[ModuleSolution]: 最优解列表
         """
         
         cpp_modules = self._convert_to_cpp_modules(modules)
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
 
-        # 将目标属性列表转换为集合
-        target_attributes_id: List[int] = []
-        if self.target_attributes:
-            for attr_str in self.target_attributes:
-                aid = MODULE_ATTR_IDS.get(attr_str)
-                if aid is not None:
-                    target_attributes_id.append(aid)
-        target_attrs_set = set(target_attributes_id)
-        
-        # 将排除属性列表转换为集合
-        exclude_attributes_id = []
-        if self.exclude_attributes:
-            for attr_str in self.exclude_attributes:
-                aid = MODULE_ATTR_IDS.get(attr_str)
-                if aid is not None:
-                    exclude_attributes_id.append(aid)
-        exclude_attrs_set = set(exclude_attributes_id)
+        stats = BeamSearchStats()
+        cpp_solutions = strategy_beam_search_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            beam_width or self.beam_width,
+            self.beam_expand_per_state,
+            self.combination_size,
+            self._beam_worker_count(),
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+            adaptive_width=self.beam_adaptive_width,
+            stats=stats)
+        self.last_beam_stats = stats
+        self.logger.info(self._t(
+            f"Beam Search 最终宽度: {stats.final_width}, 轮数: {stats.passes}, 剩余上界差距: {stats.bound_gap}, 已证明最优: {stats.exact}",
+            f"Beam search final width: {stats.final_width}, passes: {stats.passes}, remaining bound gap: {stats.bound_gap}, proven exact: {stats.exact}"))
         
-        min_attr_id_requirements: Dict[int, int] = {}
-        if self.min_attr_sum_requirements:
-            for name, val in self.min_attr_sum_requirements.items():
-                aid = MODULE_ATTR_IDS.get(name)
-                if aid is not None:
-                    min_attr_id_requirements[aid] = int(val)
+        result = self._convert_from_cpp_solutions(cpp_solutions)
+        
+        return result
+    
+    def _should_run_annealing(self, modules: List[ModuleInfo]) -> bool:
+        """是否与beam search并行运行模拟退火, 只用于5模组且模组很多的情况"""
+        return (self.annealing_enabled and self.combination_size == 5
+                and len(modules) >= self.annealing_min_modules)
+    
+    def _strategy_simulated_annealing(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """模拟退火近似求解, 多次独立重启在线程池上并行
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
 
-        cpp_solutions = strategy_beam_search_cpp(
+        self.logger.info(self._t(
+            f"模拟退火, 模组数量: {len(modules)}, 重启次数: {self.annealing_restarts}, 每次移动: {self.annealing_iterations}",
+            f"Simulated annealing over {len(modules)} modules, {self.annealing_restarts} restarts x {self.annealing_iterations} moves"))
+        cpp_solutions = strategy_simulated_annealing_cpp(
+            cpp_modules,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.annealing_restarts,
+            self.annealing_iterations,
+            self.annealing_seed,
+            self.combination_size,
+            self.get_cpu_count(),
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        result = self._convert_from_cpp_solutions(cpp_solutions)
+
+        return result
+    
+    def _strategy_beam_then_exact(self, modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """Beam Search与精确搜索流水线, 每个解标明是否已证明最优
+        
+        Args:
+            modules: 模组列表
+            
+        Returns:
+            List[ModuleSolution]: 最优解列表
+        """
+        
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        self.logger.info(self._t(
+            f"Beam+精确搜索流水线, 模组数量: {len(modules)}",
+            f"Beam + exact search pipeline over {len(modules)} modules"))
+        cpp_solutions = strategy_beam_then_exact_cpp(
             cpp_modules,
             target_attrs_set,
             exclude_attrs_set,
@@ -494,33 +1663,109 @@ class ModuleOptimizer:
             self.beam_width,
             self.beam_expand_per_state,
             self.combination_size,
-            min(self.beam_max_workers, self.get_cpu_count()))
+            self.get_cpu_count(),
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
         
         result = self._convert_from_cpp_solutions(cpp_solutions)
+        certified_count = sum(1 for solution in result if solution.certified)
+        self.logger.info(self._t(
+            f"流水线完成: {certified_count}/{len(result)}个解已证明最优",
+            f"Pipeline finished: {certified_count}/{len(result)} solutions certified optimal"))
+
+        return result
+    
+    def _local_search_swap(self, solutions: List[ModuleSolution], modules: List[ModuleInfo]) -> List[ModuleSolution]:
+        """以已有解为起点, 在全部模组上做1-交换/2-交换局部搜索
+        
+        Args:
+            solutions: 起点解列表
+            modules: 全部模组列表
+            
+        Returns:
+            List[ModuleSolution]: 起点与改进组合合并后的最优解列表
+        """
         
+        cpp_modules = self._convert_to_cpp_modules(modules)
+        seed_uuids = [[module.uuid for module in solution.modules] for solution in solutions]
+
+        target_attrs_set, exclude_attrs_set, min_attr_id_requirements = self._build_attr_id_args()
+
+        self.logger.info(self._t(
+            f"交换局部搜索, 起点数量: {len(seed_uuids)}, 模组数量: {len(modules)}",
+            f"Swap local search from {len(seed_uuids)} seeds over {len(modules)} modules"))
+        cpp_solutions = local_search_swap_cpp(
+            cpp_modules,
+            seed_uuids,
+            target_attrs_set,
+            exclude_attrs_set,
+            min_attr_id_requirements,
+            self.max_solutions,
+            self.get_cpu_count(),
+            self.locked_uuids,
+            self.banned_uuids,
+            **self._search_kwargs(),
+        )
+        
+        result = self._convert_from_cpp_solutions(cpp_solutions)
+
         return result
     
-    def _complete_deduplicate(self, solutions: List[ModuleSolution]) -> List[ModuleSolution]:
+    def _complete_deduplicate(self, solutions: List[ModuleSolution],
+                              modules: Optional[List[ModuleInfo]] = None) -> List[ModuleSolution]:
         """模组去重++
         
+        只交换同一大类且属性完全相同的模组得到的搭配视为同一个解, 保留先出现的版本(精确结果在前);
+        beam/退火/局部搜索不合并等价模组, 各引擎结果合并后在这里统一折叠
+        
         Args:
-            modules: 模组列表
+            solutions: 解列表
+            modules: 可参与搭配的模组, 给出时按它补全每个位置的全部等价替换模组,
+                否则只合并被去掉的重复解中出现的等价模组
             
         Returns:
-            List: 去重后的模组列表
+            List: 去重后的解列表
         """
-                
-        unique_solutions = []
-        seen_combinations = set()
+        twins: Dict[tuple, List[int]] = {}
+        for module in modules or []:
+            if module.uuid not in self.locked_uuids:
+                twins.setdefault(self._module_signature(module), []).append(module.uuid)
         
+        unique_solutions = []
+        seen_combinations: Dict[tuple, ModuleSolution] = {}
         for solution in solutions:
-            module_ids = tuple(sorted([module.uuid for module in solution.modules]))
-            if module_ids not in seen_combinations:
-                seen_combinations.add(module_ids)
+            signatures = [self._module_signature(module) for module in solution.modules]
+            key = tuple(sorted(signatures))
+            kept = seen_combinations.get(key)
+            if kept is None:
+                seen_combinations[key] = solution
                 unique_solutions.append(solution)
+                candidates = [twins.get(signature, []) for signature in signatures]
+            else:
+                # 重复解中与某位置签名相同的模组都可以替换该位置
+                dropped: Dict[tuple, List[int]] = {}
+                for signature, module in zip(signatures, solution.modules):
+                    dropped.setdefault(signature, []).append(module.uuid)
+                candidates = [dropped.get(self._module_signature(module), []) for module in kept.modules]
+            self._merge_equivalent_uuids(kept or solution, candidates)
         
         return unique_solutions
     
+    def _merge_equivalent_uuids(self, solution: ModuleSolution, candidates: List[List[int]]):
+        """把candidates中未被选中的模组并入各位置的等价替换列表, 锁定模组不参与替换"""
+        chosen = {module.uuid for module in solution.modules}
+        equivalents = [list(uuids) for uuids in solution.equivalent_uuids]
+        equivalents += [[] for _ in range(len(solution.modules) - len(equivalents))]
+        for pos, module in enumerate(solution.modules):
+            if module.uuid in self.locked_uuids:
+                continue
+            for uuid in candidates[pos]:
+                if uuid not in chosen and uuid not in self.locked_uuids and uuid not in equivalents[pos]:
+                    equivalents[pos].append(uuid)
+        solution.equivalent_uuids = equivalents
+    
     def _convert_to_cpp_modules(self, modules: List[ModuleInfo]) -> List:
         """python数据结构转C++
         
@@ -529,7 +1774,13 @@ class ModuleOptimizer:
             
         Returns:
             List: C++模组结构
+            
+        Raises:
+            ValueError: 模组数量超过单次搜索上限
         """
+        # C++端组合下标以16位存储
+        if len(modules) > MAX_SEARCH_MODULES:
+            raise ValueError(f"a single search supports at most {MAX_SEARCH_MODULES} modules, got {len(modules)}")
 
         cpp_modules = []
         for module in modules:
@@ -565,7 +1816,9 @@ class ModuleOptimizer:
                 ))
             
             solutions.append(ModuleSolution(
-                modules, cpp_solution.score, cpp_solution.attr_breakdown
+                modules, cpp_solution.score, cpp_solution.attr_breakdown,
+                [list(uuids) for uuids in cpp_solution.equivalent_uuids],
+                cpp_solution.certified, cpp_solution.partial
             ))
         return solutions
     
@@ -614,7 +1867,8 @@ class ModuleOptimizer:
             original_score = threshold_power + total_attr_power
             
             restored_solutions.append(ModuleSolution(
-                solution.modules, original_score, attr_breakdown
+                solution.modules, original_score, attr_breakdown, solution.equivalent_uuids,
+                solution.certified, solution.partial
             ))
         
         return restored_solutions
@@ -652,6 +1906,12 @@ class ModuleOptimizer:
             print(f"战斗力: {solution.score:.2f}")
             self._log_result(f"战斗力: {solution.score:.2f}")
         
+        certified_line = self._t(
+            "结果: 已证明最优" if solution.certified else "结果: 启发式",
+            "Result: certified optimal" if solution.certified else "Result: heuristic")
+        print(certified_line)
+        self._log_result(certified_line)
+        
         if self.lang == 'en':
             print("\nModules:")
             self._log_result("\nModules:")
@@ -668,6 +1928,11 @@ class ModuleOptimizer:
                 parts_str = ", ".join([f"{p.name}+{p.value}" for p in module.parts])
                 print(f"  {i}. {module.name} (品质{module.quality}) - {parts_str}")
                 self._log_result(f"  {i}. {module.name} (品质{module.quality}) - {parts_str}")
+            if i <= len(solution.equivalent_uuids) and solution.equivalent_uuids[i - 1]:
+                uuids_str = ", ".join(str(uuid) for uuid in solution.equivalent_uuids[i - 1])
+                line = self._t(f"     可互换: {uuids_str}", f"     Interchangeable: {uuids_str}")
+                print(line)
+                self._log_result(line)
         
         if self.lang == 'en':
             print("\nAttribute Breakdown:")
@@ -0,0 +1,594 @@
+"""
+策略规划器 - 按库存规模、重复度、计分属性与实测机器吞吐估计各引擎耗时, 在时延预算内选择或组合引擎
+"""
+
+import json
+import os
+import platform
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from math import comb, log
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logging_config import get_logger
+from module_types import BASIC_ATTR_IDS, SPECIAL_ATTR_IDS
+from cpp_extension.module_optimizer_cpp import (
+    ModulePart as CppModulePart,
+    ModuleInfo as CppModuleInfo,
+    strategy_enumeration_gpu_cpp,
+    strategy_beam_search_cpp,
+    strategy_branch_and_bound_cpp,
+    strategy_meet_in_the_middle_cpp,
+    strategy_capped_sum_dp_cpp,
+    strategy_simulated_annealing_cpp,
+    SearchControl,
+    test_cuda,
+    test_opencl,
+)
+
+logger = get_logger(__name__)
+
+# 精确引擎, CPU全量枚举在任何规模上都不优于分支定界, 不参与规划
+ENGINE_GPU_ENUMERATION = "gpu_enumeration"
+ENGINE_BRANCH_AND_BOUND = "branch_and_bound"
+ENGINE_MEET_IN_THE_MIDDLE = "meet_in_the_middle"
+ENGINE_CAPPED_SUM_DP = "capped_sum_dp"
+# 近似引擎
+ENGINE_BEAM = "beam"
+ENGINE_ANNEALING = "annealing"
+
+# 校准结果格式版本, 计时方式或代价模型变化时递增使旧缓存失效
+CALIBRATION_VERSION = 3
+CALIBRATION_FILE_NAME = "strategy_calibration.json"
+
+# 分支定界的耗时由访问节点数与节点吞吐决定, 两者都按组合数 C(n, r) 的幂次拟合:
+# 合成库存在两个规模上校准, 真实库存的剪枝效率与之相差数十倍, 规划前再在实际库存总属性最高的前缀上探测.
+# 探测从组合数约为起点值的前缀开始按倍数放大, 至少两次, 下一次预计超出预算的一定比例时停止;
+# 相邻前缀的剪枝效率起伏较大, 预算允许时多探测几次以拉开规模跨度
+PROBE_INITIAL_COMBINATIONS = 4000000
+PROBE_GROWTH = 1.6
+PROBE_MIN_SAMPLES = 2
+PROBE_BUDGET_FRACTION = 0.1
+# 计时噪声下拟合指数的合理范围: 节点数增长慢于组合数, 单节点耗时随规模缓慢上升
+NODE_EXPONENT_RANGE = (0.2, 1.0)
+THROUGHPUT_EXPONENT_RANGE = (0.0, 0.5)
+# 截断属性和DP的状态上界: 每个计分属性0-20共21档, 总属性值0-120共121档, 超过C++侧状态上限时回退分支定界
+DP_SLOT_LEVELS = 21
+DP_TOTAL_LEVELS = 121
+DP_MAX_STATES = 2000000
+# beam每层最多保留beam_width个状态, 每个状态向其后的全部模组扩展: 第一层n个根状态, 之后各层按宽度饱和计算
+# 单位代价在配置的beam宽度上按4/5模组分别校准
+# 自适应宽度先跑窄beam, 每轮都从根状态重跑; 初始宽度、放大倍数与窄beam轮数上限与C++侧一致,
+# 无法证明最优时最后跑一轮完整宽度
+ADAPTIVE_BEAM_INITIAL_WIDTH = 64
+ADAPTIVE_BEAM_GROWTH = 4
+ADAPTIVE_BEAM_MAX_NARROW_PASSES = 2
+# beam超出它的预算份额时每次按该比例缩小宽度, 低于最小宽度时不再运行beam
+BEAM_SHRINK_FACTOR = 0.8
+MIN_PLANNED_BEAM_WIDTH = 256
+# 与精确引擎共享核心时beam与模拟退火合计最多占用的预算比例, 其余留给精确引擎; 模拟退火单独最多占用的比例
+BEAM_BUDGET_SHARE = 0.5
+ANNEALING_BUDGET_SHARE = 0.25
+# 耗时过短的运行计时噪声大, 不用于修正单位代价
+MIN_RECORDED_SECONDS = 0.2
+
+
+def get_calibration_dir() -> str:
+    """获取校准缓存所在目录, 与日志目录同级"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class ExactSearchFit:
+    """分支定界耗时模型, 由不同规模的实测拟合
+
+    访问节点数与节点吞吐分别按组合数之比的幂次外推, 预计耗时为节点数除以吞吐。
+
+    Attributes:
+        free_size: 拟合时的待选位置数
+        module_count: 最大一次实测的模组数量
+        nodes: 最大一次实测访问的节点数
+        seconds: 最大一次实测的耗时(秒)
+        node_exponent: 节点数随组合数增长的指数
+        throughput_exponent: 节点吞吐随组合数下降的指数
+    """
+    free_size: int
+    module_count: int
+    nodes: float
+    seconds: float
+    node_exponent: float
+    throughput_exponent: float
+
+    @classmethod
+    def from_samples(cls, free_size: int, samples: List[Tuple[int, int, float]]) -> 'ExactSearchFit':
+        """由至少两次(模组数量, 节点数, 耗时)实测在对数坐标上最小二乘拟合, 指数限制在合理范围内以抑制计时噪声"""
+        xs = [log(comb(count, free_size)) for count, _, _ in samples]
+        node_logs = [log(max(nodes, 1)) for _, nodes, _ in samples]
+        throughput_logs = [log(max(nodes, 1) / max(seconds, 1e-4)) for _, nodes, seconds in samples]
+        mean_x = sum(xs) / len(xs)
+        spread = sum((x - mean_x) ** 2 for x in xs)
+
+        def slope(ys: List[float]) -> float:
+            mean_y = sum(ys) / len(ys)
+            return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+        count, nodes, seconds = max(samples)
+        return cls(
+            free_size, count, float(max(nodes, 1)), max(seconds, 1e-4),
+            min(max(slope(node_logs), NODE_EXPONENT_RANGE[0]), NODE_EXPONENT_RANGE[1]),
+            min(max(-slope(throughput_logs), THROUGHPUT_EXPONENT_RANGE[0]), THROUGHPUT_EXPONENT_RANGE[1]))
+
+    def estimate_nodes(self, module_count: int, free_size: int) -> float:
+        return self.nodes * self._ratio(module_count, free_size) ** self.node_exponent
+
+    def estimate_seconds(self, module_count: int, free_size: int) -> float:
+        """预计耗时; 待选位置数与拟合时不同时按组合数之比外推"""
+        ratio = self._ratio(module_count, free_size)
+        throughput = self.nodes / self.seconds * ratio ** -self.throughput_exponent
+        return self.estimate_nodes(module_count, free_size) / throughput
+
+    def _ratio(self, module_count: int, free_size: int) -> float:
+        return comb(max(module_count, free_size), free_size) / comb(self.module_count, self.free_size)
+
+
+@dataclass
+class StrategyPlan:
+    """引擎执行计划
+
+    Attributes:
+        exact_engine: 精确引擎名称
+        exact_module_count: 精确引擎覆盖的模组数量(按总属性值排序取前N个)
+        run_beam: 是否并行运行beam search补充未覆盖的模组
+        estimated_seconds: 预计耗时(秒)
+        certified: 精确引擎是否覆盖全部模组, 即结果可证明最优
+        distinct_count: 精确引擎覆盖的模组中属性不同的数量
+        free_size: 除锁定模组外待选的位置数
+        scored_slots: 参与计分的属性种类数
+        beam_width: beam search使用的宽度, 预算不足时小于配置的宽度, 不运行beam时为0
+        run_annealing: 是否与beam search并行运行模拟退火
+        probed: 精确引擎耗时是否按本次库存上的分支定界探测估计
+    """
+    exact_engine: str
+    exact_module_count: int
+    run_beam: bool
+    estimated_seconds: float
+    certified: bool
+    distinct_count: int = 0
+    free_size: int = 0
+    scored_slots: int = 0
+    beam_width: int = 0
+    run_annealing: bool = False
+    probed: bool = False
+
+
+class StrategyPlanner:
+    """按代价模型在时延预算内选择引擎
+
+    分支定界类引擎的耗时按实测节点数与节点吞吐拟合, 其它引擎的耗时模型为 单位代价 x 工作量,
+    工作量由模组数量、待选位置数和计分属性数决定. 校准微基准在本机测得单位代价与合成库存上的
+    分支定界拟合并缓存到磁盘; 库存较大时规划前另在实际库存上探测分支定界。
+    并行运行的引擎共享全部核心, 各自的耗时按线程数折算为CPU时间后合计。
+    """
+
+    def __init__(self, max_workers: int, beam_max_workers: int, beam_width: int,
+                 cache_path: Optional[str] = None, lang: str = 'zh'):
+        """初始化策略规划器
+
+        Args:
+            max_workers: 精确引擎与模拟退火使用的线程数, 即可用核心数
+            beam_max_workers: beam search使用的线程数
+            beam_width: 配置的beam宽度, beam单位代价在该宽度上校准
+            cache_path: 校准缓存文件路径, 默认位于程序目录
+            lang: 日志语言
+        """
+        self.lang = (lang or 'zh').lower()
+        self.max_workers = max(1, int(max_workers))
+        self.beam_max_workers = max(1, int(beam_max_workers))
+        self.beam_width = max(1, int(beam_width))
+        self.cache_path = cache_path or os.path.join(get_calibration_dir(), CALIBRATION_FILE_NAME)
+        self.gpu_available = bool(test_cuda()) or bool(test_opencl())
+        self._unit_costs: Optional[Dict[str, float]] = None
+        self._exact_fits: Optional[Dict[int, ExactSearchFit]] = None
+
+    def _t(self, zh: str, en: str) -> str:
+        return en if self.lang == 'en' else zh
+
+    def machine_signature(self) -> str:
+        """本机特征, 任一项变化都需要重新校准"""
+        return "|".join([
+            platform.system(), platform.machine(), platform.processor(),
+            f"workers={self.max_workers}", f"beam_workers={self.beam_max_workers}", f"beam_width={self.beam_width}",
+            f"gpu={int(self.gpu_available)}", f"v{CALIBRATION_VERSION}",
+        ])
+
+    @property
+    def unit_costs(self) -> Dict[str, float]:
+        """各引擎单位代价, 首次访问时读取缓存, 缓存缺失或失效时运行校准"""
+        self.ensure_calibrated()
+        return self._unit_costs
+
+    @property
+    def exact_fits(self) -> Dict[int, ExactSearchFit]:
+        """合成库存上4/5模组的分支定界耗时模型, 与单位代价一起校准"""
+        self.ensure_calibrated()
+        return self._exact_fits
+
+    def ensure_calibrated(self):
+        """读取校准缓存, 缓存缺失或失效时运行校准"""
+        if self._unit_costs is None:
+            calibration = self._load_calibration()
+            if calibration is None:
+                calibration = self.calibrate()
+                self._save_calibration(*calibration)
+            self._unit_costs, self._exact_fits = calibration
+
+    def _load_calibration(self) -> Optional[Tuple[Dict[str, float], Dict[int, ExactSearchFit]]]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("signature") != self.machine_signature():
+            return None
+        unit_costs = data.get("unit_costs")
+        exact_fits = data.get("exact_fits")
+        if not isinstance(unit_costs, dict) or not isinstance(exact_fits, dict):
+            return None
+        try:
+            return ({name: float(value) for name, value in unit_costs.items()},
+                    {int(free_size): ExactSearchFit(**fit) for free_size, fit in exact_fits.items()})
+        except (TypeError, ValueError):
+            return None
+
+    def _save_calibration(self, unit_costs: Dict[str, float], exact_fits: Dict[int, ExactSearchFit]):
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "signature": self.machine_signature(),
+                    "unit_costs": unit_costs,
+                    "exact_fits": {str(free_size): asdict(fit) for free_size, fit in exact_fits.items()},
+                }, f, indent=2)
+        except OSError as e:
+            logger.warning(self._t(f"保存策略校准结果失败: {e}", f"Failed to save strategy calibration: {e}"))
+
+    @staticmethod
+    def _build_calibration_modules(count: int) -> List:
+        """构造固定随机种子的合成库存, 属性分布与单一类型的真实模组相近"""
+        rng = random.Random(0)
+        basic_ids = rng.sample(sorted(BASIC_ATTR_IDS), 9)
+        special_ids = rng.sample(sorted(SPECIAL_ATTR_IDS), 4)
+        values = list(range(1, 11))
+        value_weights = (2, 4, 8, 6, 6, 3, 4, 3, 3, 3)
+        modules = []
+        for uuid in range(1, count + 1):
+            part_count = 3 if rng.random() < 0.75 else 2
+            attr_ids = rng.sample(basic_ids, part_count)
+            if rng.random() < 0.08:
+                attr_ids[-1] = rng.choice(special_ids)
+            parts = [
+                CppModulePart(attr_id, str(attr_id), rng.choices(values, value_weights)[0])
+                for attr_id in attr_ids
+            ]
+            modules.append(CppModuleInfo(str(uuid), 0, uuid, 4, parts))
+        return modules
+
+    @staticmethod
+    def _time_call(fn) -> float:
+        start = time.perf_counter()
+        fn()
+        return max(time.perf_counter() - start, 1e-4)
+
+    @staticmethod
+    def run_probe(fn: Callable[[SearchControl], object]) -> Tuple[int, float]:
+        """运行一次分支定界, 返回最后一次进度汇报的节点数与耗时(秒)
+
+        Args:
+            fn: 以SearchControl为参数调用分支定界
+
+        Returns:
+            Tuple[int, float]: (访问的节点数, 耗时秒数)
+        """
+        control = SearchControl()
+        processed = []
+        control.set_progress_callback(lambda progress: processed.append(progress.processed))
+        seconds = StrategyPlanner._time_call(lambda: fn(control))
+        return (processed[-1] if processed else 0), seconds
+
+    def calibrate(self) -> Tuple[Dict[str, float], Dict[int, ExactSearchFit]]:
+        """运行校准微基准, 测得各引擎单位代价与分支定界耗时模型
+
+        两两表与分支定界共享同一套搜索和剪枝, 其单位代价记为同规模上与分支定界的耗时之比。
+
+        Returns:
+            Tuple[Dict[str, float], Dict[int, ExactSearchFit]]:
+                (引擎名称 -> 单位代价(秒/工作量), 待选位置数 -> 分支定界耗时模型)
+        """
+        logger.info(self._t("运行策略校准微基准", "Running strategy calibration microbenchmark"))
+        modules = self._build_calibration_modules(320)
+        exclude_all_but_two = set(sorted(BASIC_ATTR_IDS | SPECIAL_ATTR_IDS)[2:])
+        workers = self.max_workers
+        unit_costs: Dict[str, float] = {}
+        exact_fits: Dict[int, ExactSearchFit] = {}
+
+        for free_size, counts in ((4, (160, 320)), (5, (70, 110))):
+            samples = []
+            for count in counts:
+                subset = modules[:count]
+                nodes, seconds = self.run_probe(lambda control: strategy_branch_and_bound_cpp(
+                    subset, set(), set(), {}, 60, workers, free_size, control=control))
+                samples.append((count, nodes, seconds))
+            exact_fits[free_size] = ExactSearchFit.from_samples(free_size, samples)
+            unit_costs[f"{ENGINE_MEET_IN_THE_MIDDLE}_{free_size}"] = self._time_call(
+                lambda: strategy_meet_in_the_middle_cpp(subset, set(), set(), {}, 60, workers, free_size)
+            ) / samples[-1][2]
+
+        subset = modules[:160]
+        if self.gpu_available:
+            unit_costs[ENGINE_GPU_ENUMERATION] = self._time_call(
+                lambda: strategy_enumeration_gpu_cpp(subset, set(), set(), {}, 60, workers, 4)) / comb(160, 4)
+
+        unit_costs[ENGINE_CAPPED_SUM_DP] = self._time_call(
+            lambda: strategy_capped_sum_dp_cpp(subset, set(), exclude_all_but_two, {}, 60, workers, 4)
+        ) / self.dp_work(160, 4, 2)
+        for free_size in (4, 5):
+            unit_costs[f"{ENGINE_BEAM}_{free_size}"] = self._time_call(
+                lambda: strategy_beam_search_cpp(
+                    subset, set(), set(), {}, 60, self.beam_width, 0, free_size, self.beam_max_workers)
+            ) / self.beam_work(160, free_size, self.beam_width)
+        # 合成库存上模拟退火的候选筛选随模组数急剧变慢, 在较小的子集上计时, 与真实大库存上的耗时相当
+        annealing_subset = modules[:80]
+        unit_costs[ENGINE_ANNEALING] = self._time_call(
+            lambda: strategy_simulated_annealing_cpp(
+                annealing_subset, set(), set(), {}, 60, workers, 2000, 1, 5, workers))
+
+        logger.info(self._t(f"策略校准完成: {unit_costs}, {exact_fits}",
+                            f"Strategy calibration finished: {unit_costs}, {exact_fits}"))
+        return unit_costs, exact_fits
+
+    def fit_exact_search(self, module_count: int, free_size: int, latency_budget: Optional[float],
+                         probe: Callable[[int], Tuple[int, float]]) -> Optional[ExactSearchFit]:
+        """在实际库存总属性最高的前缀上探测分支定界, 拟合本次库存的耗时模型
+
+        不限时或库存小到探测前缀已接近全部模组时不探测, 沿用校准的模型。
+
+        Args:
+            module_count: 支配预筛选后的模组数量
+            free_size: 除锁定模组外待选的位置数
+            latency_budget: 时延预算(秒), None表示不限时
+            probe: 在前N个模组上运行分支定界, 返回(访问的节点数, 耗时秒数)
+
+        Returns:
+            Optional[ExactSearchFit]: 拟合的耗时模型, 未探测时为None
+        """
+        if latency_budget is None or free_size <= 0:
+            return None
+        count = free_size
+        while comb(count, free_size) < PROBE_INITIAL_COMBINATIONS:
+            count += 1
+        if int(count * PROBE_GROWTH) >= module_count:
+            return None
+
+        samples = []
+        fit = None
+        while True:
+            nodes, seconds = probe(count)
+            if nodes <= 0:
+                return None
+            samples.append((count, nodes, seconds))
+            next_count = int(count * PROBE_GROWTH)
+            if len(samples) >= PROBE_MIN_SAMPLES:
+                fit = ExactSearchFit.from_samples(free_size, samples)
+                if next_count >= module_count \
+                        or fit.estimate_seconds(next_count, free_size) > latency_budget * PROBE_BUDGET_FRACTION:
+                    break
+            count = next_count
+        logger.info(self._t(
+            f"分支定界探测: {[sample[0] for sample in samples]}个模组, 节点数增长指数{fit.node_exponent:.2f}, "
+            f"吞吐下降指数{fit.throughput_exponent:.2f}, 全部{module_count}个模组预计"
+            f"{fit.estimate_nodes(module_count, free_size):.3g}个节点/{fit.estimate_seconds(module_count, free_size):.1f}s",
+            f"Branch-and-bound probes over {[sample[0] for sample in samples]} modules: node exponent "
+            f"{fit.node_exponent:.2f}, throughput exponent {fit.throughput_exponent:.2f}, all {module_count} modules "
+            f"estimated at {fit.estimate_nodes(module_count, free_size):.3g} nodes/"
+            f"{fit.estimate_seconds(module_count, free_size):.1f}s"))
+        return fit
+
+    @staticmethod
+    def dp_state_bound(scored_slots: int) -> int:
+        return DP_SLOT_LEVELS ** scored_slots * DP_TOTAL_LEVELS
+
+    @classmethod
+    def dp_work(cls, module_count: int, free_size: int, scored_slots: int) -> float:
+        return float(module_count * free_size * cls.dp_state_bound(scored_slots))
+
+    @staticmethod
+    def beam_work(module_count: int, free_size: int, beam_width: int) -> float:
+        return float(module_count * (min(module_count, beam_width) + max(free_size - 2, 0) * beam_width))
+
+    def exact_engine_costs(self, module_count: int, distinct_count: int, free_size: int,
+                           scored_slots: int, locked_count: int = 0,
+                           exact_fit: Optional[ExactSearchFit] = None) -> Dict[str, float]:
+        """估计各精确引擎在给定规模上的耗时
+
+        Args:
+            module_count: 模组数量
+            distinct_count: 属性完全相同的模组合并后的数量, 分支定界类引擎按等价类搜索
+            free_size: 除锁定模组外待选的位置数
+            scored_slots: 参与计分的属性种类数
+            locked_count: 锁定模组数量
+            exact_fit: 本次库存上探测得到的分支定界耗时模型, 按模组数量外推; 为None时按去重后的数量使用校准模型
+
+        Returns:
+            Dict[str, float]: 引擎名称 -> 预计耗时(秒)
+        """
+        if free_size <= 0:
+            return {ENGINE_BRANCH_AND_BOUND: 0.0}
+        unit_costs = self.unit_costs
+        if exact_fit is not None:
+            branch_and_bound_seconds = exact_fit.estimate_seconds(module_count, free_size)
+        else:
+            branch_and_bound_seconds = self.exact_fits[self._fit_key(free_size)].estimate_seconds(
+                distinct_count, free_size)
+        costs = {ENGINE_BRANCH_AND_BOUND: branch_and_bound_seconds}
+        if free_size >= 3:
+            costs[ENGINE_MEET_IN_THE_MIDDLE] = branch_and_bound_seconds \
+                * unit_costs[f"{ENGINE_MEET_IN_THE_MIDDLE}_{self._fit_key(free_size)}"]
+        if self.dp_state_bound(scored_slots) <= DP_MAX_STATES:
+            costs[ENGINE_CAPPED_SUM_DP] = unit_costs[ENGINE_CAPPED_SUM_DP] \
+                * self._engine_work(ENGINE_CAPPED_SUM_DP, module_count, free_size, scored_slots)
+        # GPU枚举核函数不支持锁定模组与5模组时会回退CPU
+        if ENGINE_GPU_ENUMERATION in unit_costs and free_size <= 4 and locked_count == 0:
+            costs[ENGINE_GPU_ENUMERATION] = unit_costs[ENGINE_GPU_ENUMERATION] \
+                * self._engine_work(ENGINE_GPU_ENUMERATION, module_count, free_size, scored_slots)
+        return costs
+
+    @staticmethod
+    def _fit_key(free_size: int) -> int:
+        """分支定界类引擎与beam的4/5模组分别校准, 剩余3个及以下位置沿用4模组的校准结果"""
+        return 5 if free_size >= 5 else 4
+
+    @classmethod
+    def _unit_key(cls, engine: str, free_size: int) -> str:
+        if engine == ENGINE_BEAM:
+            return f"{engine}_{cls._fit_key(free_size)}"
+        return engine
+
+    def _engine_work(self, engine: str, module_count: int, free_size: int, scored_slots: int) -> float:
+        if engine == ENGINE_CAPPED_SUM_DP:
+            return self.dp_work(module_count, free_size, scored_slots)
+        return float(comb(max(module_count, free_size), free_size))
+
+    def record_exact_run(self, plan: StrategyPlan, seconds: float):
+        """用实际运行耗时修正校准结果
+
+        合成库存与真实库存的剪枝效率不同, 每次精确搜索后按实测与预测之比的几何平均修正并写回缓存。
+        分支定界与两两表共享同一套搜索和剪枝, 两者都修正分支定界的耗时模型。
+        按本次库存探测估计的计划已反映真实剪枝效率, 不用于修正。
+
+        Args:
+            plan: 已执行的计划
+            seconds: 精确引擎实际耗时(秒)
+        """
+        if plan.free_size <= 0 or plan.probed or seconds < MIN_RECORDED_SECONDS:
+            return
+        predicted = self.exact_engine_costs(
+            plan.exact_module_count, plan.distinct_count, plan.free_size, plan.scored_slots).get(plan.exact_engine)
+        if not predicted:
+            return
+        correction = (seconds / predicted) ** 0.5
+        if plan.exact_engine in (ENGINE_BRANCH_AND_BOUND, ENGINE_MEET_IN_THE_MIDDLE):
+            self.exact_fits[self._fit_key(plan.free_size)].seconds *= correction
+        else:
+            self.unit_costs[self._unit_key(plan.exact_engine, plan.free_size)] *= correction
+        self._save_calibration(self.unit_costs, self.exact_fits)
+
+    def beam_cost(self, module_count: int, free_size: int, beam_width: int, adaptive_width: bool = False) -> float:
+        """估计beam search耗时, 自适应宽度时按最坏情况计入先跑的各轮窄beam"""
+        unit_cost = self.unit_costs[self._unit_key(ENGINE_BEAM, free_size)]
+        widths = [beam_width]
+        if adaptive_width:
+            width = ADAPTIVE_BEAM_INITIAL_WIDTH
+            for _ in range(ADAPTIVE_BEAM_MAX_NARROW_PASSES):
+                if width >= beam_width:
+                    break
+                widths.append(width)
+                width *= ADAPTIVE_BEAM_GROWTH
+        return sum(unit_cost * self.beam_work(module_count, max(free_size, 1), width) for width in widths)
+
+    def annealing_cost(self) -> float:
+        """估计模拟退火耗时: 主要花在候选筛选与计分表构建上, 与重启和移动次数关系不大, 按校准时一次调用的耗时计"""
+        return self.unit_costs[ENGINE_ANNEALING]
+
+    def concurrent_seconds(self, engine_seconds: List[Tuple[float, int]]) -> float:
+        """并行运行的引擎共享全部核心: 各引擎单独运行的耗时乘以线程数折算为CPU时间,
+        合计后除以核心数, 且不少于其中最慢引擎单独运行的耗时
+
+        Args:
+            engine_seconds: (单独运行耗时, 线程数)列表
+
+        Returns:
+            float: 预计总耗时(秒)
+        """
+        cpu_seconds = sum(seconds * min(threads, self.max_workers) for seconds, threads in engine_seconds)
+        return max(max(seconds for seconds, _ in engine_seconds), cpu_seconds / self.max_workers)
+
+    def plan(self, module_count: int, distinct_count: int, candidate_count: int, free_size: int,
+             scored_slots: int, beam_width: int, latency_budget: Optional[float],
+             locked_count: int = 0, adaptive_width: bool = False,
+             exact_fit: Optional[ExactSearchFit] = None, annealing: bool = False) -> StrategyPlan:
+        """在时延预算内选择引擎
+
+        全量精确搜索的最便宜引擎能在预算内完成时单独运行, 结果可证明最优;
+        否则beam search在候选模组上与精确引擎共享核心并行运行: beam(及模拟退火)先缩小宽度到预算的一半以内,
+        精确引擎在剩余预算内覆盖尽可能多的高总属性模组。beam缩到最小宽度仍超出时不运行beam。
+
+        Args:
+            module_count: 支配预筛选后的模组数量
+            distinct_count: 其中属性不同的模组数量
+            candidate_count: 单项属性筛选出的beam候选模组数量, beam实际还覆盖精确引擎的模组
+            free_size: 除锁定模组外待选的位置数
+            scored_slots: 参与计分的属性种类数
+            beam_width: beam search每层宽度
+            latency_budget: 时延预算(秒), None表示不限时
+            locked_count: 锁定模组数量
+            adaptive_width: beam search是否自适应宽度
+            exact_fit: 本次库存上探测得到的分支定界耗时模型, None时使用校准模型
+            annealing: 是否希望与beam并行运行模拟退火, 超出预算份额时不运行
+
+        Returns:
+            StrategyPlan: 执行计划
+        """
+        probed = exact_fit is not None
+        costs = self.exact_engine_costs(module_count, distinct_count, free_size, scored_slots, locked_count, exact_fit)
+        engine = min(costs, key=costs.get)
+        if latency_budget is None or costs[engine] <= latency_budget:
+            return StrategyPlan(
+                engine, module_count, False, costs[engine], True, distinct_count, free_size, scored_slots,
+                probed=probed)
+
+        distinct_ratio = distinct_count / max(module_count, 1)
+        annealing_seconds = self.annealing_cost() if annealing else 0.0
+        run_annealing = 0 < annealing_seconds <= latency_budget * ANNEALING_BUDGET_SHARE
+
+        def estimate(exact_seconds: float, beam_seconds: float) -> float:
+            engine_seconds = [(exact_seconds, self.max_workers)]
+            if beam_seconds > 0:
+                engine_seconds.append((beam_seconds, self.beam_max_workers))
+                if run_annealing:
+                    engine_seconds.append((annealing_seconds, self.max_workers))
+            return self.concurrent_seconds(engine_seconds)
+
+        def cheapest(count: int):
+            sub_costs = self.exact_engine_costs(
+                count, max(free_size, round(count * distinct_ratio)), free_size, scored_slots, locked_count, exact_fit)
+            sub_engine = min(sub_costs, key=sub_costs.get)
+            return sub_engine, sub_costs[sub_engine]
+
+        # beam候选包含精确引擎覆盖的高总属性模组, 以及单项属性筛选出的模组; 精确引擎的覆盖数量确定前按全部模组估计上界
+        planned_width = beam_width
+        beam_seconds = self.beam_cost(module_count, free_size, planned_width, adaptive_width)
+        while estimate(0.0, beam_seconds) > latency_budget * BEAM_BUDGET_SHARE \
+                and planned_width > MIN_PLANNED_BEAM_WIDTH:
+            planned_width = max(MIN_PLANNED_BEAM_WIDTH, int(planned_width * BEAM_SHRINK_FACTOR))
+            beam_seconds = self.beam_cost(module_count, free_size, planned_width, adaptive_width)
+        if estimate(0.0, beam_seconds) > latency_budget * BEAM_BUDGET_SHARE:
+            planned_width, beam_seconds, run_annealing = 0, 0.0, False
+
+        low, high = free_size, module_count - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if estimate(cheapest(mid)[1], beam_seconds) <= latency_budget:
+                low = mid
+            else:
+                high = mid - 1
+        engine, exact_seconds = cheapest(low)
+        if planned_width > 0:
+            beam_seconds = self.beam_cost(
+                min(module_count, low + candidate_count), free_size, planned_width, adaptive_width)
+        return StrategyPlan(
+            engine, low, planned_width > 0, estimate(exact_seconds, beam_seconds), False,
+            max(free_size, round(low * distinct_ratio)), free_size, scored_slots, planned_width,
+            run_annealing and planned_width > 0, probed)
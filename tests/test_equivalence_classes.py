@@ -0,0 +1,139 @@
+"""
+等价类合并测试 - 只有同一大类且属性完全相同的模组才能互相替换
+"""
+
+import pytest
+
+cpp = pytest.importorskip("cpp_extension.module_optimizer_cpp")
+
+from module_optimizer import ModuleOptimizer, ModuleSolution  # noqa: E402
+from module_types import ModuleCategory, ModuleInfo, ModulePart  # noqa: E402
+
+# 攻击类高性能/卓越与防护类高性能, 属性完全相同
+ATTACK_TWIN = 1
+ATTACK_SAME_CATEGORY_TWIN = 2
+PROTECTION_TWIN = 3
+
+
+def _module(uuid, config_id, parts):
+    return cpp.ModuleInfo(str(uuid), config_id, uuid, 4, [cpp.ModulePart(attr_id, str(attr_id), value) for attr_id, value in parts])
+
+
+def _inventory():
+    twin_parts = [(1110, 10), (1111, 10), (1112, 10)]
+    modules = [
+        _module(ATTACK_TWIN, 5500102, twin_parts),
+        _module(ATTACK_SAME_CATEGORY_TWIN, 5500103, twin_parts),
+        _module(PROTECTION_TWIN, 5500302, twin_parts),
+    ]
+    fillers = [[(1113, 6), (1114, 5)], [(1205, 7), (1113, 3)], [(1114, 8), (1206, 2)], [(1113, 4), (1205, 4)]]
+    for offset, parts in enumerate(fillers):
+        modules.append(_module(10 + offset, 5500101, parts))
+    return modules
+
+
+def _equivalents(solution):
+    """uuid -> 该位置可等价替换的uuid集合"""
+    return {module.uuid: set(uuids) for module, uuids in zip(solution.modules, solution.equivalent_uuids)}
+
+
+def test_cross_category_twins_stay_distinct():
+    solutions = cpp.strategy_branch_and_bound_cpp(_inventory(), set(), set(), {}, 60, 1, 4)
+    assert solutions
+
+    for solution in solutions:
+        equivalents = _equivalents(solution)
+        for uuid in (ATTACK_TWIN, ATTACK_SAME_CATEGORY_TWIN):
+            assert PROTECTION_TWIN not in equivalents.get(uuid, set())
+        assert not equivalents.get(PROTECTION_TWIN, set()) & {ATTACK_TWIN, ATTACK_SAME_CATEGORY_TWIN}
+
+    # 防护类副本单独成类, 与攻击类副本分别出现在不同的解中
+    chosen = [{module.uuid for module in solution.modules} for solution in solutions]
+    assert any(PROTECTION_TWIN in uuids and not uuids & {ATTACK_TWIN, ATTACK_SAME_CATEGORY_TWIN} for uuids in chosen)
+    assert any(uuids & {ATTACK_TWIN, ATTACK_SAME_CATEGORY_TWIN} and PROTECTION_TWIN not in uuids for uuids in chosen)
+
+
+def test_same_category_twins_are_collapsed():
+    solutions = cpp.strategy_branch_and_bound_cpp(_inventory(), set(), set(), {}, 60, 1, 4)
+
+    for solution in solutions:
+        equivalents = _equivalents(solution)
+        uuids = set(equivalents)
+        # 同一大类的两个副本只选其一时, 另一个作为等价替换列出, 不再单独成解
+        if ATTACK_TWIN in uuids and ATTACK_SAME_CATEGORY_TWIN not in uuids:
+            assert ATTACK_SAME_CATEGORY_TWIN in equivalents[ATTACK_TWIN]
+        assert not (ATTACK_SAME_CATEGORY_TWIN in uuids and ATTACK_TWIN not in uuids)
+
+
+def _batch_query(module_uuids):
+    query = cpp.BatchQuery()
+    query.module_uuids = set(module_uuids)
+    return query
+
+
+def test_batch_twins_respect_each_query_module_set():
+    # 三个同类副本分属不同查询: 查询间只有可用副本数不同, 副本仍合并为一个等价类
+    twin_parts = [(1110, 10), (1111, 10), (1112, 10)]
+    modules = [_module(uuid, 5500102, twin_parts) for uuid in (1, 2, 3)]
+    fillers = [[(1113, 6), (1114, 5)], [(1205, 7), (1113, 3)], [(1114, 8), (1206, 2)], [(1113, 4), (1205, 4)],
+               [(1110, 3), (1206, 6)], [(1111, 5), (1205, 2)]]
+    for offset, parts in enumerate(fillers):
+        modules.append(_module(10 + offset, 5500101, parts))
+    filler_uuids = {10 + offset for offset in range(len(fillers))}
+    query_sets = [{1} | filler_uuids, {2, 3} | filler_uuids, {1, 2, 3} | filler_uuids]
+
+    results = cpp.strategy_batch_enumeration_cpp(modules, [_batch_query(uuids) for uuids in query_sets], 20, 1, 4)
+
+    for allowed, solutions in zip(query_sets, results):
+        expected = cpp.strategy_branch_and_bound_cpp(
+            [module for module in modules if module.uuid in allowed], set(), set(), {}, 20, 1, 4)
+        assert [solution.score for solution in solutions] == [solution.score for solution in expected]
+        twin_counts = []
+        for solution in solutions:
+            chosen = {module.uuid for module in solution.modules}
+            assert chosen <= allowed
+            for uuids in solution.equivalent_uuids:
+                assert set(uuids) <= allowed - chosen
+            twin_counts.append((len(chosen & {1, 2, 3}), frozenset(chosen & filler_uuids)))
+        # 只交换副本得到的搭配不再单独成解
+        assert len(twin_counts) == len(set(twin_counts))
+        assert max(count for count, _ in twin_counts) == len(allowed & {1, 2, 3})
+
+
+def _py_inventory():
+    return [ModuleInfo(module.name, module.config_id, module.uuid, module.quality,
+                       [ModulePart(part.id, part.name, part.value) for part in module.parts])
+            for module in _inventory()]
+
+
+def _py_solution(modules, uuids, equivalent_uuids=None):
+    by_uuid = {module.uuid: module for module in modules}
+    return ModuleSolution([by_uuid[uuid] for uuid in uuids], 100, {}, equivalent_uuids or [])
+
+
+def test_merged_engine_results_collapse_twins():
+    modules = _py_inventory()
+    optimizer = ModuleOptimizer(lang='en')
+    # beam/退火的结果不合并等价模组, 与精确结果只差一次副本交换
+    exact = _py_solution(modules, [ATTACK_TWIN, 10, 11, 12])
+    beam = _py_solution(modules, [ATTACK_SAME_CATEGORY_TWIN, 10, 11, 12])
+    protection = _py_solution(modules, [PROTECTION_TWIN, 10, 11, 12])
+
+    unique = optimizer._complete_deduplicate([exact, beam, protection], modules)
+    assert unique == [exact, protection]
+    assert exact.equivalent_uuids == [[ATTACK_SAME_CATEGORY_TWIN], [], [], []]
+    assert protection.equivalent_uuids == [[], [], [], []]
+
+    # 不给出模组列表时从被去掉的重复解补全等价模组
+    exact = _py_solution(modules, [ATTACK_TWIN, 10, 11, 12])
+    beam = _py_solution(modules, [ATTACK_SAME_CATEGORY_TWIN, 10, 11, 12])
+    assert optimizer._complete_deduplicate([exact, beam]) == [exact]
+    assert exact.equivalent_uuids == [[ATTACK_SAME_CATEGORY_TWIN], [], [], []]
+
+
+def test_optimize_modules_returns_no_twin_swaps():
+    optimizer = ModuleOptimizer(lang='en')
+    solutions = optimizer.optimize_modules(_py_inventory(), ModuleCategory.ALL, 40)
+    assert solutions
+    keys = [tuple(sorted(optimizer._module_signature(module) for module in solution.modules)) for solution in solutions]
+    assert len(keys) == len(set(keys))
@@ -0,0 +1,215 @@
+"""
+精确引擎一致性测试 - 小库存上与itertools穷举的top-K分数逐一比对
+"""
+
+import itertools
+import random
+from collections import defaultdict
+
+import pytest
+
+cpp = pytest.importorskip("cpp_extension.module_optimizer_cpp")
+
+from module_types import (  # noqa: E402
+    ATTR_THRESHOLDS, BASIC_ATTR_POWER_MAP, SPECIAL_ATTR_IDS, SPECIAL_ATTR_POWER_MAP, TOTAL_ATTR_POWER_MAP,
+)
+
+COMBINATION_SIZE = 4
+TOP_K = 12
+ATTR_POOL = [1110, 1111, 1112, 1113, 1114, 1205, 1206, 2104, 2105, 2204]
+CONFIG_IDS = [5500101, 5500102, 5500103, 5500201, 5500202, 5500301]
+
+# (target, exclude, min_attr_sum, locked, banned)
+CASES = {
+    "plain": (set(), set(), {}, set(), set()),
+    "target": ({1110, 2104}, set(), {}, set(), set()),
+    "exclude": (set(), {1111, 1205}, {}, set(), set()),
+    "min_attr": (set(), set(), {1110: 8, 1113: 4}, set(), set()),
+    "locked_banned": (set(), set(), {}, {3}, {5, 7}),
+    "combined": ({1112}, {1113}, {1205: 4}, {8}, {2, 11}),
+}
+
+
+def _inventory(seed=7, count=30):
+    """无等价副本的随机库存; 单个模组总属性值5~21, 4件组合的总值落在总属性战力表连续的区间内"""
+    rng = random.Random(seed)
+    modules, signatures = [], set()
+    while len(modules) < count:
+        attrs = rng.sample(ATTR_POOL, rng.randint(1, 3))
+        parts = [(attr_id, rng.randint(1, 9)) for attr_id in attrs]
+        if not 5 <= sum(value for _, value in parts) <= 21:
+            continue
+        config_id = rng.choice(CONFIG_IDS)
+        signature = (config_id // 100, tuple(sorted(parts)))
+        if signature in signatures:
+            continue
+        signatures.add(signature)
+        uuid = len(modules) + 1
+        modules.append(cpp.ModuleInfo(str(uuid), config_id, uuid, 4,
+                                      [cpp.ModulePart(attr_id, str(attr_id), value) for attr_id, value in parts]))
+    return modules
+
+
+def _attr_sums(combo):
+    sums = defaultdict(int)
+    for module in combo:
+        for part in module.parts:
+            sums[part.id] += part.value
+    return sums
+
+
+def _score(combo, target, exclude):
+    sums = _attr_sums(combo)
+    power = 0
+    for attr_id, value in sums.items():
+        level = sum(1 for threshold in ATTR_THRESHOLDS if value >= threshold)
+        if level == 0:
+            continue
+        base = SPECIAL_ATTR_POWER_MAP[level] if attr_id in SPECIAL_ATTR_IDS else BASIC_ATTR_POWER_MAP[level]
+        multiplier = 2 if target and attr_id in target else 0 if attr_id in exclude else 1
+        power += base * multiplier
+    return power + TOTAL_ATTR_POWER_MAP[sum(sums.values())]
+
+
+_BRUTE_FORCE_CACHE = {}
+
+
+def _brute_force(modules, case, required=None):
+    """全部满足约束的组合, 按分数降序; required给出时只枚举包含该模组的组合"""
+    key = (tuple(module.uuid for module in modules), repr(case), required and required.uuid)
+    if key not in _BRUTE_FORCE_CACHE:
+        _BRUTE_FORCE_CACHE[key] = _enumerate(modules, case, required)
+    return _BRUTE_FORCE_CACHE[key]
+
+
+def _enumerate(modules, case, required):
+    target, exclude, min_attr, locked, banned = case
+    pool = [module for module in modules if module.uuid not in banned and module is not required]
+    if required is None:
+        combos = itertools.combinations(pool, COMBINATION_SIZE)
+    else:
+        combos = ((required,) + rest for rest in itertools.combinations(pool, COMBINATION_SIZE - 1))
+    results = []
+    for combo in combos:
+        if not locked <= {module.uuid for module in combo}:
+            continue
+        sums = _attr_sums(combo)
+        if any(sums[attr_id] < value for attr_id, value in min_attr.items()):
+            continue
+        results.append((_score(combo, target, exclude), combo))
+    results.sort(key=lambda item: -item[0])
+    return results
+
+
+def _top_scores(modules, case, k=TOP_K):
+    return [score for score, _ in _brute_force(modules, case)[:k]]
+
+
+def _kwargs(case):
+    target, exclude, min_attr, locked, banned = case
+    return dict(target_attributes=target, exclude_attributes=exclude, min_attr_sum_requirements=min_attr,
+                combination_size=COMBINATION_SIZE, locked_uuids=locked, banned_uuids=banned)
+
+
+@pytest.fixture(scope="module")
+def modules():
+    return _inventory()
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+@pytest.mark.parametrize("engine", ["strategy_branch_and_bound_cpp", "strategy_meet_in_the_middle_cpp",
+                                    "strategy_capped_sum_dp_cpp", "strategy_beam_then_exact_cpp"])
+def test_top_k_matches_brute_force(modules, case, engine):
+    solutions = getattr(cpp, engine)(modules, max_solutions=TOP_K, max_workers=1, **_kwargs(case))
+    assert [solution.score for solution in solutions] == _top_scores(modules, case)
+    for solution in solutions:
+        assert solution.score == _score(solution.modules, case[0], case[1])
+        assert case[3] <= {module.uuid for module in solution.modules}
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_pages_concatenate_to_top_k(modules, case):
+    cursor = cpp.SearchCursor()
+    scores = []
+    for _ in range(3):
+        page = cpp.strategy_branch_and_bound_page_cpp(modules, cursor, max_solutions=TOP_K // 3, max_workers=1,
+                                                      **_kwargs(case))
+        scores.extend(solution.score for solution in page)
+    assert scores == _top_scores(modules, case)
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_pareto_frontier_matches_brute_force(modules, case):
+    frontier_attributes = [1110, 1205]
+    solutions = cpp.strategy_pareto_frontier_cpp(modules, frontier_attributes, max_workers=1, **_kwargs(case))
+
+    def point(score, combo):
+        sums = _attr_sums(combo)
+        return (score,) + tuple(sums[attr_id] for attr_id in frontier_attributes)
+
+    points = {point(score, combo) for score, combo in _brute_force(modules, case)}
+    frontier = {p for p in points
+                if not any(q != p and all(a >= b for a, b in zip(q, p)) for q in points)}
+    assert {point(solution.score, solution.modules) for solution in solutions} == frontier
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_importance_matches_brute_force(modules, case):
+    banned = case[4]
+    reports = cpp.module_importance_report_cpp(modules, max_solutions=TOP_K, max_workers=1, **_kwargs(case))
+    combos = _brute_force(modules, case)
+    best = combos[0][0]
+    for report in reports:
+        assert not report.partial and report.uuid not in banned
+        containing = [score for score, combo in combos if any(module.uuid == report.uuid for module in combo)]
+        assert report.best_score == (containing[0] if containing else -1)
+        if report.uuid not in case[3]:
+            remaining = [score for score, combo in combos if all(module.uuid != report.uuid for module in combo)]
+            assert report.loss_if_removed == best - (remaining[0] if remaining else 0)
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_what_if_matches_brute_force(modules, case):
+    hypotheticals = [
+        cpp.ModuleInfo("h1", 5500102, 101, 4, [cpp.ModulePart(1110, "1110", 9), cpp.ModulePart(2104, "2104", 9)]),
+        cpp.ModuleInfo("h2", 5500301, 102, 4, [cpp.ModulePart(1113, "1113", 3), cpp.ModulePart(1205, "1205", 3)]),
+        cpp.ModuleInfo("h3", 5500201, 103, 4, [cpp.ModulePart(1112, "1112", 9), cpp.ModulePart(1205, "1205", 9)]),
+    ]
+    results = cpp.evaluate_hypothetical_modules_cpp(modules, [], hypotheticals, max_workers=1, **_kwargs(case))
+    baseline = _brute_force(modules, case)[0][0]
+    for hypothetical, result in zip(hypotheticals, results):
+        assert result.uuid == hypothetical.uuid and not result.partial
+        containing = _brute_force(modules + [hypothetical], case, required=hypothetical)
+        expected = containing[0][0] if containing else -1
+        assert result.gain == max(0, expected - baseline)
+        if result.gain > 0:
+            assert result.best_score == expected
+        else:
+            assert result.best_score <= expected
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_batch_matches_brute_force(modules, case):
+    target, exclude, min_attr, locked, banned = case
+    module_sets = [{module.uuid for module in modules}, {module.uuid for module in modules if module.uuid % 3}]
+    queries = []
+    for module_uuids in module_sets:
+        query = cpp.BatchQuery()
+        query.target_attributes = target
+        query.exclude_attributes = exclude
+        query.min_attr_sum_requirements = min_attr
+        query.module_uuids = module_uuids | locked
+        queries.append(query)
+
+    results = cpp.strategy_batch_enumeration_cpp(modules, queries, TOP_K, 1, COMBINATION_SIZE,
+                                                 locked_uuids=locked, banned_uuids=banned)
+    for query, solutions in zip(queries, results):
+        subset = [module for module in modules if module.uuid in query.module_uuids]
+        assert [solution.score for solution in solutions] == _top_scores(subset, case)
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_prefilter_keeps_top_k(modules, case):
+    kept = cpp.prefilter_dominated_modules_cpp(modules, max_solutions=TOP_K, **_kwargs(case))
+    assert case[3] <= {module.uuid for module in kept}
+    assert _top_scores(kept, case) == _top_scores(modules, case)
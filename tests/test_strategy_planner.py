@@ -0,0 +1,64 @@
+"""
+策略规划测试 - 耗时模型拟合、共享核心的并行耗时与时延预算内完成
+"""
+
+import random
+import time
+from math import comb
+
+import pytest
+
+pytest.importorskip("cpp_extension.module_optimizer_cpp")
+
+from module_optimizer import ModuleOptimizer  # noqa: E402
+from module_types import BASIC_ATTR_IDS, ModuleCategory, ModuleInfo, ModulePart, MODULE_ATTR_NAMES  # noqa: E402
+from strategy_planner import ExactSearchFit, StrategyPlanner  # noqa: E402
+
+
+def test_exact_fit_recovers_power_law():
+    # 节点数 ~ C^0.5, 吞吐 ~ C^-0.1, 耗时 ~ C^0.6
+    samples = [(count, int(comb(count, 4) ** 0.5), 1e-7 * comb(count, 4) ** 0.6) for count in (100, 160, 256)]
+    fit = ExactSearchFit.from_samples(4, samples)
+    assert fit.node_exponent == pytest.approx(0.5, abs=0.01)
+    assert fit.throughput_exponent == pytest.approx(0.1, abs=0.01)
+    assert fit.estimate_seconds(1000, 4) == pytest.approx(1e-7 * comb(1000, 4) ** 0.6, rel=0.05)
+
+
+def test_concurrent_engines_share_cores(tmp_path):
+    single = StrategyPlanner(1, 1, 512, cache_path=str(tmp_path / "single.json"))
+    assert single.concurrent_seconds([(2.0, 1), (3.0, 1)]) == pytest.approx(5.0)
+    many = StrategyPlanner(8, 3, 512, cache_path=str(tmp_path / "many.json"))
+    # 8核上3线程的beam与8线程的精确引擎: CPU时间合计(2x3+3x8)/8, 不少于较慢者
+    assert many.concurrent_seconds([(2.0, 3), (3.0, 8)]) == pytest.approx(30.0 / 8)
+    assert many.concurrent_seconds([(2.0, 1), (0.5, 1)]) == pytest.approx(2.0)
+
+
+def _inventory(count=400, seed=3):
+    rng = random.Random(seed)
+    attr_ids = sorted(BASIC_ATTR_IDS)[:9]
+    modules = []
+    for uuid in range(1, count + 1):
+        parts = [ModulePart(attr_id, MODULE_ATTR_NAMES[attr_id], rng.randint(1, 10))
+                 for attr_id in rng.sample(attr_ids, rng.choice((2, 3, 3)))]
+        modules.append(ModuleInfo(str(uuid), 5500101, uuid, 4, parts))
+    return modules
+
+
+@pytest.mark.parametrize("latency_budget, deadline_ms", [(2.0, 0), (None, 2000)], ids=["budget", "deadline"])
+def test_planned_run_stays_within_budget(tmp_path, latency_budget, deadline_ms):
+    budget = latency_budget or deadline_ms / 1000.0
+    optimizer = ModuleOptimizer(lang='en', combination_size=5, latency_budget=latency_budget, deadline_ms=deadline_ms)
+    optimizer.beam_width = 512
+    planner = StrategyPlanner(optimizer.get_cpu_count(), optimizer._beam_worker_count(), optimizer.beam_width,
+                              cache_path=str(tmp_path / "calibration.json"))
+    # 校准只在首次运行, 不计入本次计时
+    planner.ensure_calibrated()
+    optimizer._planner = planner
+
+    start = time.perf_counter()
+    solutions = optimizer.optimize_modules(_inventory(), ModuleCategory.ATTACK, 20)
+    elapsed = time.perf_counter() - start
+
+    # 全量精确搜索远超预算, 规划只覆盖部分模组
+    assert solutions and not all(solution.certified for solution in solutions)
+    assert elapsed <= budget * 1.25 + 0.5